@@ -1,24 +1,9 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, has_app_context
 from flask_cors import CORS
 import sqlite3
 import os
 import jwt
 from datetime import datetime, timedelta
-
-# Earnings calculation constants
-EARNINGS_PERCENTAGES = {
-    'pilot': 0.50,      # 50%
-    'editor': 0.15,     # 15%
-    'referral': 0.125,  # 12.5%
-    'hmx': 0.20,        # 20%
-    'payment_gateway': 0.025  # 2.5%
-}
-
-def calculate_earnings(total_amount, user_type):
-    """Calculate earnings for different user types"""
-    if user_type not in EARNINGS_PERCENTAGES:
-        return 0
-    return round(total_amount * EARNINGS_PERCENTAGES[user_type], 2)
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 import hashlib
@@ -26,50 +11,135 @@ import random
 import string
 import werkzeug
 from phonepe_payment import phonepe
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from config import DatabaseConfig, AuthConfig, EmailConfig, MetricsConfig, OtpConfig, PhonePeConfig, SlowQueryConfig
+from db_pool import ConnectionPool, CheckpointScheduler
+from migrations import migrate, ensure_schema
+from principal_cache import PrincipalCache, table_for_role
+from password_hashing import PasswordHasher, HashingBusy, in_pool_process
+from email_outbox import OutboxSender, enqueue as enqueue_email, outbox_stats
+from mailer import SMTPPool
+from email_templates import TemplateCache
+from email_broadcast import create_job, render_job, cancel_job, job_progress
+from payment_events import PaymentEventProcessor, parse_callback, record_event, events_stats
+from payment_reconciler import PaymentReconciler, reconcile_lag
+from request_metrics import RequestMetrics
+from slow_queries import SlowQueryLog
+import otp_store
+from otp_store import OtpSweeper, OtpThrottled
+import app_logging
+import dashboard_counters
+import earnings
+import pricing
+from concurrent.futures import ThreadPoolExecutor
+from list_query import (ListQuery, ListQueryError, Field, Filter, parse_date, cached_query, columns_of,
+                        json_response, ndjson_response, csv_response)
 import threading
 import json
 import random
 import string
 from datetime import datetime, timedelta
 
+# Leveled logging written by a background thread (see app_logging.py); LOG_LEVEL=DEBUG for request traces
+app_logging.setup()
+logger = app_logging.get_logger('app')
+
 # Load environment variables from .env file
 try:
     from dotenv import load_dotenv
     load_dotenv()
-    print("✅ Environment variables loaded from .env file")
+    logger.info('✅ Environment variables loaded from .env file')
 except ImportError:
-    print("⚠️  python-dotenv not installed. Install with: pip install python-dotenv")
-    print("⚠️  Using system environment variables only")
+    logger.warning('⚠️  python-dotenv not installed. Install with: pip install python-dotenv')
+    logger.warning('⚠️  Using system environment variables only')
 
 app = Flask(__name__)
 
 # Configure CORS to allow both development ports and Authorization header
-CORS(app, origins=['http://localhost:5173', 'http://localhost:5174'], supports_credentials=True, allow_headers=["Content-Type", "Authorization"])
+CORS(app, origins=['http://localhost:5173', 'http://localhost:5174'], supports_credentials=True, allow_headers=["Content-Type", "Authorization"], expose_headers=["X-Next-Cursor", "X-Total-Count"])
 
 # Configuration
 app.config['SECRET_KEY'] = 'your-secret-key-here'  # Change this in production
-DATABASE = 'hmx.db'  # Changed from 'backend/hmx.db' to just 'hmx.db'
+DATABASE = DatabaseConfig.PATH  # Defaults to 'hmx.db' next to the app
+
+# One pool of pre-configured connections per worker process
+db_pool = ConnectionPool(
+    DATABASE,
+    max_size=DatabaseConfig.POOL_SIZE,
+    timeout=DatabaseConfig.BUSY_TIMEOUT,
+    acquire_timeout=DatabaseConfig.POOL_ACQUIRE_TIMEOUT,
+    pragmas=DatabaseConfig.pragmas()
+)
+
+# Wall time, SQL time, statements and rows per endpoint, with a Server-Timing header on every response
+request_metrics = RequestMetrics(window=MetricsConfig.WINDOW, server_timing=MetricsConfig.SERVER_TIMING)
+if MetricsConfig.ENABLED:
+    request_metrics.init_app(app, db_pool)
+
+# Statements over SLOW_QUERY_MS are logged with their query plan and aggregated for /api/admin/slow-queries
+slow_queries = SlowQueryLog(threshold_ms=SlowQueryConfig.THRESHOLD_MS, explain=SlowQueryConfig.EXPLAIN)
+if SlowQueryConfig.THRESHOLD_MS > 0:
+    slow_queries.init_app(app, db_pool)
+
+# Periodic WAL checkpoints (only meaningful when journal_mode is WAL)
+wal_checkpointer = CheckpointScheduler(
+    db_pool,
+    interval=DatabaseConfig.CHECKPOINT_INTERVAL if DatabaseConfig.JOURNAL_MODE.upper() == 'WAL' else 0,
+    truncate_pages=DatabaseConfig.CHECKPOINT_TRUNCATE_PAGES,
+    truncate_timeout=DatabaseConfig.CHECKPOINT_TRUNCATE_TIMEOUT
+)
+
+# Account rows behind recently seen tokens, so token_required skips the lookup
+principal_cache = PrincipalCache(
+    ttl=AuthConfig.PRINCIPAL_CACHE_TTL,
+    max_entries=AuthConfig.PRINCIPAL_CACHE_SIZE
+)
+
+# scrypt/pbkdf2 run in a small process pool so they never hold the request threads' GIL
+password_hasher = PasswordHasher(
+    method=AuthConfig.PASSWORD_HASH_METHOD,
+    workers=AuthConfig.PASSWORD_HASH_WORKERS,
+    max_pending=AuthConfig.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=AuthConfig.PASSWORD_HASH_QUEUE_TIMEOUT
+)
 
 # Email Configuration
 EMAIL_CONFIG = {
-    'SMTP_SERVER': os.getenv('SMTP_SERVER'),  # No default
-    'SMTP_PORT': int(os.getenv('SMTP_PORT', '587')),  # Port can have default
-    'EMAIL_ADDRESS': os.getenv('EMAIL_ADDRESS'),
-    'EMAIL_PASSWORD': os.getenv('EMAIL_PASSWORD'),  # Must be set in env
-    'USE_TLS': os.getenv('USE_TLS', 'true').lower() == 'true'
+    'SMTP_SERVER': EmailConfig.SMTP_SERVER,
+    'SMTP_PORT': EmailConfig.SMTP_PORT,
+    'EMAIL_ADDRESS': EmailConfig.EMAIL_ADDRESS,
+    'EMAIL_PASSWORD': EmailConfig.EMAIL_PASSWORD,
+    'USE_TLS': EmailConfig.USE_TLS
 }
 
+# Reused authenticated SMTP sessions, so a burst of mail pays one handshake
+smtp_pool = SMTPPool.from_config(EmailConfig)
+
+# Compiled email templates; edits through this worker invalidate, others reload after the TTL
+template_cache = TemplateCache(ttl=EmailConfig.TEMPLATE_CACHE_TTL)
+
+# Renders broadcast jobs one at a time, off the request threads
+broadcast_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-broadcast')
+
+# Handlers only enqueue into email_outbox; this drains it (see email_outbox.py)
+email_sender = OutboxSender.from_config(db_pool, send=smtp_pool.send)
+
+# The callback endpoint only records events in payment_events; this confirms and applies them
+payment_processor = PaymentEventProcessor.from_config(db_pool, phonepe)
+
+# Settles payments still pending after their callback should have arrived
+payment_reconciler = PaymentReconciler.from_config(db_pool, phonepe)
+
+# Deletes expired OTP rows once their resend window is over
+otp_sweeper = OtpSweeper(db_pool, interval=OtpConfig.SWEEP_INTERVAL)
+
 # Debug email configuration
-print("📧 Email Configuration:")
-print(f"   SMTP Server: {EMAIL_CONFIG['SMTP_SERVER']}")
-print(f"   SMTP Port: {EMAIL_CONFIG['SMTP_PORT']}")
-print(f"   Email Address: {EMAIL_CONFIG['EMAIL_ADDRESS']}")
-print(f"   Password Set: {'Yes' if EMAIL_CONFIG['EMAIL_PASSWORD'] else 'No'}")
-print(f"   Use TLS: {EMAIL_CONFIG['USE_TLS']}")
-print()
+logger.info('📧 Email Configuration:')
+logger.info('   SMTP Server: %s', EMAIL_CONFIG['SMTP_SERVER'])
+logger.info('   SMTP Port: %s', EMAIL_CONFIG['SMTP_PORT'])
+logger.info('   Email Address: %s', EMAIL_CONFIG['EMAIL_ADDRESS'])
+logger.info('   Password Set: %s', 'Yes' if EMAIL_CONFIG['EMAIL_PASSWORD'] else 'No')
+logger.info('   Use TLS: %s', EMAIL_CONFIG['USE_TLS'])
+logger.info('   Outbox sender: %s', EmailConfig.OUTBOX_SENDER)
 
 CITY_LIST = [
     'Mumbai',
@@ -93,37 +163,40 @@ def get_cors_origin():
     return 'http://localhost:5173'  # fallback
 
 # Email sending functions
-def send_email_async(to_email, subject, body, is_html=False):
-    """Send email asynchronously to avoid blocking the main thread"""
-    def send_email():
-        try:
-            send_email_sync(to_email, subject, body, is_html)
-        except Exception as e:
-            print(f"Failed to send email to {to_email}: {str(e)}")
+def queue_email(to_email, subject, body, is_html=False):
+    """Add a message to email_outbox; the outbox sender delivers it in the background"""
+    email_id = enqueue_email(get_db(), to_email, subject, body, is_html)
+    email_sender.wake()
+    logger.info('📧 Queued email %s to %s', email_id, to_email)
+    return email_id
+
 
-    thread = threading.Thread(target=send_email)
-    thread.daemon = True
-    thread.start()
+def send_email_async(to_email, subject, body, is_html=False):
+    """Queue an email instead of sending it on the request thread"""
+    return queue_email(to_email, subject, body, is_html)
     
     
-def send_email_with_template_helper(to_email, template_name, variables):
-    """Fetch template, replace variables, and send email"""
-    conn = sqlite3.connect("hmx.db")
-    c = conn.cursor()
-    c.execute("SELECT subject, body FROM email_templates WHERE name=?", (template_name,))
-    row = c.fetchone()
-    conn.close()
+def load_email_template(name):
+    """Compiled template from the cache, or None if there is no such template"""
+    def fetch():
+        return get_db().execute("SELECT subject, body FROM email_templates WHERE name=?", (name,)).fetchone()
+    return template_cache.get(name, fetch)
+
 
-    if not row:
-        print(f"❌ Template {template_name} not found in DB")
+def send_email_with_template_helper(to_email, template_name, variables):
+    """Render a stored template and queue the email"""
+    template = load_email_template(template_name)
+    if not template:
+        logger.error('❌ Template %s not found in DB', template_name)
         return False
 
-    subject, body = row
-    for key, value in variables.items():
-        subject = subject.replace(f"{{{{{key}}}}}", str(value))
-        body = body.replace(f"{{{{{key}}}}}", str(value))
+    missing = template.missing(variables)
+    if missing:
+        logger.warning('⚠️  Template %s has no value for: %s', template_name, ', '.join(missing))
 
-    return send_email_sync(to_email, subject, body, is_html=True)
+    subject, body = template.render(variables)
+    queue_email(to_email, subject, body, is_html=True)
+    return True
 
 
 def generate_random_password(length=10):
@@ -131,1139 +204,142 @@ def generate_random_password(length=10):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
 
-def send_email_sync(to_email, subject, body, is_html=False):
-    """Send email synchronously"""
-    try:
-        print(f"📧 Attempting to send email to: {to_email}")
-        print(f"📧 Using SMTP: {EMAIL_CONFIG['SMTP_SERVER']}:{EMAIL_CONFIG['SMTP_PORT']}")
-        print(f"📧 From: {EMAIL_CONFIG['EMAIL_ADDRESS']}")
-        print(f"📧 Password configured: {'Yes' if EMAIL_CONFIG['EMAIL_PASSWORD'] else 'No'}")
-
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = EMAIL_CONFIG['EMAIL_ADDRESS']
-        msg['To'] = to_email
-        msg['Subject'] = subject
-
-        # Add body to email
-        if is_html:
-            msg.attach(MIMEText(body, 'html'))
-        else:
-            msg.attach(MIMEText(body, 'plain'))
-
-        print("📧 Connecting to SMTP server...")
-        # Create SMTP session
-        server = smtplib.SMTP(EMAIL_CONFIG['SMTP_SERVER'], EMAIL_CONFIG['SMTP_PORT'])
-
-        if EMAIL_CONFIG['USE_TLS']:
-            print("📧 Starting TLS...")
-            server.starttls()  # Enable security
-
-        # Login if credentials are provided
-        if EMAIL_CONFIG['EMAIL_PASSWORD']:
-            print("📧 Logging in with credentials...")
-            server.login(EMAIL_CONFIG['EMAIL_ADDRESS'], EMAIL_CONFIG['EMAIL_PASSWORD'])
-        else:
-            print("⚠️  No password configured - attempting to send without authentication")
-
-        print("📧 Sending email...")
-        # Send email
-        text = msg.as_string()
-        server.sendmail(EMAIL_CONFIG['EMAIL_ADDRESS'], to_email, text)
-        server.quit()
-
-        print(f"✅ Email sent successfully to {to_email}")
-        return True
-
-    except Exception as e:
-        print(f"❌ Failed to send email to {to_email}: {str(e)}")
-        print(f"❌ Error type: {type(e).__name__}")
-        import traceback
-        print(f"❌ Full traceback: {traceback.format_exc()}")
-        return False
-
-
-
 def init_db():
-    print("\n=== Initializing Database ===")
-    print(f"Database path: {os.path.abspath(DATABASE)}")
-
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-
-    # Check if users table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-    if not c.fetchone():
-        print("Creating users table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT,
-                email TEXT UNIQUE,
-                password_hash TEXT,
-                role TEXT DEFAULT 'admin',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-    else:
-        # Add missing columns to existing users table if needed
-        new_columns = [
-            ('username', 'TEXT'),
-            ('updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
-        ]
-
-        for column_name, column_type in new_columns:
-            try:
-                c.execute(f'ALTER TABLE users ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to users table")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" not in str(e):
-                    print(f"Error adding {column_name} column: {e}")
-                else:
-                    print(f"{column_name} column already exists")
-# --- Ensure default admin exists ---
-    admin_email = "admin@hmx.com"
-    c.execute("SELECT id FROM users WHERE email=?", (admin_email,))
-    if not c.fetchone():
-        from datetime import datetime
-        from werkzeug.security import generate_password_hash
-
-        password_hash = generate_password_hash("JustBrew@45")
-        c.execute('''INSERT INTO users (username, email, password_hash, role, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (
-        "Admin User",
-        admin_email,
-        password_hash,
-        "admin",
-        datetime.now(),
-        datetime.now()
-        ))
-        print("\n✅ Admin user created successfully!")
-        print(f"Email: {admin_email}")
-        print("Password: JustBrew@45")
-    else:
-        print("\nℹ️ Admin user already exists")
-    # Check if pilots table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pilots'")
-    if not c.fetchone():
-        print("Creating pilots table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS pilots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                full_name TEXT,
-                email TEXT UNIQUE NOT NULL,
-                phone TEXT,
-                password TEXT,
-                password_hash TEXT NOT NULL,
-                date_of_birth DATE,
-                gender TEXT,
-                address TEXT,
-                government_id_proof TEXT,
-                license_number TEXT,
-                issuing_authority TEXT,
-                license_issue_date DATE,
-                license_expiry_date DATE,
-                drone_model TEXT,
-                drone_serial TEXT,
-                drone_uin TEXT,
-                drone_category TEXT,
-                total_flying_hours INTEGER,
-                flight_records TEXT,
-                insurance_policy TEXT,
-                insurance_validity DATE,
-                pilot_license_url TEXT,
-                id_proof_url TEXT,
-                training_certificate_url TEXT,
-                photograph_url TEXT,
-                insurance_certificate_url TEXT,
-                experience TEXT,
-                equipment TEXT,
-                cities TEXT,
-                portfolio_url TEXT,
-                bank_account TEXT,
-                status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-    else:
-        # Add missing columns to existing pilots table
-        new_columns = [
-            ('password_hash', 'TEXT'),
-            ('full_name', 'TEXT'),
-            ('date_of_birth', 'DATE'),
-            ('gender', 'TEXT'),
-            ('address', 'TEXT'),
-            ('government_id_proof', 'TEXT'),
-            ('license_number', 'TEXT'),
-            ('issuing_authority', 'TEXT'),
-            ('license_issue_date', 'DATE'),
-            ('license_expiry_date', 'DATE'),
-            ('drone_model', 'TEXT'),
-            ('drone_serial', 'TEXT'),
-            ('drone_uin', 'TEXT'),
-            ('drone_category', 'TEXT'),
-            ('total_flying_hours', 'INTEGER'),
-            ('flight_records', 'TEXT'),
-            ('insurance_policy', 'TEXT'),
-            ('insurance_validity', 'DATE'),
-            ('pilot_license_url', 'TEXT'),
-            ('id_proof_url', 'TEXT'),
-            ('training_certificate_url', 'TEXT'),
-            ('photograph_url', 'TEXT'),
-            ('insurance_certificate_url', 'TEXT'),
-            ('portfolio_url', 'TEXT'),
-            ('bank_account', 'TEXT'),
-            ('experience', 'TEXT'),
-            ('equipment', 'TEXT'),
-            ('cities', 'TEXT')
-        ]
-
-        for column_name, column_type in new_columns:
-            try:
-                c.execute(f'ALTER TABLE pilots ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to pilots table")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" not in str(e):
-                    print(f"Error adding {column_name} column: {e}")
-                else:
-                    print(f"{column_name} column already exists")
-
-    # Check if bookings table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='bookings'")
-    if not c.fetchone():
-        print("Creating bookings table...")
-        c.execute('''
-           CREATE TABLE IF NOT EXISTS bookings (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    pilot_id INTEGER,
-    editor_id INTEGER,
-    referral_id INTEGER,
-
-    -- Booking details
-    location_address TEXT,
-    gps_link TEXT,
-    property_type TEXT,
-    indoor_outdoor TEXT,
-    area_size REAL,
-    area_unit TEXT,
-    rooms_sections INTEGER,
-    num_floors INTEGER,
-    preferred_date DATE,
-    preferred_time TEXT,
-    special_requirements TEXT,
-    drone_permissions_required BOOLEAN,
-    -- Cost
-    base_package_cost REAL,
-    total_cost REAL,
-    custom_quote TEXT,
-
-    -- Status / meta
-    status TEXT DEFAULT 'pending',
-    payment_status TEXT DEFAULT 'pending',
-    payment_amount DECIMAL(10,2),
-    payment_date TIMESTAMP,
-    completed_date TIMESTAMP,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    admin_comments TEXT,
-    description TEXT,
-    delivery_video_link TEXT,
-    drive_link TEXT,
-
-    -- Earnings
-    pilot_earnings DECIMAL(10,2),
-    editor_earnings DECIMAL(10,2),
-    referral_earnings DECIMAL(10,2),
-    hmx_earnings DECIMAL(10,2),
-    gateway_fees DECIMAL(10,2),
-
-    -- Relationships
-    FOREIGN KEY (user_id) REFERENCES users (id),
-    FOREIGN KEY (pilot_id) REFERENCES pilots (id),
-    FOREIGN KEY (editor_id) REFERENCES editors (id),
-    FOREIGN KEY (referral_id) REFERENCES referrals (id)
-    )
-    ''')
-    
-
-    else:
-        # Add new columns to existing bookings table
-        required_columns = {
-        "location_address": "TEXT",
-        "gps_link": "TEXT",
-        "property_type": "TEXT",
-        "indoor_outdoor": "TEXT",
-        "area_size": "REAL",
-        "area_unit": "TEXT",
-        "rooms_sections": "INTEGER",
-        "num_floors": "INTEGER",
-        "preferred_date": "DATE",
-        "preferred_time": "TEXT",
-        "special_requirements": "TEXT",
-        "drone_permissions_required": "BOOLEAN",
-        "base_package_cost": "REAL",
-        "total_cost": "REAL",
-        "custom_quote": "TEXT",
-        "description": "TEXT",
-        "delivery_video_link": "TEXT",
-        "pilot_earnings": "DECIMAL(10,2)",
-        "editor_earnings": "DECIMAL(10,2)",
-        "referral_earnings": "DECIMAL(10,2)",
-        "hmx_earnings": "DECIMAL(10,2)",
-        "gateway_fees": "DECIMAL(10,2)"
-    }
-
-    # Get existing columns
-        c.execute("PRAGMA table_info(bookings)")
-        existing_cols = [row[1] for row in c.fetchall()]
-
-    # Add only missing ones
-        for col, col_type in required_columns.items():
-            if col not in existing_cols:
-                print(f"Adding missing column: {col}")
-                c.execute(f"ALTER TABLE bookings ADD COLUMN {col} {col_type}")
-
-    # Check if messages table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='messages'")
-    if not c.fetchone():
-        print("Creating messages table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender_id INTEGER,
-                receiver_id INTEGER,
-                message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                read_at TIMESTAMP,
-                FOREIGN KEY (sender_id) REFERENCES users (id),
-                FOREIGN KEY (receiver_id) REFERENCES users (id)
-            )
-        ''')
-    
-    # Check if videos table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='videos'")
-    if not c.fetchone():
-        print("Creating videos table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS videos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                booking_id INTEGER,
-                title TEXT,
-                description TEXT,
-                status TEXT DEFAULT 'pending',
-                review_type TEXT,
-                drive_link TEXT,
-                review_notes TEXT,
-                editor_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (booking_id) REFERENCES bookings (id),
-                FOREIGN KEY (editor_id) REFERENCES editors (id)
-            )
-        ''')
-    else:
-        # Check if editor_id column exists
-        c.execute("PRAGMA table_info(videos)")
-        columns = [column[1] for column in c.fetchall()]
-        if 'editor_id' not in columns:
-            print("Adding editor_id column to videos table...")
-            c.execute('ALTER TABLE videos ADD COLUMN editor_id INTEGER REFERENCES editors(id)')
-            print("editor_id column added successfully")
-    
-    # Check if referrals table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='referrals'")
-    if not c.fetchone():
-        print("Creating referrals table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS referrals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                email TEXT UNIQUE,
-                phone TEXT,
-                status TEXT DEFAULT 'pending',
-                commission_rate DECIMAL(5,2),
-                total_earnings DECIMAL(10,2) DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-    else:
-        # Add missing columns to existing referrals table
-        new_columns = [
-            ('commission_rate', 'DECIMAL(5,2)'),
-            ('total_earnings', 'DECIMAL(10,2) DEFAULT 0'),
-            ('updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
-        ]
-        
-        for column_name, column_type in new_columns:
-            try:
-                c.execute(f'ALTER TABLE referrals ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to referrals table")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" not in str(e):
-                    print(f"Error adding {column_name} column: {e}")
-                else:
-                    print(f"{column_name} column already exists")
-
-    # Check if video_reviews table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='video_reviews'")
-    if not c.fetchone():
-        print("Creating video_reviews table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS video_reviews (
-                video_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                client_id INTEGER,
-                editor_id INTEGER,
-                pilot_id INTEGER,
-                drive_link TEXT,
-                submitted_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                admin_comments TEXT,
-                pilot_comments TEXT,
-                editor_comments TEXT,
-                status TEXT DEFAULT 'submitted' CHECK (status IN ('submitted', 'review_changes', 'completed', 'forwarded_to_editor')),
-                submission_type TEXT DEFAULT 'pilot' CHECK (submission_type IN ('pilot', 'editor')),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES bookings (id),
-                FOREIGN KEY (client_id) REFERENCES users (id),
-                FOREIGN KEY (editor_id) REFERENCES editors (id),
-                FOREIGN KEY (pilot_id) REFERENCES pilots (id)
-            )
-        ''')
-        print("video_reviews table created successfully")
-
-    # Check if editors table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='editors'")
-    if not c.fetchone():
-        print("Creating editors table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS editors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                full_name TEXT,
-                email TEXT UNIQUE NOT NULL,
-                phone TEXT,
-                password_hash TEXT NOT NULL,
-                role TEXT,
-                years_experience INTEGER,
-                primary_skills TEXT,
-                specialization TEXT,
-                portfolio_url TEXT,
-                time_zone TEXT,
-                government_id_url TEXT,
-                tax_gst_number TEXT,
-                status TEXT DEFAULT 'active',
-                approval_status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-    else:
-        # Add missing columns to existing editors table
-        new_columns = [
-            ('password_hash', 'TEXT'),
-            ('experience', 'TEXT'),
-            ('equipment', 'TEXT'),
-            ('full_name', 'TEXT'),
-            ('years_experience', 'INTEGER'),
-            ('primary_skills', 'TEXT'),
-            ('specialization', 'TEXT'),
-            ('portfolio_url', 'TEXT'),
-            ('time_zone', 'TEXT'),
-            ('government_id_url', 'TEXT'),
-            ('tax_gst_number', 'TEXT'),
-            ('role', 'TEXT'),
-            ('approval_status', 'TEXT DEFAULT "pending"')
-        ]
-
-        for column_name, column_type in new_columns:
-            try:
-                c.execute(f'ALTER TABLE editors ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to editors table")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" not in str(e):
-                    print(f"Error adding {column_name} column: {e}")
-                else:
-                    print(f"{column_name} column already exists")
-
-        # Handle the password column migration
-        try:
-            # Check if the old password column exists and has NOT NULL constraint
-            c.execute("PRAGMA table_info(editors)")
-            columns = c.fetchall()
-            has_password_column = any(col[1] == 'password' for col in columns)
-            has_password_hash_column = any(col[1] == 'password_hash' for col in columns)
-
-            if has_password_column:
-                print("Found old password column, performing migration...")
-
-                # If password_hash doesn't exist, copy password data to it
-                if not has_password_hash_column:
-                    c.execute("ALTER TABLE editors ADD COLUMN password_hash TEXT")
-                    print("Added password_hash column")
-
-                # Copy existing password data to password_hash
-                c.execute("UPDATE editors SET password_hash = password WHERE password_hash IS NULL AND password IS NOT NULL")
-
-                # Create new table without the password column
-                c.execute('''
-                    CREATE TABLE editors_new (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL,
-                        full_name TEXT,
-                        email TEXT UNIQUE NOT NULL,
-                        phone TEXT,
-                        password_hash TEXT NOT NULL,
-                        role TEXT,
-                        years_experience INTEGER,
-                        primary_skills TEXT,
-                        specialization TEXT,
-                        portfolio_url TEXT,
-                        time_zone TEXT,
-                        government_id_url TEXT,
-                        tax_gst_number TEXT,
-                        status TEXT DEFAULT 'active',
-                        approval_status TEXT DEFAULT 'pending',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-
-                # Copy data from old table to new table
-                c.execute('''
-                    INSERT INTO editors_new (
-                        id, name, full_name, email, phone, password_hash, role, years_experience,
-                        primary_skills, specialization, portfolio_url, time_zone,
-                        government_id_url, tax_gst_number, status, approval_status, created_at
-                    )
-                    SELECT
-                        id, name, full_name, email, phone, password_hash, role, years_experience,
-                        primary_skills, specialization, portfolio_url, time_zone,
-                        government_id_url, tax_gst_number,
-                        COALESCE(status, 'active'),
-                        COALESCE(approval_status, 'pending'),
-                        created_at
-                    FROM editors
-                ''')
-
-                # Drop old table and rename new table
-                c.execute("DROP TABLE editors")
-                c.execute("ALTER TABLE editors_new RENAME TO editors")
-                print("Successfully migrated editors table structure")
-
-        except sqlite3.OperationalError as e:
-            print(f"Migration error (this might be normal for new installations): {e}")
-            pass
-
-    # Check if business_clients table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='business_clients'")
-    if not c.fetchone():
-        print("Creating business_clients table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS business_clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                business_name TEXT NOT NULL,
-                registration_number TEXT NOT NULL,
-                organization_type TEXT NOT NULL,
-                incorporation_date DATE NOT NULL,
-                official_address TEXT NOT NULL,
-                official_email TEXT UNIQUE NOT NULL,
-                phone TEXT NOT NULL,
-                contact_name TEXT NOT NULL,
-                contact_person_designation TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                registration_certificate_url TEXT,
-                tax_identification_url TEXT,
-                business_license_url TEXT,
-                address_proof_url TEXT,
-                status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("Business clients table created successfully")
-    else:
-        print("Business clients table already exists")
-
-    # Check if editor_applications table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='editor_applications'")
-    if not c.fetchone():
-        print("Creating editor_applications table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS editor_applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                full_name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                phone TEXT NOT NULL,
-                role TEXT NOT NULL,
-                years_experience INTEGER NOT NULL,
-                primary_skills TEXT NOT NULL,
-                specialization TEXT NOT NULL,
-                portfolio_url TEXT,
-                time_zone TEXT,
-                government_id_url TEXT,
-                tax_gst_number TEXT,
-                password_hash TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
-                admin_comments TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("Editor applications table created successfully")
-    else:
-        print("Editor applications table already exists")
-
-    # Check if referral_applications table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='referral_applications'")
-    if not c.fetchone():
-        print("Creating referral_applications table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS referral_applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                phone TEXT NOT NULL,
-                location TEXT,
-                experience TEXT,
-                network_size TEXT,
-                referral_strategy TEXT,
-                social_media_links TEXT,
-                password_hash TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
-                admin_comments TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("Referral applications table created successfully")
-    else:
-        print("Referral applications table already exists")
-
-    # Check if business_client_applications table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='business_client_applications'")
-    if not c.fetchone():
-        print("Creating business_client_applications table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS business_client_applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                business_name TEXT NOT NULL,
-                registration_number TEXT NOT NULL,
-                organization_type TEXT NOT NULL,
-                incorporation_date DATE NOT NULL,
-                official_address TEXT NOT NULL,
-                official_email TEXT UNIQUE NOT NULL,
-                phone TEXT NOT NULL,
-                contact_name TEXT NOT NULL,
-                contact_person_designation TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                registration_certificate_url TEXT,
-                tax_identification_url TEXT,
-                business_license_url TEXT,
-                address_proof_url TEXT,
-                status TEXT DEFAULT 'pending',
-                admin_comments TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("Business client applications table created successfully")
-    else:
-        print("Business client applications table already exists")
-
-    # Check if inquiries table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='inquiries'")
-    if not c.fetchone():
-        print("Creating inquiries table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS inquiries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                email TEXT,
-                phone TEXT,
-                message TEXT,
-                status TEXT DEFAULT 'new',
-                source TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-    
-    # Check if payments table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='payments'")
-    if not c.fetchone():
-        print("Creating payments table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS payments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                booking_id INTEGER,
-                amount DECIMAL(10,2),
-                status TEXT DEFAULT 'pending',
-                payment_method TEXT,
-                transaction_id TEXT,
-                merchant_transaction_id TEXT,
-                phonepe_transaction_id TEXT,
-                payment_gateway TEXT DEFAULT 'phonepe',
-                gateway_response TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (booking_id) REFERENCES bookings (id)
-            )
-        ''')
-    else:
-        # Add PhonePe specific columns to existing payments table
-        new_columns = [
-            ('merchant_transaction_id', 'TEXT'),
-            ('phonepe_transaction_id', 'TEXT'),
-            ('payment_gateway', 'TEXT DEFAULT "phonepe"'),
-            ('gateway_response', 'TEXT')
-        ]
-        
-        for column_name, column_type in new_columns:
-            try:
-                c.execute(f'ALTER TABLE payments ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to payments table")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" not in str(e):
-                    print(f"Error adding {column_name} column: {e}")
-                else:
-                    print(f"{column_name} column already exists")
-    
-    # Check if cancellations table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cancellations'")
-    if not c.fetchone():
-        print("Creating cancellations table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS cancellations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                booking_id INTEGER,
-                reason TEXT,
-                status TEXT DEFAULT 'pending',
-                refund_amount DECIMAL(10,2),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (booking_id) REFERENCES bookings (id)
-            )
-        ''')
-    
-    # Check if pre_list table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pre_list'")
-    if not c.fetchone():
-        print("Creating pre_list table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS pre_list (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                
-                status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-    
-    # Check if otp_verifications table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='otp_verifications'")
-    if not c.fetchone():
-        print("Creating otp_verifications table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS otp_verifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT NOT NULL,
-                otp_code TEXT NOT NULL,
-                user_type TEXT NOT NULL,
-                user_data TEXT NOT NULL,
-                is_verified BOOLEAN DEFAULT FALSE,
-                expires_at TIMESTAMP NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("OTP verifications table created successfully")
-    else:
-        print("OTP verifications table already exists")
-    
-    # Check if pilot_applications table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pilot_applications'")
-    if not c.fetchone():
-        print("Creating pilot_applications table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS pilot_applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                full_name TEXT,
-                email TEXT UNIQUE NOT NULL,
-                phone TEXT,
-                password TEXT,
-                password_hash TEXT NOT NULL,
-                date_of_birth DATE,
-                gender TEXT,
-                address TEXT,
-                government_id_proof TEXT,
-                license_number TEXT,
-                issuing_authority TEXT,
-                license_issue_date DATE,
-                license_expiry_date DATE,
-                drone_model TEXT,
-                drone_serial TEXT,
-                drone_uin TEXT,
-                drone_category TEXT,
-                total_flying_hours INTEGER,
-                flight_records TEXT,
-                insurance_policy TEXT,
-                insurance_validity DATE,
-                pilot_license_url TEXT,
-                id_proof_url TEXT,
-                training_certificate_url TEXT,
-                photograph_url TEXT,
-                insurance_certificate_url TEXT,
-                cities TEXT,
-                experience TEXT,
-                equipment TEXT,
-                portfolio_url TEXT,
-                bank_account TEXT,
-                status TEXT DEFAULT 'pending',
-                admin_comments TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("Pilot applications table created successfully")
-    else:
-        # Add missing columns to existing pilot_applications table
-        new_columns = [
-            ('password_hash', 'TEXT'),
-            ('full_name', 'TEXT'),
-            ('date_of_birth', 'DATE'),
-            ('gender', 'TEXT'),
-            ('address', 'TEXT'),
-            ('government_id_proof', 'TEXT'),
-            ('license_number', 'TEXT'),
-            ('issuing_authority', 'TEXT'),
-            ('license_issue_date', 'DATE'),
-            ('license_expiry_date', 'DATE'),
-            ('drone_model', 'TEXT'),
-            ('drone_serial', 'TEXT'),
-            ('drone_uin', 'TEXT'),
-            ('drone_category', 'TEXT'),
-            ('total_flying_hours', 'INTEGER'),
-            ('flight_records', 'TEXT'),
-            ('insurance_policy', 'TEXT'),
-            ('insurance_validity', 'DATE'),
-            ('pilot_license_url', 'TEXT'),
-            ('id_proof_url', 'TEXT'),
-            ('training_certificate_url', 'TEXT'),
-            ('photograph_url', 'TEXT'),
-            ('insurance_certificate_url', 'TEXT'),
-            ('portfolio_url', 'TEXT'),
-            ('bank_account', 'TEXT'),
-            ('admin_comments', 'TEXT')
-        ]
-
-        for column_name, column_type in new_columns:
-            try:
-                c.execute(f'ALTER TABLE pilot_applications ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to pilot_applications table")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" not in str(e):
-                    print(f"Error adding {column_name} column to pilot_applications: {e}")
-                else:
-                    print(f"{column_name} column already exists in pilot_applications")
-        print("Pilot applications table updated successfully")
-            # Check if email_templates table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='email_templates'")
-    if not c.fetchone():
-        print("Creating email_templates table...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS email_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE,
-                subject TEXT,
-                body TEXT
-            )
-        ''')
-
-        default_templates = [
-    ("approval", "Application Approved", 
-     "Dear {{applicant_name}},<br><br>Your {{application_type}} application has been approved.<br>{{admin_comments}}<br><br>Welcome aboard!"),
-
-    ("rejection", "Application Rejected", 
-     "Dear {{applicant_name}},<br><br>Unfortunately, your {{application_type}} application was not successful.<br>{{admin_comments}}"),
-
-    ("forgot_password", "Password Reset Request", 
-     "Hello {{name}},<br><br>Please use this link to reset your password: {{reset_link}}"),
-
-    ("welcome", "Welcome to HMX FPV Tours", 
-     "Hi {{name}},<br><br>We are excited to have you onboard as a {{user_role}}."),
-
-    ("otp", "Your OTP Code", 
-     "Dear {{name}},<br><br>Your OTP is <b>{{otp}}</b>. It expires in 10 minutes."),
-
-    ("order_created", "Your Booking {{booking_id}} is Created", 
-     "Dear {{name}},<br><br>Your booking {{booking_id}} for {{location}} on {{date}} has been created successfully."),
-
-    # 🚀 NEW: Booking status templates
-    ("order_approved", "Your Booking {{booking_id}} is Approved",
-     "Dear {{name}},<br><br>Your booking <b>{{booking_id}}</b> for {{location}} on {{date}} has been <b>approved</b>.<br><br>"
-     "Our pilot/editor team will coordinate with you shortly.<br><br>Regards,<br>Team HMX"),
-
-    ("order_cancelled", "Your Booking {{booking_id}} is Cancelled",
-     "Dear {{name}},<br><br>We regret to inform you that your booking <b>{{booking_id}}</b> has been <b>cancelled</b>.<br>"
-     "Reason: {{reason}}<br><br>If you believe this was a mistake, please contact our support team.<br><br>Regards,<br>Team HMX"),
-
-    ("order_deleted", "Your Booking {{booking_id}} was Deleted",
-     "Dear {{name}},<br><br>Your booking <b>{{booking_id}}</b> has been <b>removed</b> from our system.<br><br>"
-     "If you did not request this or have questions, please reach out to support.<br><br>Regards,<br>Team HMX"),
-
-    # Existing credential templates...
-    ("pilot_credentials", "Your Pilot Account Credentials",
-     "Hi {{name}},<br><br>Your pilot account has been created.<br><br>"
-     "<b>Email:</b> {{email}}<br>"
-     "<b>Password:</b> {{password}}<br><br>"
-     "Please log in and change your password after first login.<br><br>Regards,<br>Team HMX"),
-
-    ("editor_credentials", "Your Editor Account Credentials",
-     "Hi {{name}},<br><br>Your editor account has been created.<br><br>"
-     "<b>Email:</b> {{email}}<br>"
-     "<b>Password:</b> {{password}}<br><br>"
-     "Please log in and change your password after first login.<br><br>Regards,<br>Team HMX"),
-
-    ("referral_credentials", "Your Referral Partner Credentials",
-     "Hi {{name}},<br><br>Your referral partner account has been created.<br><br>"
-     "<b>Email:</b> {{email}}<br>"
-     "<b>Password:</b> {{password}}<br><br>"
-     "You can now log in and start referring clients.<br><br>Regards,<br>Team HMX"),
-
-    ("client_credentials", "Your Client Account Credentials",
-     "Hi {{name}},<br><br>Your client account has been created.<br><br>"
-     "<b>Email:</b> {{email}}<br>"
-     "<b>Password:</b> {{password}}<br><br>"
-     "You can log in and follow up on your bookings.<br><br>"
-     "Please change your password after first login.<br><br>Regards,<br>Team HMX"),
-    ]
-
-
-        for tpl in default_templates:
-            c.execute(
-                "INSERT OR IGNORE INTO email_templates (name, subject, body) VALUES (?, ?, ?)", tpl
-            )
-        print("Default email templates inserted")
-    else:
-        print("Email_templates table already exists")
-
-
-    conn.commit()
-    conn.close()
-    print("Database initialization complete!")
-    print("===================\n")
+    """Bring hmx.db up to the latest schema version (see migrations.py)"""
+    logger.info('=== Migrating Database: %s ===', os.path.abspath(DATABASE))
+    migrate(DATABASE)
 
 def get_db():
-    print(f"\n=== Database Connection ===")
-    print(f"Current working directory: {os.getcwd()}")
-    print(f"Looking for database at: {os.path.abspath(DATABASE)}")
-    print(f"Database exists: {os.path.exists(DATABASE)}")
-    
-    # Add timeout to prevent database locked errors
-    conn = sqlite3.connect(DATABASE, timeout=20.0)
-    conn.row_factory = sqlite3.Row
-    
-    # Verify users table
-    cursor = conn.cursor()
-    users = cursor.execute('SELECT * FROM users').fetchall()
-    print(f"Number of users in database: {len(users)}")
-    for user in users:
-        print(f"Found user: {user['email']} (ID: {user['id']})")
-    print("===================\n")
-    
-    return conn
+    """Get a pooled database connection.
 
-# OTP Helper Functions
-def generate_otp():
-    """Generate a 6-digit OTP"""
-    return ''.join(random.choices(string.digits, k=6))
+    Inside a request the same connection is handed out until the app context
+    tears down, so handlers calling conn.close() (or forgetting to) are safe.
+    """
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = db_pool.acquire()
+            conn.hold()
+            g._db_conn = conn
+        return conn
+    return db_pool.acquire()
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Return the request's connection to the pool"""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+# Hashing pool processes re-import the entry script (this module under `python app.py`); they only hash
+if not in_pool_process():
+    # Single schema version check; migrations normally run once via `python migrations.py`
+    ensure_schema(DATABASE, auto_migrate=DatabaseConfig.AUTO_MIGRATE)
+    # The hashing pool starts on the first hash, or from gunicorn's post_fork hook
+    wal_checkpointer.start()
+    if EmailConfig.OUTBOX_SENDER == 'thread':
+        email_sender.start()
+    if PhonePeConfig.EVENTS_PROCESSOR == 'thread':
+        payment_processor.start()
+    payment_reconciler.start()
+    otp_sweeper.start()
+
+def hashing_busy_response():
+    """503 for a request that could not get a password hashing slot"""
+    response = jsonify({'message': 'Server is busy, please try again in a moment'})
+    response.headers['Retry-After'] = '1'
+    response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response, 503
 
-def store_otp(email, user_type, user_data):
-    """Store OTP in database for verification"""
-    try:
-        otp_code = generate_otp()
-        expires_at = datetime.now() + timedelta(minutes=10)  # OTP expires in 10 minutes
-        
-        # Save consistently as ISO string
-        expires_at_str = expires_at.isoformat(sep=" ", timespec="seconds")
-        # 👉 Example: "2025-08-28 13:15:42"
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Delete any existing OTP for this email
-        cursor.execute('DELETE FROM otp_verifications WHERE email = ?', (email,))
-        
-        # Store new OTP
-        cursor.execute('''
-            INSERT INTO otp_verifications (email, otp_code, user_type, user_data, expires_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (email, otp_code, user_type, json.dumps(user_data), expires_at_str))
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"OTP stored for {email}: {otp_code} (expires at {expires_at_str})")
-        return otp_code
-        
-    except Exception as e:
-        print(f"Error storing OTP: {str(e)}")
-        return None
+@app.errorhandler(HashingBusy)
+def handle_hashing_busy(e):
+    return hashing_busy_response()
 
-def verify_otp(email, otp_code):
-    """Verify OTP and return user data if valid"""
-    try:
+def load_principal(role, user_id):
+    """Account row for a token's (role, user_id), from principal_cache or its role table"""
+    def fetch():
         conn = get_db()
-        cursor = conn.cursor()
-        
-        # Get OTP record
-        cursor.execute('''
-            SELECT otp_code, user_type, user_data, expires_at, is_verified
-            FROM otp_verifications 
-            WHERE email = ?
-            ORDER BY created_at DESC 
-            LIMIT 1
-        ''', (email,))
-        
-        otp_record = cursor.fetchone()
-        
-        if not otp_record:
-            conn.close()
-            return {'success': False, 'error': 'No OTP found for this email'}
-        
-        stored_otp, user_type, user_data_json, expires_at, is_verified = otp_record
-        
-        # Handle datetime parsing safely (with microseconds)
-        try:
-            expires_at = datetime.fromisoformat(expires_at)
-        except Exception:
-            try:
-                expires_at = datetime.strptime(expires_at, '%Y-%m-%d %H:%M:%S.%f')
-            except Exception:
-                expires_at = datetime.strptime(expires_at, '%Y-%m-%d %H:%M:%S')
-        
-        # Check if OTP is already verified
-        if is_verified:
-            conn.close()
-            return {'success': False, 'error': 'OTP already used'}
-        
-        # Check if OTP is expired
-        if datetime.now() > expires_at:
-            conn.close()
-            return {'success': False, 'error': 'OTP has expired'}
-        
-        # Verify OTP code
-        if stored_otp != otp_code:
-            conn.close()
-            return {'success': False, 'error': 'Invalid OTP'}
-        
-        # Mark OTP as verified
-        cursor.execute(
-            'UPDATE otp_verifications SET is_verified = TRUE WHERE email = ?',
-            (email,)
-        )
-        conn.commit()
-        conn.close()
-        
-        # Return success with user data
-        return {
-            'success': True,
-            'user_type': user_type,
-            'user_data': json.loads(user_data_json)
-        }
-        
-    except Exception as e:
-        print(f"Error verifying OTP: {str(e)}")
-        return {'success': False, 'error': 'Server error while verifying OTP'}
-
-
+        return conn.execute(f'SELECT * FROM {table_for_role(role)} WHERE id = ?', (user_id,)).fetchone()
 
-# Initialize database
-init_db()
+    return principal_cache.load(role, user_id, fetch)
 
 # Update the token_required decorator to skip OPTIONS requests
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        print("\n=== Token Verification ===")
         # Skip token check for OPTIONS requests
         if request.method == 'OPTIONS':
-            print("Skipping token check for OPTIONS request")
             return '', 200
             
         token = request.headers.get('Authorization')
         if not token:
-            print("No token found in Authorization header")
+            logger.debug('No token found in Authorization header')
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            print(f"Received token: {token}")
             if not token.startswith('Bearer '):
-                print("Token does not start with 'Bearer '")
+                logger.debug("Token does not start with 'Bearer '")
                 return jsonify({'message': 'Invalid token format'}), 401
                 
             token = token.split(' ')[1]  # Remove 'Bearer ' prefix
-            print(f"Decoded token (without Bearer): {token}")
             
             # Decode the token
             decoded_token = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            print(f"Decoded token data: {decoded_token}")
             
             # Get user data based on role from token
             role = decoded_token.get('role')
             user_id = decoded_token.get('user_id')
             
             if not role or not user_id:
-                print("Token missing role or user_id")
+                logger.debug('Token missing role or user_id')
                 return jsonify({'message': 'Invalid token data'}), 401
             
-            # Get user data based on role
-            conn = get_db()
-            cursor = conn.cursor()
-            
-            if role == 'pilot':
-                cursor.execute('SELECT * FROM pilots WHERE id = ?', (user_id,))
-            elif role == 'editor':
-                cursor.execute('SELECT * FROM editors WHERE id = ?', (user_id,))
-            elif role == 'referral':
-                cursor.execute('SELECT * FROM referrals WHERE id = ?', (user_id,))
-            else:
-                cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-            
-            user = cursor.fetchone()
-            conn.close()
+            user = load_principal(role, user_id)
             
             if not user:
-                print(f"No user found for ID {user_id} with role {role}")
+                logger.debug('No user found for ID %s with role %s', user_id, role)
                 return jsonify({'message': 'User not found'}), 401
             
             # Create a user object that includes the role from the token
-            user_data = dict(user)
+            user_data = user
             user_data['role'] = role  # Use the role from the token
             user_data['user_id'] = user_id  # Use the user_id from the token
-
-            print("✅ Token verification successful")
-            print(f"🔑 Token role: {role}")
-            print(f"👤 Token user_id: {user_id}")
-            print(f"📋 User data being passed to endpoint: {user_data}")
-            print(f"🎯 Endpoint being called: {request.endpoint}")
-            print("=" * 50)
-            return f(user_data, *args, **kwargs)
-            
         except Exception as e:
-            print(f"Token verification failed: {str(e)}")
+            logger.error('Token verification failed: %s', e)
             return jsonify({'message': 'Invalid token'}), 401
+
+        logger.debug('🔑 %s %s -> %s', role, user_id, request.endpoint)
+        return f(user_data, *args, **kwargs)
     
     return decorated
 
 # Helper functions
+# Tables checked by login(), in order: an email registered as a pilot and as a client logs in as the pilot
+LOGIN_SOURCES = ('pilots', 'editors', 'users')
+# Tables whose password reset_password_via_otp() can change, in order (admins are never reset this way)
+RESET_SOURCES = ('business_clients', 'pilots', 'editors')
+
+def find_identities(email):
+    """Every account registered with this email, keyed by source table.
+
+    One query on the login_identities view (migration 3); each branch of the
+    view is an indexed lookup on that table's UNIQUE email.
+    """
+    conn = get_db()
+    rows = conn.execute('SELECT * FROM login_identities WHERE email = ?', (email,)).fetchall()
+    return {row['source']: dict(row) for row in rows}
+
+def first_identity(identities, sources):
+    """The account from the first of `sources` that has this email, or None"""
+    for source in sources:
+        if source in identities:
+            return identities[source]
+    return None
+
 def get_user_by_id(user_id):
-    print(f"\n=== Looking up user by ID ===")
-    print(f"ID to find: {user_id}")
+    logger.debug('=== Looking up user by ID ===')
+    logger.debug('ID to find: %s', user_id)
     
     conn = get_db()
     
@@ -1277,36 +353,35 @@ def get_user_by_id(user_id):
     conn.close()
     
     if user:
-        print(f"Found user in database:")
-        print(f"ID: {user['id']}")
-        print(f"Email: {user['email']}")
-        print(f"Role: {user['role']}")
+        logger.debug('Found user in database:')
+        logger.debug('ID: %s', user['id'])
+        logger.debug('Email: %s', user['email'])
+        logger.debug('Role: %s', user['role'])
         if 'approval_status' in user:
-            print(f"Approval: {user['approval_status']}")
+            logger.debug('Approval: %s', user['approval_status'])
         elif 'status' in user:
-            print(f"Status: {user['status']}")
-        print()
+            logger.debug('Status: %s', user['status'])
     else:
-        print("No user found with that ID\n")
+        logger.debug('No user found with that ID')
     
     return dict(user) if user else None
 
 def get_user_by_email(email):
-    print(f"\n=== Looking up user by email ===")
-    print(f"Email to find: {email}")
+    logger.debug('=== Looking up user by email ===')
+    logger.debug('Email to find: %s', email)
     
     conn = get_db()
     user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
     conn.close()
     
     if user:
-        print(f"Found user in database:")
-        print(f"ID: {user['id']}")
-        print(f"Email: {user['email']}")
-        print(f"Role: {user['role']}")
-        print(f"Approval: {user['approval_status']}\n")
+        logger.debug('Found user in database:')
+        logger.debug('ID: %s', user['id'])
+        logger.debug('Email: %s', user['email'])
+        logger.debug('Role: %s', user['role'])
+        logger.debug('Approval: %s', user['approval_status'])
     else:
-        print("No user found with that email\n")
+        logger.debug('No user found with that email')
     
     return dict(user) if user else None
 
@@ -1323,21 +398,21 @@ def register():
         return response
 
     try:
-        print("\n=== New User Registration ===")
-        print(f"Request headers: {dict(request.headers)}")
-        print(f"Request method: {request.method}")
-        print(f"Request content type: {request.content_type}")
+        logger.debug('=== New User Registration ===')
+        logger.debug('Request headers: %s', dict(request.headers))
+        logger.debug('Request method: %s', request.method)
+        logger.debug('Request content type: %s', request.content_type)
         
         # Get and validate request data
         try:
             data = request.get_json()
-            print(f"Registration data received: {data}")
+            logger.debug('Registration data received: %s', data)
         except Exception as e:
-            print(f"Error parsing JSON data: {str(e)}")
+            logger.error('Error parsing JSON data: %s', e)
             return jsonify({'message': 'Invalid JSON data'}), 400
         
         if not data:
-            print("No data received in request")
+            logger.debug('No data received in request')
             return jsonify({'message': 'No data received'}), 400
 
         # Validate required fields
@@ -1348,22 +423,22 @@ def register():
         ]
         missing_fields = [field for field in required_fields if field not in data or not data[field]]
         if missing_fields:
-            print(f"Missing required fields: {missing_fields}")
+            logger.debug('Missing required fields: %s', missing_fields)
             return jsonify({'message': f'Missing required fields: {", ".join(missing_fields)}'}), 400
 
         # Validate email format
         if '@' not in data['email'] or '.' not in data['email']:
-            print(f"Invalid email format: {data['email']}")
+            logger.warning('Invalid email format: %s', data['email'])
             return jsonify({'message': 'Invalid email format'}), 400
 
         # Validate official email format
         if '@' not in data['official_email'] or '.' not in data['official_email']:
-            print(f"Invalid official email format: {data['official_email']}")
+            logger.warning('Invalid official email format: %s', data['official_email'])
             return jsonify({'message': 'Invalid official email format'}), 400
 
         # Validate password length
         if len(data['password']) < 8:
-            print("Password too short")
+            logger.debug('Password too short')
             return jsonify({'message': 'Password must be at least 8 characters long'}), 400
 
         # Validate incorporation date format (YYYY-MM-DD)
@@ -1371,13 +446,13 @@ def register():
             from datetime import datetime
             datetime.strptime(data['incorporation_date'], '%Y-%m-%d')
         except ValueError:
-            print(f"Invalid incorporation date format: {data['incorporation_date']}")
+            logger.warning('Invalid incorporation date format: %s', data['incorporation_date'])
             return jsonify({'message': 'Invalid incorporation date format. Use YYYY-MM-DD'}), 400
 
         # Validate organization type
         valid_org_types = ['Private Limited', 'Public Limited', 'Partnership', 'LLP', 'Sole Proprietorship', 'NGO', 'Trust', 'Society', 'Other']
         if data['organization_type'] not in valid_org_types:
-            print(f"Invalid organization type: {data['organization_type']}")
+            logger.warning('Invalid organization type: %s', data['organization_type'])
             return jsonify({'message': f'Invalid organization type. Must be one of: {", ".join(valid_org_types)}'}), 400
 
         # Check if email already exists in applications or main table
@@ -1386,21 +461,21 @@ def register():
         cursor.execute('SELECT id FROM business_client_applications WHERE (email = ? OR official_email = ?) AND status = "pending"',
                       (data['email'], data['official_email']))
         if cursor.fetchone():
-            print(f"Email {data['email']} or official email {data['official_email']} already has pending application")
+            logger.debug('Email %s or official email %s already has pending application', data['email'], data['official_email'])
             conn.close()
             return jsonify({'message': 'Application already submitted with this email'}), 400
 
         cursor.execute('SELECT id FROM business_clients WHERE email = ? OR official_email = ?',
                       (data['email'], data['official_email']))
         if cursor.fetchone():
-            print(f"Email {data['email']} or official email {data['official_email']} already registered")
+            logger.debug('Email %s or official email %s already registered', data['email'], data['official_email'])
             conn.close()
             return jsonify({'message': 'Email already registered'}), 400
 
         try:
             # Generate password hash using werkzeug
             password_hash = generate_password_hash(data['password'])
-            print("Password hash generated successfully")
+            logger.debug('Password hash generated successfully')
 
             # Insert new business client application
             cursor.execute('''
@@ -1438,19 +513,19 @@ def register():
                 data.get('business_license_url', ''),
                 data.get('address_proof_url', '')
             ))
-            print("Business client application submitted to database")
+            logger.info('Business client application submitted to database')
 
             # Commit transaction
             conn.commit()
             application_id = cursor.lastrowid
-            print(f"New business client application created with ID: {application_id}")
-            print(f"Email: {data['email']}")
-            print(f"Business: {data['business_name']}")
-            print(f"Status: pending")
+            logger.info('New business client application created with ID: %s', application_id)
+            logger.debug('Email: %s', data['email'])
+            logger.debug('Business: %s', data['business_name'])
+            logger.debug('Status: pending')
 
             # Close database connection
             conn.close()
-            print("Database connection closed")
+            logger.debug('Database connection closed')
 
             response = jsonify({
                 'message': 'Business application submitted successfully. Please wait for admin approval.',
@@ -1460,18 +535,18 @@ def register():
             response.headers.add('Access-Control-Allow-Credentials', 'true')
             return response, 201
 
+        except HashingBusy:
+            return hashing_busy_response()
         except sqlite3.Error as e:
-            print(f"Database error: {str(e)}")
-            print(f"Error type: {type(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.error('Database error: %s', e)
+            logger.debug('Error type: %s', type(e))
+            logger.debug('Traceback', exc_info=True)
             return jsonify({'message': f'Database error: {str(e)}'}), 500
 
     except Exception as e:
-        print(f"Unexpected error during registration: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Unexpected error during registration: %s', e)
+        logger.debug('Error type: %s', type(e))
+        logger.debug('Traceback', exc_info=True)
         response = jsonify({'message': 'Registration failed due to an unexpected error'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -1489,200 +564,84 @@ def login():
         return response
 
     try:
-        print("\n=== Login Attempt ===")
-        print(f"Request headers: {dict(request.headers)}")
-        print(f"Request method: {request.method}")
-        print(f"Request content type: {request.content_type}")
+        logger.debug('=== Login Attempt ===')
 
         # Get and validate request data
         try:
             data = request.get_json()
-            print(f"Login data received: {data}")
         except Exception as e:
-            print(f"Error parsing JSON data: {str(e)}")
+            logger.error('Error parsing JSON data: %s', e)
             return jsonify({'message': 'Invalid JSON data'}), 400
 
         if not data:
-            print("No data received in request")
+            logger.debug('No data received in request')
             return jsonify({'message': 'No data received'}), 400
 
         # Validate required fields
         if 'email' not in data or not data['email']:
-            print("Email is required")
+            logger.debug('Email is required')
             return jsonify({'message': 'Email is required'}), 400
         if 'password' not in data or not data['password']:
-            print("Password is required")
+            logger.debug('Password is required')
             return jsonify({'message': 'Password is required'}), 400
 
         email = data['email']
         password = data['password']
-        print(f"Attempting login for email: {email}")
+        logger.debug('Attempting login for email: %s', email)
 
-        # First check pilots table
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        print("Checking pilots table...")
-        cursor.execute('SELECT * FROM pilots WHERE email = ?', (email,))
-        pilot = cursor.fetchone()
-        
-        if pilot:
-            print("Found pilot in database")
-            pilot_dict = dict(pilot)
-            print(f"Pilot status: {pilot_dict['status']}")
-            
-            # Check if pilot has password_hash or password field
-            password_field = pilot_dict.get('password_hash') or pilot_dict.get('password')
-            if password_field:
-                print(f"Pilot password hash: {password_field[:20]}...")
-            else:
-                print("No password field found for pilot")
-                return jsonify({'message': 'Invalid email or password'}), 401
-            
-            if pilot_dict['status'] == 'pending':
-                print("Pilot is pending approval")
-                return jsonify({'message': 'Your account is pending approval'}), 403
-            
-            print("Verifying pilot password...")
-            password_check = verify_password(password, password_field)
-            print(f"Password verification result: {password_check}")
-            
-            if password_check:
-                print("Password verified for pilot")
-                token_data = {
-                    'user_id': pilot_dict['id'],
-                    'role': 'pilot',
-                    'exp': datetime.utcnow() + timedelta(days=1)
-                }
-                print(f"Token data: {token_data}")
-                token = jwt.encode(token_data, app.config['SECRET_KEY'])
-                print("Generated token for pilot")
-                
-                response = jsonify({
-                    'token': token,
-                    'role': 'pilot',
-                    'user_id': pilot_dict['id']
-                })
-                response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
-                response.headers.add('Access-Control-Allow-Credentials', 'true')
-                return response
-            else:
-                print("Invalid password for pilot")
-                return jsonify({'message': 'Invalid email or password'}), 401
-        
-        # Check editors table
-        print("Pilot not found, checking editors table...")
-        cursor.execute('SELECT * FROM editors WHERE email = ?', (email,))
-        editor = cursor.fetchone()
-        
-        if editor:
-            print("Found editor in database")
-            editor_dict = dict(editor)
-            print(f"Editor status: {editor_dict['status']}")
-            
-            # Check if editor has password_hash or password field
-            password_field = editor_dict.get('password_hash') or editor_dict.get('password')
-            if password_field:
-                print(f"Editor password hash: {password_field[:20]}...")
-            else:
-                print("No password field found for editor")
-                return jsonify({'message': 'Invalid email or password'}), 401
-            
-            if editor_dict['status'] == 'pending':
-                print("Editor is pending approval")
-                return jsonify({'message': 'Your account is pending approval'}), 403
-            
-            print("Verifying editor password...")
-            password_check = verify_password(password, password_field)
-            print(f"Password verification result: {password_check}")
-            
-            if password_check:
-                print("Password verified for editor")
-                token_data = {
-                    'user_id': editor_dict['id'],
-                    'role': 'editor',
-                    'exp': datetime.utcnow() + timedelta(days=1)
-                }
-                print(f"Token data: {token_data}")
-                token = jwt.encode(token_data, app.config['SECRET_KEY'])
-                print("Generated token for editor")
-                
-                response = jsonify({
-                    'token': token,
-                    'role': 'editor',
-                    'user_id': editor_dict['id']
-                })
-                response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
-                response.headers.add('Access-Control-Allow-Credentials', 'true')
-                return response
-            else:
-                print("Invalid password for editor")
-                return jsonify({'message': 'Invalid email or password'}), 401
-        
-        # Check users table (for all user types including clients and admins)
-        print("Checking users table...")
-        cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-        user = cursor.fetchone()
+        # Pilots, editors and users (clients and admins) in one lookup
+        account = first_identity(find_identities(email), LOGIN_SOURCES)
 
-        if user:
-            user_dict = dict(user)
-            user_role = user_dict.get('role', 'admin')
-            print(f"Found user in database with role: {user_role}")
-            print(f"User password hash: {user_dict['password_hash'][:20]}...")
-
-            print("Verifying user password...")
-            password_check = verify_password(password, user_dict['password_hash'])
-            print(f"Password verification result: {password_check}")
-
-            if password_check:
-                print(f"Password verified for {user_role} user")
-
-                # For clients, also get business details
-                business_name = None
-                if user_role == 'client':
-                    cursor.execute('SELECT business_name FROM business_clients WHERE email = ?', (email,))
-                    business_result = cursor.fetchone()
-                    if business_result:
-                        business_name = business_result[0]
-
-                token_data = {
-                    'user_id': user_dict['id'],
-                    'email': user_dict['email'],
-                    'role': user_role,
-                    'exp': datetime.utcnow() + timedelta(days=1)
-                }
-                print(f"Token data: {token_data}")
-                token = jwt.encode(token_data, app.config['SECRET_KEY'])
-                print(f"Generated token for {user_role} user")
-
-                response_data = {
-                    'token': token,
-                    'role': user_role,
-                    'user_id': user_dict['id']
-                }
+        if not account:
+            logger.debug('No pilot, editor or user found for this email')
+            return jsonify({'message': 'Invalid email or password'}), 401
 
-                # Add business name for clients
-                if business_name:
-                    response_data['business_name'] = business_name
+        role = account['role']
+        logger.debug('Found %s in %s table', role, account['source'])
 
-                response = jsonify(response_data)
-                response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
-                response.headers.add('Access-Control-Allow-Credentials', 'true')
-                return response
-            else:
-                print("Invalid password for user")
-                return jsonify({'message': 'Invalid email or password'}), 401
-        else:
-            print("User not found in users table")
+        if not account['password_hash']:
+            logger.debug('No password set for %s', role)
             return jsonify({'message': 'Invalid email or password'}), 401
-        
-        conn.close()
 
+        if account['source'] in ('pilots', 'editors') and account['status'] == 'pending':
+            logger.debug('%s is pending approval', role.capitalize())
+            return jsonify({'message': 'Your account is pending approval'}), 403
+
+        if not verify_password(password, account['password_hash']):
+            logger.warning('Invalid password for %s', role)
+            return jsonify({'message': 'Invalid email or password'}), 401
+
+        upgrade_password_hash(account, password)
+
+        token_data = {'user_id': account['id']}
+        if account['source'] == 'users':
+            token_data['email'] = account['email']
+        token_data['role'] = role
+        token_data['exp'] = datetime.utcnow() + timedelta(days=1)
+        token = jwt.encode(token_data, app.config['SECRET_KEY'])
+        logger.info('✅ Generated token for %s %s', role, account['id'])
+
+        response_data = {
+            'token': token,
+            'role': role,
+            'user_id': account['id']
+        }
+
+        # Add business name for clients
+        if role == 'client' and account['business_name']:
+            response_data['business_name'] = account['business_name']
+
+        response = jsonify(response_data)
+        response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response
+
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        print(f"Unexpected error during login: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Unexpected error during login: %s', e)
+        logger.debug('Error type: %s', type(e))
+        logger.debug('Traceback', exc_info=True)
         response = jsonify({'message': 'Login failed due to an unexpected error'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -1692,8 +651,8 @@ def login():
 @token_required
 def verify_token(current_user):
     try:
-        print('\n=== Verifying Token ===')
-        print('User data received:', current_user)
+        logger.debug('=== Verifying Token ===')
+        logger.debug('User data received: %s', current_user)
         
         # Return the user data with the role from the token
         return jsonify({
@@ -1705,52 +664,15 @@ def verify_token(current_user):
         })
         
     except Exception as e:
-        print('Error in verify_token:', str(e))
+        logger.error('Error in verify_token: %s', e)
         return jsonify({'error': 'Token verification failed'}), 401
 
 @app.route('/api/bookings', methods=['GET', 'POST', 'OPTIONS'])
 @token_required
 def get_bookings(current_user):
-    def calculate_cost(category, area_sqft, num_floors):
-        COSTING_TABLE = {
-            "Retail Store / Showroom":      [5999,  9999,  15999, 20999, None],
-            "Restaurants & Cafes":          [7999, 11999, 19999, 25999, None],
-            "Fitness & Sports Arenas":      [9999, 13999, 22999, 31999, None],
-            "Resorts & Farmstays / Hotels": [11999,17999, 29999, 39999, None],
-            "Real Estate Property":         [13999,23999, 37999, 49999, None],
-            "Shopping Mall / Complex":      [15999,29999, 47999, 63999, None],
-            "Adventure / Water Parks":      [12999,23999, 39999, 55999, None],
-            "Gaming & Entertainment Zones": [10999,19999, 33999, 45999, None],
-        }
-        area_ranges = [1000, 5000, 10000, 50000]
-
-        if category not in COSTING_TABLE:
-            return None, None, "Invalid category"
-        if area_sqft > 50000:
-            return None, None, "Custom Quote"
-
-        # Find area slab
-        idx = 0
-        for i, max_area in enumerate(area_ranges):
-            if area_sqft <= max_area:
-                idx = i
-                break
-            idx = i + 1
-
-        base_cost = COSTING_TABLE[category][idx]
-        if base_cost is None:
-            return None, None, "Custom Quote"
-
-        # Floor adjustment
-        if num_floors is None or num_floors < 1:
-            num_floors = 1
-        final_cost = int(base_cost * (1 + 0.1 * (num_floors - 1)))
-
-        return base_cost, final_cost, None
-
     if request.method == 'POST':
         data = request.json
-        print("\n=== Creating New Booking ===")
+        logger.debug('=== Creating New Booking ===')
         try:
             conn = get_db()
             cursor = conn.cursor()
@@ -1818,7 +740,7 @@ def get_bookings(current_user):
             rooms_sections = int(data['rooms_sections'])
             num_floors = int(data.get('num_floors', 1))
 
-            base_cost, final_cost, error = calculate_cost(
+            base_cost, final_cost, error = pricing.quote(
                 data['property_type'], area_size, num_floors
             )
             if error:
@@ -1827,25 +749,7 @@ def get_bookings(current_user):
             total_cost = final_cost
             has_referral = bool(data.get('referral_id'))
 
-            def calculate_earnings(total_cost, has_referral):
-                pilot_pct = 0.50
-                editor_pct = 0.15
-                gateway_pct = 0.025
-                if has_referral:
-                    referral_pct = 0.125
-                    hmx_pct = 0.20
-                else:
-                    referral_pct = 0.0
-                    hmx_pct = 0.325
-                return {
-                    "pilot_earnings": round(total_cost * pilot_pct, 2),
-                    "editor_earnings": round(total_cost * editor_pct, 2),
-                    "referral_earnings": round(total_cost * referral_pct, 2),
-                    "hmx_earnings": round(total_cost * hmx_pct, 2),
-                    "gateway_fees": round(total_cost * gateway_pct, 2),
-                }
-            has_referral = bool(data.get('referral_id'))
-            earn = calculate_earnings(total_cost, has_referral)
+            earn = earnings.split_order(total_cost, has_referral)
 
             # --- Insert booking ---
             cursor.execute('''
@@ -1918,17 +822,17 @@ def get_bookings(current_user):
                 'earnings': earn
             }), 201
 
+        except HashingBusy:
+            return hashing_busy_response()
         except sqlite3.Error as e:
-            import traceback
-            print(traceback.format_exc())
+            logger.debug('Traceback', exc_info=True)
             return jsonify({'message': f'Database error: {str(e)}'}), 500
         except Exception as e:
-            import traceback
-            print(traceback.format_exc())
+            logger.debug('Traceback', exc_info=True)
             return jsonify({'message': f'Failed to create booking: {str(e)}'}), 500
 
     # --- GET BOOKINGS ---
-    print("\n=== Fetching Bookings ===")
+    logger.debug('=== Fetching Bookings ===')
     try:
         conn = get_db()
         cursor = conn.cursor()
@@ -1972,7 +876,7 @@ def get_bookings(current_user):
         return jsonify([dict(booking) for booking in bookings])
 
     except Exception as e:
-        print(f"Error fetching bookings: {str(e)}")
+        logger.error('Error fetching bookings: %s', e)
         return jsonify({'message': 'Failed to fetch bookings'}), 500
 
 
@@ -2008,20 +912,20 @@ def claim_booking(current_user, booking_id):
             return jsonify({'message': 'Booking was claimed by another pilot'}), 409
             
         conn.commit()
-        print(f"Booking {booking_id} claimed by pilot {pilot_id}")
+        logger.info('Booking %s claimed by pilot %s', booking_id, pilot_id)
         conn.close()
         
         return jsonify({'message': 'Booking claimed successfully'})
     except Exception as e:
-        print(f"Error claiming booking: {str(e)}")
+        logger.error('Error claiming booking: %s', e)
         return jsonify({'message': 'Failed to claim booking'}), 500
 
 @app.route('/api/bookings/<int:booking_id>', methods=['PUT', 'OPTIONS'])
 @token_required
 def update_booking(current_user, booking_id):
     data = request.json
-    print(f"\n=== Updating Booking {booking_id} ===")
-    print(f"Update data: {data}")
+    logger.debug('=== Updating Booking %s ===', booking_id)
+    logger.debug('Update data: %s', data)
     
     try:
         conn = get_db()
@@ -2064,12 +968,12 @@ def update_booking(current_user, booking_id):
             ''', (data.get('client_notes'), booking_id, current_user['id']))
             
         conn.commit()
-        print("Booking updated successfully")
+        logger.debug('Booking updated successfully')
         conn.close()
         
         return jsonify({'message': 'Booking updated successfully'})
     except Exception as e:
-        print(f"Error updating booking: {str(e)}")
+        logger.error('Error updating booking: %s', e)
         return jsonify({'message': 'Failed to update booking'}), 500
 
 @app.route('/api/bookings/<int:booking_id>/complete', methods=['POST'])
@@ -2108,12 +1012,12 @@ def complete_booking(current_user, booking_id):
         ''', (data['drive_link'], booking_id, pilot_id))
         
         conn.commit()
-        print(f"Booking {booking_id} completed by pilot {pilot_id}")
+        logger.info('Booking %s completed by pilot %s', booking_id, pilot_id)
         conn.close()
         
         return jsonify({'message': 'Booking completed successfully'})
     except Exception as e:
-        print(f"Error completing booking: {str(e)}")
+        logger.error('Error completing booking: %s', e)
         return jsonify({'message': 'Failed to complete booking'}), 500
 
 @app.route('/api/bookings/<int:booking_id>/payment', methods=['POST'])
@@ -2151,12 +1055,12 @@ def process_payment(current_user, booking_id):
         ''', (data['amount'], booking_id, current_user['id']))
         
         conn.commit()
-        print(f"Payment processed for booking {booking_id} by client {current_user['id']}")
+        logger.info('Payment processed for booking %s by client %s', booking_id, current_user['id'])
         conn.close()
         
         return jsonify({'message': 'Payment processed successfully'})
     except Exception as e:
-        print(f"Error processing payment: {str(e)}")
+        logger.error('Error processing payment: %s', e)
         return jsonify({'message': 'Failed to process payment'}), 500
 
 @app.route('/api/bookings/<int:booking_id>/start', methods=['POST'])
@@ -2189,12 +1093,12 @@ def start_booking(current_user, booking_id):
         ''', (booking_id, pilot_id))
         
         conn.commit()
-        print(f"Booking {booking_id} started by pilot {pilot_id}")
+        logger.info('Booking %s started by pilot %s', booking_id, pilot_id)
         conn.close()
         
         return jsonify({'message': 'Booking started successfully'})
     except Exception as e:
-        print(f"Error starting booking: {str(e)}")
+        logger.error('Error starting booking: %s', e)
         return jsonify({'message': 'Failed to start booking'}), 500
 
 # Client Profile Update
@@ -2232,6 +1136,7 @@ def update_client_profile(current_user):
 
         conn.commit()
         conn.close()
+        principal_cache.invalidate('users', current_user['id'])
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -2241,7 +1146,7 @@ def update_client_profile(current_user):
         }), 200
 
     except Exception as e:
-        print(f"Error updating client profile: {str(e)}")
+        logger.error('Error updating client profile: %s', e)
         return jsonify({'message': 'Failed to update profile'}), 500
 
 # Client Password Update
@@ -2286,11 +1191,14 @@ def update_client_password(current_user):
 
         conn.commit()
         conn.close()
+        principal_cache.invalidate('users', current_user['id'])
 
         return jsonify({'message': 'Password updated successfully'}), 200
 
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        print(f"Error updating client password: {str(e)}")
+        logger.error('Error updating client password: %s', e)
         return jsonify({'message': 'Failed to update password'}), 500
 
 # Client Account Deletion
@@ -2320,6 +1228,7 @@ def delete_client_account(current_user):
             # Commit transaction
             cursor.execute('COMMIT')
             conn.close()
+            principal_cache.invalidate('users', current_user['id'])
 
             return jsonify({'message': 'Account deleted successfully'}), 200
 
@@ -2329,31 +1238,60 @@ def delete_client_account(current_user):
             raise e
 
     except Exception as e:
-        print(f"Error deleting client account: {str(e)}")
+        logger.error('Error deleting client account: %s', e)
         return jsonify({'message': 'Failed to delete account'}), 500
 
 # Helper function to verify password
 def verify_password(password, password_hash):
+    if not password_hash:
+        return False
     try:
-        print(f"\n=== Password Verification ===")
-        print(f"Password hash format: {password_hash[:20]}...")
-        
-        # Use werkzeug's password verification
-        result = werkzeug.security.check_password_hash(password_hash, password)
-        print(f"Password verification result: {result}")
-        return result
-            
-    except Exception as e:
-        print(f"Error verifying password: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        # werkzeug's check_password_hash, run in the hashing pool
+        return password_hasher.verify(password_hash, password)
+
+    except ValueError as e:
+        # A stored hash werkzeug cannot parse can never match; pool failures propagate as 503/500
+        logger.error('Error verifying password: %s', e)
         return False
 
 # Helper function to generate password hash
 def generate_password_hash(password):
-    # Use werkzeug's password hashing
-    return werkzeug.security.generate_password_hash(password)
+    # werkzeug's generate_password_hash with the configured method, run in the hashing pool
+    return password_hasher.hash(password)
+
+def upgrade_password_hash(account, password):
+    """Re-hash a login_identities account's password if it predates the configured cost"""
+    if not password_hasher.needs_rehash(account['password_hash']):
+        return
+    try:
+        new_hash = password_hasher.hash(password)
+        conn = get_db()
+        conn.execute(f"UPDATE {account['source']} SET password_hash = ? WHERE id = ?", (new_hash, account['id']))
+        conn.commit()
+        principal_cache.invalidate(account['source'], account['id'])
+        password_hasher.record_rehash()
+        logger.info('🔐 Upgraded password hash for %s %s to %s', account['role'], account['id'], password_hasher.method)
+    except (HashingBusy, sqlite3.Error) as e:
+        # The login itself succeeded; the upgrade is retried next time
+        logger.warning('⚠️  Password hash upgrade skipped: %s', e)
+
+@cached_query
+def admin_users_query(conn):
+    """ListQuery for /api/admin/users (every users column except the hash)"""
+    return ListQuery(
+        'admin_users',
+        from_sql='users u',
+        alias='u',
+        fields=columns_of(conn, 'users', 'u'),
+        sorts={'id': 'u.id', 'created_at': 'u.created_at'},
+        default_sort='id',
+        default_order='asc',
+        filters={
+            'role': Filter('u.role = ?'),
+            'date_from': Filter('u.created_at >= ?', parse_date),
+            'date_to': Filter("u.created_at < date(?, '+1 day')", parse_date),
+        }
+    )
 
 @app.route('/api/admin/users', methods=['GET', 'OPTIONS'])
 @token_required
@@ -2367,11 +1305,11 @@ def get_users(current_user):
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
-    print("\n=== Admin Users Request ===")
-    print(f"Requesting user role: {current_user['role']}")
+    logger.debug('=== Admin Users Request ===')
+    logger.debug('Requesting user role: %s', current_user['role'])
     
     if current_user['role'] != 'admin':
-        print("Unauthorized access attempt")
+        logger.warning('Unauthorized access attempt')
         response = jsonify({'message': 'Unauthorized'}), 403
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -2379,20 +1317,19 @@ def get_users(current_user):
     
     try:
         conn = get_db()
-        users = conn.execute('SELECT * FROM users').fetchall()
-        conn.close()
-        
-        users_list = [dict(user) for user in users]
-        print(f"Found {len(users_list)} users:")
-        for user in users_list:
-            print(f"- {user['email']} (Status: {user['approval_status']})")
-        
-        response = jsonify(users_list)
+        page = admin_users_query(conn).fetch(conn, request.args)
+
+        response = json_response(page)
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
+    except ListQueryError as e:
+        response = jsonify({'message': str(e)}), 400
+        response[0].headers.add('Access-Control-Allow-Origin', get_cors_origin())
+        response[0].headers.add('Access-Control-Allow-Credentials', 'true')
+        return response
     except Exception as e:
-        print(f"Error fetching users: {str(e)}")
+        logger.error('Error fetching users: %s', e)
         response = jsonify({'message': 'Error fetching users'}), 500
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -2410,12 +1347,12 @@ def update_user_approval(current_user, user_id):
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
-    print(f"\n=== Update User Approval ===")
-    print(f"Requesting user role: {current_user['role']}")
-    print(f"Target user ID: {user_id}")
+    logger.debug('=== Update User Approval ===')
+    logger.debug('Requesting user role: %s', current_user['role'])
+    logger.debug('Target user ID: %s', user_id)
     
     if current_user['role'] != 'admin':
-        print("Unauthorized access attempt")
+        logger.warning('Unauthorized access attempt')
         response = jsonify({'message': 'Unauthorized'}), 403
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -2442,8 +1379,9 @@ def update_user_approval(current_user, user_id):
         c.execute('UPDATE users SET approval_status = ? WHERE id = ?', (approval_status, user_id))
         conn.commit()
         conn.close()
+        principal_cache.invalidate('users', user_id)
         
-        print(f"User {user_id} approval status updated to: {approval_status}")
+        logger.info('User %s approval status updated to: %s', user_id, approval_status)
         
         response = jsonify({'message': f'User approval status updated to {approval_status}'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
@@ -2451,12 +1389,26 @@ def update_user_approval(current_user, user_id):
         return response
         
     except Exception as e:
-        print(f"Error updating user approval: {str(e)}")
+        logger.error('Error updating user approval: %s', e)
         response = jsonify({'message': 'Error updating user approval'}), 500
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
+ADMIN_PILOTS_QUERY = ListQuery(
+    'admin_pilots',
+    from_sql='pilots p',
+    alias='p',
+    fields={name: Field(f'p.{name}') for name in ['id', 'name', 'email', 'phone', 'status', 'created_at']},
+    sorts={'id': 'p.id', 'created_at': 'p.created_at', 'name': 'p.name'},
+    default_sort='id',
+    default_order='asc',
+    filters={
+        'status': Filter('p.status = ?'),
+        'city': Filter('p.cities LIKE ?', lambda value: f'%{value}%'),
+    }
+)
+
 @app.route('/api/admin/pilots', methods=['GET', 'POST', 'OPTIONS'])
 @token_required
 def manage_pilots(current_user):
@@ -2496,43 +1448,23 @@ def manage_pilots(current_user):
             conn.commit()
             return jsonify({'message': 'Pilot added successfully'}), 201
 
+        except HashingBusy:
+            return hashing_busy_response()
         except Exception as e:
-            print(f"Error adding pilot: {e}")
+            logger.error('Error adding pilot: %s', e)
             return jsonify({'error': 'Internal server error'}), 500
 
     # GET method
     try:
         conn = get_db()
-        c = conn.cursor()
-        
-        # Fetch pilots with error handling for each column
-        c.execute('SELECT id, name, email, phone, status, created_at FROM pilots')
-        pilots = c.fetchall()
-        
-        pilots_list = []
-        for pilot in pilots:
-            try:
-                pilot_dict = {
-                    'id': pilot[0],
-                    'name': pilot[1],
-                    'email': pilot[2],
-                    'phone': pilot[3],
-                    'status': pilot[4],
-                    'created_at': pilot[5] if len(pilot) > 5 else None
-                }
-                pilots_list.append(pilot_dict)
-            except Exception as e:
-                print(f"Error processing pilot data: {e}")
-                print(f"Problematic pilot data: {pilot}")
-                continue
-
-        print(f"Successfully fetched {len(pilots_list)} pilots")
-        return jsonify(pilots_list)
+        page = ADMIN_PILOTS_QUERY.fetch(conn, request.args)
+        return json_response(page)
 
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error fetching pilots: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Error fetching pilots: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/pilots/<int:pilot_id>', methods=['GET', 'PUT', 'DELETE', 'OPTIONS'])
@@ -2606,6 +1538,7 @@ def manage_pilot(current_user, pilot_id):
             
             c.execute(query, update_values)
             conn.commit()
+            principal_cache.invalidate('pilots', pilot_id)
             
             return jsonify({'message': 'Pilot updated successfully'})
 
@@ -2618,13 +1551,15 @@ def manage_pilot(current_user, pilot_id):
             # Delete pilot
             c.execute('DELETE FROM pilots WHERE id = ?', (pilot_id,))
             conn.commit()
+            principal_cache.invalidate('pilots', pilot_id)
             
             return jsonify({'message': 'Pilot deleted successfully'})
 
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        print(f"Error managing pilot: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Error managing pilot: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/pilots/<int:pilot_id>/details', methods=['GET'])
@@ -2652,7 +1587,7 @@ def get_pilot_details(current_user, pilot_id):
         return response
 
     except Exception as e:
-        print(f"Error fetching pilot details: {str(e)}")
+        logger.error('Error fetching pilot details: %s', e)
         return jsonify({'message': 'Internal server error'}), 500
 
 @app.route('/api/admin/videos', methods=['GET', 'OPTIONS'])
@@ -2835,13 +1770,28 @@ def public_referral_register():
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 201
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        print(f"Error in public_referral_register: {str(e)}")
+        logger.error('Error in public_referral_register: %s', e)
         response = jsonify({'message': 'Internal server error'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 500
 
+ADMIN_REFERRALS_QUERY = ListQuery(
+    'admin_referrals',
+    from_sql='referrals r',
+    alias='r',
+    fields={
+        name: Field(f'r.{name}')
+        for name in ['id', 'name', 'email', 'phone', 'status', 'commission_rate', 'total_earnings', 'created_at']
+    },
+    sorts={'created_at': 'r.created_at', 'id': 'r.id', 'name': "COALESCE(r.name, '')"},
+    default_sort='created_at',
+    filters={'status': Filter('r.status = ?')}
+)
+
 @app.route('/api/admin/referrals', methods=['GET', 'POST', 'OPTIONS'])
 @token_required
 def manage_referrals(current_user):
@@ -2879,49 +1829,20 @@ def manage_referrals(current_user):
             return jsonify({'message': 'Referral added successfully'}), 201
 
         except Exception as e:
-            print(f"Error adding referral: {e}")
+            logger.error('Error adding referral: %s', e)
             return jsonify({'error': 'Internal server error'}), 500
 
     # GET method
     try:
         conn = get_db()
-        c = conn.cursor()
-        
-        # Fetch referrals
-        c.execute('''
-            SELECT id, name, email, phone, status, commission_rate, total_earnings, created_at
-            FROM referrals
-            ORDER BY created_at DESC
-        ''')
-        referrals = c.fetchall()
-        
-        referrals_list = []
-        for referral in referrals:
-            try:
-                referral_dict = {
-                    'id': referral[0],
-                    'name': referral[1],
-                    'email': referral[2],
-                    'phone': referral[3],
-                    'status': referral[4],
-                    'commission_rate': referral[5],
-                    'total_earnings': referral[6],
-                    'created_at': referral[7]
-                }
-                referrals_list.append(referral_dict)
-            except Exception as e:
-                print(f"Error processing referral data: {e}")
-                print(f"Problematic referral data: {referral}")
-                continue
-
-        conn.close()
-        print(f"Successfully fetched {len(referrals_list)} referrals")
-        return jsonify(referrals_list)
+        page = ADMIN_REFERRALS_QUERY.fetch(conn, request.args)
+        return json_response(page)
 
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error fetching referrals: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Error fetching referrals: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/referrals/<int:referral_id>', methods=['GET', 'PUT', 'DELETE', 'OPTIONS'])
@@ -2996,6 +1917,7 @@ def manage_referral(current_user, referral_id):
             c.execute(query, update_values)
             conn.commit()
             conn.close()
+            principal_cache.invalidate('referrals', referral_id)
             
             return jsonify({'message': 'Referral updated successfully'})
 
@@ -3010,15 +1932,26 @@ def manage_referral(current_user, referral_id):
             c.execute('DELETE FROM referrals WHERE id = ?', (referral_id,))
             conn.commit()
             conn.close()
+            principal_cache.invalidate('referrals', referral_id)
             
             return jsonify({'message': 'Referral deleted successfully'})
 
     except Exception as e:
-        print(f"Error managing referral: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Error managing referral: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
+ADMIN_EDITORS_QUERY = ListQuery(
+    'admin_editors',
+    from_sql='editors e',
+    alias='e',
+    fields={name: Field(f'e.{name}') for name in ['id', 'name', 'email', 'phone', 'status', 'created_at']},
+    sorts={'id': 'e.id', 'created_at': 'e.created_at', 'name': 'e.name'},
+    default_sort='id',
+    default_order='asc',
+    filters={'status': Filter('e.status = ?')}
+)
+
 @app.route('/api/admin/editors', methods=['GET', 'POST', 'OPTIONS'])
 @token_required
 def manage_editors(current_user):
@@ -3059,10 +1992,11 @@ def manage_editors(current_user):
             conn.close()
             return jsonify({'message': 'Editor added successfully'}), 201
 
+        except HashingBusy:
+            return hashing_busy_response()
         except Exception as e:
-            print(f"Error adding editor: {e}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.error('Error adding editor: %s', e)
+            logger.debug('Traceback', exc_info=True)
             try:
                 conn.close()
             except:
@@ -3072,42 +2006,14 @@ def manage_editors(current_user):
     # GET method
     try:
         conn = get_db()
-        c = conn.cursor()
-        
-        # First, let's check what columns exist in the editors table
-        c.execute("PRAGMA table_info(editors)")
-        columns_info = c.fetchall()
-        print(f"Editors table columns: {[col[1] for col in columns_info]}")
-        
-        # Fetch editors with error handling for each column
-        c.execute('SELECT id, name, email, phone, status, created_at FROM editors')
-        editors = c.fetchall()
-        
-        editors_list = []
-        for editor in editors:
-            try:
-                editor_dict = {
-                    'id': editor[0],
-                    'name': editor[1],
-                    'email': editor[2],
-                    'phone': editor[3],
-                    'status': editor[4],
-                    'created_at': editor[5] if len(editor) > 5 else None
-                }
-                editors_list.append(editor_dict)
-            except Exception as e:
-                print(f"Error processing editor data: {e}")
-                print(f"Problematic editor data: {editor}")
-                continue
-
-        print(f"Successfully fetched {len(editors_list)} editors")
-        conn.close()
-        return jsonify(editors_list)
+        page = ADMIN_EDITORS_QUERY.fetch(conn, request.args)
+        return json_response(page)
 
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error fetching editors: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Error fetching editors: %s', e)
+        logger.debug('Traceback', exc_info=True)
         try:
             conn.close()
         except:
@@ -3182,6 +2088,7 @@ def manage_editor(current_user, editor_id):
             
             c.execute(query, update_values)
             conn.commit()
+            principal_cache.invalidate('editors', editor_id)
             
             return jsonify({'message': 'Editor updated successfully'})
 
@@ -3194,13 +2101,13 @@ def manage_editor(current_user, editor_id):
             # Delete editor
             c.execute('DELETE FROM editors WHERE id = ?', (editor_id,))
             conn.commit()
+            principal_cache.invalidate('editors', editor_id)
             
             return jsonify({'message': 'Editor deleted successfully'})
 
     except Exception as e:
-        print(f"Error managing editor: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Error managing editor: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/editors/<int:editor_id>/details', methods=['GET'])
@@ -3228,7 +2135,7 @@ def get_editor_details(current_user, editor_id):
         return response
 
     except Exception as e:
-        print(f"Error fetching editor details: {str(e)}")
+        logger.error('Error fetching editor details: %s', e)
         return jsonify({'message': 'Internal server error'}), 500
 
 @app.route('/api/admin/inquiries', methods=['GET', 'PUT', 'OPTIONS'])
@@ -3265,6 +2172,46 @@ def manage_inquiries(current_user):
         except Exception as e:
             return jsonify({'message': str(e)}), 500
 
+ADMIN_PAYMENTS_QUERY = ListQuery(
+    'admin_payments',
+    from_sql='payments p JOIN bookings b ON p.booking_id = b.id JOIN users u ON b.user_id = u.id',
+    alias='p',
+    fields={
+        'id': Field('p.id'),
+        'booking_id': Field('p.booking_id'),
+        'amount': Field('p.amount', convert=lambda value: float(value) if value else 0),
+        'status': Field('p.status'),
+        'payment_method': Field('p.payment_method'),
+        'transaction_id': Field('p.transaction_id'),
+        'created_at': Field('p.created_at'),
+        'updated_at': Field('p.updated_at'),
+        'property_type': Field('b.property_type'),
+        'location': Field('b.location_address'),
+        'client_name': Field('u.username'),
+        'client_company': Field('bc.business_name', joins=['business_clients']),
+        'client_email': Field('u.email'),
+        'client_phone': Field('bc.phone', joins=['business_clients']),
+        'pilot_name': Field('pi.name', joins=['pilots']),
+        'pilot_email': Field('pi.email', joins=['pilots']),
+        'pilot_phone': Field('pi.phone', joins=['pilots']),
+        'referral_name': Field('r.name', joins=['referrals']),
+        'referral_email': Field('r.email', joins=['referrals']),
+    },
+    joins={
+        'business_clients': 'LEFT JOIN business_clients bc ON u.email = bc.email',
+        'pilots': 'LEFT JOIN pilots pi ON b.pilot_id = pi.id',
+        'referrals': 'LEFT JOIN referrals r ON b.referral_id = r.id',
+    },
+    sorts={'created_at': 'p.created_at', 'id': 'p.id'},
+    default_sort='created_at',
+    filters={
+        'status': Filter('p.status = ?'),
+        'booking_id': Filter('p.booking_id = ?', int),
+        'date_from': Filter('p.created_at >= ?', parse_date),
+        'date_to': Filter("p.created_at < date(?, '+1 day')", parse_date),
+    }
+)
+
 @app.route('/api/admin/payments', methods=['GET', 'OPTIONS'])
 @token_required
 def get_payments(current_user):
@@ -3284,65 +2231,44 @@ def get_payments(current_user):
     
     try:
         conn = get_db()
-        payments = conn.execute('''
-            SELECT 
-                p.*,
-                b.property_type,
-                b.location,
-                u.contact_name as client_name,
-                u.business_name as client_company,
-                u.email as client_email,
-                u.phone as client_phone,
-                pi.name as pilot_name,
-                pi.email as pilot_email,
-                pi.phone as pilot_phone,
-                r.name as referral_name,
-                r.email as referral_email
-            FROM payments p
-            JOIN bookings b ON p.booking_id = b.id
-            JOIN users u ON b.user_id = u.id
-            LEFT JOIN pilots pi ON b.pilot_id = pi.id
-            LEFT JOIN referrals r ON b.referral_id = r.id
-            ORDER BY p.created_at DESC
-        ''').fetchall()
-        conn.close()
-        
-        payments_list = []
-        for payment in payments:
-            payment_dict = {
-                'id': payment[0],
-                'booking_id': payment[1],
-                'amount': float(payment[2]) if payment[2] else 0,
-                'status': payment[3],
-                'payment_method': payment[4],
-                'transaction_id': payment[5],
-                'created_at': payment[6],
-                'updated_at': payment[7],
-                'property_type': payment[8],
-                'location': payment[9],
-                'client_name': payment[10],
-                'client_company': payment[11],
-                'client_email': payment[12],
-                'client_phone': payment[13],
-                'pilot_name': payment[14],
-                'pilot_email': payment[15],
-                'pilot_phone': payment[16],
-                'referral_name': payment[17],
-                'referral_email': payment[18]
-            }
-            payments_list.append(payment_dict)
-        
-        response = jsonify(payments_list)
+        page = ADMIN_PAYMENTS_QUERY.fetch(conn, request.args)
+
+        response = json_response(page)
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
+    except ListQueryError as e:
+        response = jsonify({'message': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response, 400
     except Exception as e:
-        print(f"Error fetching payments: {str(e)}")
+        logger.error('Error fetching payments: %s', e)
         response = jsonify({'message': str(e)}), 500
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
+@cached_query
+def admin_cancellations_query(conn):
+    """ListQuery for /api/admin/cancellations (cancellation row plus booking details)"""
+    fields = columns_of(conn, 'cancellations', 'c')
+    fields['property_type'] = Field('b.property_type')
+    fields['location'] = Field('b.location_address')
+    return ListQuery(
+        'admin_cancellations',
+        from_sql='cancellations c JOIN bookings b ON c.booking_id = b.id',
+        alias='c',
+        fields=fields,
+        sorts={'created_at': 'c.created_at', 'id': 'c.id'},
+        default_sort='created_at',
+        filters={
+            'status': Filter('c.status = ?'),
+            'date_from': Filter('c.created_at >= ?', parse_date),
+            'date_to': Filter("c.created_at < date(?, '+1 day')", parse_date),
+        }
+    )
+
 @app.route('/api/admin/cancellations', methods=['GET', 'POST', 'OPTIONS'])
 @token_required
 def manage_cancellations(current_user):
@@ -3352,15 +2278,10 @@ def manage_cancellations(current_user):
     if request.method == 'GET':
         try:
             conn = get_db()
-            cancellations = conn.execute('''
-                SELECT c.*, b.property_type, b.location 
-                FROM cancellations c
-                JOIN bookings b ON c.booking_id = b.id
-                ORDER BY c.created_at DESC
-            ''').fetchall()
-            conn.close()
-            
-            return jsonify([dict(cancellation) for cancellation in cancellations])
+            page = admin_cancellations_query(conn).fetch(conn, request.args)
+            return json_response(page)
+        except ListQueryError as e:
+            return jsonify({'message': str(e)}), 400
         except Exception as e:
             return jsonify({'message': str(e)}), 500
     
@@ -3388,50 +2309,129 @@ def manage_cancellations(current_user):
         except Exception as e:
             return jsonify({'message': str(e)}), 500
 
-@app.route('/api/admin/stats', methods=['GET', 'OPTIONS'])
+@app.route('/api/admin/stats', methods=['GET', 'OPTIONS'])
+@token_required
+def get_admin_stats(current_user):
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    
+    try:
+        conn = get_db()
+        
+        # Read from dashboard_counters, kept current by triggers on videos, bookings and payments
+        videos = dashboard_counters.counts(conn, 'videos_by_status')
+        orders = dashboard_counters.counts(conn, 'bookings_by_status')
+        this_month = datetime.utcnow().strftime('%Y-%m')
+
+        return jsonify({
+            'videos': {
+                'pending_before': videos.get('pending/before', 0),
+                'pending_after': videos.get('pending/after', 0)
+            },
+            'orders': {
+                'new_orders': orders.get('pending', 0),
+                'ongoing_orders': orders.get('in_progress', 0),
+                'completed_orders': orders.get('completed', 0)
+            },
+            'revenue': {
+                'total_revenue': dashboard_counters.total(conn, 'payments_completed_by_month', this_month)
+            }
+        })
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/admin/db/pool', methods=['GET', 'OPTIONS'])
+@token_required
+def get_db_pool_stats(current_user):
+    """Connection pool, pragma profile and WAL checkpoint counters for this worker"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    stats = db_pool.stats()
+    stats['pragmas'] = dict(DatabaseConfig.pragmas())
+    stats['checkpoint'] = wal_checkpointer.stats()
+    return jsonify(stats)
+
+@app.route('/api/admin/auth/hashing', methods=['GET'])
+@token_required
+def get_password_hashing_stats(current_user):
+    """Method, queue depth and timings of this worker's password hashing pool"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify(password_hasher.stats())
+
+@app.route('/api/admin/metrics', methods=['GET'])
+@token_required
+def get_request_metrics(current_user):
+    """Per-endpoint request and SQL timings for this worker"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify(request_metrics.snapshot())
+
+@app.route('/api/admin/metrics/prometheus', methods=['GET'])
+@token_required
+def get_request_metrics_prometheus(current_user):
+    """The same counters in Prometheus text format"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return request_metrics.prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/api/admin/slow-queries', methods=['GET'])
+@token_required
+def get_slow_queries(current_user):
+    """Slowest statements in this worker, grouped by normalized text, with their query plans"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    limit = request.args.get('limit', SlowQueryConfig.TOP_N, type=int)
+    report = slow_queries.top(limit=max(1, min(limit, 200)), sort=request.args.get('sort', 'total'))
+    report['enabled'] = SlowQueryConfig.THRESHOLD_MS > 0
+    return jsonify(report)
+
+@app.route('/api/admin/slow-queries', methods=['DELETE'])
+@token_required
+def reset_slow_queries(current_user):
+    """Start the slow-query report over, e.g. after adding an index"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    slow_queries.reset()
+    return jsonify({'message': 'Slow-query report cleared'})
+
+@app.route('/api/admin/logging', methods=['GET'])
 @token_required
-def get_admin_stats(current_user):
+def get_logging_stats(current_user):
+    """Log level and this worker's log queue depth and dropped records"""
     if current_user['role'] != 'admin':
         return jsonify({'message': 'Unauthorized'}), 403
-    
-    try:
-        conn = get_db()
-        
-        # Get video stats
-        video_stats = conn.execute('''
-            SELECT 
-                COUNT(CASE WHEN status = 'pending' AND review_type = 'before' THEN 1 END) as pending_before,
-                COUNT(CASE WHEN status = 'pending' AND review_type = 'after' THEN 1 END) as pending_after
-            FROM videos
-        ''').fetchone()
-        
-        # Get order stats
-        order_stats = conn.execute('''
-            SELECT 
-                COUNT(CASE WHEN status = 'pending' THEN 1 END) as new_orders,
-                COUNT(CASE WHEN status = 'in_progress' THEN 1 END) as ongoing_orders,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_orders
-            FROM bookings
-        ''').fetchone()
-        
-        # Get revenue stats
-        revenue_stats = conn.execute('''
-            SELECT 
-                COALESCE(SUM(amount), 0) as total_revenue
-            FROM payments
-            WHERE status = 'completed'
-            AND created_at >= date('now', 'start of month')
-        ''').fetchone()
-        
-        conn.close()
-        
-        return jsonify({
-            'videos': dict(video_stats),
-            'orders': dict(order_stats),
-            'revenue': dict(revenue_stats)
-        })
-    except Exception as e:
-        return jsonify({'message': str(e)}), 500
+
+    return jsonify(app_logging.stats())
+
+@app.route('/api/admin/email/outbox', methods=['GET'])
+@token_required
+def get_email_outbox_stats(current_user):
+    """Queue depth and send latency of email_outbox, plus this worker's sender, SMTP and template counters"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    stats = outbox_stats(get_db())
+    stats['mode'] = EmailConfig.OUTBOX_SENDER
+    stats['sender'] = email_sender.stats()
+    stats['smtp'] = smtp_pool.stats()
+    stats['templates'] = template_cache.stats()
+    return jsonify(stats)
+
+@app.route('/api/admin/auth/cache', methods=['GET'])
+@token_required
+def get_principal_cache_stats(current_user):
+    """Hit rate and size of this worker's principal cache"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify(principal_cache.stats())
 
 # Pre-List Management Endpoints
 @app.route('/api/admin/pre-list', methods=['GET', 'POST', 'OPTIONS'])
@@ -3504,6 +2504,137 @@ def manage_pre_list_item(current_user, item_id):
         except Exception as e:
             return jsonify({'message': str(e)}), 500
 
+# Admin orders list: (output key, bookings column, default when the column is missing)
+ADMIN_ORDER_COLUMNS = [
+    ('user_id', 'user_id', None),
+    ('status', 'status', 'pending'),
+    ('created_at', 'created_at', ''),
+    ('updated_at', 'updated_at', ''),
+    ('pilot_id', 'pilot_id', None),
+    ('editor_id', 'editor_id', None),
+    ('referral_id', 'referral_id', None),
+    ('location', 'location', ''),
+    ('location_address', 'location_address', ''),
+    ('gps_link', 'gps_link', ''),
+    ('property_type', 'property_type', ''),
+    ('indoor_outdoor', 'indoor_outdoor', ''),
+    ('area_size', 'area_size', 0),
+    ('area_unit', 'area_unit', ''),
+    ('area_sqft', 'area_sqft', 0),
+    ('num_floors', 'num_floors', 0),
+    ('rooms_sections', 'rooms_sections', 0),
+    ('duration', 'duration', 0),
+    ('preferred_date', 'preferred_date', ''),
+    ('preferred_time', 'preferred_time', ''),
+    ('shooting_hours', 'shooting_hours', 0),
+    ('area_covered', 'area_covered', 0),
+    ('base_package_cost', 'base_package_cost', 0),
+    ('base_cost', 'base_cost', 0),
+    ('total_cost', 'total_cost', 0),
+    ('discount_code', 'discount_code', ''),
+    ('discount_amount', 'discount_amount', 0),
+    ('payment_status', 'payment_status', 'pending'),
+    ('payment_amount', 'payment_amount', 0),
+    ('total_amount', 'payment_amount', 0),  # For backward compatibility
+    ('payment_date', 'payment_date', ''),
+    ('completed_date', 'completed_date', ''),
+    ('requirements', 'requirements', ''),
+    ('special_requirements', 'special_requirements', ''),
+    ('custom_quote', 'custom_quote', ''),
+    ('description', 'description', ''),
+    ('pilot_notes', 'pilot_notes', ''),
+    ('client_notes', 'client_notes', ''),
+    ('admin_comments', 'admin_comments', ''),
+    ('drive_link', 'drive_link', ''),
+    ('delivery_video_link', 'delivery_video_link', ''),
+    ('pilot_earnings', 'pilot_earnings', ''),
+    ('editor_earnings', 'editor_earnings', ''),
+    ('referral_earnings', 'referral_earnings', ''),
+    ('hmx_earnings', 'hmx_earnings', ''),
+    ('gateway_fees', 'gateway_fees', ''),
+]
+
+ADMIN_ORDER_FLAGS = [
+    'background_music_voiceover', 'editing_color_grading', 'voiceover_script',
+    'background_music_licensed', 'branding_overlay', 'multiple_revisions',
+    'drone_licensing_fee', 'drone_permissions_required'
+]
+
+def _client_from_notes(notes):
+    """Admin-created orders keep 'Client: name (email)' on the first line of client_notes"""
+    if notes and notes.startswith('Client: '):
+        parts = notes.split('\n')[0].replace('Client: ', '').split(' (')
+        if len(parts) == 2:
+            return parts[0], parts[1].rstrip(')')
+    return None, None
+
+def _order_status_clause(status):
+    """Map the Orders page tabs to WHERE fragments; any other value means every order, as before"""
+    tabs = {
+        'pending': "b.status = 'pending'",
+        'ongoing': "b.status NOT IN ('pending', 'completed', 'rejected', 'cancelled')",
+        'completed': "b.status = 'completed'",
+        'cancelled': "b.status = 'cancelled'",
+    }
+    return tabs.get(status), []
+
+@cached_query
+def admin_orders_query(conn):
+    """ListQuery for /api/admin/orders, built from the live bookings columns"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(bookings)')}
+
+    def column(name):
+        return f'b.{name}' if name in columns else None
+
+    notes_sql = column('client_notes') or 'NULL'
+
+    def client_name(raw):
+        return raw['_client_name'] or _client_from_notes(raw['_notes'])[0] or 'Unknown'
+
+    def client_email(raw):
+        return _client_from_notes(raw['_notes'])[1] or raw['_client_email']
+
+    fields = {
+        'id': Field('b.id'),
+        'booking_id': Field(derive=lambda raw: f"HMX{raw['_booking_id']:04d}", requires=[('_booking_id', 'b.id')]),
+        'client_id': Field('u.id', joins=['users']),
+        'client_name': Field(derive=client_name, joins=['users'], requires=[
+            ('_client_name', "COALESCE(u.username, 'Unknown Client')"), ('_notes', notes_sql)]),
+        'client_email': Field(derive=client_email, joins=['users'], requires=[
+            ('_client_email', 'u.email'), ('_notes', notes_sql)]),
+        'pilot_name': Field('p.name', joins=['pilots']),
+        'editor_name': Field('e.name', joins=['editors']),
+        'referral_name': Field('r.name', joins=['referrals']),
+    }
+    for key, name, default in ADMIN_ORDER_COLUMNS:
+        fields[key] = Field(column(name), default=default)
+    for name in ADMIN_ORDER_FLAGS:
+        fields[name] = Field(column(name), convert=bool, default=False)
+
+    return ListQuery(
+        'admin_orders',
+        from_sql='bookings b',
+        alias='b',
+        fields=fields,
+        joins={
+            'users': 'LEFT JOIN users u ON b.user_id = u.id',
+            'pilots': 'LEFT JOIN pilots p ON b.pilot_id = p.id',
+            'editors': 'LEFT JOIN editors e ON b.editor_id = e.id',
+            'referrals': 'LEFT JOIN referrals r ON b.referral_id = r.id',
+        },
+        sorts={'created_at': 'b.created_at', 'updated_at': "COALESCE(b.updated_at, '')"},
+        default_sort='created_at',
+        filters={
+            'status': Filter(build=_order_status_clause),
+            'pilot_id': Filter('b.pilot_id = ?', int),
+            'editor_id': Filter('b.editor_id = ?', int),
+            'client_id': Filter('b.user_id = ?', int),
+            'date_from': Filter('b.created_at >= ?', parse_date),
+            'date_to': Filter("b.created_at < date(?, '+1 day')", parse_date),
+            'city': Filter('b.location_address LIKE ?', lambda value: f'%{value}%'),
+        }
+    )
+
 @app.route('/api/admin/orders', methods=['GET', 'POST', 'OPTIONS'])
 @token_required
 def get_admin_orders(current_user):
@@ -3525,8 +2656,8 @@ def get_admin_orders(current_user):
     # Handle POST request for creating new order
     if request.method == 'POST':
         data = request.json
-        print("\n=== Creating New Order (Admin) ===")
-        print(f"Order data: {data}")
+        logger.debug('=== Creating New Order (Admin) ===')
+        logger.debug('Order data: %s', data)
         
         try:
             # Validate required fields
@@ -3588,7 +2719,7 @@ def get_admin_orders(current_user):
             
             conn.commit()
             booking_id = cursor.lastrowid
-            print(f"Created order with ID: {booking_id}")
+            logger.info('Created order with ID: %s', booking_id)
             conn.close()
             
             return jsonify({
@@ -3597,169 +2728,109 @@ def get_admin_orders(current_user):
             }), 201
             
         except sqlite3.Error as e:
-            print(f"Database error: {str(e)}")
+            logger.error('Database error: %s', e)
             return jsonify({'message': f'Database error: {str(e)}'}), 500
         except Exception as e:
-            print(f"Unexpected error: {str(e)}")
+            logger.error('Unexpected error: %s', e)
             return jsonify({'message': f'Failed to create order: {str(e)}'}), 500
     
     # Handle GET request for fetching orders
     try:
         conn = get_db()
+        page = admin_orders_query(conn).fetch(conn, request.args)
+        return json_response(page)
+    except ListQueryError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
 
-        # Get status filter from query parameters
-        status_filter = request.args.get('status', 'all')
-
-        # Use a simple query with only the columns we know exist from your data
-        base_query = '''
-            SELECT b.*,
-                   COALESCE(u.username, 'Unknown Client') as client_name,
-                   u.username, u.email as client_email, u.id as client_id, b.property_type,
-                   p.name as pilot_name, p.email as pilot_email, p.id as pilot_id_actual,
-                   e.name as editor_name, e.email as editor_email, e.id as editor_id_actual,
-                   r.name as referral_name, r.id as referral_id_actual
-            FROM bookings b
-            LEFT JOIN users u ON b.user_id = u.id
-            LEFT JOIN pilots p ON b.pilot_id = p.id
-            LEFT JOIN editors e ON b.editor_id = e.id
-            LEFT JOIN referrals r ON b.referral_id = r.id
-        '''
-
-        # Add status filtering
-        if status_filter == 'pending':
-            query = base_query + " WHERE b.status = 'pending' ORDER BY b.created_at DESC"
-        elif status_filter == 'ongoing':
-            query = base_query + " WHERE b.status NOT IN ('pending', 'completed', 'rejected', 'cancelled') ORDER BY b.created_at DESC"
-        elif status_filter == 'completed':
-            query = base_query + " WHERE b.status = 'completed' ORDER BY b.created_at DESC"
-        elif status_filter == 'cancelled':
-            query = base_query + " WHERE b.status = 'cancelled' ORDER BY b.created_at DESC"
-        else:
-            query = base_query + " ORDER BY b.created_at DESC"
-
-        orders = conn.execute(query).fetchall()
-        conn.close()
-
-        # Process orders to handle cases where user_id is null
-        processed_orders = []
-        for order in orders:
-            order_dict = dict(order)
-
-            # If no user data, try to extract from client_notes
-            if not order_dict.get('name') and order_dict.get('client_notes'):
-                client_notes = order_dict['client_notes']
-                if client_notes.startswith('Client: '):
-                    # Extract client name and email from notes
-                    client_info = client_notes.split('\n')[0]
-                    client_parts = client_info.replace('Client: ', '').split(' (')
-                    if len(client_parts) == 2:
-                        order_dict['name'] = client_parts[0]
-                        order_dict['client_email'] = client_parts[1].rstrip(')')
-
-            # Format the order data with ALL booking fields
-            formatted_order = {
-                # Basic Information
-                'id': order_dict.get('id'),
-                'booking_id': f"HMX{order_dict.get('id', ''):04d}",
-                'user_id': order_dict.get('user_id'),
-                'status': order_dict.get('status', 'pending'),
-                'created_at': order_dict.get('created_at', ''),
-                'updated_at': order_dict.get('updated_at', ''),
+# Admin Export Endpoints
+ADMIN_EARNINGS_QUERY = ListQuery(
+    'admin_earnings',
+    from_sql='bookings b',
+    alias='b',
+    fields={
+        'id': Field('b.id'),
+        'booking_id': Field(derive=lambda raw: f"HMX{raw['_booking_id']:04d}", requires=[('_booking_id', 'b.id')]),
+        'status': Field('b.status'),
+        'payment_status': Field('b.payment_status'),
+        'payment_amount': Field('b.payment_amount'),
+        'created_at': Field('b.created_at'),
+        'completed_date': Field('b.completed_date'),
+        'pilot_id': Field('b.pilot_id'),
+        'pilot_name': Field('p.name', joins=['pilots']),
+        'pilot_earnings': Field('b.pilot_earnings'),
+        'editor_id': Field('b.editor_id'),
+        'editor_name': Field('e.name', joins=['editors']),
+        'editor_earnings': Field('b.editor_earnings'),
+        'referral_id': Field('b.referral_id'),
+        'referral_name': Field('r.name', joins=['referrals']),
+        'referral_earnings': Field('b.referral_earnings'),
+        'hmx_earnings': Field('b.hmx_earnings'),
+        'gateway_fees': Field('b.gateway_fees'),
+    },
+    joins={
+        'pilots': 'LEFT JOIN pilots p ON b.pilot_id = p.id',
+        'editors': 'LEFT JOIN editors e ON b.editor_id = e.id',
+        'referrals': 'LEFT JOIN referrals r ON b.referral_id = r.id',
+    },
+    # Bookings created before the earnings columns existed have no split to export
+    where=['b.pilot_earnings IS NOT NULL'],
+    sorts={'created_at': 'b.created_at', 'id': 'b.id'},
+    default_sort='created_at',
+    default_order='asc',
+    filters={
+        'status': Filter('b.status = ?'),
+        'pilot_id': Filter('b.pilot_id = ?', int),
+        'editor_id': Filter('b.editor_id = ?', int),
+        'referral_id': Filter('b.referral_id = ?', int),
+        'date_from': Filter('b.created_at >= ?', parse_date),
+        'date_to': Filter("b.created_at < date(?, '+1 day')", parse_date),
+    }
+)
 
-                # Client Information
-                'client_id': order_dict.get('client_id'),
-                'client_name': order_dict.get('client_name') or order_dict.get('name', 'Unknown'),
-                'client_email': order_dict.get('client_email', ''),
+ADMIN_EXPORTS = {
+    'orders': admin_orders_query,
+    'payments': lambda conn: ADMIN_PAYMENTS_QUERY,
+    'earnings': lambda conn: ADMIN_EARNINGS_QUERY,
+}
 
-                # Team Assignment
-                'pilot_id': order_dict.get('pilot_id'),
-                'pilot_name': order_dict.get('pilot_name', ''),
-                'editor_id': order_dict.get('editor_id'),
-                'editor_name': order_dict.get('editor_name', ''),
-                'referral_id': order_dict.get('referral_id'),
-                'referral_name': order_dict.get('referral_name', ''),
+EXPORT_FORMATS = {
+    'ndjson': ndjson_response,
+    'csv': csv_response,
+}
 
-                # Location & Property
-                'location': order_dict.get('location', ''),
-                'location_address': order_dict.get('location_address', ''),
-                'gps_link': order_dict.get('gps_link', ''),
-                'property_type': order_dict.get('property_type', ''),
-                
-                'indoor_outdoor': order_dict.get('indoor_outdoor', ''),
-                'area_size': order_dict.get('area_size', 0),
-                'area_unit': order_dict.get('area_unit', ''),
-                'area_sqft': order_dict.get('area_sqft', 0),
-                'num_floors': order_dict.get('num_floors', 0),
-                'rooms_sections': order_dict.get('rooms_sections', 0),
-                'duration': order_dict.get('duration', 0),
-
-                # Scheduling
-                'preferred_date': order_dict.get('preferred_date', ''),
-                'preferred_time': order_dict.get('preferred_time', ''),
-                'shooting_hours': order_dict.get('shooting_hours', 0),
-                'area_covered': order_dict.get('area_covered', 0),
+@app.route('/api/admin/export/<export_name>', methods=['GET'])
+@token_required
+def export_admin_list(current_user, export_name):
+    """Stream the full orders / payments / earnings history as NDJSON or CSV.
 
-                
-                'background_music_voiceover': bool(order_dict.get('background_music_voiceover', 0)),
-                'editing_color_grading': bool(order_dict.get('editing_color_grading', 0)),
-                'voiceover_script': bool(order_dict.get('voiceover_script', 0)),
-                'background_music_licensed': bool(order_dict.get('background_music_licensed', 0)),
-                'branding_overlay': bool(order_dict.get('branding_overlay', 0)),
-                'multiple_revisions': bool(order_dict.get('multiple_revisions', 0)),
-                'drone_licensing_fee': bool(order_dict.get('drone_licensing_fee', 0)),
-                'drone_permissions_required': bool(order_dict.get('drone_permissions_required', 0)),
-
-                # Financial Information
-                'base_package_cost': order_dict.get('base_package_cost', 0),
-                'base_cost': order_dict.get('base_cost', 0),
-                'total_cost': order_dict.get('total_cost', 0),
-                'discount_code': order_dict.get('discount_code', ''),
-                'discount_amount': order_dict.get('discount_amount', 0),
-                'payment_status': order_dict.get('payment_status', 'pending'),
-                'payment_amount': order_dict.get('payment_amount', 0),
-                'total_amount': order_dict.get('payment_amount', 0),  # For backward compatibility
-                'payment_date': order_dict.get('payment_date', ''),
-                'completed_date': order_dict.get('completed_date', ''),
-
-                # Requirements & Notes
-                'requirements': order_dict.get('requirements', ''),
-                'special_requirements': order_dict.get('special_requirements', ''),
-                'custom_quote': order_dict.get('custom_quote', ''),
-                'description': order_dict.get('description', ''),
-                'pilot_notes': order_dict.get('pilot_notes', ''),
-                'client_notes': order_dict.get('client_notes', ''),
-                'admin_comments': order_dict.get('admin_comments', ''),
-
-                # Links & Deliverables
-                'drive_link': order_dict.get('drive_link', ''),
-                'delivery_video_link': order_dict.get('delivery_video_link', ''),
-                
-                #Earnings
-                'pilot_earnings': order_dict.get('pilot_earnings', ''),
-                'editor_earnings': order_dict.get('editor_earnings', ''),
-                'referral_earnings': order_dict.get('referral_earnings', ''),
-                'hmx_earnings': order_dict.get('hmx_earnings', ''),
-                'gateway_fees': order_dict.get('gateway_fees', ''),
-            }
+    Rows are read from the cursor in batches and written out as they come,
+    so memory stays flat however many rows match. Accepts the same filters,
+    sort and fields as the matching list endpoint.
+    """
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
 
-            processed_orders.append(formatted_order)
+    if export_name not in ADMIN_EXPORTS:
+        return jsonify({'message': f"Invalid export. Must be one of: {', '.join(ADMIN_EXPORTS)}"}), 400
 
-        # Debug: Print raw data from database
-        if orders:
-            print("Raw order from DB:", dict(orders[0]))
-            print("Raw order keys:", list(dict(orders[0]).keys()))
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
 
-        # Debug: Print processed order data
-        if processed_orders:
-            print("Processed order keys:", list(processed_orders[0].keys()))
-            sample = processed_orders[0]
-            print("Sample processed values:")
-            for key, value in sample.items():
-                if value and value != '' and value != 0:
-                    print(f"  {key}: {value}")
+    # An export is always the whole result set
+    args = {key: value for key, value in request.args.items() if key not in ('limit', 'cursor')}
 
-        return jsonify(processed_orders)
+    try:
+        conn = get_db()
+        page = ADMIN_EXPORTS[export_name](conn).fetch(conn, args, batch_size=500)
+        filename = f"{export_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+        return EXPORT_FORMATS[export_format](page, filename=filename)
+    except ListQueryError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
+        logger.error('❌ Error exporting %s: %s', export_name, e)
         return jsonify({'message': str(e)}), 500
 
 @app.route('/api/admin/debug/bookings', methods=['GET'])
@@ -3821,9 +2892,9 @@ def manage_order(current_user, order_id):
 
         if request.method == 'PUT':
             data = request.json
-            print("=== PUT Request Received ===")
-            print("Raw JSON:", request.data)
-            print("Parsed JSON:", data)
+            logger.debug('=== PUT Request Received ===')
+            logger.debug('Raw JSON: %s', request.data)
+            logger.debug('Parsed JSON: %s', data)
 
             update_fields = []
             update_values = []
@@ -3850,8 +2921,8 @@ def manage_order(current_user, order_id):
                 update_values.append(order_id)
 
                 # ✅ Debug prints AFTER values are defined
-                print("Query:", query)
-                print("Values:", update_values)
+                logger.debug('Query: %s', query)
+                logger.debug('Values: %s', update_values)
 
                 cursor.execute(query, update_values)
                 conn.commit()
@@ -3865,6 +2936,7 @@ def manage_order(current_user, order_id):
                             variables={
                                 "name": order['client_name'],
                                 "booking_id": order_id,
+                                "location": order['location_address'],
                                 "date": order['preferred_date']
                             }
                         )
@@ -3899,8 +2971,7 @@ def manage_order(current_user, order_id):
             return jsonify({'message': 'Order deleted successfully'})
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'message': str(e)}), 500
 
 
@@ -3918,36 +2989,14 @@ def get_dashboard_stats(current_user):
         conn = get_db()
         c = conn.cursor()
 
-        # Get pending videos count
-        c.execute('''
-            SELECT COUNT(*) FROM videos 
-            WHERE status = 'pending'
-        ''')
-        pending_videos = c.fetchone()[0]
-
-        # Get active orders count
-        c.execute('''
-            SELECT COUNT(*) FROM bookings 
-            WHERE status = 'in_progress'
-        ''')
-        active_orders = c.fetchone()[0]
-
-        # Get revenue for current month
+        # Read from dashboard_counters, kept current by triggers on videos, bookings and payments
+        videos = dashboard_counters.counts(conn, 'videos_by_status')
+        pending_videos = sum(count for bucket, count in videos.items() if bucket.startswith('pending/'))
+        orders = dashboard_counters.counts(conn, 'bookings_by_status')
+        active_orders = orders.get('in_progress', 0)
+        completed_orders = orders.get('completed', 0)
         current_month = datetime.now().strftime('%Y-%m')
-        c.execute('''
-            SELECT COALESCE(SUM(payment_amount), 0) 
-            FROM bookings 
-            WHERE payment_status = 'completed' 
-            AND strftime('%Y-%m', payment_date) = ?
-        ''', (current_month,))
-        revenue_mtd = c.fetchone()[0] or 0
-
-        # Get completed orders count
-        c.execute('''
-            SELECT COUNT(*) FROM bookings 
-            WHERE status = 'completed'
-        ''')
-        completed_orders = c.fetchone()[0]
+        revenue_mtd = dashboard_counters.total(conn, 'bookings_paid_by_month', current_month)
 
         return jsonify({
             'pendingVideos': pending_videos,
@@ -3957,7 +3006,7 @@ def get_dashboard_stats(current_user):
         })
 
     except Exception as e:
-        print(f"Error fetching dashboard stats: {e}")
+        logger.error('Error fetching dashboard stats: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/dashboard/activities', methods=['GET', 'OPTIONS'])
@@ -4034,7 +3083,7 @@ def get_dashboard_activities(current_user):
         return jsonify(activities[:10])
 
     except Exception as e:
-        print(f"Error fetching dashboard activities: {e}")
+        logger.error('Error fetching dashboard activities: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/settings', methods=['GET', 'PUT', 'OPTIONS'])
@@ -4080,9 +3129,8 @@ def manage_settings(current_user):
             return jsonify({'message': 'Settings updated successfully'})
 
     except Exception as e:
-        print(f"Error managing settings: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error('Error managing settings: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/pilots/register', methods=['POST', 'OPTIONS'])
@@ -4097,9 +3145,9 @@ def pilot_register():
         return response, 200
 
     try:
-        print('\n=== Pilot Registration ===')
+        logger.debug('=== Pilot Registration ===')
         data = request.get_json()
-        print(f"Registration data: {data}")
+        logger.debug('Registration data: %s', data)
 
         # Validate required fields
         required_fields = ['name', 'full_name', 'email', 'phone', 'password', 'date_of_birth',
@@ -4109,17 +3157,17 @@ def pilot_register():
 
         for field in required_fields:
             if field not in data or not data[field]:
-                print(f"Missing required field: {field}")
+                logger.debug('Missing required field: %s', field)
                 return jsonify({'message': f'Missing required field: {field}'}), 400
 
         # Validate email format
         if '@' not in data['email'] or '.' not in data['email']:
-            print(f"Invalid email format: {data['email']}")
+            logger.warning('Invalid email format: %s', data['email'])
             return jsonify({'message': 'Invalid email format'}), 400
 
         # Validate password length
         if len(data['password']) < 6:
-            print(f"Password too short: {len(data['password'])} characters")
+            logger.debug('Password too short: %s characters', len(data['password']))
             return jsonify({'message': 'Password must be at least 6 characters long'}), 400
 
         # Validate age (must be 18+)
@@ -4147,13 +3195,13 @@ def pilot_register():
         # Check if email already exists in applications or main table
         cursor.execute('SELECT id FROM pilot_applications WHERE email = ? AND status="pending"', (data['email'],))
         if cursor.fetchone():
-            print(f"Email already has pending application: {data['email']}")
+            logger.debug('Email already has pending application: %s', data['email'])
             conn.close()
             return jsonify({'message': 'Application already submitted with this email'}), 409
 
         cursor.execute('SELECT id FROM pilots WHERE email = ?', (data['email'],))
         if cursor.fetchone():
-            print(f"Email already exists: {data['email']}")
+            logger.debug('Email already exists: %s', data['email'])
             conn.close()
             return jsonify({'message': 'Email already registered'}), 409
 
@@ -4209,7 +3257,7 @@ def pilot_register():
         conn.commit()
         conn.close()
 
-        print(f"Pilot application submitted successfully with ID: {application_id}")
+        logger.info('Pilot application submitted successfully with ID: %s', application_id)
 
         # Create response with CORS headers
         response = jsonify({
@@ -4220,10 +3268,11 @@ def pilot_register():
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 201
 
+    except HashingBusy:
+        return hashing_busy_response()
     except sqlite3.Error as e:
-        print(f"Database error during pilot registration: {str(e)}")
-        import traceback
-        print(f"Database error traceback: {traceback.format_exc()}")
+        logger.error('Database error during pilot registration: %s', e)
+        logger.debug('Database error traceback', exc_info=True)
 
         # Close connection if still open
         try:
@@ -4237,9 +3286,8 @@ def pilot_register():
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 500
     except Exception as e:
-        print(f"Unexpected error during pilot registration: {str(e)}")
-        import traceback
-        print(f"Unexpected error traceback: {traceback.format_exc()}")
+        logger.error('Unexpected error during pilot registration: %s', e)
+        logger.debug('Unexpected error traceback', exc_info=True)
 
         # Close connection if still open
         try:
@@ -4265,25 +3313,25 @@ def editor_register():
         return response, 200
 
     try:
-        print('\n=== Editor Registration ===')
+        logger.debug('=== Editor Registration ===')
         data = request.get_json()
-        print(f"Registration data: {data}")
+        logger.debug('Registration data: %s', data)
 
         # Validate required fields
         required_fields = ['full_name', 'email', 'phone', 'password', 'role', 'years_experience', 'primary_skills', 'specialization']
         for field in required_fields:
             if field not in data or not data[field]:
-                print(f"Missing required field: {field}")
+                logger.debug('Missing required field: %s', field)
                 return jsonify({'message': f'Missing required field: {field}'}), 400
 
         # Validate email format
         if '@' not in data['email'] or '.' not in data['email']:
-            print(f"Invalid email format: {data['email']}")
+            logger.warning('Invalid email format: %s', data['email'])
             return jsonify({'message': 'Invalid email format'}), 400
 
         # Validate password length
         if len(data['password']) < 6:
-            print(f"Password too short: {len(data['password'])} characters")
+            logger.debug('Password too short: %s characters', len(data['password']))
             return jsonify({'message': 'Password must be at least 6 characters long'}), 400
 
         # Validate years of experience
@@ -4300,13 +3348,13 @@ def editor_register():
         # Check if email already exists in applications or main table
         cursor.execute('SELECT id FROM editor_applications WHERE email = ? AND status="pending"', (data['email'],))
         if cursor.fetchone():
-            print(f"Email already exists in applications: {data['email']}")
+            logger.debug('Email already exists in applications: %s', data['email'])
             conn.close()
             return jsonify({'message': 'Application already submitted with this email'}), 409
 
         cursor.execute('SELECT id FROM editors WHERE email = ?', (data['email'],))
         if cursor.fetchone():
-            print(f"Email already exists in editors: {data['email']}")
+            logger.debug('Email already exists in editors: %s', data['email'])
             conn.close()
             return jsonify({'message': 'Email already registered'}), 409
 
@@ -4339,7 +3387,7 @@ def editor_register():
         conn.commit()
         conn.close()
 
-        print(f"Editor application submitted successfully with ID: {application_id}")
+        logger.info('Editor application submitted successfully with ID: %s', application_id)
 
         # Create response with CORS headers
         response = jsonify({
@@ -4350,14 +3398,16 @@ def editor_register():
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 201
 
+    except HashingBusy:
+        return hashing_busy_response()
     except sqlite3.Error as e:
-        print(f"Database error during editor registration: {str(e)}")
+        logger.error('Database error during editor registration: %s', e)
         response = jsonify({'message': 'Database error during registration'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 500
     except Exception as e:
-        print(f"Unexpected error during editor registration: {str(e)}")
+        logger.error('Unexpected error during editor registration: %s', e)
         response = jsonify({'message': 'Registration failed due to an unexpected error'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -4403,14 +3453,14 @@ def get_editor_videos(current_user):
                 }
                 videos_list.append(video_dict)
             except Exception as e:
-                print(f"Error processing video data: {e}")
+                logger.error('Error processing video data: %s', e)
                 continue
 
         conn.close()
         return jsonify(videos_list)
 
     except Exception as e:
-        print(f"Error fetching videos: {e}")
+        logger.error('Error fetching videos: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/editor/videos/<int:video_id>', methods=['PUT', 'OPTIONS'])
@@ -4467,9 +3517,41 @@ def update_editor_video(current_user, video_id):
         return jsonify({'message': 'Video updated successfully'})
 
     except Exception as e:
-        print(f"Error updating video: {e}")
+        logger.error('Error updating video: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
+# Order totals come from correlated subqueries (idx_bookings_user_created) instead
+# of JOIN + GROUP BY, so a page only aggregates the clients it returns
+ADMIN_CLIENTS_QUERY = ListQuery(
+    'admin_clients',
+    from_sql='users u',
+    alias='u',
+    where=["u.role = 'client'"],
+    fields={
+        'id': Field('u.id'),
+        'contact_name': Field('u.username'),
+        'business_name': Field('bc.business_name', joins=['business_clients']),
+        'position': Field('bc.contact_person_designation', joins=['business_clients']),
+        'phone': Field('bc.phone', joins=['business_clients']),
+        'email': Field('u.email'),
+        'city': Field('bc.official_address', joins=['business_clients']),
+        'created_at': Field('u.created_at'),
+        'order_count': Field('(SELECT COUNT(*) FROM bookings b WHERE b.user_id = u.id)'),
+        'total_order_value': Field(
+            '(SELECT COALESCE(SUM(b.payment_amount), 0) FROM bookings b WHERE b.user_id = u.id)',
+            convert=lambda value: float(value) if value else 0
+        ),
+    },
+    joins={'business_clients': 'LEFT JOIN business_clients bc ON u.email = bc.email'},
+    sorts={'created_at': 'u.created_at', 'id': 'u.id'},
+    default_sort='created_at',
+    filters={
+        'city': Filter('bc.official_address LIKE ?', lambda value: f'%{value}%', joins=['business_clients']),
+        'date_from': Filter('u.created_at >= ?', parse_date),
+        'date_to': Filter("u.created_at < date(?, '+1 day')", parse_date),
+    }
+)
+
 @app.route('/api/admin/clients', methods=['GET', 'OPTIONS'])
 @token_required
 def get_clients(current_user):
@@ -4482,11 +3564,11 @@ def get_clients(current_user):
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
-    print("\n=== Admin Clients Request ===")
-    print(f"Requesting user role: {current_user['role']}")
+    logger.debug('=== Admin Clients Request ===')
+    logger.debug('Requesting user role: %s', current_user['role'])
     
     if current_user['role'] != 'admin':
-        print("Unauthorized access attempt")
+        logger.warning('Unauthorized access attempt')
         response = jsonify({'message': 'Unauthorized'}), 403
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -4494,57 +3576,20 @@ def get_clients(current_user):
     
     try:
         conn = get_db()
-        c = conn.cursor()
-        
-        # Get all clients (users with role 'client') with their business details and order info
-        c.execute('''
-            SELECT
-                u.id,
-                u.username as contact_name,
-                bc.business_name,
-                bc.contact_person_designation as position,
-                bc.phone,
-                u.email,
-                bc.official_address as city,
-                u.created_at,
-                COUNT(b.id) as order_count,
-                COALESCE(SUM(b.payment_amount), 0) as total_order_value
-            FROM users u
-            LEFT JOIN business_clients bc ON u.email = bc.email
-            LEFT JOIN bookings b ON u.id = b.user_id
-            WHERE u.role = 'client'
-            GROUP BY u.id
-            ORDER BY u.created_at DESC
-        ''')
-        
-        clients = c.fetchall()
-        conn.close()
-        
-        clients_list = []
-        for client in clients:
-            client_dict = {
-                'id': client[0],
-                'contact_name': client[1],
-                'business_name': client[2],
-                'position': client[3],
-                'phone': client[4],
-                'email': client[5],
-                'city': client[6],
-                'created_at': client[7],
-                'order_count': client[8],
-                'total_order_value': float(client[9]) if client[9] else 0
-            }
-            clients_list.append(client_dict)
-        
-        print(f"Found {len(clients_list)} clients")
-        
-        response = jsonify(clients_list)
+        page = ADMIN_CLIENTS_QUERY.fetch(conn, request.args)
+
+        response = json_response(page)
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
-        
+
+    except ListQueryError as e:
+        response = jsonify({'message': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response, 400
     except Exception as e:
-        print(f"Error fetching clients: {str(e)}")
+        logger.error('Error fetching clients: %s', e)
         response = jsonify({'message': 'Error fetching clients'}), 500
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -4610,7 +3655,7 @@ def get_client_details(current_user, client_id):
         return response
 
     except Exception as e:
-        print(f"Error fetching client details: {str(e)}")
+        logger.error('Error fetching client details: %s', e)
         return jsonify({'message': 'Internal server error'}), 500
 
 # Old pilot_apply endpoint removed - use /api/pilots/register instead
@@ -4631,7 +3676,7 @@ def list_pilot_applications(current_user):
         conn.close()
         return jsonify(applications)
     except Exception as e:
-        print(f"Error fetching pilot applications: {e}")
+        logger.error('Error fetching pilot applications: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/pilot-applications/<int:app_id>/approve', methods=['POST'])
@@ -4677,7 +3722,7 @@ def approve_pilot_application(current_user, app_id):
         conn.close()
         return jsonify({'message': 'Pilot approved and registered.'})
     except Exception as e:
-        print(f"Error approving pilot application: {e}")
+        logger.error('Error approving pilot application: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admin/pilot-applications/<int:app_id>/reject', methods=['POST'])
@@ -4697,7 +3742,7 @@ def reject_pilot_application(current_user, app_id):
         conn.close()
         return jsonify({'message': 'Application rejected.'})
     except Exception as e:
-        print(f"Error rejecting pilot application: {e}")
+        logger.error('Error rejecting pilot application: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/cities', methods=['GET'])
@@ -4709,54 +3754,37 @@ def get_cities():
 
 @app.route('/api/cost/preview', methods=['POST'])
 def cost_preview():
-    data = request.json
-    category = data.get('category')
-    area_sqft = data.get('area_sqft')
-    num_floors = data.get('num_floors')
-    def calculate_cost(category, area_sqft, num_floors):
-        COSTING_TABLE = {
-            "Retail Store / Showroom":      [5999,  9999,  15999, 20999, None],
-            "Restaurants & Cafes":          [7999, 11999, 19999, 25999, None],
-            "Fitness & Sports Arenas":      [9999, 13999, 22999, 31999, None],
-            "Resorts & Farmstays / Hotels": [11999,17999, 29999, 39999, None],
-            "Real Estate Property":         [13999,23999, 37999, 49999, None],
-            "Shopping Mall / Complex":      [15999,29999, 47999, 63999, None],
-            "Adventure / Water Parks":      [12999,23999, 39999, 55999, None],
-            "Gaming & Entertainment Zones": [10999,19999, 33999, 45999, None],
-        }
-        area_ranges = [1000, 5000, 10000, 50000]
-        if category not in COSTING_TABLE:
-            return None, None, "Invalid category"
-        try:
-            area_sqft = int(area_sqft)
-        except:
-            return None, None, "Invalid area"
-        try:
-            num_floors = int(num_floors)
-        except:
-            num_floors = 1
-        if area_sqft > 50000:
-            return None, None, "Custom Quote"
-        idx = 0
-        for i, max_area in enumerate(area_ranges):
-            if area_sqft <= max_area:
-                idx = i
-                break
-            idx = i + 1
-        base_cost = COSTING_TABLE[category][idx]
-        if base_cost is None:
-            return None, None, "Custom Quote"
-        if num_floors is None or num_floors < 1:
-            num_floors = 1
-        final_cost = int(base_cost * (1 + 0.1 * (num_floors - 1)))
-        return base_cost, final_cost, None
-    base_cost, final_cost, custom_quote = calculate_cost(category, area_sqft, num_floors)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Body must be a {category, area_sqft, num_floors} object'}), 400
+    base_cost, final_cost, custom_quote = pricing.quote(
+        data.get('category'), data.get('area_sqft'), data.get('num_floors')
+    )
     return jsonify({
         'base_cost': base_cost,
         'final_cost': final_cost,
         'custom_quote': custom_quote
     })
 
+@app.route('/api/cost/preview/batch', methods=['POST'])
+def cost_preview_batch():
+    """Price many (category, area_sqft, num_floors) items in one request"""
+    data = request.get_json(silent=True)
+    # A JSON array or scalar body has no items key; answer it like a bad items value
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({'message': 'items must be a list of {category, area_sqft, num_floors} objects'}), 400
+    if len(items) > pricing.MAX_BATCH_QUOTES:
+        return jsonify({'message': f'At most {pricing.MAX_BATCH_QUOTES} items per request'}), 400
+
+    quotes = []
+    for item in items:
+        base_cost, final_cost, custom_quote = pricing.quote(
+            item.get('category'), item.get('area_sqft'), item.get('num_floors')
+        )
+        quotes.append({'base_cost': base_cost, 'final_cost': final_cost, 'custom_quote': custom_quote})
+    return jsonify({'quotes': quotes})
+
 # PhonePe Payment Integration Endpoints
 
 @app.route('/api/payment/initiate', methods=['POST', 'OPTIONS'])
@@ -4834,86 +3862,77 @@ def initiate_payment(current_user):
             return jsonify({
                 'success': False,
                 'message': payment_result['error']
-            }), 400
+            }), 503 if payment_result.get('unavailable') else 400
 
     except Exception as e:
-        print(f"Error initiating payment: {str(e)}")
+        logger.error('Error initiating payment: %s', e)
         return jsonify({'message': 'Failed to initiate payment'}), 500
 
 @app.route('/api/payment/callback', methods=['POST', 'GET'])
 def payment_callback():
-    """Handle PhonePe payment callback"""
+    """Record a PhonePe payment callback; the payment event processor confirms and applies it"""
     try:
         # Get callback data
         if request.method == 'POST':
-            callback_data = request.get_json()
+            callback_data = request.get_json(silent=True) or {}
         else:
             # For GET requests, parse query parameters
             callback_data = request.args.to_dict()
 
-        print(f"Payment callback received: {callback_data}")
+        try:
+            callback_data = parse_callback(callback_data)
+        except ValueError:
+            return jsonify({'message': 'Invalid callback'}), 400
 
         # Validate callback
         is_valid, message = phonepe.validate_callback(callback_data)
 
         if not is_valid:
-            print(f"Invalid callback: {message}")
+            logger.warning('Invalid callback: %s', message)
             return jsonify({'message': 'Invalid callback'}), 400
 
-        # Check payment status with PhonePe
-        merchant_transaction_id = callback_data.get('merchantTransactionId')
-        status_result = phonepe.check_payment_status(merchant_transaction_id)
+        merchant_transaction_id = callback_data['merchantTransactionId']
+        event_id, duplicate = record_event(get_db(), merchant_transaction_id, callback_data['state'], callback_data)
+        if duplicate:
+            logger.warning('Duplicate payment callback for %s (%s)', merchant_transaction_id, callback_data['state'])
+        else:
+            payment_processor.wake()
+            logger.info('Payment callback recorded: %s (%s)', merchant_transaction_id, callback_data['state'])
 
-        if status_result['success']:
-            payment_status = status_result['status']
+        return jsonify({
+            'success': True,
+            'status': callback_data['state'],
+            'event_id': event_id,
+            'duplicate': duplicate,
+            'message': 'Payment callback received'
+        })
 
-            # Update payment record in database
-            conn = get_db()
-            cursor = conn.cursor()
+    except Exception as e:
+        logger.error('Error processing payment callback: %s', e)
+        return jsonify({'message': 'Failed to process callback'}), 500
 
-            # Update payment status
-            cursor.execute('''
-                UPDATE payments 
-                SET status = ?, gateway_response = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE merchant_transaction_id = ?
-            ''', (payment_status, json.dumps(status_result), merchant_transaction_id))
+@app.route('/api/admin/payments/events', methods=['GET'])
+@token_required
+def get_payment_events_stats(current_user):
+    """Depth and processing latency of the payment callback inbox"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
 
-            # Get payment record
-            cursor.execute('SELECT booking_id FROM payments WHERE merchant_transaction_id = ?', (merchant_transaction_id,))
-            payment_record = cursor.fetchone()
-            
-            if payment_record:
-                booking_id = payment_record[0]
-                
-                # Update booking payment status
-                if payment_status == 'COMPLETED':
-                    cursor.execute('''
-                        UPDATE bookings 
-                        SET payment_status = 'paid', 
-                            payment_amount = (SELECT amount FROM payments WHERE merchant_transaction_id = ?),
-                            payment_date = CURRENT_TIMESTAMP,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (merchant_transaction_id, booking_id))
-                
-                conn.commit()
-            
-            conn.close()
+    stats = events_stats(get_db())
+    stats['mode'] = PhonePeConfig.EVENTS_PROCESSOR
+    stats['processor'] = payment_processor.stats()
+    return jsonify(stats)
 
-            return jsonify({
-                'success': True,
-                'status': payment_status,
-                'message': 'Payment status updated successfully'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': status_result['error']
-            }), 400
+@app.route('/api/admin/payments/reconcile', methods=['GET'])
+@token_required
+def get_payment_reconcile_stats(current_user):
+    """Pending payments and reconciliation lag, plus this worker's reconciler runs"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
 
-    except Exception as e:
-        print(f"Error processing payment callback: {str(e)}")
-        return jsonify({'message': 'Failed to process callback'}), 500
+    stats = reconcile_lag(get_db(), payment_reconciler.min_age, payment_reconciler.interval)
+    stats['reconciler'] = payment_reconciler.stats()
+    return jsonify(stats)
 
 @app.route('/api/payment/status/<merchant_transaction_id>', methods=['GET'])
 @token_required
@@ -4929,10 +3948,10 @@ def check_payment_status(current_user, merchant_transaction_id):
             return jsonify({
                 'success': False,
                 'message': status_result['error']
-            }), 400
+            }), 503 if status_result.get('unavailable') else 400
 
     except Exception as e:
-        print(f"Error checking payment status: {str(e)}")
+        logger.error('Error checking payment status: %s', e)
         return jsonify({'message': 'Failed to check payment status'}), 500
 
 @app.route('/api/payment/refund', methods=['POST'])
@@ -4979,13 +3998,43 @@ def process_refund(current_user):
             return jsonify({
                 'success': False,
                 'message': refund_result['error']
-            }), 400
+            }), 503 if refund_result.get('unavailable') else 400
 
     except Exception as e:
-        print(f"Error processing refund: {str(e)}")
+        logger.error('Error processing refund: %s', e)
         return jsonify({'message': 'Failed to process refund'}), 500
 
+@app.route('/api/admin/payments/gateway', methods=['GET'])
+@token_required
+def get_payment_gateway_stats(current_user):
+    """PhonePe client health: circuit breaker state, call outcomes and latency histograms"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify(phonepe.stats())
+
 # Application Management Endpoints
+def _application_list_query(application_type):
+    table_name = f"{application_type}_applications"
+
+    @cached_query
+    def build(conn):
+        return ListQuery(
+            f'admin_{table_name}',
+            from_sql=f'{table_name} a',
+            alias='a',
+            fields=columns_of(conn, table_name, 'a'),
+            sorts={'created_at': 'a.created_at', 'id': 'a.id'},
+            default_sort='created_at',
+            filters={'status': Filter('a.status = ?')}
+        )
+    return build
+
+APPLICATION_LIST_QUERIES = {
+    application_type: _application_list_query(application_type)
+    for application_type in ['pilot', 'editor', 'referral', 'business_client']
+}
+
 @app.route('/api/admin/applications/<application_type>', methods=['GET', 'OPTIONS'])
 @token_required
 def get_applications(current_user, application_type):
@@ -5007,28 +4056,20 @@ def get_applications(current_user, application_type):
         conn = get_db()
         cursor = conn.cursor()
 
-        table_name = f"{application_type}_applications"
-        cursor.execute(f'SELECT * FROM {table_name} ORDER BY created_at DESC')
-        applications = cursor.fetchall()
+        page = APPLICATION_LIST_QUERIES[application_type](conn).fetch(conn, request.args)
 
-        # Convert to list of dictionaries
-        applications_list = []
-        for app in applications:
-            app_dict = dict(app)
-            applications_list.append(app_dict)
-
-        conn.close()
-
-        response = jsonify({
-            'applications': applications_list,
-            'count': len(applications_list)
-        })
+        response = json_response(page, envelope='applications')
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
+    except ListQueryError as e:
+        response = jsonify({'message': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response, 400
     except Exception as e:
-        print(f"Error getting applications: {str(e)}")
+        logger.error('Error getting applications: %s', e)
         response = jsonify({'message': 'Failed to get applications'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -5157,11 +4198,11 @@ def approve_application(current_user, application_type, application_id):
                     admin_comments
                 )
                 send_email_async(applicant_email, subject, body)
-                print(f"Approval email sent to {applicant_email}")
+                logger.info('Approval email sent to %s', applicant_email)
             else:
-                print("No email address found for applicant")
+                logger.debug('No email address found for applicant')
         except Exception as e:
-            print(f"Failed to send approval email: {str(e)}")
+            logger.error('Failed to send approval email: %s', e)
 
         response = jsonify({'message': f'{application_type.title()} application approved successfully'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
@@ -5169,7 +4210,7 @@ def approve_application(current_user, application_type, application_id):
         return response
 
     except Exception as e:
-        print(f"Error approving application: {str(e)}")
+        logger.error('Error approving application: %s', e)
         response = jsonify({'message': 'Failed to approve application'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -5231,11 +4272,11 @@ def reject_application(current_user, application_type, application_id):
                     admin_comments
                 )
                 send_email_async(applicant_email, subject, body)
-                print(f"Rejection email sent to {applicant_email}")
+                logger.info('Rejection email sent to %s', applicant_email)
             else:
-                print("No email address found for applicant")
+                logger.debug('No email address found for applicant')
         except Exception as e:
-            print(f"Failed to send rejection email: {str(e)}")
+            logger.error('Failed to send rejection email: %s', e)
 
         response = jsonify({'message': f'{application_type.title()} application rejected'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
@@ -5243,7 +4284,7 @@ def reject_application(current_user, application_type, application_id):
         return response
 
     except Exception as e:
-        print(f"Error rejecting application: {str(e)}")
+        logger.error('Error rejecting application: %s', e)
         response = jsonify({'message': 'Failed to reject application'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -5251,6 +4292,49 @@ def reject_application(current_user, application_type, application_id):
 
 # Video Reviews API Endpoints
 
+ADMIN_VIDEO_REVIEWS_QUERY = ListQuery(
+    'admin_video_reviews',
+    from_sql='video_reviews vr',
+    alias='vr',
+    key='video_id',
+    fields={
+        'video_id': Field('vr.video_id'),
+        'order_id': Field('vr.order_id'),
+        'booking_id': Field(derive=lambda raw: f"HMX{raw['_order_id']:04d}", requires=[('_order_id', 'vr.order_id')]),
+        'client_id': Field('vr.client_id'),
+        'client_name': Field('u.username', joins=['users']),
+        'client_email': Field('u.email', joins=['users']),
+        'editor_id': Field('vr.editor_id'),
+        'editor_name': Field('e.name', joins=['editors']),
+        'pilot_id': Field('vr.pilot_id'),
+        'pilot_name': Field('p.name', joins=['pilots']),
+        'drive_link': Field('vr.drive_link'),
+        'submitted_date': Field('vr.submitted_date'),
+        'admin_comments': Field('vr.admin_comments'),
+        'pilot_comments': Field('vr.pilot_comments'),
+        'editor_comments': Field('vr.editor_comments'),
+        'status': Field('vr.status'),
+        'submission_type': Field('vr.submission_type'),
+        'created_at': Field('vr.created_at'),
+        'updated_at': Field('vr.updated_at'),
+    },
+    joins={
+        'users': 'LEFT JOIN users u ON vr.client_id = u.id',
+        'pilots': 'LEFT JOIN pilots p ON vr.pilot_id = p.id',
+        'editors': 'LEFT JOIN editors e ON vr.editor_id = e.id',
+    },
+    sorts={'submitted_date': 'vr.submitted_date', 'created_at': 'vr.created_at'},
+    default_sort='submitted_date',
+    filters={
+        # pilot or editor; anything else (the default 'all') lists both
+        'type': Filter(build=lambda value: ('vr.submission_type = ?', [value]) if value in ('pilot', 'editor') else (None, [])),
+        'status': Filter('vr.status = ?'),
+        'pilot_id': Filter('vr.pilot_id = ?', int),
+        'editor_id': Filter('vr.editor_id = ?', int),
+        'order_id': Filter('vr.order_id = ?', int),
+    }
+)
+
 @app.route('/api/admin/video-reviews', methods=['GET'])
 @token_required
 def get_video_reviews(current_user):
@@ -5261,60 +4345,11 @@ def get_video_reviews(current_user):
     try:
         conn = get_db()
 
-        # Get submission type filter
-        submission_type = request.args.get('type', 'all')  # pilot, editor, or all
-
-        base_query = '''
-            SELECT vr.*,
-                   b.id as booking_id,
-                   u.username as client_name, u.email as client_email,
-                   p.name as pilot_name, p.email as pilot_email,
-                   e.name as editor_name, e.email as editor_email
-            FROM video_reviews vr
-            LEFT JOIN bookings b ON vr.order_id = b.id
-            LEFT JOIN users u ON vr.client_id = u.id
-            LEFT JOIN pilots p ON vr.pilot_id = p.id
-            LEFT JOIN editors e ON vr.editor_id = e.id
-        '''
-
-        if submission_type == 'pilot':
-            query = base_query + " WHERE vr.submission_type = 'pilot' ORDER BY vr.submitted_date DESC"
-        elif submission_type == 'editor':
-            query = base_query + " WHERE vr.submission_type = 'editor' ORDER BY vr.submitted_date DESC"
-        else:
-            query = base_query + " ORDER BY vr.submitted_date DESC"
-
-        reviews = conn.execute(query).fetchall()
-        conn.close()
-
-        # Format the response
-        reviews_list = []
-        for review in reviews:
-            review_dict = dict(review)
-            reviews_list.append({
-                'video_id': review_dict.get('video_id'),
-                'order_id': review_dict.get('order_id'),
-                'booking_id': f"HMX{review_dict.get('order_id', ''):04d}",
-                'client_id': review_dict.get('client_id'),
-                'client_name': review_dict.get('client_name', 'Unknown'),
-                'client_email': review_dict.get('client_email', ''),
-                'editor_id': review_dict.get('editor_id'),
-                'editor_name': review_dict.get('editor_name', 'Unassigned'),
-                'pilot_id': review_dict.get('pilot_id'),
-                'pilot_name': review_dict.get('pilot_name', 'Unassigned'),
-                'drive_link': review_dict.get('drive_link', ''),
-                'submitted_date': review_dict.get('submitted_date', ''),
-                'admin_comments': review_dict.get('admin_comments', ''),
-                'pilot_comments': review_dict.get('pilot_comments', ''),
-                'editor_comments': review_dict.get('editor_comments', ''),
-                'status': review_dict.get('status', 'submitted'),
-                'submission_type': review_dict.get('submission_type', 'pilot'),
-                'created_at': review_dict.get('created_at', ''),
-                'updated_at': review_dict.get('updated_at', '')
-            })
-
-        return jsonify(reviews_list)
+        page = ADMIN_VIDEO_REVIEWS_QUERY.fetch(conn, request.args)
+        return json_response(page)
 
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -5366,7 +4401,7 @@ def update_video_review(current_user, video_id):
                             SET status = 'editing', drive_link = ?
                             WHERE id = ?
                         ''', (drive_link, order_id))
-                        print(f"Updated booking {order_id} status to editing with pilot video link: {drive_link}")
+                        logger.info('Updated booking %s status to editing with pilot video link: %s', order_id, drive_link)
                     elif data['status'] == 'approved' and submission_type == 'pilot':
                         # When admin approves pilot video, update drive_link with latest approved pilot video
                         cursor.execute('''
@@ -5383,7 +4418,7 @@ def update_video_review(current_user, video_id):
                                 SET drive_link = ?
                                 WHERE id = ?
                             ''', (latest_drive_link, order_id))
-                            print(f"Updated booking {order_id} drive_link with approved pilot video: {latest_drive_link}")
+                            logger.info('Updated booking %s drive_link with approved pilot video: %s', order_id, latest_drive_link)
                         else:
                             # If no approved video found yet, use current video link
                             cursor.execute('''
@@ -5391,7 +4426,7 @@ def update_video_review(current_user, video_id):
                                 SET drive_link = ?
                                 WHERE id = ?
                             ''', (drive_link, order_id))
-                            print(f"Updated booking {order_id} drive_link with current pilot video: {drive_link}")
+                            logger.info('Updated booking %s drive_link with current pilot video: %s', order_id, drive_link)
                     elif data['status'] == 'completed' and submission_type == 'editor':
                         # When marking editor video as completed, also update delivery link
                         cursor.execute('''
@@ -5399,7 +4434,7 @@ def update_video_review(current_user, video_id):
                             SET status = 'completed', delivery_video_link = ?
                             WHERE id = ?
                         ''', (drive_link, order_id))
-                        print(f"Updated booking {order_id} status to completed with video link: {drive_link}")
+                        logger.info('Updated booking %s status to completed with video link: %s', order_id, drive_link)
                     elif data['status'] == 'approved' and submission_type == 'editor':
                         # When admin approves editor video, update delivery_video_link with the latest approved video
                         # Get the latest approved video from this editor for this order
@@ -5413,39 +4448,21 @@ def update_video_review(current_user, video_id):
                         latest_approved = cursor.fetchone()
                         if latest_approved:
                             latest_drive_link = latest_approved[0]
-                            # Update the booking with the latest approved video link and calculate earnings
-                            cursor.execute('''
+                            # Complete the booking and write its earnings split in one update,
+                            # so the earnings ledger records the order once
+                            cursor.execute('SELECT payment_amount, referral_id FROM bookings WHERE id = ?', (order_id,))
+                            payment_amount, referral_id = cursor.fetchone()
+                            split = earnings.split_order(payment_amount, bool(referral_id)) if payment_amount else {}
+                            assignments = ''.join(f', {column} = ?' for column in split)
+                            cursor.execute(f'''
                                 UPDATE bookings
-                                SET delivery_video_link = ?, status = 'completed'
+                                SET delivery_video_link = ?, status = 'completed',
+                                    completed_date = COALESCE(completed_date, CURRENT_TIMESTAMP){assignments}
                                 WHERE id = ?
-                            ''', (latest_drive_link, order_id))
-                            print(f"Updated booking {order_id} with approved video link: {latest_drive_link}")
-
-                            # Calculate and update earnings when order is completed
-                            cursor.execute('SELECT payment_amount, pilot_id, editor_id, referral_id FROM bookings WHERE id = ?', (order_id,))
-                            booking_data = cursor.fetchone()
-                            if booking_data and booking_data[0]:  # payment_amount exists
-                                payment_amount = booking_data[0]
-                                pilot_id = booking_data[1]
-                                editor_id = booking_data[2]
-                                referral_id = booking_data[3]
-
-                                # Calculate earnings for each party
-                                pilot_earnings = calculate_earnings(payment_amount, 'pilot')
-                                editor_earnings = calculate_earnings(payment_amount, 'editor')
-                                referral_earnings = calculate_earnings(payment_amount, 'referral') if referral_id else 0
-                                hmx_earnings = calculate_earnings(payment_amount, 'hmx')
-                                gateway_fees = calculate_earnings(payment_amount, 'payment_gateway')
-
-                                # Update earnings in bookings table
-                                cursor.execute('''
-                                    UPDATE bookings
-                                    SET pilot_earnings = ?, editor_earnings = ?, referral_earnings = ?,
-                                        hmx_earnings = ?, gateway_fees = ?
-                                    WHERE id = ?
-                                ''', (pilot_earnings, editor_earnings, referral_earnings, hmx_earnings, gateway_fees, order_id))
-
-                                print(f"Calculated earnings for order {order_id}: Pilot: ₹{pilot_earnings}, Editor: ₹{editor_earnings}, Referral: ₹{referral_earnings}")
+                            ''', (latest_drive_link, *split.values(), order_id))
+                            logger.info('Updated booking %s with approved video link: %s', order_id, latest_drive_link)
+                            if split:
+                                logger.info('Calculated earnings for order %s: Pilot: ₹%s, Editor: ₹%s, Referral: ₹%s', order_id, split['pilot_earnings'], split['editor_earnings'], split['referral_earnings'])
                         else:
                             # If no approved video found yet, just update with current video link
                             cursor.execute('''
@@ -5453,7 +4470,7 @@ def update_video_review(current_user, video_id):
                                 SET delivery_video_link = ?, status = 'completed'
                                 WHERE id = ?
                             ''', (drive_link, order_id))
-                            print(f"Updated booking {order_id} with current video link: {drive_link}")
+                            logger.info('Updated booking %s with current video link: %s', order_id, drive_link)
 
             conn.commit()
 
@@ -5521,7 +4538,7 @@ def pilot_video_submissions(current_user):
                 return jsonify({'message': 'Booking not found'}), 404
 
             client_id = booking['user_id']
-            print(f"Auto-filling client_id: {client_id} for pilot submission on order {order_id}")
+            logger.debug('Auto-filling client_id: %s for pilot submission on order %s', client_id, order_id)
 
             cursor.execute('''
                 INSERT INTO video_reviews (
@@ -5603,7 +4620,7 @@ def editor_video_submissions(current_user):
 
             client_id = booking['user_id']
             pilot_id = booking['pilot_id']
-            print(f"Auto-filling client_id: {client_id}, pilot_id: {pilot_id} for editor submission on order {order_id}")
+            logger.debug('Auto-filling client_id: %s, pilot_id: %s for editor submission on order %s', client_id, pilot_id, order_id)
 
             cursor.execute('''
                 INSERT INTO video_reviews (
@@ -5631,7 +4648,7 @@ def editor_video_submissions(current_user):
 @token_required
 def get_pilot_assigned_orders(current_user):
     """Get ALL orders assigned to pilot for dashboard"""
-    print(f"Pilot assigned orders - current_user: {current_user}")
+    logger.debug('Pilot assigned orders - current_user: %s', current_user)
 
     if current_user['role'] != 'pilot':
         return jsonify({'message': 'Unauthorized'}), 403
@@ -5641,7 +4658,7 @@ def get_pilot_assigned_orders(current_user):
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
-        print(f"Fetching orders for pilot ID: {current_user['user_id']}")
+        logger.debug('Fetching orders for pilot ID: %s', current_user['user_id'])
 
         # Get ALL orders assigned to this pilot (for dashboard)
         cursor.execute('''
@@ -5681,20 +4698,19 @@ def get_pilot_assigned_orders(current_user):
                 'created_at': order_dict.get('created_at')
             })
 
-        print(f"Returning {len(orders_list)} orders")
+        logger.debug('Returning %s orders', len(orders_list))
         return jsonify(orders_list)
 
     except Exception as e:
-        print(f"Error in get_pilot_assigned_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_pilot_assigned_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/editor/ongoing-orders', methods=['GET'])
 @token_required
 def get_editor_ongoing_orders(current_user):
     """Get ongoing orders for the logged-in editor (not completed, cancelled, or rejected)"""
-    print(f"Editor ongoing orders - current_user: {current_user}")
+    logger.debug('Editor ongoing orders - current_user: %s', current_user)
 
     if current_user['role'] != 'editor':
         return jsonify({'message': 'Unauthorized'}), 403
@@ -5733,13 +4749,12 @@ def get_editor_ongoing_orders(current_user):
                 'created_at': order_dict.get('created_at')
             })
 
-        print(f"Returning {len(orders_list)} ongoing orders for editor")
+        logger.debug('Returning %s ongoing orders for editor', len(orders_list))
         return jsonify(orders_list)
 
     except Exception as e:
-        print(f"Error in get_editor_ongoing_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_editor_ongoing_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/editor/completed-orders', methods=['GET', 'OPTIONS'])
@@ -5756,19 +4771,19 @@ def get_editor_completed_orders(current_user):
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
-    print(f"\n=== EDITOR COMPLETED ORDERS DEBUG ===")
-    print(f"Current user data: {current_user}")
-    print(f"User ID: {current_user.get('user_id', 'NOT_FOUND')}")
-    print(f"User role: {current_user.get('role', 'NOT_FOUND')}")
+    logger.debug('=== EDITOR COMPLETED ORDERS DEBUG ===')
+    logger.debug('Current user data: %s', current_user)
+    logger.debug('User ID: %s', current_user.get('user_id', 'NOT_FOUND'))
+    logger.debug('User role: %s', current_user.get('role', 'NOT_FOUND'))
 
     if current_user['role'] != 'editor':
-        print(f"❌ AUTHORIZATION FAILED: Expected role 'editor', got '{current_user['role']}'")
+        logger.warning("❌ AUTHORIZATION FAILED: Expected role 'editor', got '%s'", current_user['role'])
         response = jsonify({'message': f'Unauthorized - Role is {current_user["role"]}, expected editor'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 403
 
-    print(f"✅ AUTHORIZATION PASSED: User is an editor")
+    logger.debug('✅ AUTHORIZATION PASSED: User is an editor')
 
     try:
         conn = get_db()
@@ -5804,16 +4819,15 @@ def get_editor_completed_orders(current_user):
                 'created_at': order_dict.get('created_at')
             })
 
-        print(f"Returning {len(orders_list)} completed orders for editor")
+        logger.debug('Returning %s completed orders for editor', len(orders_list))
         response = jsonify(orders_list)
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
     except Exception as e:
-        print(f"Error in get_editor_completed_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_editor_completed_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         response = jsonify({'error': str(e)})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -5823,16 +4837,16 @@ def get_editor_completed_orders(current_user):
 @token_required
 def get_editor_cancelled_orders(current_user):
     """Get cancelled/rejected orders for the logged-in editor"""
-    print(f"\n=== EDITOR CANCELLED ORDERS DEBUG ===")
-    print(f"Current user data: {current_user}")
-    print(f"User ID: {current_user.get('user_id', 'NOT_FOUND')}")
-    print(f"User role: {current_user.get('role', 'NOT_FOUND')}")
+    logger.debug('=== EDITOR CANCELLED ORDERS DEBUG ===')
+    logger.debug('Current user data: %s', current_user)
+    logger.debug('User ID: %s', current_user.get('user_id', 'NOT_FOUND'))
+    logger.debug('User role: %s', current_user.get('role', 'NOT_FOUND'))
 
     if current_user['role'] != 'editor':
-        print(f"❌ AUTHORIZATION FAILED: Expected role 'editor', got '{current_user['role']}'")
+        logger.warning("❌ AUTHORIZATION FAILED: Expected role 'editor', got '%s'", current_user['role'])
         return jsonify({'message': f'Unauthorized - Role is {current_user["role"]}, expected editor'}), 403
 
-    print(f"✅ AUTHORIZATION PASSED: User is an editor")
+    logger.debug('✅ AUTHORIZATION PASSED: User is an editor')
 
     try:
         conn = get_db()
@@ -5865,13 +4879,12 @@ def get_editor_cancelled_orders(current_user):
                 'created_at': order_dict.get('created_at')
             })
 
-        print(f"Returning {len(orders_list)} cancelled orders for editor")
+        logger.debug('Returning %s cancelled orders for editor', len(orders_list))
         return jsonify(orders_list)
 
     except Exception as e:
-        print(f"Error in get_editor_cancelled_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_editor_cancelled_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/editor/submission-history/<int:order_id>', methods=['GET'])
@@ -5914,9 +4927,8 @@ def get_editor_submission_history(current_user, order_id):
         return jsonify(submissions_list)
 
     except Exception as e:
-        print(f"Error in get_editor_submission_history: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_editor_submission_history: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/editor/video-submissions', methods=['POST'])
@@ -5949,7 +4961,7 @@ def submit_editor_video(current_user):
         client_id = booking['user_id']
         pilot_id = booking['pilot_id']
 
-        print(f"Auto-filling client_id: {client_id}, pilot_id: {pilot_id} for order {order_id}")
+        logger.debug('Auto-filling client_id: %s, pilot_id: %s for order %s', client_id, pilot_id, order_id)
 
         # Insert new video submission with auto-filled client_id and pilot_id
         cursor.execute('''
@@ -5973,9 +4985,8 @@ def submit_editor_video(current_user):
         return jsonify({'message': 'Video submitted successfully'}), 201
 
     except Exception as e:
-        print(f"Error in submit_editor_video: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in submit_editor_video: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
@@ -6067,9 +5078,8 @@ def get_pilot_all_orders(current_user):
         return jsonify(orders_list)
 
     except Exception as e:
-        print(f"Error in get_pilot_all_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_pilot_all_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
@@ -6079,7 +5089,7 @@ def get_pilot_all_orders(current_user):
 @token_required
 def get_pilot_completed_orders(current_user):
     """Get completed orders for the logged-in pilot"""
-    print(f"Pilot completed orders - current_user: {current_user}")
+    logger.debug('Pilot completed orders - current_user: %s', current_user)
 
     if current_user['role'] != 'pilot':
         return jsonify({'message': 'Unauthorized'}), 403
@@ -6120,16 +5130,15 @@ def get_pilot_completed_orders(current_user):
         return jsonify(orders_list)
 
     except Exception as e:
-        print(f"Error in get_pilot_completed_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_pilot_completed_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/pilot/cancelled-orders', methods=['GET'])
 @token_required
 def get_pilot_cancelled_orders(current_user):
     """Get cancelled/rejected orders for the logged-in pilot"""
-    print(f"Pilot cancelled orders - current_user: {current_user}")
+    logger.debug('Pilot cancelled orders - current_user: %s', current_user)
 
     if current_user['role'] != 'pilot':
         return jsonify({'message': 'Unauthorized'}), 403
@@ -6167,9 +5176,8 @@ def get_pilot_cancelled_orders(current_user):
         return jsonify(orders_list)
 
     except Exception as e:
-        print(f"Error in get_pilot_cancelled_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_pilot_cancelled_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/pilot/final-review', methods=['GET'])
@@ -6229,33 +5237,8 @@ def get_pilot_earnings(current_user):
 
         pilot_id = current_user['user_id']
 
-        # Get total earnings
-        cursor.execute('''
-            SELECT
-                COALESCE(SUM(pilot_earnings), 0) as total_earnings,
-                COUNT(*) as completed_orders,
-                COALESCE(AVG(pilot_earnings), 0) as avg_earnings_per_order
-            FROM bookings
-            WHERE pilot_id = ? AND status = 'completed' AND pilot_earnings IS NOT NULL
-        ''', (pilot_id,))
-
-        earnings_data = cursor.fetchone()
-
-        # Get monthly earnings for current year
-        cursor.execute('''
-            SELECT
-                strftime('%m', completed_date) as month,
-                COALESCE(SUM(pilot_earnings), 0) as monthly_earnings,
-                COUNT(*) as monthly_orders
-            FROM bookings
-            WHERE pilot_id = ? AND status = 'completed'
-            AND strftime('%Y', completed_date) = strftime('%Y', 'now')
-            AND pilot_earnings IS NOT NULL
-            GROUP BY strftime('%m', completed_date)
-            ORDER BY month
-        ''', (pilot_id,))
-
-        monthly_data = cursor.fetchall()
+        # Totals and this year's months come from the earnings_monthly rollup
+        summary = earnings.party_summary(conn, 'pilot', pilot_id)
 
         # Get recent completed orders with earnings
         cursor.execute('''
@@ -6273,16 +5256,7 @@ def get_pilot_earnings(current_user):
         conn.close()
 
         return jsonify({
-            'total_earnings': earnings_data[0] if earnings_data else 0,
-            'completed_orders': earnings_data[1] if earnings_data else 0,
-            'avg_earnings_per_order': earnings_data[2] if earnings_data else 0,
-            'monthly_earnings': [
-                {
-                    'month': row[0],
-                    'earnings': row[1],
-                    'orders': row[2]
-                } for row in monthly_data
-            ],
+            **summary,
             'recent_orders': [
                 {
                     'id': row[0],
@@ -6312,28 +5286,28 @@ def get_editor_assigned_orders(current_user):
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
-    print(f"\n=== EDITOR ASSIGNED ORDERS DEBUG ===")
-    print(f"Current user data: {current_user}")
-    print(f"User ID: {current_user.get('user_id', 'NOT_FOUND')}")
-    print(f"User role: {current_user.get('role', 'NOT_FOUND')}")
-    print(f"User email: {current_user.get('email', 'NOT_FOUND')}")
-    print(f"User name: {current_user.get('name', 'NOT_FOUND')}")
+    logger.debug('=== EDITOR ASSIGNED ORDERS DEBUG ===')
+    logger.debug('Current user data: %s', current_user)
+    logger.debug('User ID: %s', current_user.get('user_id', 'NOT_FOUND'))
+    logger.debug('User role: %s', current_user.get('role', 'NOT_FOUND'))
+    logger.debug('User email: %s', current_user.get('email', 'NOT_FOUND'))
+    logger.debug('User name: %s', current_user.get('name', 'NOT_FOUND'))
 
     if current_user['role'] != 'editor':
-        print(f"❌ AUTHORIZATION FAILED: Expected role 'editor', got '{current_user['role']}'")
+        logger.warning("❌ AUTHORIZATION FAILED: Expected role 'editor', got '%s'", current_user['role'])
         response = jsonify({'message': f'Unauthorized - Role is {current_user["role"]}, expected editor'})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 403
 
-    print(f"✅ AUTHORIZATION PASSED: User is an editor")
+    logger.debug('✅ AUTHORIZATION PASSED: User is an editor')
 
     try:
         conn = get_db()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
-        print(f"Fetching orders for editor ID: {current_user['user_id']}")
+        logger.debug('Fetching orders for editor ID: %s', current_user['user_id'])
 
         # Get ALL orders assigned to this editor (for dashboard)
         cursor.execute('''
@@ -6373,16 +5347,15 @@ def get_editor_assigned_orders(current_user):
                 'created_at': order_dict.get('created_at')
             })
 
-        print(f"Returning {len(orders_list)} orders for editor")
+        logger.debug('Returning %s orders for editor', len(orders_list))
         response = jsonify(orders_list)
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
     except Exception as e:
-        print(f"Error in get_editor_assigned_orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in get_editor_assigned_orders: %s', e)
+        logger.debug('Traceback', exc_info=True)
         response = jsonify({'error': str(e)})
         response.headers.add('Access-Control-Allow-Origin', get_cors_origin())
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -6401,33 +5374,8 @@ def get_editor_earnings(current_user):
 
         editor_id = current_user['user_id']
 
-        # Get total earnings
-        cursor.execute('''
-            SELECT
-                COALESCE(SUM(editor_earnings), 0) as total_earnings,
-                COUNT(*) as completed_orders,
-                COALESCE(AVG(editor_earnings), 0) as avg_earnings_per_order
-            FROM bookings
-            WHERE editor_id = ? AND status = 'completed' AND editor_earnings IS NOT NULL
-        ''', (editor_id,))
-
-        earnings_data = cursor.fetchone()
-
-        # Get monthly earnings for current year
-        cursor.execute('''
-            SELECT
-                strftime('%m', completed_date) as month,
-                COALESCE(SUM(editor_earnings), 0) as monthly_earnings,
-                COUNT(*) as monthly_orders
-            FROM bookings
-            WHERE editor_id = ? AND status = 'completed'
-            AND strftime('%Y', completed_date) = strftime('%Y', 'now')
-            AND editor_earnings IS NOT NULL
-            GROUP BY strftime('%m', completed_date)
-            ORDER BY month
-        ''', (editor_id,))
-
-        monthly_data = cursor.fetchall()
+        # Totals and this year's months come from the earnings_monthly rollup
+        summary = earnings.party_summary(conn, 'editor', editor_id)
 
         # Get recent completed orders with earnings
         cursor.execute('''
@@ -6445,16 +5393,7 @@ def get_editor_earnings(current_user):
         conn.close()
 
         return jsonify({
-            'total_earnings': earnings_data[0] if earnings_data else 0,
-            'completed_orders': earnings_data[1] if earnings_data else 0,
-            'avg_earnings_per_order': earnings_data[2] if earnings_data else 0,
-            'monthly_earnings': [
-                {
-                    'month': row[0],
-                    'earnings': row[1],
-                    'orders': row[2]
-                } for row in monthly_data
-            ],
+            **summary,
             'recent_orders': [
                 {
                     'id': row[0],
@@ -6524,6 +5463,8 @@ def add_pilot_direct(current_user):
 
         return jsonify({'message': 'Pilot added successfully'}), 201
 
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -6573,6 +5514,8 @@ def add_editor_direct(current_user):
 
         return jsonify({'message': 'Editor added successfully'}), 201
 
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -6620,8 +5563,10 @@ def add_referral_direct(current_user):
 
         return jsonify({'message': 'Referral added successfully'}), 201
 
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        print(f"Error adding referral: {str(e)}")
+        logger.error('Error adding referral: %s', e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/admin/bookings', methods=['POST'])
@@ -6687,12 +5632,12 @@ def add_booking_direct(current_user):
                     }
                 )
         except Exception as e:
-            print(f"Failed to send booking notification: {str(e)}")
+            logger.error('Failed to send booking notification: %s', e)
 
         return jsonify({'message': 'Order added successfully', 'booking_id': booking_id}), 201
 
     except Exception as e:
-        print(f"Error adding order: {str(e)}")
+        logger.error('Error adding order: %s', e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -6725,7 +5670,7 @@ def change_password(current_user):
             return jsonify({'error': 'User not found'}), 404
 
         # Verify current password
-        if not check_password_hash(user_data['password_hash'], current_password):
+        if not verify_password(current_password, user_data['password_hash']):
             return jsonify({'error': 'Current password is incorrect'}), 400
 
         # Hash new password
@@ -6744,11 +5689,14 @@ def change_password(current_user):
 
         conn.commit()
         conn.close()
+        principal_cache.invalidate(table_for_role(current_user['role']), current_user['user_id'])
 
         return jsonify({'message': 'Password changed successfully'}), 200
 
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        print(f"Error changing password: {str(e)}")
+        logger.error('Error changing password: %s', e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/auth/reset-password', methods=['POST'])
@@ -6765,58 +5713,36 @@ def reset_password_via_otp():
         if not email or not new_password:
             return jsonify({'error': 'Email and new password are required'}), 400
 
+        identities = find_identities(email)
+        account = first_identity(identities, RESET_SOURCES)
+        if not account:
+            return jsonify({'error': 'User not found'}), 404
+
         conn = get_db()
         cursor = conn.cursor()
-
         hashed_pw = generate_password_hash(new_password)
-        updated = False
 
-        # 1️⃣ Check business_clients
-        cursor.execute('SELECT id FROM business_clients WHERE email = ?', (email,))
-        row = cursor.fetchone()
-        if row:
-            user_id = row[0]
-            cursor.execute('UPDATE business_clients SET password_hash = ? WHERE id = ?', (hashed_pw, user_id))
+        if account['source'] == 'business_clients':
+            # Business clients log in through their users row; keep both hashes in step
+            cursor.execute('UPDATE business_clients SET password_hash = ? WHERE id = ?', (hashed_pw, account['id']))
             cursor.execute('UPDATE users SET password_hash = ? WHERE email = ?', (hashed_pw, email))
-            updated = True
-
-        # 2️⃣ Check pilots
-        if not updated:
-            cursor.execute('SELECT id FROM pilots WHERE email = ?', (email,))
-            row = cursor.fetchone()
-            if row:
-                user_id = row[0]
-                cursor.execute('UPDATE pilots SET password_hash = ? WHERE id = ?', (hashed_pw, user_id))
-                updated = True
-
-        # 3️⃣ Check editors
-        if not updated:
-            cursor.execute('SELECT id FROM editors WHERE email = ?', (email,))
-            row = cursor.fetchone()
-            if row:
-                user_id = row[0]
-                cursor.execute('UPDATE editors SET password_hash = ? WHERE id = ?', (hashed_pw, user_id))
-                updated = True
-
-        # 4️⃣ Check referrals
-        if not updated:
-            cursor.execute('SELECT id FROM referrals WHERE email = ?', (email,))
-            row = cursor.fetchone()
-            if row:
-                user_id = row[0]
-                cursor.execute('UPDATE referrals SET password_hash = ? WHERE id = ?', (hashed_pw, user_id))
-                updated = True
-
-        if not updated:
-            conn.close()
-            return jsonify({'error': 'User not found'}), 404
+        else:
+            cursor.execute(f"UPDATE {account['source']} SET password_hash = ? WHERE id = ?", (hashed_pw, account['id']))
 
         conn.commit()
         conn.close()
+
+        if account['source'] == 'business_clients':
+            if 'users' in identities:
+                principal_cache.invalidate('users', identities['users']['id'])
+        else:
+            principal_cache.invalidate(account['source'], account['id'])
         return jsonify({'success': True, 'message': 'Password reset successfully'}), 200
 
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        print(f"Error resetting password: {str(e)}")
+        logger.error('Error resetting password: %s', e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -6832,9 +5758,21 @@ def request_otp():
         if not email or not user_type:
             return jsonify({'success': False, 'error': 'Missing email or user_type'}), 400
 
-        otp = store_otp(email, user_type, user_data)
-        if not otp:
-            return jsonify({'success': False, 'error': 'Failed to generate OTP'}), 500
+        # 'user' is the forgot-password flow: only send a code to an existing account
+        if user_type == 'user':
+            account = first_identity(find_identities(email), RESET_SOURCES)
+            if not account:
+                return jsonify({'success': False, 'error': 'No account found for this email'}), 404
+            if account['name'] and not user_data.get('name'):
+                user_data['name'] = account['name']
+
+        try:
+            otp = otp_store.issue(get_db(), email, user_type, user_data)
+        except OtpThrottled as e:
+            response = jsonify({'success': False, 'error': 'Too many OTP requests, please try again later',
+                                'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
 
         # 🔑 Use template system instead of raw function
         send_email_with_template_helper(
@@ -6849,8 +5787,7 @@ def request_otp():
         return jsonify({'success': True, 'message': 'OTP sent successfully'}), 200
 
     except Exception as e:
-        import traceback
-        print(traceback.format_exc())
+        logger.debug('Traceback', exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -6860,7 +5797,7 @@ def verify_otp_route():
     email = data.get('email')
     otp_code = data.get('otp') or data.get('otp_code')
 
-    result = verify_otp(email, otp_code)
+    result = otp_store.verify(get_db(), email, otp_code)
     if not result['success']:
         return jsonify(result), 400
 
@@ -6875,12 +5812,13 @@ def update_email_template(template_name):
     if not subject or not body:
         return jsonify({"error": "Both subject and body are required"}), 400
 
-    conn = sqlite3.connect("hmx.db")
+    conn = get_db()
     c = conn.cursor()
     c.execute("UPDATE email_templates SET subject=?, body=? WHERE name=?", (subject, body, template_name))
     conn.commit()
     updated = c.rowcount
     conn.close()
+    template_cache.invalidate(template_name)
 
     if updated:
         return jsonify({"message": "Template updated successfully"})
@@ -6899,32 +5837,114 @@ def send_email_with_template():
     if not template_name or not recipient:
         return jsonify({"error": "Template name and recipient email are required"}), 400
 
-    # Fetch template
-    conn = sqlite3.connect("hmx.db")
-    c = conn.cursor()
-    c.execute("SELECT subject, body FROM email_templates WHERE name=?", (template_name,))
-    row = c.fetchone()
-    conn.close()
-
-    if not row:
+    template = load_email_template(template_name)
+    if not template:
         return jsonify({"error": "Template not found"}), 404
 
-    subject, body = row
+    missing = template.missing(variables)
+    if missing:
+        return jsonify({"error": "Missing template variables", "missing": missing}), 400
 
-    # Replace placeholders {{var}}
-    for key, value in variables.items():
-        subject = subject.replace(f"{{{{{key}}}}}", value)
-        body = body.replace(f"{{{{{key}}}}}", value)
+    subject, body = template.render(variables)
 
-    # Send email
-    success = send_email_sync(recipient, subject, body, is_html=True)
+    # Queue email; the outbox sender delivers it
+    email_id = queue_email(recipient, subject, body, is_html=True)
 
     return jsonify({
-        "success": success,
+        "success": True,
+        "email_id": email_id,
         "to": recipient,
         "subject": subject,
         "body": body
     })
+
+# Admin Broadcast Email Endpoints
+# Audience -> (admin list query whose filters select the recipients, field used for {{name}})
+BROADCAST_AUDIENCES = {
+    'pilots': (ADMIN_PILOTS_QUERY, 'name'),
+    'editors': (ADMIN_EDITORS_QUERY, 'name'),
+    'referrals': (ADMIN_REFERRALS_QUERY, 'name'),
+    'clients': (ADMIN_CLIENTS_QUERY, 'contact_name'),
+}
+
+@app.route('/api/admin/email/broadcast', methods=['POST'])
+@token_required
+def create_email_broadcast(current_user):
+    """Send one template to every pilot / editor / referral / client matching the filters.
+
+    Recipients are rendered and queued in the background, paced at
+    EMAIL_BROADCAST_RATE; poll the returned job for progress.
+    """
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Body must be a {template, audience, filters, variables} object'}), 400
+    template_name = data.get('template')
+    audience = data.get('audience')
+    filters = data.get('filters') or {}
+    variables = data.get('variables') or {}
+    if not isinstance(filters, dict) or not isinstance(variables, dict):
+        return jsonify({'message': 'filters and variables must be objects'}), 400
+    filters = {key: str(value) for key, value in filters.items()}
+
+    if not template_name or audience not in BROADCAST_AUDIENCES:
+        return jsonify({'message': f"template and audience ({', '.join(BROADCAST_AUDIENCES)}) are required"}), 400
+
+    query, name_field = BROADCAST_AUDIENCES[audience]
+    unknown = [key for key in filters if key not in query.filters]
+    if unknown:
+        return jsonify({'message': f"Unknown filters for {audience}: {', '.join(unknown)}"}), 400
+
+    template = load_email_template(template_name)
+    if not template:
+        return jsonify({'message': 'Template not found'}), 404
+
+    # name, email and the audience's list fields come from each recipient
+    missing = [name for name in template.missing(variables) if name != 'name' and name not in query.fields]
+    if missing:
+        return jsonify({'message': 'Missing template variables', 'missing': missing}), 400
+
+    try:
+        conn = get_db()
+        total = conn.execute(*query.count_sql(filters)).fetchone()[0]
+        if not total:
+            return jsonify({'message': 'No recipients match these filters'}), 400
+        job_id = create_job(conn, template_name, audience, filters, variables, total, current_user['id'])
+    except ListQueryError as e:
+        return jsonify({'message': str(e)}), 400
+
+    broadcast_executor.submit(render_job, db_pool, job_id, query, name_field, template, filters, variables,
+                              EmailConfig.BROADCAST_BATCH_SIZE, EmailConfig.BROADCAST_RATE)
+    logger.info('📧 Broadcast %s: %s to %s %s', job_id, template_name, total, audience)
+    return jsonify({'job_id': job_id, 'status': 'rendering', 'total': total}), 202
+
+@app.route('/api/admin/email/broadcast/<int:job_id>', methods=['GET'])
+@token_required
+def get_email_broadcast(current_user, job_id):
+    """Progress of a broadcast job"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    job = job_progress(get_db(), job_id)
+    if job is None:
+        return jsonify({'message': 'Broadcast not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/admin/email/broadcast/<int:job_id>/cancel', methods=['POST'])
+@token_required
+def cancel_email_broadcast(current_user, job_id):
+    """Stop a broadcast; messages already handed to SMTP still go out"""
+    if current_user['role'] != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    conn = get_db()
+    if job_progress(conn, job_id) is None:
+        return jsonify({'message': 'Broadcast not found'}), 404
+    dropped = cancel_job(conn, job_id)
+    return jsonify({'message': 'Broadcast cancelled', 'dropped': dropped})
+
 # -------------------------------
 # Admin Email Templates Management
 # -------------------------------
@@ -6992,6 +6012,7 @@ def update_email_template_admin(current_user, name):
         """, (subject, body, name))
         conn.commit()
         conn.close()
+        template_cache.invalidate(name)
 
         return jsonify({'message': f'Template {name} updated successfully'}), 200
     except Exception as e:
@@ -7020,10 +6041,19 @@ def create_email_template(current_user):
         """, (name, subject, body))
         conn.commit()
         conn.close()
+        template_cache.invalidate(name)
 
         return jsonify({'message': f'Template {name} created successfully'}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def list_queries(conn):
+    """Every admin list endpoint's ListQuery by name (db_indexes checks their plans)"""
+    queries = [admin_users_query(conn), ADMIN_PILOTS_QUERY, ADMIN_EDITORS_QUERY, ADMIN_REFERRALS_QUERY,
+               ADMIN_CLIENTS_QUERY, admin_orders_query(conn), ADMIN_PAYMENTS_QUERY, ADMIN_EARNINGS_QUERY,
+               admin_cancellations_query(conn), ADMIN_VIDEO_REVIEWS_QUERY]
+    queries += [build(conn) for build in APPLICATION_LIST_QUERIES.values()]
+    return {query.name: query for query in queries}
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,146 @@
+"""Logging for the backend: leveled, structured and off the request thread.
+
+Modules log through logging.getLogger('hmx.<name>'). setup() gives the 'hmx'
+logger a single QueueHandler: a request thread only formats the message and
+does a put_nowait, and a QueueListener thread writes the lines to stderr.
+If the sink falls behind and the queue fills up, records are dropped and
+counted instead of blocking requests.
+
+gunicorn forks workers after the app is imported (preload_app), and the
+listener thread does not survive a fork, so each process starts its own
+listener on its first record.
+
+LOG_LEVEL=DEBUG turns on the per-request traces (token checks, request
+payloads, tracebacks). LOG_FORMAT=json writes one JSON object per line;
+extra={...} fields are included in both formats.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from config import LoggingConfig
+
+ROOT = 'hmx'
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time level logger message key=value ...`, or the same as one JSON object per line"""
+
+    def __init__(self, fmt='text'):
+        super().__init__()
+        self.json = fmt == 'json'
+
+    def format(self, record):
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            message = f'{message}\n{record.exc_text}'
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}'
+
+        if self.json:
+            return json.dumps(dict(
+                {'time': timestamp, 'level': record.levelname, 'logger': record.name, 'message': message,
+                 'pid': record.process},
+                **fields
+            ), default=str)
+        extra = ''.join(f' {key}={value}' for key, value in fields.items())
+        return f'{timestamp} {record.levelname:<7} {record.name} {message}{extra}'
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full and (re)starts its listener per process"""
+
+    def __init__(self, sink, queue_size):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.sink = sink
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the queue (and maybe a parent's backlog) but not the thread
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self.dropped = 0
+            self._listener = QueueListener(self.queue, self.sink, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self._listener and self._pid == os.getpid():
+            self._listener.stop()
+        self._pid = None
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'dropped': self.dropped,
+            'listener_running': self._pid == os.getpid()
+        }
+
+
+_handler = None
+
+
+def setup(level=None, fmt=None, stream=None, queue_size=None, use_queue=True):
+    """(Re)configure the 'hmx' logger; defaults come from LoggingConfig"""
+    global _handler
+    logger = logging.getLogger(ROOT)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        if isinstance(handler, NonBlockingQueueHandler):
+            handler.stop()
+
+    sink = logging.StreamHandler(stream or sys.stderr)
+    sink.setFormatter(StructuredFormatter(fmt or LoggingConfig.FORMAT))
+    if use_queue:
+        _handler = NonBlockingQueueHandler(sink, queue_size or LoggingConfig.QUEUE_SIZE)
+        logger.addHandler(_handler)
+        # Flush what is still queued when the process exits
+        atexit.register(_handler.stop)
+    else:
+        # Synchronous writes on the calling thread (benchmarks and one-off scripts)
+        _handler = None
+        logger.addHandler(sink)
+    logger.setLevel((level or LoggingConfig.LEVEL).upper())
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name):
+    return logging.getLogger(f'{ROOT}.{name}')
+
+
+def stats():
+    stats = {
+        'level': logging.getLevelName(logging.getLogger(ROOT).level),
+        'format': LoggingConfig.FORMAT,
+        'queue': None
+    }
+    if _handler:
+        stats['queue'] = _handler.stats()
+    return stats
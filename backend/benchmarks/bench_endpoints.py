@@ -0,0 +1,439 @@
+"""Throughput, latency percentiles and peak RSS of the main endpoints on a seeded synthetic database.
+
+Builds a scratch hmx.db (clients, pilots, editors, bookings, video_reviews,
+payments) from --seed at --scale, where scale 1 is 1000 clients and 10000
+bookings. Each count can also be set on its own. Every scenario then runs
+for --seconds on --threads threads, after a short warm-up, under two
+drivers, each in a fresh process:
+
+  client  the Flask test client, with no sockets: what the app itself costs
+  http    the app behind werkzeug's threaded server, loaded over keep-alive
+          HTTP/1.1 connections from this process
+
+Per scenario it reports requests/s, non-2xx responses, p50/p90/p95/p99/max
+latency and the serving process's peak RSS so far. --output writes it all as
+JSON, along with the commit and settings. --compare takes an earlier file
+and prints the change, so two commits can be compared on the same machine:
+
+    git checkout abc123 && python benchmarks/bench_endpoints.py --output /tmp/abc123.json
+    git checkout def456 && python benchmarks/bench_endpoints.py --compare /tmp/abc123.json --output /tmp/def456.json
+
+--env KEY=VALUE is passed to the app process, e.g. --env DB_POOL_SIZE=4.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PASSWORD = 'bench-password'
+
+# Rows per unit of --scale
+BASE_COUNTS = {
+    'clients': 1000,
+    'pilots': 50,
+    'editors': 20,
+    'bookings': 10000,
+    'video_reviews': 3000,
+    'payments': 7000,
+}
+
+# (status, weight); completed bookings get a split and land in the earnings ledger
+BOOKING_STATUSES = [('pending', 15), ('assigned', 15), ('in_progress', 10), ('completed', 50), ('cancelled', 10)]
+REVIEW_STATUSES = ['submitted', 'review_changes', 'completed', 'forwarded_to_editor']
+
+# name -> (method, path, role, body); `{n}` in a body is replaced by the request number modulo the clients
+SCENARIOS = {
+    'login': ('POST', '/api/auth/login', None, {'email': 'client{n}@bench.test', 'password': PASSWORD}),
+    'bookings': ('GET', '/api/bookings', 'client', None),
+    'admin_orders': ('GET', '/api/admin/orders', 'admin', None),
+    'pilot_earnings': ('GET', '/api/pilot/earnings', 'pilot', None),
+    'cost_preview': ('POST', '/api/cost/preview', None,
+                     {'category': 'Real Estate Property', 'area_sqft': 4200, 'num_floors': 2}),
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+# Synthetic data
+
+def counts_for(args):
+    return {name: getattr(args, name) if getattr(args, name) is not None else int(base * args.scale)
+            for name, base in BASE_COUNTS.items()}
+
+
+def build_database(path, counts, seed, hash_method):
+    """Migrate a new database at path and fill it; returns the ids the scenarios sign in as"""
+    import earnings
+    import pricing
+    from migrations import migrate
+    from werkzeug.security import generate_password_hash
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(path)
+    rng = random.Random(seed)
+    # Relative to today so the "this year" views have data
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    password_hash = generate_password_hash(PASSWORD, method=hash_method)
+
+    def moment(max_days):
+        return (today - timedelta(days=rng.randint(0, max_days), seconds=rng.randint(0, 86399))).strftime('%Y-%m-%d %H:%M:%S')
+
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT OR IGNORE INTO users (id, username, email, password_hash, role) "
+                 "VALUES (1, 'Admin', 'admin@bench.test', ?, 'admin')", (password_hash,))
+    client_start = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM users').fetchone()[0]
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role, created_at) VALUES (?, ?, ?, 'client', ?)",
+        ((f'Client {i}', f'client{i}@bench.test', password_hash, moment(730)) for i in range(counts['clients']))
+    )
+    conn.executemany(
+        "INSERT INTO pilots (name, email, phone, password_hash, status, cities) VALUES (?, ?, ?, ?, 'active', 'Chennai')",
+        ((f'Pilot {i}', f'pilot{i}@bench.test', f'9{i:09d}', password_hash) for i in range(counts['pilots']))
+    )
+    conn.executemany(
+        "INSERT INTO editors (name, email, phone, password_hash, status) VALUES (?, ?, ?, ?, 'active')",
+        ((f'Editor {i}', f'editor{i}@bench.test', f'8{i:09d}', password_hash) for i in range(counts['editors']))
+    )
+    pilot_ids = [row[0] for row in conn.execute('SELECT id FROM pilots ORDER BY id')]
+    editor_ids = [row[0] for row in conn.execute('SELECT id FROM editors ORDER BY id')]
+    client_ids = list(range(client_start, client_start + counts['clients']))
+
+    statuses, weights = zip(*BOOKING_STATUSES)
+    categories = list(pricing.COSTING_TABLE)
+
+    def bookings():
+        for i in range(counts['bookings']):
+            status = rng.choices(statuses, weights)[0]
+            area, floors = rng.choice((800, 2500, 4200, 8000, 20000)), rng.randint(1, 4)
+            base_cost, total, _ = pricing.quote(rng.choice(categories), area, floors)
+            assigned = status != 'pending'
+            paid = status in ('in_progress', 'completed') or (assigned and rng.random() < 0.5)
+            split = earnings.split_order(total, False) if status == 'completed' else dict.fromkeys(
+                ('pilot_earnings', 'editor_earnings', 'referral_earnings', 'hmx_earnings', 'gateway_fees'), 0)
+            created = moment(365)
+            yield (rng.choice(client_ids), rng.choice(pilot_ids) if assigned and pilot_ids else None,
+                   rng.choice(editor_ids) if status == 'completed' and editor_ids else None,
+                   f'{i} Example Street, Chennai', rng.choice(categories), area, 'sqft', floors,
+                   base_cost, total, status, 'paid' if paid else 'pending', total if paid else None,
+                   created if paid else None, created if status == 'completed' else None, created, created,
+                   split['pilot_earnings'], split['editor_earnings'], split['referral_earnings'],
+                   split['hmx_earnings'], split['gateway_fees'])
+
+    conn.executemany('''
+        INSERT INTO bookings (user_id, pilot_id, editor_id, location_address, property_type, area_size, area_unit,
+                              num_floors, base_package_cost, total_cost, status, payment_status, payment_amount,
+                              payment_date, completed_date, created_at, updated_at, pilot_earnings, editor_earnings,
+                              referral_earnings, hmx_earnings, gateway_fees)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', bookings())
+
+    # Payments and reviews go to bookings that are far enough along to have them
+    paid = conn.execute("SELECT id, payment_amount, payment_date FROM bookings WHERE payment_status = 'paid'").fetchall()
+    conn.executemany('''
+        INSERT INTO payments (booking_id, amount, status, payment_method, transaction_id, payment_gateway, created_at)
+        VALUES (?, ?, 'success', 'upi', ?, 'phonepe', ?)
+    ''', ((booking_id, amount, f'TXN{booking_id}-{n}', paid_at)
+          for n, (booking_id, amount, paid_at) in enumerate(rng.choices(paid, k=counts['payments']) if paid else [])))
+    worked = conn.execute('SELECT id, user_id, pilot_id, editor_id, created_at FROM bookings '
+                          'WHERE pilot_id IS NOT NULL').fetchall()
+    conn.executemany('''
+        INSERT INTO video_reviews (order_id, client_id, editor_id, pilot_id, drive_link, submitted_date, status,
+                                   submission_type, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((order_id, client_id, editor_id, pilot_id, f'https://drive.example.com/{order_id}/{n}', created,
+           rng.choice(REVIEW_STATUSES), 'editor' if editor_id and rng.random() < 0.5 else 'pilot', created)
+          for n, (order_id, client_id, pilot_id, editor_id, created)
+          in enumerate(rng.choices(worked, k=counts['video_reviews']) if worked else [])))
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    # The busiest client and pilot, so their pages have something to show
+    conn = sqlite3.connect(path)
+    client_id = conn.execute('SELECT user_id FROM bookings GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()
+    pilot_id = conn.execute("SELECT pilot_id FROM bookings WHERE status = 'completed' AND pilot_id IS NOT NULL "
+                            'GROUP BY pilot_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()
+    conn.close()
+    return {'admin': 1, 'client': client_id[0] if client_id else client_start,
+            'pilot': pilot_id[0] if pilot_id else (pilot_ids[0] if pilot_ids else None)}
+
+
+# Load
+
+def drive(send, threads, seconds):
+    """Call send(n) from `threads` threads for `seconds`; returns request/s, errors and latency percentiles"""
+    stop = threading.Event()
+    latencies = [[] for _ in range(threads)]
+    errors = [0] * threads
+
+    def loop(index):
+        n = index
+        own = latencies[index]
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                ok = 200 <= send(n) < 300
+            except Exception:
+                ok = False
+            own.append(time.perf_counter() - started)
+            if not ok:
+                errors[index] += 1
+            n += threads
+
+    workers = [threading.Thread(target=loop, args=(index,), daemon=True) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    samples = sorted(value for own in latencies for value in own)
+    result = {'requests': len(samples), 'errors': sum(errors), 'requests_per_sec': round(len(samples) / elapsed, 1)}
+    for p in PERCENTILES:
+        result[f'p{p}_ms'] = round(samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000, 3) if samples else None
+    result['max_ms'] = round(samples[-1] * 1000, 3) if samples else None
+    return result
+
+
+def request_body(scenario, n, clients):
+    body = SCENARIOS[scenario][3]
+    if body is None:
+        return None
+    return json.loads(json.dumps(body).replace('{n}', str(n % max(clients, 1))))
+
+
+def peak_rss_kb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def import_app():
+    # Migration and startup chatter goes to stdout; the result lines must be the only thing there
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as hmx
+    return hmx
+
+
+def sign_tokens(hmx, accounts):
+    import jwt
+    expires = datetime.utcnow() + timedelta(hours=6)
+    return {role: jwt.encode({'user_id': account_id, 'role': role, 'exp': expires}, hmx.app.config['SECRET_KEY'])
+            for role, account_id in accounts.items() if account_id is not None}
+
+
+def child_client(plan):
+    """--child client: run every scenario through the test client and print the results"""
+    hmx = import_app()
+    tokens = sign_tokens(hmx, plan['accounts'])
+    results = {}
+    for scenario in plan['scenarios']:
+        method, path, role, _ = SCENARIOS[scenario]
+        headers = {'Authorization': f'Bearer {tokens[role]}'} if role else {}
+        clients = [hmx.app.test_client() for _ in range(plan['threads'])]
+
+        def send(n):
+            response = clients[n % plan['threads']].open(path, method=method, headers=headers,
+                                                         json=request_body(scenario, n, plan['clients']))
+            response.get_data()
+            response.close()
+            return response.status_code
+
+        drive(send, plan['threads'], plan['warmup'])
+        results[scenario] = drive(send, plan['threads'], plan['seconds'])
+        results[scenario]['peak_rss_kb'] = peak_rss_kb()
+    print(json.dumps({'scenarios': results, 'peak_rss_kb': peak_rss_kb()}))
+
+
+def child_server(plan):
+    """--child server: serve the app on a free port until stdin closes, then print the peak RSS"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    hmx = import_app()
+    server = make_server('127.0.0.1', 0, hmx.app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(json.dumps({'port': server.server_port, 'tokens': sign_tokens(hmx, plan['accounts'])}), flush=True)
+    sys.stdin.read()
+    server.shutdown()
+    print(json.dumps({'peak_rss_kb': peak_rss_kb()}), flush=True)
+
+
+def run_client(plan, env, workdir):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', 'client', '--plan', json.dumps(plan)],
+                            cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f'client driver failed:\n{result.stderr[-3000:]}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_http(plan, env, workdir):
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', 'server', '--plan', json.dumps(plan)],
+                              cwd=workdir, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        ready = json.loads(server.stdout.readline())
+    except ValueError:
+        server.kill()
+        sys.exit('http driver: the server did not start (see its stderr above)')
+    port, tokens = ready['port'], ready['tokens']
+    results = {}
+    for scenario in plan['scenarios']:
+        method, path, role, _ = SCENARIOS[scenario]
+        headers = {'Content-Type': 'application/json'}
+        if role:
+            headers['Authorization'] = f'Bearer {tokens[role]}'
+        local = threading.local()
+
+        def send(n):
+            body = request_body(scenario, n, plan['clients'])
+            payload = json.dumps(body).encode() if body is not None else None
+            conn = getattr(local, 'conn', None) or http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            local.conn = conn
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                local.conn = None
+                raise
+
+        drive(send, plan['threads'], plan['warmup'])
+        results[scenario] = drive(send, plan['threads'], plan['seconds'])
+    server.stdin.close()
+    finished = json.loads(server.stdout.read().strip().splitlines()[-1])
+    server.wait()
+    # The server's RSS is only known once it stops, so it is reported for the whole run
+    return {'scenarios': results, 'peak_rss_kb': finished['peak_rss_kb']}
+
+
+# Reporting
+
+def commit():
+    try:
+        head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '--', '.'], cwd=BACKEND_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return head + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(report, baseline=None):
+    for driver, result in report['results'].items():
+        print(f"\n{driver} driver (peak RSS {result['peak_rss_kb'] / 1024:.1f}MB)")
+        print(f"  {'scenario':16s} {'req/s':>9s} {'errors':>7s} {'p50':>9s} {'p90':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s}"
+              + ('   vs baseline' if baseline else ''))
+        for scenario, stats in result['scenarios'].items():
+            line = f"  {scenario:16s} {stats['requests_per_sec']:9.1f} {stats['errors']:7d}" + ''.join(
+                f" {stats[key]:7.2f}ms" if stats[key] is not None else f" {'-':>9s}"
+                for key in ('p50_ms', 'p90_ms', 'p95_ms', 'p99_ms', 'max_ms'))
+            old = (baseline or {}).get('results', {}).get(driver, {}).get('scenarios', {}).get(scenario)
+            if old and old['requests_per_sec'] and old['p95_ms'] and stats['p95_ms'] is not None:
+                line += (f"   req/s {stats['requests_per_sec'] / old['requests_per_sec'] - 1:+6.1%}"
+                         f"  p95 {stats['p95_ms'] / old['p95_ms'] - 1:+6.1%}")
+            print(line)
+    if baseline:
+        print(f"\nBaseline: {baseline.get('commit')} ({baseline.get('created_at')})")
+        settings = baseline.get('settings', {})
+        for key, label in (('counts', 'data set'), ('threads', 'thread count'), ('env', 'app settings')):
+            if settings.get(key) != report['settings'][key]:
+                print(f'  note: the baseline was run with a different {label}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies every row count')
+    for name, base in BASE_COUNTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int, help=f'default {base} x scale')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0, help='per scenario and driver')
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--drivers', nargs='+', choices=['client', 'http'], default=['client', 'http'])
+    parser.add_argument('--hash-method', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'))
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE', help='extra app settings')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='a JSON file from an earlier run')
+    parser.add_argument('--child', choices=['client', 'server'], help=argparse.SUPPRESS)
+    parser.add_argument('--plan', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        (child_client if args.child == 'client' else child_server)(json.loads(args.plan))
+        return
+
+    counts = counts_for(args)
+    overrides = dict(item.split('=', 1) for item in args.env)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hmx.db')
+        started = time.perf_counter()
+        accounts = build_database(db_path, counts, args.seed, args.hash_method)
+        built = time.perf_counter() - started
+        print(f"Data: {', '.join(f'{n} {name}' for name, n in counts.items())} (built in {built:.1f}s)")
+        print(f"Threads: {args.threads}  Seconds: {args.seconds} per scenario  Commit: {commit()}")
+
+        plan = {'accounts': accounts, 'scenarios': args.scenarios, 'threads': args.threads, 'seconds': args.seconds,
+                'warmup': args.warmup, 'clients': counts['clients']}
+        results = {}
+        for driver in args.drivers:
+            # Each driver gets the database as built: logins may rehash passwords, bookings age
+            driver_db = os.path.join(tmp, f'{driver}.db')
+            shutil.copy(db_path, driver_db)
+            env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DATABASE_PATH=driver_db, DB_CHECKPOINT_INTERVAL='0', LOG_LEVEL='WARNING',
+                       EMAIL_OUTBOX_SENDER='external', PAYMENT_EVENTS_PROCESSOR='external', SLOW_QUERY_MS='0',
+                       PASSWORD_HASH_METHOD=args.hash_method)
+            env.update(overrides)
+            results[driver] = (run_client if driver == 'client' else run_http)(plan, env, tmp)
+
+    report = {
+        'benchmark': 'endpoints',
+        'commit': commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                    'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'settings': {'counts': counts, 'seed': args.seed, 'threads': args.threads, 'seconds': args.seconds,
+                     'warmup': args.warmup, 'hash_method': args.hash_method, 'env': overrides},
+        'build_seconds': round(built, 2),
+        'results': results
+    }
+    print_results(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Peak RSS of the streaming exports vs materializing the same rows.
+
+Builds a scratch database with N bookings and payments, then for each size
+runs one export in a fresh process and reports ru_maxrss before and after
+the request. `legacy` is the old pattern: fetchall() + jsonify of the list.
+
+SQLite's mmap and page cache also count towards RSS; both are bounded by
+DB_MMAP_SIZE / DB_CACHE_SIZE, so they are switched off here to measure the
+application side. Pass --keep-pragmas to measure with the configured profile.
+
+    python benchmarks/bench_export_rss.py --sizes 10000 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+STATUSES = ['pending', 'assigned', 'in_progress', 'completed', 'cancelled']
+
+# Runs inside the child process; prints one JSON line with the measurements
+CHILD = r'''
+import contextlib, datetime, io, json, resource, sys, time
+import jwt
+with contextlib.redirect_stdout(io.StringIO()):
+    import app as hmx
+mode, export_name, export_format = sys.argv[1:4]
+client = hmx.app.test_client()
+token = jwt.encode({'user_id': 1, 'role': 'admin', 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+                   hmx.app.config['SECRET_KEY'], algorithm='HS256')
+queries = {'orders': hmx.admin_orders_query, 'payments': lambda conn: hmx.ADMIN_PAYMENTS_QUERY,
+           'earnings': lambda conn: hmx.ADMIN_EARNINGS_QUERY}
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.perf_counter()
+size = 0
+with contextlib.redirect_stdout(io.StringIO()):
+    if mode == 'stream':
+        response = client.get(f'/api/admin/export/{export_name}?format={export_format}',
+                              headers={'Authorization': 'Bearer ' + token}, buffered=False)
+        for chunk in response.response:
+            size += len(chunk)
+        response.close()
+    else:
+        with hmx.app.app_context():
+            conn = hmx.get_db()
+            query = queries[export_name](conn)
+            sql, params, plan = query.build({})
+            rows = [query.format_row(raw, plan['fields']) for raw in conn.execute(sql, params).fetchall()]
+            size = len(hmx.jsonify(rows).get_data())
+print(json.dumps({'before_kb': before, 'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  'seconds': time.perf_counter() - started, 'bytes': size}))
+'''
+
+
+def build_database(path, rows):
+    from migrations import migrate
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT OR IGNORE INTO users (id, username, email, password_hash, role) "
+                 "VALUES (1, 'Admin', 'admin@example.com', 'x', 'admin')")
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, 'x', 'client')",
+        ((f'Client {i}', f'client{i}@example.com') for i in range(1000))
+    )
+    conn.executemany(
+        "INSERT INTO pilots (name, email, phone, password_hash, status) VALUES (?, ?, '9999999999', 'x', 'active')",
+        ((f'Pilot {i}', f'pilot{i}@example.com') for i in range(50))
+    )
+
+    def bookings():
+        for i in range(rows):
+            amount = random.randint(5000, 90000)
+            yield (random.randint(2, 1001), random.randint(1, 50), f'{i} Example Street, Chennai',
+                   'Residential', random.choice(STATUSES), amount, amount,
+                   round(amount * 0.5, 2), round(amount * 0.15, 2), 0, round(amount * 0.2, 2), round(amount * 0.025, 2))
+
+    conn.executemany('''
+        INSERT INTO bookings (user_id, pilot_id, location_address, property_type, status, total_cost, payment_amount,
+                              pilot_earnings, editor_earnings, referral_earnings, hmx_earnings, gateway_fees)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', bookings())
+    conn.execute('''
+        INSERT INTO payments (booking_id, amount, status, payment_method, transaction_id)
+        SELECT id, payment_amount, 'success', 'upi', 'TXN' || id FROM bookings
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def run_child(workdir, db_path, mode, export_name, export_format, keep_pragmas):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DATABASE_PATH=db_path, DB_CHECKPOINT_INTERVAL='0')
+    if not keep_pragmas:
+        env.update(DB_MMAP_SIZE='0', DB_CACHE_SIZE='-2000')
+    result = subprocess.run([sys.executable, '-c', CHILD, mode, export_name, export_format], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--export', choices=['orders', 'payments', 'earnings'], default='payments')
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='csv')
+    parser.add_argument('--legacy-max', type=int, default=100000,
+                        help='largest size to also run the materializing version for')
+    parser.add_argument('--keep-pragmas', action='store_true',
+                        help='keep the configured mmap_size / cache_size instead of minimal ones')
+    args = parser.parse_args()
+
+    print(f"Export: {args.export} ({args.format})\n")
+    print(f"{'rows':>9s} {'mode':8s} {'rss before':>12s} {'rss peak':>12s} {'growth':>10s} {'seconds':>8s} {'MB out':>8s}")
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'hmx.db')
+            started = time.perf_counter()
+            build_database(db_path, rows)
+            print(f"  (built {rows} rows in {time.perf_counter() - started:.1f}s)")
+
+            modes = ['stream'] + (['legacy'] if rows <= args.legacy_max else [])
+            for mode in modes:
+                result = run_child(tmp, db_path, mode, args.export, args.format, args.keep_pragmas)
+                growth = result['peak_kb'] - result['before_kb']
+                print(f"{rows:9d} {mode:8s} {result['before_kb'] / 1024:10.1f}MB {result['peak_kb'] / 1024:10.1f}MB "
+                      f"{growth / 1024:8.1f}MB {result['seconds']:8.2f} {result['bytes'] / 1e6:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Request throughput with logging off, at INFO, and at DEBUG through the queue vs written synchronously.
+
+Runs --threads client threads against GET /api/pilot/assigned-orders (a
+pilot token, so token_required and the handler both log debug traces)
+through Flask's test client on a scratch copy of the database, for
+--seconds per profile. Log lines go to a file; --sink-delay adds a pause
+per write to stand in for a slow stdout pipe or log collector.
+
+    python benchmarks/bench_logging.py --threads 4 --seconds 3 --sink-delay 0.0002
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# (name, level, through the queue)
+PROFILES = [
+    ('off', 'CRITICAL', True),
+    ('info', 'INFO', True),
+    ('debug-queue', 'DEBUG', True),
+    ('debug-sync', 'DEBUG', False),
+]
+
+
+class SlowFile(io.TextIOWrapper):
+    """A file whose every write also waits `delay` seconds"""
+
+    def __init__(self, path, delay):
+        super().__init__(open(path, 'ab'), write_through=True)
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return super().write(text)
+
+
+def run(client, headers, threads, seconds):
+    stop = threading.Event()
+    done = [0] * threads
+
+    def loop(n):
+        while not stop.is_set():
+            client.get('/api/pilot/assigned-orders', headers=headers)
+            done[n] += 1
+
+    workers = [threading.Thread(target=loop, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(done) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--sink-delay', type=float, default=0.0, help='seconds each log write waits')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'hmx.db')
+        shutil.copy(os.path.join(BACKEND_DIR, 'hmx.db'), database)
+        os.environ.update(DATABASE_PATH=database, DB_CHECKPOINT_INTERVAL='0', LOG_LEVEL='CRITICAL',
+                          EMAIL_OUTBOX_SENDER='external', PAYMENT_EVENTS_PROCESSOR='external')
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app as hmx
+        import app_logging
+        import jwt
+
+        conn = sqlite3.connect(database)
+        pilot_id = conn.execute('SELECT id FROM pilots ORDER BY id LIMIT 1').fetchone()[0]
+        conn.close()
+        token = jwt.encode({'user_id': pilot_id, 'role': 'pilot', 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           hmx.app.config['SECRET_KEY'])
+        headers = {'Authorization': f'Bearer {token}'}
+        client = hmx.app.test_client()
+        log_path = os.path.join(tmp, 'app.log')
+
+        print(f"Threads: {args.threads}  Seconds: {args.seconds}  Sink delay: {args.sink_delay * 1000:.2f}ms/line\n")
+        baseline = None
+        for name, level, use_queue in PROFILES:
+            sink = SlowFile(log_path, args.sink_delay)
+            app_logging.setup(level=level, stream=sink, use_queue=use_queue)
+            run(client, headers, args.threads, 0.3)  # warm up
+            before = os.path.getsize(log_path)
+            rate = run(client, headers, args.threads, args.seconds)
+            stats = app_logging.stats()['queue'] or {}
+            app_logging.setup(level='CRITICAL', stream=sink)  # drains and stops the listener
+            lines = (os.path.getsize(log_path) - before) / 100  # roughly 100 bytes a line
+            baseline = baseline or rate
+            print(f"{name:<12} {rate:8.0f} req/s  ({rate / baseline:5.2f}x off)   ~{lines:8.0f} lines   "
+                  f"dropped={stats.get('dropped', 0)}")
+            sink.close()
+
+
+if __name__ == '__main__':
+    main()
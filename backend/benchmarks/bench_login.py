@@ -0,0 +1,117 @@
+"""Login throughput and latency of other requests, inline hashing vs the pool.
+
+Runs one worker-like process per profile: `--threads` login threads plus a
+probe thread calling GET /api/cities, all through the Flask test client
+against a scratch database, for `--seconds`. Reports logins/s and the
+probe's p50/p95 while logins are running.
+
+    python benchmarks/bench_login.py --threads 4 --seconds 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PROFILES = {
+    'inline': {'PASSWORD_HASH_WORKERS': '0', 'PASSWORD_HASH_MAX_PENDING': '1000'},
+    'pool': {},
+}
+
+CHILD = r'''
+import io, json, sys, threading, time
+# The app prints per request; keep that out of the result line
+real_stdout, sys.stdout = sys.stdout, io.StringIO()
+import app as hmx
+threads, seconds, users = int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])
+stop = threading.Event()
+lock = threading.Lock()
+counts = {'ok': 0, 'busy': 0, 'failed': 0}
+probe = []
+
+def login(n):
+    client = hmx.app.test_client()
+    i = n
+    while not stop.is_set():
+        status = client.post('/api/auth/login', json={'email': f'user{i % users}@example.com',
+                                                      'password': 'bench-password'}).status_code
+        key = 'ok' if status == 200 else 'busy' if status == 503 else 'failed'
+        with lock:
+            counts[key] += 1
+        i += threads
+
+def probe_loop():
+    client = hmx.app.test_client()
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get('/api/cities')
+        probe.append(time.perf_counter() - started)
+        time.sleep(0.01)
+
+workers = [threading.Thread(target=login, args=(n,)) for n in range(threads)] + [threading.Thread(target=probe_loop)]
+for t in workers:
+    t.start()
+time.sleep(seconds)
+stop.set()
+for t in workers:
+    t.join()
+probe.sort()
+print(json.dumps({
+    'logins_per_sec': counts['ok'] / seconds, 'busy': counts['busy'], 'failed': counts['failed'],
+    'probe_p50_ms': probe[len(probe) // 2] * 1000, 'probe_p95_ms': probe[int(len(probe) * 0.95)] * 1000,
+    'probe_requests': len(probe), 'hashing': hmx.password_hasher.stats(),
+}), file=real_stdout)
+'''
+
+
+def build_database(path, users, method):
+    from migrations import migrate
+    from werkzeug.security import generate_password_hash
+    import sqlite3
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(path)
+    password_hash = generate_password_hash('bench-password', method=method)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, 'client')",
+        ((f'User {i}', f'user{i}@example.com', password_hash) for i in range(users))
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4, help='concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--method', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'))
+    parser.add_argument('--workers', type=int, default=2, help='hashing processes for the pool profile')
+    args = parser.parse_args()
+
+    print(f"Method: {args.method}  Login threads: {args.threads}  Duration: {args.seconds}s\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hmx.db')
+        build_database(db_path, args.users, args.method)
+        for name, overrides in PROFILES.items():
+            env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DATABASE_PATH=db_path, DB_CHECKPOINT_INTERVAL='0',
+                       PASSWORD_HASH_METHOD=args.method, PASSWORD_HASH_WORKERS=str(args.workers),
+                       PASSWORD_HASH_MAX_PENDING=str(args.threads))
+            env.update(overrides)
+            result = subprocess.run([sys.executable, '-c', CHILD, str(args.threads), str(args.seconds), str(args.users)],
+                                    cwd=tmp, env=env, capture_output=True, text=True, check=True)
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{name:7s} logins/s={stats['logins_per_sec']:7.1f}  busy={stats['busy']:<4d} failed={stats['failed']:<4d} "
+                  f"probe p50={stats['probe_p50_ms']:7.2f}ms p95={stats['probe_p95_ms']:7.2f}ms "
+                  f"({stats['probe_requests']} probes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""PhonePe status checks: bare requests.get per call vs the pooled client, healthy and degraded.
+
+Runs the local gateway stub (stubs/phonepe_stub.py) in-process. A healthy
+gateway shows what keep-alive saves; a degraded one (--slow seconds per
+answer, longer than the read timeout) shows how long request threads stay
+pinned before and after the circuit opens.
+
+    python benchmarks/bench_phonepe.py --calls 300 --threads 8 --slow 2
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def run(check, calls, threads):
+    latencies, failures = [], []
+
+    def one(n):
+        started = time.perf_counter()
+        if not check(f'TXN_{n}_bench'):
+            failures.append(n)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(one, range(calls)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {'per_sec': calls / elapsed, 'seconds': elapsed, 'failed': len(failures),
+            'p50_ms': latencies[len(latencies) // 2] * 1000, 'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+            'max_ms': latencies[-1] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=8, help='concurrent request threads')
+    parser.add_argument('--slow', type=float, default=2.0, help='stub answer delay in the degraded runs')
+    parser.add_argument('--read-timeout', type=float, default=0.5)
+    args = parser.parse_args()
+
+    from config import PhonePeConfig
+    from phonepe_payment import PhonePePayment
+    from stubs.phonepe_stub import PhonePeStub
+
+    stub = PhonePeStub(port=0).start()
+
+    class BenchConfig(PhonePeConfig):
+        STATUS_API = f'{stub.url}/pg/v1/status'
+        READ_TIMEOUT = args.read_timeout
+        POOL_SIZE = args.threads
+        CIRCUIT_RESET = 60.0
+
+    def bare(transaction_id):
+        # What the client did before: a new connection per call and a single 30 s timeout
+        try:
+            response = requests.get(f'{BenchConfig.STATUS_API}/{BenchConfig.MERCHANT_ID}/{transaction_id}',
+                                    headers={'X-VERIFY': 'bench'}, timeout=30)
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    print(f"Calls: {args.calls}  Threads: {args.threads}  Read timeout: {args.read_timeout}s  "
+          f"Degraded delay: {args.slow}s\n")
+    for degraded in (False, True):
+        stub.delay = args.slow if degraded else 0.0
+        client = PhonePePayment(mock_mode=False, config=BenchConfig)
+        # A slow gateway makes the bare run take calls * slow / threads seconds; a handful shows it
+        calls = min(args.calls, args.threads * 2) if degraded else args.calls
+        for name, check in (('bare', bare), ('pooled', lambda t: client.check_payment_status(t)['success'])):
+            before = stub.stats()
+            result = run(check, calls, args.threads)
+            after = stub.stats()
+            print(f"{'degraded' if degraded else 'healthy':8s} {name:6s} {result['per_sec']:8.1f} calls/s  "
+                  f"p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms max={result['max_ms']:8.2f}ms  "
+                  f"failed={result['failed']:<4d} connections={after['connections'] - before['connections']}")
+        print(f"         circuit: {client.breaker.stats()['state']}  "
+              f"outcomes: {client.stats()['operations']['status']['outcomes']}\n")
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
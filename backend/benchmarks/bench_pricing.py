@@ -0,0 +1,122 @@
+"""Quotes/s of the old per-request pricing function vs pricing.quote, and preview vs batch over HTTP.
+
+The old function rebuilt COSTING_TABLE and scanned the area slabs on every
+call (it was nested in get_bookings and cost_preview). Before timing, both
+are checked to agree on a grid of integer areas. The HTTP part posts
+--items quotes one /api/cost/preview request at a time and then as a
+single /api/cost/preview/batch request, through Flask's test client
+against a scratch copy of the database.
+
+    python benchmarks/bench_pricing.py --quotes 200000 --items 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import pricing
+
+
+def legacy_calculate_cost(category, area_sqft, num_floors):
+    """cost_preview's nested calculate_cost before the pricing module"""
+    COSTING_TABLE = {
+        "Retail Store / Showroom":      [5999,  9999,  15999, 20999, None],
+        "Restaurants & Cafes":          [7999, 11999, 19999, 25999, None],
+        "Fitness & Sports Arenas":      [9999, 13999, 22999, 31999, None],
+        "Resorts & Farmstays / Hotels": [11999, 17999, 29999, 39999, None],
+        "Real Estate Property":         [13999, 23999, 37999, 49999, None],
+        "Shopping Mall / Complex":      [15999, 29999, 47999, 63999, None],
+        "Adventure / Water Parks":      [12999, 23999, 39999, 55999, None],
+        "Gaming & Entertainment Zones": [10999, 19999, 33999, 45999, None],
+    }
+    area_ranges = [1000, 5000, 10000, 50000]
+    if category not in COSTING_TABLE:
+        return None, None, "Invalid category"
+    try:
+        area_sqft = int(area_sqft)
+    except (TypeError, ValueError):
+        return None, None, "Invalid area"
+    try:
+        num_floors = int(num_floors)
+    except (TypeError, ValueError):
+        num_floors = 1
+    if area_sqft > 50000:
+        return None, None, "Custom Quote"
+    idx = 0
+    for i, max_area in enumerate(area_ranges):
+        if area_sqft <= max_area:
+            idx = i
+            break
+        idx = i + 1
+    base_cost = COSTING_TABLE[category][idx]
+    if base_cost is None:
+        return None, None, "Custom Quote"
+    if num_floors is None or num_floors < 1:
+        num_floors = 1
+    final_cost = int(base_cost * (1 + 0.1 * (num_floors - 1)))
+    return base_cost, final_cost, None
+
+
+def requests_for(count):
+    categories = list(pricing.COSTING_TABLE) + ['Unknown']
+    return [(random.choice(categories), random.randint(100, 60000), random.randint(1, 5)) for _ in range(count)]
+
+
+def time_quotes(quote, items):
+    started = time.perf_counter()
+    for category, area, floors in items:
+        quote(category, area, floors)
+    return len(items) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quotes', type=int, default=200000)
+    parser.add_argument('--items', type=int, default=200, help='quotes per HTTP round')
+    args = parser.parse_args()
+
+    mismatches = sum(
+        1 for category in list(pricing.COSTING_TABLE) + ['Unknown']
+        for area in range(0, 60001, 7) for floors in (0, 1, 3)
+        if legacy_calculate_cost(category, area, floors) != pricing.quote(category, area, floors)
+    )
+    print(f"Agreement on integer areas: {'ok' if not mismatches else f'{mismatches} mismatches'}\n")
+
+    items = requests_for(args.quotes)
+    legacy = time_quotes(legacy_calculate_cost, items)
+    engine = time_quotes(pricing.quote, items)
+    print(f"legacy  {legacy:12,.0f} quotes/s")
+    print(f"engine  {engine:12,.0f} quotes/s  ({engine / legacy:.1f}x)  cache: {pricing.cache_stats()}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(BACKEND_DIR, 'hmx.db'), os.path.join(tmp, 'hmx.db'))
+        os.environ.update(DATABASE_PATH=os.path.join(tmp, 'hmx.db'), DB_CHECKPOINT_INTERVAL='0',
+                          EMAIL_OUTBOX_SENDER='external', PAYMENT_EVENTS_PROCESSOR='external')
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app as hmx
+        client = hmx.app.test_client()
+        batch = [{'category': c, 'area_sqft': a, 'num_floors': f} for c, a, f in requests_for(args.items)]
+
+        started = time.perf_counter()
+        for item in batch:
+            client.post('/api/cost/preview', json={'category': item['category'], 'area_sqft': item['area_sqft'],
+                                                   'num_floors': item['num_floors']})
+        single = time.perf_counter() - started
+        started = time.perf_counter()
+        response = client.post('/api/cost/preview/batch', json={'items': batch})
+        batched = time.perf_counter() - started
+        assert len(response.get_json()['quotes']) == len(batch)
+    print(f"HTTP    {args.items} previews: {single * 1000:8.1f}ms   one batch: {batched * 1000:8.1f}ms "
+          f"({single / batched:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Pending-payment reconciliation throughput: one status check at a time vs the bounded pool.
+
+Builds a scratch database with the real schema and --payments pending
+payments, starts the local gateway stub (stubs/phonepe_stub.py) with
+--delay seconds per answer, and runs a full reconciliation pass per worker
+count. A share of the transactions (--completed) is reported COMPLETED,
+the rest stay PENDING.
+
+    python benchmarks/bench_reconcile.py --payments 500 --delay 0.05 --workers 1,4,8
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DatabaseConfig, PhonePeConfig
+from db_pool import ConnectionPool
+from migrations import ensure_schema
+from payment_reconciler import PaymentReconciler, reconcile_lag
+from phonepe_payment import PhonePePayment
+from stubs.phonepe_stub import PhonePeStub
+
+
+def build_database(path, payments):
+    ensure_schema(path, auto_migrate=True)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO bookings (id, user_id, location_address, payment_status) VALUES (?, 1, 'bench', 'pending')",
+        ((i,) for i in range(1, payments + 1))
+    )
+    conn.executemany('''
+        INSERT INTO payments (booking_id, amount, status, merchant_transaction_id, created_at)
+        VALUES (?, 500, 'pending', ?, datetime('now', ?))
+    ''', ((i, f'TXN_{i}_bench', f'-{random.randint(180, 3600)} seconds') for i in range(1, payments + 1)))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--payments', type=int, default=500)
+    parser.add_argument('--delay', type=float, default=0.05, help='stub seconds per status answer')
+    parser.add_argument('--workers', default='1,4,8', help='comma separated worker counts')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--completed', type=float, default=0.7, help='share of payments the stub reports COMPLETED')
+    args = parser.parse_args()
+
+    stub = PhonePeStub(port=0, state='PENDING', delay=args.delay).start()
+    for i in range(1, args.payments + 1):
+        if random.random() < args.completed:
+            stub.set_state(f'TXN_{i}_bench', 'COMPLETED')
+
+    print(f"Payments: {args.payments}  Gateway delay: {args.delay * 1000:.0f}ms  Page size: {args.page_size}\n")
+    for workers in [int(n) for n in args.workers.split(',')]:
+        class BenchConfig(PhonePeConfig):
+            STATUS_API = f'{stub.url}/pg/v1/status'
+            POOL_SIZE = workers
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            build_database(path, args.payments)
+            pool = ConnectionPool(path, max_size=2, pragmas=DatabaseConfig.pragmas())
+            gateway = PhonePePayment(mock_mode=False, config=BenchConfig)
+            reconciler = PaymentReconciler(pool, gateway, interval=300, page_size=args.page_size,
+                                           workers=workers, min_age=60)
+            result = reconciler.run_once()
+            conn = pool.acquire()
+            lag = reconcile_lag(conn, reconciler.min_age, reconciler.interval)
+            pool.release(conn)
+            pool.close_all()
+        print(f"workers={workers:<3d} {result['per_sec']:8.1f} checks/s  {result['seconds']:7.2f}s  "
+              f"pages={result['pages']:<3d} settled={result['applied']:<5d} still_pending={result['still_pending']:<5d} "
+              f"unavailable={result['unavailable']:<3d} lag_p95={result['lag_p95_seconds']}s  "
+              f"left pending={lag['pending']} due={lag['due']}")
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Messages/s of a fresh SMTP session per message vs the pooled client.
+
+Runs the local SMTP stub (stubs/smtp_stub.py) in-process. --connect-delay
+is added before every greeting, standing in for the TCP + TLS handshake and
+login round trips a remote provider costs; that is what the pool saves.
+
+    python benchmarks/bench_smtp.py --messages 200 --connect-delay 0.05
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BODY = '<p>Hello {n},</p><p>Your booking has been created.</p>' + '<p>Details</p>' * 40
+
+
+def run(name, send, messages, threads):
+    latencies = []
+
+    def one(n):
+        started = time.perf_counter()
+        send(f'client{n}@example.com', f'Booking {n}', BODY.format(n=n), True)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(one, range(messages)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {'name': name, 'per_sec': messages / elapsed, 'seconds': elapsed,
+            'p50_ms': latencies[len(latencies) // 2] * 1000, 'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1, help='concurrent senders')
+    parser.add_argument('--connect-delay', type=float, default=0.05, help='simulated handshake + login seconds')
+    parser.add_argument('--delay', type=float, default=0.0, help='simulated seconds per DATA reply')
+    parser.add_argument('--session-limit', type=int, default=0, help='stub closes a session after this many messages')
+    args = parser.parse_args()
+
+    import mailer
+    from config import EmailConfig
+    from stubs.smtp_stub import SMTPStub
+
+    stub = SMTPStub(port=0, delay=args.delay, connect_delay=args.connect_delay,
+                    session_limit=args.session_limit).start()
+
+    class BenchConfig(EmailConfig):
+        SMTP_SERVER = '127.0.0.1'
+        SMTP_PORT = stub.port
+        USE_TLS = False
+        EMAIL_ADDRESS = 'noreply@example.com'
+        EMAIL_PASSWORD = 'bench'
+        SMTP_POOL_SIZE = args.threads
+
+    pool = mailer.SMTPPool.from_config(BenchConfig)
+    profiles = [
+        ('fresh', lambda *message: mailer.send_email(*message, config=BenchConfig)),
+        ('pooled', pool.send),
+    ]
+
+    print(f"Messages: {args.messages}  Threads: {args.threads}  "
+          f"Connect delay: {args.connect_delay * 1000:.0f}ms  DATA delay: {args.delay * 1000:.0f}ms\n")
+    for name, send in profiles:
+        before = stub.stats()
+        result = run(name, send, args.messages, args.threads)
+        after = stub.stats()
+        print(f"{name:7s} {result['per_sec']:8.1f} msg/s  p50={result['p50_ms']:7.2f}ms p95={result['p95_ms']:7.2f}ms  "
+              f"sessions={after['connections'] - before['connections']:<5d} "
+              f"accepted={after['accepted'] - before['accepted']}")
+
+    # send_many: one call for the whole batch, as a broadcast would do
+    before = stub.stats()
+    started = time.perf_counter()
+    errors = [e for e in pool.send_many(
+        (f'client{n}@example.com', f'Booking {n}', BODY.format(n=n), True) for n in range(args.messages)
+    ) if e is not None]
+    elapsed = time.perf_counter() - started
+    after = stub.stats()
+    print(f"{'many':7s} {args.messages / elapsed:8.1f} msg/s  {'':31s}  "
+          f"sessions={after['connections'] - before['connections']:<5d} accepted={after['accepted'] - before['accepted']}"
+          f"  errors={len(errors)}")
+    print(f"\nPool: {pool.stats()}")
+    pool.close_all()
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
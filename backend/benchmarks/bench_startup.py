@@ -0,0 +1,69 @@
+"""Worker startup cost: full `import app` and the schema check on its own.
+
+Runs against a scratch copy of the database so the real file is untouched.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from migrations import ensure_schema, migrate
+
+
+def time_import(workdir, runs):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DATABASE_PATH=os.path.join(workdir, 'hmx.db'),
+               DB_CHECKPOINT_INTERVAL='0')
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import app'], cwd=workdir, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def time_call(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(label, samples):
+    print(f"{label:32s} median={statistics.median(samples) * 1000:8.2f} ms  "
+          f"min={min(samples) * 1000:8.2f} ms  max={max(samples) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default=os.path.join(BACKEND_DIR, 'hmx.db'))
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hmx.db')
+        shutil.copy(args.database, db_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(db_path)
+
+        report('schema check (ensure_schema)', time_call(lambda: ensure_schema(db_path), args.runs * 10))
+        report('migrate() with nothing pending', time_call(lambda: migrate(db_path), args.runs * 10))
+        report('python -c "import app"', time_import(tmp, args.runs))
+
+
+if __name__ == '__main__':
+    main()
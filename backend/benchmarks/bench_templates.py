@@ -0,0 +1,73 @@
+"""Render cost of the compiled templates vs the old str.replace loop.
+
+Renders every default template (from a freshly migrated scratch database)
+and one large generated template, reporting microseconds per render.
+
+    python benchmarks/bench_templates.py --number 20000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+VALUES = {
+    'name': 'Asha Raman', 'email': 'asha@example.com', 'password': 'Xy7kP2qLm9', 'otp': '482913',
+    'booking_id': 1042, 'location': '12 Example Street, Chennai', 'date': '2026-11-02',
+    'reason': 'Weather', 'applicant_name': 'Asha Raman', 'application_type': 'Pilot',
+    'admin_comments': 'Welcome!', 'reset_link': 'https://example.com/reset', 'user_role': 'pilot',
+}
+
+
+def legacy_render(subject, body, variables):
+    """The previous implementation: one str.replace per variable over subject and body"""
+    for key, value in variables.items():
+        subject = subject.replace(f"{{{{{key}}}}}", str(value))
+        body = body.replace(f"{{{{{key}}}}}", str(value))
+    return subject, body
+
+
+def load_templates():
+    from migrations import migrate
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'hmx.db')
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(path)
+        conn = sqlite3.connect(path)
+        rows = conn.execute('SELECT name, subject, body FROM email_templates ORDER BY name').fetchall()
+        conn.close()
+    # A newsletter-sized template: ~40 KB with 13 variables used throughout
+    body = ''.join(f'<p>Dear {{{{name}}}}, section {i}: booking {{{{booking_id}}}} at {{{{location}}}} '
+                   f'on {{{{date}}}}. Reason: {{{{reason}}}}.</p>' for i in range(300))
+    rows.append(('large (generated)', 'Update for {{name}}', body))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000, help='renders per template and method')
+    args = parser.parse_args()
+
+    from email_templates import EmailTemplate
+
+    print(f"{'template':22s} {'bytes':>7s} {'legacy us':>10s} {'compiled us':>12s} {'speedup':>8s}")
+    for name, subject, body in load_templates():
+        template = EmailTemplate(name, subject, body)
+        assert template.render(VALUES) == legacy_render(subject, body, VALUES), name
+        number = max(1, args.number // (50 if len(body) > 10000 else 1))
+        legacy = timeit.timeit(lambda: legacy_render(subject, body, VALUES), number=number) / number
+        compiled = timeit.timeit(lambda: template.render(VALUES), number=number) / number
+        print(f"{name:22s} {len(body):7d} {legacy * 1e6:10.2f} {compiled * 1e6:12.2f} {legacy / compiled:7.1f}x")
+
+    compile_time = timeit.timeit(lambda: EmailTemplate('large', subject, body), number=100) / 100
+    print(f"\nCompiling the large template once: {compile_time * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
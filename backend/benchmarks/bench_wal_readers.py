@@ -0,0 +1,132 @@
+"""Concurrent read throughput while a writer is busy, old vs tuned pragmas.
+
+Builds a scratch database shaped like `bookings`, then runs one writer
+(claim_booking-style UPDATE + COMMIT in a loop) next to N reader threads
+(admin orders-style SELECT) for each pragma profile.
+
+    python benchmarks/bench_wal_readers.py --rows 20000 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DatabaseConfig
+from db_pool import apply_pragmas
+
+STATUSES = ['pending', 'assigned', 'in_progress', 'completed', 'cancelled']
+
+PROFILES = {
+    # What init_db()/get_db() used before: sqlite defaults + 20s busy timeout
+    'default': [('journal_mode', 'DELETE'), ('busy_timeout', 20000)],
+    'tuned': DatabaseConfig.pragmas(),
+}
+
+
+def build_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            pilot_id INTEGER,
+            status TEXT,
+            location_address TEXT,
+            total_cost REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO bookings (user_id, pilot_id, status, location_address, total_cost) VALUES (?, ?, ?, ?, ?)',
+        (
+            (random.randint(1, 500), random.randint(1, 50), random.choice(STATUSES),
+             f'{i} Example Street', random.randint(1000, 90000))
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_profile(path, pragmas, readers, seconds, rows):
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+
+    def connect():
+        conn = sqlite3.connect(path, timeout=20.0, check_same_thread=False)
+        apply_pragmas(conn, pragmas)
+        return conn
+
+    def writer():
+        conn = connect()
+        while not stop.is_set():
+            try:
+                conn.execute('UPDATE bookings SET pilot_id = ?, status = ? WHERE id = ?',
+                             (random.randint(1, 50), random.choice(STATUSES), random.randint(1, rows)))
+                # Hold the write transaction briefly, like a handler doing work before commit
+                time.sleep(0.002)
+                conn.commit()
+                with lock:
+                    counts['writes'] += 1
+            except sqlite3.OperationalError:
+                conn.rollback()
+                with lock:
+                    counts['locked'] += 1
+        conn.close()
+
+    def reader():
+        conn = connect()
+        local = 0
+        while not stop.is_set():
+            try:
+                conn.execute('SELECT * FROM bookings WHERE status = ? ORDER BY created_at DESC LIMIT 50',
+                             (random.choice(STATUSES),)).fetchall()
+                local += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    counts['locked'] += 1
+        conn.close()
+        with lock:
+            counts['reads'] += local
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return {
+        'reads_per_sec': round(counts['reads'] / seconds, 1),
+        'writes_per_sec': round(counts['writes'] / seconds, 1),
+        'locked_errors': counts['locked'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"Rows: {args.rows}  Readers: {args.readers}  Duration: {args.seconds}s per profile\n")
+    for name, pragmas in PROFILES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            build_database(path, args.rows)
+            result = run_profile(path, pragmas, args.readers, args.seconds, args.rows)
+        print(f"{name:8s} reads/s={result['reads_per_sec']:>10}  writes/s={result['writes_per_sec']:>8}  "
+              f"locked={result['locked_errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import app_logging
+
+logger = app_logging.get_logger('circuit_breaker')
+
+
+class CircuitOpen(RuntimeError):
+    """The breaker is open; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency keeps failing.
+
+    closed:    calls go through; `failure_threshold` consecutive failures open it
+    open:      calls are rejected for `reset_timeout` seconds
+    half_open: one trial call goes through; success closes, failure re-opens
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._opens = 0
+        self._rejected = 0
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go through now"""
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = 'half_open'
+                self._trial_running = False
+            if self._state == 'closed':
+                return
+            if self._state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return
+            self._rejected += 1
+        raise CircuitOpen(f'{self.name} circuit is open')
+
+    def record_success(self):
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    self._opens += 1
+                    logger.warning('⚠️  %s circuit opened after %s consecutive failures', self.name, self._failures)
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'opens': self._opens,
+                'rejected': self._rejected,
+                'retry_in_seconds': round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+                if self._state == 'open' else 0.0
+            }
@@ -1,5 +1,155 @@
 import os
 
+# Read .env before the classes below look at os.environ (app.py imports this module first)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Database Configuration
+class DatabaseConfig:
+    PATH = os.getenv('DATABASE_PATH', 'hmx.db')
+
+    # Connections kept open per worker process
+    POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+    # Seconds sqlite waits on a locked database before raising
+    BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', '20'))
+    # Seconds a request waits for a free pooled connection
+    POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', '30'))
+    # Let a worker run pending migrations itself if `python migrations.py` was skipped
+    AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() == 'true'
+
+    # Pragma profile applied to every connection
+    JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+    SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+    MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes
+    CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '-32768'))  # negative = KiB, i.e. 32 MB
+    TEMP_STORE = os.getenv('DB_TEMP_STORE', 'MEMORY')
+
+    # WAL checkpoints run in the background; 0 disables the scheduler
+    CHECKPOINT_INTERVAL = float(os.getenv('DB_CHECKPOINT_INTERVAL', '60'))
+    # Pages left in the WAL after a passive checkpoint that trigger a TRUNCATE
+    CHECKPOINT_TRUNCATE_PAGES = int(os.getenv('DB_CHECKPOINT_TRUNCATE_PAGES', '4000'))
+    # Seconds that TRUNCATE waits for readers and writers before it is skipped until the next pass
+    CHECKPOINT_TRUNCATE_TIMEOUT = float(os.getenv('DB_CHECKPOINT_TRUNCATE_TIMEOUT', '0.2'))
+
+    @classmethod
+    def pragmas(cls):
+        """Ordered (name, value) pairs; journal_mode must come first"""
+        return [
+            ('journal_mode', cls.JOURNAL_MODE),
+            ('synchronous', cls.SYNCHRONOUS),
+            ('busy_timeout', int(cls.BUSY_TIMEOUT * 1000)),
+            ('mmap_size', cls.MMAP_SIZE),
+            ('cache_size', cls.CACHE_SIZE),
+            ('temp_store', cls.TEMP_STORE),
+        ]
+
+# Logging Configuration (see app_logging.py)
+class LoggingConfig:
+    # DEBUG adds per-request traces: token checks, request payloads, tracebacks
+    LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # 'text' or 'json' (one object per line)
+    FORMAT = os.getenv('LOG_FORMAT', 'text')
+    # Records buffered per worker before new ones are dropped rather than blocking a request
+    QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+# Request Metrics Configuration (see request_metrics.py)
+class MetricsConfig:
+    # Time every request and its SQL; false removes the hooks entirely
+    ENABLED = os.getenv('REQUEST_METRICS', 'true').lower() == 'true'
+    # Seconds of recent requests the p50/p95/p99 in /api/admin/metrics cover
+    WINDOW = float(os.getenv('METRICS_WINDOW', '300'))
+    # Add a Server-Timing header (db, app, total) to every response
+    SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'true').lower() == 'true'
+
+# Slow-Query Log Configuration (see slow_queries.py)
+class SlowQueryConfig:
+    # Statements taking at least this long (execute plus fetches) are logged; 0 turns the log off
+    THRESHOLD_MS = float(os.getenv('SLOW_QUERY_MS', '50'))
+    # Capture EXPLAIN QUERY PLAN for each new slow statement
+    EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    # Statements returned by /api/admin/slow-queries unless ?limit= says otherwise
+    TOP_N = int(os.getenv('SLOW_QUERY_TOP', '20'))
+
+# Authentication Configuration
+class AuthConfig:
+    # Seconds a token's account row is reused before it is read again; 0 disables the cache
+    PRINCIPAL_CACHE_TTL = float(os.getenv('AUTH_PRINCIPAL_CACHE_TTL', '30'))
+    # Accounts kept per worker process (least recently used are dropped first)
+    PRINCIPAL_CACHE_SIZE = int(os.getenv('AUTH_PRINCIPAL_CACHE_SIZE', '1024'))
+
+    # werkzeug method and cost for new hashes, e.g. scrypt:32768:8:1 or pbkdf2:sha256:600000;
+    # older hashes are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    # Hashing processes per worker; 0 hashes on the request thread
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    # Hashes queued or running per worker before new ones wait (then 503). Above
+    # PASSWORD_HASH_WORKERS they only queue behind the pool, hence the default. It only turns
+    # logins away when it is below gunicorn --threads, e.g. 1 with --threads 2 always leaves a
+    # thread for other requests; at or above --threads the thread count is the only limit
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '2'))
+    # Seconds to wait for a slot before answering 503
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '2'))
+
+# One-Time Code Configuration (see otp_store.py)
+class OtpConfig:
+    # Seconds a code stays valid
+    TTL = float(os.getenv('OTP_TTL', '600'))
+    # Seconds before the same email can be sent another code
+    RESEND_COOLDOWN = float(os.getenv('OTP_RESEND_COOLDOWN', '60'))
+    # Codes one email can be sent per OTP_WINDOW seconds
+    MAX_SENDS = int(os.getenv('OTP_MAX_SENDS', '5'))
+    WINDOW = float(os.getenv('OTP_WINDOW', '3600'))
+    # Wrong guesses before a code stops working
+    MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', '5'))
+    # Seconds between sweeps of expired rows; 0 leaves it to `python otp_store.py --sweep`
+    SWEEP_INTERVAL = float(os.getenv('OTP_SWEEP_INTERVAL', '300'))
+
+# Email Configuration
+class EmailConfig:
+    SMTP_SERVER = os.getenv('SMTP_SERVER')  # No default
+    SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+    EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
+    EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')  # Must be set in env
+    USE_TLS = os.getenv('USE_TLS', 'true').lower() == 'true'
+    # Seconds to wait for the SMTP server to connect or reply
+    SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '30'))
+    # Authenticated sessions kept open per process and reused across messages
+    SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+    # A session idle longer than this is checked with NOOP before reuse
+    SMTP_NOOP_AFTER = float(os.getenv('SMTP_NOOP_AFTER', '10'))
+    # ...and one idle longer than this is closed (servers drop idle clients)
+    SMTP_MAX_IDLE = float(os.getenv('SMTP_MAX_IDLE', '120'))
+    # Messages per session before it is replaced (many servers cap this)
+    SMTP_MAX_MESSAGES = int(os.getenv('SMTP_MAX_MESSAGES', '100'))
+
+    # Seconds a compiled email template is reused before it is read again; 0 disables the cache
+    TEMPLATE_CACHE_TTL = float(os.getenv('EMAIL_TEMPLATE_CACHE_TTL', '300'))
+
+    # Broadcast messages per second across all senders, enforced as they claim them;
+    # each job is rendered and queued in pages of BATCH_SIZE
+    BROADCAST_RATE = float(os.getenv('EMAIL_BROADCAST_RATE', '1'))
+    BROADCAST_BATCH_SIZE = int(os.getenv('EMAIL_BROADCAST_BATCH_SIZE', '200'))
+
+    # Who drains email_outbox: 'thread' runs a sender in every app worker,
+    # 'external' leaves it to a separate `python email_outbox.py` process
+    OUTBOX_SENDER = os.getenv('EMAIL_OUTBOX_SENDER', 'thread')
+    # Seconds between polls when the queue is idle
+    OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '2'))
+    # Messages claimed per poll
+    OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '20'))
+    # Delivery attempts before a message is marked failed
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '8'))
+    # Retry n waits RETRY_BASE * 2**(n-1) seconds (+/- 25% jitter), capped at RETRY_MAX
+    OUTBOX_RETRY_BASE = float(os.getenv('EMAIL_OUTBOX_RETRY_BASE', '30'))
+    OUTBOX_RETRY_MAX = float(os.getenv('EMAIL_OUTBOX_RETRY_MAX', '3600'))
+    # Seconds a claimed message may stay 'sending' before it is handed out again (sender died mid-send)
+    OUTBOX_LEASE = float(os.getenv('EMAIL_OUTBOX_LEASE', '300'))
+    # Days sent messages are kept for the latency stats
+    OUTBOX_RETENTION_DAYS = float(os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', '7'))
+
 # PhonePe Configuration
 class PhonePeConfig:
     # Sandbox/Test Environment - Updated with working credentials
@@ -16,6 +166,40 @@ class PhonePeConfig:
     STATUS_API = f"{BASE_URL}/pg/v1/status"
     REFUND_API = f"{BASE_URL}/pg/v1/refund"
 
+    # Answer with simulated gateway responses instead of calling PhonePe
+    MOCK_MODE = os.getenv('PHONEPE_MOCK_MODE', 'true').lower() == 'true'
+    # Seconds to open a connection, and to wait for a response once connected
+    CONNECT_TIMEOUT = float(os.getenv('PHONEPE_CONNECT_TIMEOUT', '3'))
+    READ_TIMEOUT = float(os.getenv('PHONEPE_READ_TIMEOUT', '10'))
+    # Keep-alive connections per process; also the most gateway calls in flight at once,
+    # further calls fail fast instead of queueing behind a slow gateway
+    POOL_SIZE = int(os.getenv('PHONEPE_POOL_SIZE', '4'))
+    # Consecutive failures (timeouts, connection errors, 5xx) that open the circuit,
+    # and seconds it stays open before one trial call is let through
+    CIRCUIT_FAILURES = int(os.getenv('PHONEPE_CIRCUIT_FAILURES', '5'))
+    CIRCUIT_RESET = float(os.getenv('PHONEPE_CIRCUIT_RESET', '30'))
+
+    # Who processes recorded callbacks: 'thread' runs a processor in every app worker,
+    # 'external' leaves it to a separate `python payment_events.py` process
+    EVENTS_PROCESSOR = os.getenv('PAYMENT_EVENTS_PROCESSOR', 'thread')
+    EVENTS_POLL_INTERVAL = float(os.getenv('PAYMENT_EVENTS_POLL_INTERVAL', '1'))
+    EVENTS_BATCH_SIZE = int(os.getenv('PAYMENT_EVENTS_BATCH_SIZE', '20'))
+    # Status checks per event before it is marked failed; retry n waits RETRY_BASE * 2**(n-1) s, capped at RETRY_MAX
+    EVENTS_MAX_ATTEMPTS = int(os.getenv('PAYMENT_EVENTS_MAX_ATTEMPTS', '10'))
+    EVENTS_RETRY_BASE = float(os.getenv('PAYMENT_EVENTS_RETRY_BASE', '15'))
+    EVENTS_RETRY_MAX = float(os.getenv('PAYMENT_EVENTS_RETRY_MAX', '1800'))
+    # Seconds a claimed event may stay 'processing' before it is handed out again
+    EVENTS_LEASE = float(os.getenv('PAYMENT_EVENTS_LEASE', '120'))
+
+    # Pending payments are re-checked with PhonePe every RECONCILE_INTERVAL seconds (0 disables the
+    # reconciler thread), RECONCILE_PAGE_SIZE per transaction, RECONCILE_WORKERS status checks at once
+    # (keep below PHONEPE_POOL_SIZE so request threads still get a connection); payments younger
+    # than RECONCILE_MIN_AGE seconds are left to their callback
+    RECONCILE_INTERVAL = float(os.getenv('PAYMENT_RECONCILE_INTERVAL', '300'))
+    RECONCILE_PAGE_SIZE = int(os.getenv('PAYMENT_RECONCILE_PAGE_SIZE', '100'))
+    RECONCILE_WORKERS = int(os.getenv('PAYMENT_RECONCILE_WORKERS', '2'))
+    RECONCILE_MIN_AGE = float(os.getenv('PAYMENT_RECONCILE_MIN_AGE', '120'))
+
 # Alternative Sandbox Configuration (if the above doesn't work)
 class PhonePeConfigAlt:
     MERCHANT_ID = os.getenv('PHONEPE_MERCHANT_ID', 'PGTESTPAYUAT')
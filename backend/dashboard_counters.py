@@ -0,0 +1,126 @@
+"""Admin dashboard counters kept up to date by triggers.
+
+dashboard_counters holds one (count, total) row per metric and bucket, for
+example ('bookings_by_status', 'in_progress') or
+('payments_completed_by_month', '2025-03'). Triggers on bookings, videos
+and payments (migration 9) move a row between buckets as it is written, so
+the dashboard reads a handful of primary-key rows instead of scanning the
+tables on every page load.
+
+METRICS below is also how the counters are rebuilt: each metric's query
+recomputes it from scratch.
+
+    python dashboard_counters.py --check     # compare the counters with fresh counts
+    python dashboard_counters.py --rebuild   # recompute every counter from the tables
+"""
+import argparse
+import json
+import sqlite3
+import sys
+
+from config import DatabaseConfig
+
+# metric -> query returning (bucket, count, total) from the source table
+METRICS = {
+    'bookings_by_status': '''
+        SELECT COALESCE(status, ''), COUNT(*), 0 FROM bookings GROUP BY 1
+    ''',
+    'bookings_paid_by_month': '''
+        SELECT COALESCE(strftime('%Y-%m', payment_date), ''), COUNT(*), ROUND(SUM(COALESCE(payment_amount, 0)), 2)
+        FROM bookings WHERE payment_status = 'completed' GROUP BY 1
+    ''',
+    'videos_by_status': '''
+        SELECT COALESCE(status, '') || '/' || COALESCE(review_type, ''), COUNT(*), 0 FROM videos GROUP BY 1
+    ''',
+    'payments_completed_by_month': '''
+        SELECT COALESCE(strftime('%Y-%m', created_at), ''), COUNT(*), ROUND(SUM(COALESCE(amount, 0)), 2)
+        FROM payments WHERE status = 'completed' GROUP BY 1
+    ''',
+}
+
+
+def counts(conn, metric):
+    """{bucket: count} for one metric"""
+    return {
+        row[0]: row[1]
+        for row in conn.execute('SELECT bucket, count FROM dashboard_counters WHERE metric = ?', (metric,))
+    }
+
+
+def total(conn, metric, bucket):
+    """Summed amount of one bucket, 0 when it has none"""
+    row = conn.execute('SELECT total FROM dashboard_counters WHERE metric = ? AND bucket = ?',
+                       (metric, bucket)).fetchone()
+    return row[0] if row else 0
+
+
+def _fresh(conn):
+    return {
+        (metric, row[0]): (row[1], row[2])
+        for metric, query in METRICS.items()
+        for row in conn.execute(query)
+    }
+
+
+def check(conn):
+    """Buckets whose counter differs from a fresh count (empty when consistent)"""
+    held = {
+        (row[0], row[1]): (row[2], row[3])
+        for row in conn.execute('SELECT metric, bucket, count, total FROM dashboard_counters')
+    }
+    fresh = _fresh(conn)
+    problems = []
+    for key in sorted(set(held) | set(fresh)):
+        count, amount = held.get(key, (0, 0))
+        expected_count, expected_amount = fresh.get(key, (0, 0))
+        if count != expected_count or abs(amount - expected_amount) > 0.005:
+            problems.append({'metric': key[0], 'bucket': key[1], 'counter': [count, amount],
+                             'expected': [expected_count, expected_amount]})
+    return problems
+
+
+def rebuild(conn):
+    """Recompute every counter from the tables; the caller commits. Returns the bucket count."""
+    conn.execute('DELETE FROM dashboard_counters')
+    fresh = _fresh(conn)
+    conn.executemany(
+        'INSERT INTO dashboard_counters (metric, bucket, count, total) VALUES (?, ?, ?, ?)',
+        [(metric, bucket, count, amount) for (metric, bucket), (count, amount) in fresh.items()]
+    )
+    return len(fresh)
+
+
+def main():
+    from migrations import ensure_schema
+
+    parser = argparse.ArgumentParser(description='Verify or rebuild the admin dashboard counters')
+    parser.add_argument('--database', default=DatabaseConfig.PATH)
+    parser.add_argument('--check', action='store_true', help='compare the counters with fresh counts')
+    parser.add_argument('--rebuild', action='store_true', help='recompute every counter from the tables')
+    args = parser.parse_args()
+    if not args.check and not args.rebuild:
+        parser.error('pass --check and/or --rebuild')
+
+    ensure_schema(args.database, auto_migrate=DatabaseConfig.AUTO_MIGRATE)
+    conn = sqlite3.connect(args.database, timeout=DatabaseConfig.BUSY_TIMEOUT, isolation_level=None)
+    try:
+        if args.check:
+            problems = check(conn)
+            for problem in problems:
+                print(json.dumps(problem))
+            print(f"{'❌' if problems else '✅'} {len(problems)} dashboard counter differences")
+            if problems and not args.rebuild:
+                return 1
+        if args.rebuild:
+            # Under a write lock, so no trigger moves a counter between the scan and the swap
+            conn.execute('BEGIN IMMEDIATE')
+            buckets = rebuild(conn)
+            conn.execute('COMMIT')
+            print(f"✅ Rebuilt {buckets} dashboard counters")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,374 @@
+"""Secondary indexes for the hot filter, join and sort columns.
+
+Index sets are versioned: once a set has shipped it is never edited, a new
+set is appended instead, so any database can be brought forward one set at
+a time. Composite indexes follow the exact WHERE ... ORDER BY shapes used by
+/api/admin/orders, /api/pilot/* and /api/editor/*.
+
+The plan check takes its statements from the code itself, never from
+copies: every admin ListQuery is built for each sort, order and filter
+(list_query_cases), and the pilot, editor, client and dashboard endpoints
+in HOT_ENDPOINTS are requested through the test client while a pool
+observer records what they run (endpoint_cases). tests/test_db_indexes.py
+runs it on a seeded scratch database.
+
+    python db_indexes.py            # create missing indexes in hmx.db
+    python db_indexes.py --check    # EXPLAIN QUERY PLAN every hot query, on a copy of hmx.db
+"""
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+INDEX_SETS = [
+    (1, [
+        # Client, pilot and editor order lists: owner = ? ORDER BY created_at DESC
+        ('idx_bookings_user_created', 'bookings', 'user_id, created_at'),
+        ('idx_bookings_pilot_created', 'bookings', 'pilot_id, created_at'),
+        ('idx_bookings_editor_created', 'bookings', 'editor_id, created_at'),
+        ('idx_bookings_referral', 'bookings', 'referral_id'),
+        # Pilot/editor completed + cancelled tabs: owner = ? AND status ... ORDER BY updated_at DESC
+        ('idx_bookings_pilot_status_updated', 'bookings', 'pilot_id, status, updated_at'),
+        ('idx_bookings_editor_status_updated', 'bookings', 'editor_id, status, updated_at'),
+        # Earnings: owner = ? AND status = 'completed' ORDER BY completed_date DESC
+        ('idx_bookings_pilot_status_completed', 'bookings', 'pilot_id, status, completed_date'),
+        ('idx_bookings_editor_status_completed', 'bookings', 'editor_id, status, completed_date'),
+        # Admin orders tabs and dashboard counts: status = ? ORDER BY created_at DESC
+        ('idx_bookings_status_created', 'bookings', 'status, created_at'),
+        ('idx_bookings_created', 'bookings', 'created_at'),
+        ('idx_bookings_payment_status_date', 'bookings', 'payment_status, payment_date'),
+
+        ('idx_video_reviews_order_type', 'video_reviews', 'order_id, submission_type, submitted_date'),
+        ('idx_video_reviews_pilot_type', 'video_reviews', 'pilot_id, submission_type, submitted_date'),
+        ('idx_video_reviews_editor_type', 'video_reviews', 'editor_id, submission_type, submitted_date'),
+        ('idx_video_reviews_type_submitted', 'video_reviews', 'submission_type, submitted_date'),
+        ('idx_video_reviews_submitted', 'video_reviews', 'submitted_date'),
+
+        ('idx_payments_merchant_txn', 'payments', 'merchant_transaction_id'),
+        ('idx_payments_booking', 'payments', 'booking_id'),
+        ('idx_payments_status_created', 'payments', 'status, created_at'),
+        ('idx_payments_created', 'payments', 'created_at'),
+
+        ('idx_otp_verifications_email', 'otp_verifications', 'email, created_at'),
+
+        ('idx_users_role_created', 'users', 'role, created_at'),
+        ('idx_pilots_created', 'pilots', 'created_at'),
+        ('idx_editors_created', 'editors', 'created_at'),
+        ('idx_referrals_created', 'referrals', 'created_at'),
+
+        ('idx_videos_editor_created', 'videos', 'editor_id, created_at'),
+        ('idx_videos_status_review', 'videos', 'status, review_type'),
+        ('idx_videos_created', 'videos', 'created_at'),
+        ('idx_cancellations_booking', 'cancellations', 'booking_id'),
+        ('idx_cancellations_created', 'cancellations', 'created_at'),
+        ('idx_inquiries_created', 'inquiries', 'created_at'),
+        ('idx_pre_list_created', 'pre_list', 'created_at'),
+
+        ('idx_pilot_applications_created', 'pilot_applications', 'created_at'),
+        ('idx_editor_applications_created', 'editor_applications', 'created_at'),
+        ('idx_referral_applications_created', 'referral_applications', 'created_at'),
+        ('idx_business_client_applications_created', 'business_client_applications', 'created_at'),
+    ]),
+    (2, [
+        # Admin ListQuery sorts and filters the plan check found unindexed
+        ('idx_users_created', 'users', 'created_at'),
+        ('idx_pilots_name', 'pilots', 'name'),
+        ('idx_pilots_status_name', 'pilots', 'status, name'),
+        ('idx_editors_name', 'editors', 'name'),
+        ('idx_editors_status_name', 'editors', 'status, name'),
+        ('idx_referrals_name', 'referrals', "COALESCE(name, '')"),
+        ('idx_referrals_status_created', 'referrals', 'status, created_at'),
+        ('idx_bookings_updated', 'bookings', "COALESCE(updated_at, '')"),
+        # Earnings export: pilot_earnings IS NOT NULL, counted and paged by created_at
+        ('idx_bookings_earnings_created', 'bookings', 'pilot_earnings, created_at'),
+        ('idx_cancellations_status_created', 'cancellations', 'status, created_at'),
+        ('idx_video_reviews_created', 'video_reviews', 'created_at'),
+        ('idx_video_reviews_status_submitted', 'video_reviews', 'status, submitted_date'),
+        ('idx_pilot_applications_status_created', 'pilot_applications', 'status, created_at'),
+        ('idx_editor_applications_status_created', 'editor_applications', 'status, created_at'),
+        ('idx_referral_applications_status_created', 'referral_applications', 'status, created_at'),
+        ('idx_business_client_applications_status_created', 'business_client_applications', 'status, created_at'),
+    ]),
+]
+
+INDEX_SET_VERSION = INDEX_SETS[-1][0]
+
+
+def create_indexes(cursor, up_to=None):
+    """Create every index in the sets up to `up_to` (default: latest). Idempotent."""
+    created = 0
+    for version, indexes in INDEX_SETS:
+        if up_to is not None and version > up_to:
+            break
+        for name, table, columns in indexes:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+            created += 1
+    return created
+
+
+# Read-only requests whose statements the plan check records: (role, method, path, json body).
+# role None is anonymous; {order_id} is filled with a booking the pilot and editor share.
+HOT_ENDPOINTS = [
+    (None, 'POST', '/api/auth/login', {'email': 'nobody@example.com', 'password': 'x'}),
+    (None, 'POST', '/api/auth/verify-otp', {'email': 'nobody@example.com', 'otp': '000000'}),
+    ('client', 'GET', '/api/bookings', None),
+    ('pilot', 'GET', '/api/bookings', None),
+    ('pilot', 'GET', '/api/pilot/all-orders', None),
+    ('pilot', 'GET', '/api/pilot/assigned-orders', None),
+    ('pilot', 'GET', '/api/pilot/completed-orders', None),
+    ('pilot', 'GET', '/api/pilot/cancelled-orders', None),
+    ('pilot', 'GET', '/api/pilot/final-review', None),
+    ('pilot', 'GET', '/api/pilot/earnings', None),
+    ('pilot', 'GET', '/api/pilot/video-submissions', None),
+    ('pilot', 'GET', '/api/pilot/submission-history/{order_id}', None),
+    ('editor', 'GET', '/api/editor/assigned-orders', None),
+    ('editor', 'GET', '/api/editor/ongoing-orders', None),
+    ('editor', 'GET', '/api/editor/completed-orders', None),
+    ('editor', 'GET', '/api/editor/cancelled-orders', None),
+    ('editor', 'GET', '/api/editor/earnings', None),
+    ('editor', 'GET', '/api/editor/video-submissions', None),
+    ('editor', 'GET', '/api/editor/submission-history/{order_id}', None),
+    ('editor', 'GET', '/api/editor/videos', None),
+    ('admin', 'GET', '/api/admin/dashboard/stats', None),
+    ('admin', 'GET', '/api/admin/dashboard/activities', None),
+    ('admin', 'GET', '/api/admin/videos', None),
+]
+
+# Raw filter values tried in turn until one parses and produces a WHERE clause
+FILTER_SAMPLES = ('1', '2024-01-01', 'pending', 'true')
+
+
+class QueryRecorder:
+    """Pool observer keeping each distinct statement run under a label, with its first parameters"""
+
+    def __init__(self):
+        self.label = None
+        self.statements = {}
+
+    def query(self, sql, params, seconds):
+        if self.label is not None and params is not None:
+            self.statements.setdefault(sql, (self.label, params))
+
+    def rows(self, count, seconds):
+        pass
+
+    def cases(self):
+        return [(label, sql, params) for sql, (label, params) in self.statements.items()]
+
+
+def _filter_sample(flt):
+    """(raw value, bound params) of the first sample the filter turns into a clause, else (None, None)"""
+    from list_query import ListQueryError
+
+    for raw in FILTER_SAMPLES:
+        try:
+            sql, params = flt.clause(raw)
+        except ListQueryError:
+            continue
+        if sql:
+            return raw, params
+    return None, None
+
+
+def _is_substring_match(params):
+    return any(isinstance(value, str) and value.startswith('%') for value in params)
+
+
+def list_query_cases(query):
+    """(label, sql, params) from ListQuery.build: every sort and order, unfiltered and per filter, two pages"""
+    from list_query import encode_cursor
+
+    variants = [('', {}, True)]
+    for name, flt in query.filters.items():
+        raw, bound = _filter_sample(flt)
+        if raw is not None:
+            # A LIKE '%x%' match cannot use an index, so its count reads every row by design
+            variants.append((f' {name}={raw}', {name: raw}, not _is_substring_match(bound)))
+
+    cases = []
+    for suffix, filters, counted in variants:
+        if counted:
+            sql, params = query.count_sql(filters)
+            cases.append((f'{query.name} count{suffix}', sql, params))
+        for sort in query.sorts:
+            for order in ('desc', 'asc'):
+                args = dict(filters, sort=sort, order=order, limit='50')
+                sql, params, _ = query.build(args)
+                cases.append((f'{query.name} by {sort} {order}{suffix}', sql, params))
+                args['cursor'] = encode_cursor(sort, order, '2024-01-01', 1)
+                sql, params, _ = query.build(args)
+                cases.append((f'{query.name} by {sort} {order}{suffix} next page', sql, params))
+    return cases
+
+
+def endpoint_cases(hmx, accounts, order_id, endpoints=HOT_ENDPOINTS):
+    """Request each endpoint through hmx's test client and return (cases, [(path, status)] of failed requests).
+
+    accounts maps role -> account id to sign a token for.
+    """
+    import jwt
+    import otp_store
+    from datetime import datetime, timedelta
+
+    expires = datetime.utcnow() + timedelta(hours=1)
+    tokens = {role: jwt.encode({'user_id': account_id, 'role': role, 'exp': expires}, hmx.app.config['SECRET_KEY'])
+              for role, account_id in accounts.items()}
+    recorder = QueryRecorder()
+    client = hmx.app.test_client()
+    failed = []
+    hmx.db_pool.add_observer(recorder)
+    try:
+        for role, method, path, body in endpoints:
+            if role and role not in tokens:
+                continue
+            path = path.format(order_id=order_id)
+            recorder.label = f'{method} {path}' + (f' as {role}' if role else '')
+            headers = {'Authorization': f'Bearer {tokens[role]}'} if role else {}
+            response = client.open(path, method=method, headers=headers, json=body)
+            response.get_data()
+            response.close()
+            if response.status_code >= 500 or (role and response.status_code != 200):
+                failed.append((recorder.label, response.status_code))
+        recorder.label = 'otp sweep'
+        conn = hmx.db_pool.acquire()
+        try:
+            otp_store.sweep(conn)
+        finally:
+            hmx.db_pool.release(conn)
+    finally:
+        recorder.label = None
+        hmx.db_pool.remove_observer(recorder)
+    return recorder.cases(), failed
+
+
+def hot_query_cases(hmx, accounts, order_id):
+    """Every admin ListQuery expanded by list_query_cases, plus the statements HOT_ENDPOINTS run"""
+    conn = hmx.db_pool.acquire()
+    try:
+        cases = [case for query in hmx.list_queries(conn).values() for case in list_query_cases(query)]
+    finally:
+        hmx.db_pool.release(conn)
+    recorded, failed = endpoint_cases(hmx, accounts, order_id)
+    return cases + recorded, failed
+
+
+def explain(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()]
+
+
+def is_full_scan(detail, views=()):
+    """A plan step that walks a whole table without any index.
+
+    Scanning a view only reads the rows its (separately planned) branches produce.
+    """
+    if not detail.startswith('SCAN '):
+        return False
+    if detail.split()[1] in views:
+        return False
+    return 'INDEX' not in detail and 'CONSTANT ROW' not in detail
+
+
+def reads_every_row(sql, details):
+    """False when a scan can stop early: a LIMITed statement read in its ORDER BY order.
+
+    That is how a keyset page reads (see ListQuery.build): the table is walked
+    in rowid or index order and the walk ends after limit + 1 rows. Without a
+    LIMIT, or when the rows go through a temp B-tree to be sorted, every row
+    is read.
+    """
+    if not re.search(r'\bLIMIT\b', sql, re.I):
+        return True
+    return any('USE TEMP B-TREE' in detail for detail in details)
+
+
+def check_query_plans(conn, queries):
+    """Return [(label, detail)] for every hot query step that scans a whole table"""
+    views = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view'")}
+    problems = []
+    for label, sql, params in queries:
+        try:
+            details = explain(conn, sql, params)
+        except sqlite3.Error as e:
+            problems.append((label, f'cannot plan: {e}'))
+            continue
+        if not reads_every_row(sql, details):
+            continue
+        for detail in details:
+            if is_full_scan(detail, views):
+                problems.append((label, detail))
+    return problems
+
+
+def sample_accounts(conn):
+    """{role: first account id} and a booking with a pilot and an editor, to request HOT_ENDPOINTS as"""
+    def first(sql):
+        row = conn.execute(sql).fetchone()
+        return row[0] if row else None
+
+    accounts = {
+        'admin': first("SELECT id FROM users WHERE role = 'admin' ORDER BY id LIMIT 1"),
+        'client': first("SELECT id FROM users WHERE role = 'client' ORDER BY id LIMIT 1"),
+        'pilot': first('SELECT pilot_id FROM bookings WHERE pilot_id IS NOT NULL ORDER BY editor_id IS NULL, id LIMIT 1')
+                 or first('SELECT id FROM pilots ORDER BY id LIMIT 1'),
+        'editor': first('SELECT editor_id FROM bookings WHERE editor_id IS NOT NULL ORDER BY pilot_id IS NULL, id LIMIT 1')
+                  or first('SELECT id FROM editors ORDER BY id LIMIT 1'),
+    }
+    order_id = first('SELECT id FROM bookings ORDER BY editor_id IS NULL, pilot_id IS NULL, id LIMIT 1') or 1
+    return {role: account_id for role, account_id in accounts.items() if account_id is not None}, order_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and verify hmx.db secondary indexes')
+    parser.add_argument('--database', default='hmx.db')
+    parser.add_argument('--check', action='store_true', help='fail if any hot query plan contains a full scan')
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args()
+
+    if not args.check:
+        conn = sqlite3.connect(args.database)
+        count = create_indexes(conn.cursor())
+        conn.commit()
+        print(f"✅ Index set v{INDEX_SET_VERSION} ensured ({count} indexes)")
+        conn.close()
+        return 0
+
+    # The endpoints run against a copy (the OTP sweep and failed-login bookkeeping write)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'hmx.db')
+        shutil.copyfile(args.database, database)
+        os.environ.update(DATABASE_PATH=database, DB_CHECKPOINT_INTERVAL='0', EMAIL_OUTBOX_SENDER='external',
+                          PAYMENT_EVENTS_PROCESSOR='external', PAYMENT_RECONCILE_INTERVAL='0',
+                          OTP_SWEEP_INTERVAL='0')
+        import app as hmx
+
+        conn = sqlite3.connect(database)
+        accounts, order_id = sample_accounts(conn)
+        queries, failed = hot_query_cases(hmx, accounts, order_id)
+        if args.verbose:
+            for label, sql, params in queries:
+                print(f"{label}:")
+                try:
+                    for detail in explain(conn, sql, params):
+                        print(f"    {detail}")
+                except sqlite3.Error as e:
+                    print(f"    cannot plan: {e}")
+        problems = check_query_plans(conn, queries)
+        conn.close()
+        hmx.db_pool.close_all()
+
+    for label, status in failed:
+        print(f"⚠️  {label} answered {status}; its statements may be missing from the check")
+    if problems:
+        for label, detail in problems:
+            print(f"❌ {label}: {detail}")
+        return 1
+    print(f"✅ {len(queries)} hot queries checked, no full table scans")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
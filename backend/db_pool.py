@@ -0,0 +1,349 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import app_logging
+
+logger = app_logging.get_logger('db_pool')
+
+
+def apply_pragmas(conn, pragmas):
+    """Apply an ordered list of (name, value) pragmas to a connection"""
+    for name, value in pragmas or ():
+        conn.execute(f'PRAGMA {name}={value}')
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection became free in time"""
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports statement and fetch timings to its pool's observers.
+
+    An observer has query(sql, params, seconds) for each execute and
+    rows(count, seconds) for each fetch; with none registered the cursor
+    adds a single attribute check per call.
+    """
+
+    def _observers(self):
+        pool = getattr(self.connection, '_pool', None)
+        return pool.observers if pool is not None else ()
+
+    def execute(self, sql, parameters=()):
+        observers = self._observers()
+        if not observers:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            for observer in observers:
+                observer.query(sql, parameters, elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        observers = self._observers()
+        if not observers:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            for observer in observers:
+                observer.query(sql, None, elapsed)
+
+    def _fetched(self, fetch, *args):
+        observers = self._observers()
+        if not observers:
+            return fetch(*args)
+        started = time.perf_counter()
+        result = fetch(*args)
+        elapsed = time.perf_counter() - started
+        count = len(result) if isinstance(result, list) else int(result is not None)
+        for observer in observers:
+            observer.rows(count, elapsed)
+        return result
+
+    def fetchone(self):
+        return self._fetched(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetched(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetched(super().fetchall)
+
+    def __next__(self):
+        row = self._fetched(super().fetchone)
+        if row is None:
+            raise StopIteration
+        return row
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that goes back to its pool instead of closing"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._held = False
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute* use a plain cursor; go through ours so statements are observed
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def hold(self):
+        """Keep the connection for the rest of the request; close() becomes a no-op"""
+        self._held = True
+
+    def close(self):
+        if self._held:
+            # Released by the app teardown once the request is finished
+            return
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+    def discard(self):
+        """Really close the underlying sqlite connection"""
+        self._pool = None
+        self._held = False
+        super().close()
+
+
+class ConnectionPool:
+    """Bounded pool of pre-configured SQLite connections for one worker process"""
+
+    def __init__(self, database, max_size=8, timeout=20.0, acquire_timeout=30.0, pragmas=None):
+        self.database = database
+        self.pragmas = list(pragmas or [])
+        self.max_size = max_size
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        # Notified of every statement and fetch on this pool's connections (see InstrumentedCursor)
+        self.observers = ()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def add_observer(self, observer):
+        self.observers = self.observers + (observer,)
+
+    def remove_observer(self, observer):
+        self.observers = tuple(o for o in self.observers if o is not observer)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._open = 0
+        self._in_use = 0
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=PooledConnection
+        )
+        apply_pragmas(conn, self.pragmas)
+        conn.row_factory = sqlite3.Row
+        conn._pool = self
+        return conn
+
+    def acquire(self):
+        """Take an idle connection, open a new one, or wait for one to be released"""
+        if self._pid != os.getpid():
+            # Forked worker: connections from the parent must not be shared
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._hits += 1
+                self._in_use += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open < self.max_size
+            if can_open:
+                self._open += 1
+                self._misses += 1
+            else:
+                self._waits += 1
+
+        if can_open:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+            with self._lock:
+                self._in_use += 1
+            return conn
+
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f'No database connection available after {self.acquire_timeout}s')
+        with self._lock:
+            self._wait_seconds += time.perf_counter() - started
+            self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        conn._held = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            with self._lock:
+                self._open -= 1
+                self._in_use -= 1
+            conn.discard()
+            return
+
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown and in scripts)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._open -= 1
+            conn.discard()
+
+    def stats(self):
+        with self._lock:
+            requests = self._hits + self._misses + self._waits
+            return {
+                'database': os.path.abspath(self.database),
+                'max_size': self.max_size,
+                'open': self._open,
+                'idle': self._idle.qsize(),
+                'in_use': self._in_use,
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_seconds': round(self._wait_seconds, 4),
+                'hit_rate': round(self._hits / requests, 4) if requests else 0.0
+            }
+
+
+class CheckpointScheduler:
+    """Background thread that keeps the WAL file from growing without bound.
+
+    A PASSIVE checkpoint never blocks readers or writers; if it leaves more
+    than truncate_pages frames behind (busy readers), a TRUNCATE is tried so
+    the file shrinks once traffic allows. A TRUNCATE holds off writers while
+    it waits, so it runs on a connection of its own that gives up after
+    truncate_timeout seconds instead of the pool's busy_timeout, and a busy
+    result is skipped until the next pass.
+    """
+
+    def __init__(self, pool, interval=60.0, truncate_pages=4000, truncate_timeout=0.2):
+        self.pool = pool
+        self.interval = interval
+        self.truncate_pages = truncate_pages
+        self.truncate_timeout = truncate_timeout
+        self._stop = threading.Event()
+        self._thread = None
+        self._runs = 0
+        self._truncates = 0
+        self._truncates_busy = 0
+        self._errors = 0
+        self._last = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='wal-checkpoint', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as e:
+                self._errors += 1
+                logger.warning('⚠️  WAL checkpoint failed: %s', e)
+
+    def checkpoint(self):
+        """Run one checkpoint pass and return (busy, wal_pages, checkpointed_pages)"""
+        conn = self.pool.acquire()
+        try:
+            started = time.perf_counter()
+            result = tuple(conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone())
+            mode = 'PASSIVE'
+            if result[1] - result[2] > self.truncate_pages:
+                truncated = self._truncate()
+                if truncated[0]:
+                    mode = 'PASSIVE (TRUNCATE busy)'
+                    self._truncates_busy += 1
+                else:
+                    result = truncated
+                    mode = 'TRUNCATE'
+                    self._truncates += 1
+            self._runs += 1
+            self._last = {
+                'mode': mode,
+                'busy': result[0],
+                'wal_pages': result[1],
+                'checkpointed_pages': result[2],
+                'seconds': round(time.perf_counter() - started, 4),
+                'at': time.time()
+            }
+            return result
+        finally:
+            self.pool.release(conn)
+
+    def _truncate(self):
+        conn = sqlite3.connect(self.pool.database, timeout=self.truncate_timeout)
+        try:
+            return tuple(conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone())
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'running': bool(self._thread and self._thread.is_alive()),
+            'runs': self._runs,
+            'truncates': self._truncates,
+            'truncates_busy': self._truncates_busy,
+            'errors': self._errors,
+            'last': self._last
+        }
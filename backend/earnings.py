@@ -0,0 +1,183 @@
+"""Order earnings: how a payment is split, and the ledger the dashboards read.
+
+Every booking carries its split in pilot_earnings, editor_earnings,
+referral_earnings, hmx_earnings and gateway_fees. Triggers on bookings
+(migration 8) append to earnings_ledger whenever a booking enters or leaves
+'completed', or its split, parties or completed_date change while it is
+completed: changes are written as a 'reversed' row cancelling what the
+ledger holds for the booking followed by fresh 'completed' rows, so the
+ledger is append-only. Another trigger folds each ledger row into
+earnings_monthly (party, party_id, month), which the earnings endpoints
+read by primary key instead of aggregating bookings on every request.
+
+    python earnings.py --backfill   # ledger rows for completed bookings that have none
+    python earnings.py --check      # compare the ledger and rollups with bookings
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from config import DatabaseConfig
+
+# Share of the order total per party; the referral share goes to HMX when there is no referral
+SPLIT = {
+    'pilot': 0.50,
+    'editor': 0.15,
+    'referral': 0.125,
+    'hmx': 0.20,
+    'gateway': 0.025
+}
+
+# (party, bookings column holding its party id or None, bookings column holding its amount)
+PARTIES = (
+    ('pilot', 'pilot_id', 'pilot_earnings'),
+    ('editor', 'editor_id', 'editor_earnings'),
+    ('referral', 'referral_id', 'referral_earnings'),
+    ('hmx', None, 'hmx_earnings'),
+    ('gateway', None, 'gateway_fees'),
+)
+
+
+def split_order(total_amount, has_referral):
+    """Earnings columns for an order of total_amount"""
+    referral = SPLIT['referral'] if has_referral else 0.0
+    return {
+        'pilot_earnings': round(total_amount * SPLIT['pilot'], 2),
+        'editor_earnings': round(total_amount * SPLIT['editor'], 2),
+        'referral_earnings': round(total_amount * referral, 2),
+        'hmx_earnings': round(total_amount * (SPLIT['hmx'] + SPLIT['referral'] - referral), 2),
+        'gateway_fees': round(total_amount * SPLIT['gateway'], 2),
+    }
+
+
+def party_summary(conn, party, party_id, year=None):
+    """Totals and this year's months for one party, from earnings_monthly"""
+    year = year or datetime.now().strftime('%Y')
+    total, orders = conn.execute('''
+        SELECT COALESCE(SUM(total), 0), COALESCE(SUM(orders), 0) FROM earnings_monthly
+        WHERE party = ? AND party_id = ?
+    ''', (party, party_id)).fetchone()
+    months = conn.execute('''
+        SELECT substr(month, 6, 2), total, orders FROM earnings_monthly
+        WHERE party = ? AND party_id = ? AND month BETWEEN ? AND ? AND (orders != 0 OR total != 0)
+        ORDER BY month
+    ''', (party, party_id, f'{year}-01', f'{year}-12')).fetchall()
+    total = round(total, 2)
+    return {
+        'total_earnings': total,
+        'completed_orders': orders,
+        'avg_earnings_per_order': round(total / orders, 2) if orders else 0,
+        'monthly_earnings': [{'month': row[0], 'earnings': row[1], 'orders': row[2]} for row in months]
+    }
+
+
+def backfill(conn, batch_size=500, commit=False):
+    """Write 'completed' ledger rows for completed bookings with no ledger rows yet;
+    returns the number of bookings added. Bookings with no completed_date are
+    placed in the month they were created."""
+    added = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in conn.execute('''
+            SELECT id FROM bookings b
+            WHERE b.id > ? AND b.status = 'completed'
+              AND NOT EXISTS (SELECT 1 FROM earnings_ledger l WHERE l.booking_id = b.id)
+            ORDER BY b.id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()]
+        if not ids:
+            return added
+        for party, id_column, amount_column in PARTIES:
+            party_id = f'COALESCE(b.{id_column}, 0)' if id_column else '0'
+            only_with = f'AND b.{id_column} IS NOT NULL' if party == 'referral' else ''
+            conn.execute(f'''
+                INSERT INTO earnings_ledger (booking_id, party, party_id, kind, amount, orders, month, recorded_at)
+                SELECT b.id, '{party}', {party_id}, 'completed', b.{amount_column}, 1,
+                       strftime('%Y-%m', COALESCE(b.completed_date, b.created_at, 'now')), ?
+                FROM bookings b
+                WHERE b.id IN (SELECT value FROM json_each(?)) AND b.{amount_column} IS NOT NULL {only_with}
+            ''', (time.time(), json.dumps(ids)))
+        if commit:
+            conn.commit()
+        added += len(ids)
+        last_id = ids[-1]
+
+
+def check(conn):
+    """Differences between bookings, the ledger and the rollups (empty when consistent)"""
+    problems = []
+    for party, id_column, amount_column in PARTIES:
+        party_id = f'COALESCE(b.{id_column}, 0)' if id_column else '0'
+        only_with = f'AND b.{id_column} IS NOT NULL' if party == 'referral' else ''
+        rows = conn.execute(f'''
+            WITH expected AS (
+                SELECT b.id AS booking_id, {party_id} AS party_id, b.{amount_column} AS amount
+                FROM bookings b
+                WHERE b.status = 'completed' AND b.{amount_column} IS NOT NULL {only_with}
+            ), held AS (
+                SELECT booking_id, party_id, ROUND(SUM(amount), 2) AS amount, SUM(orders) AS orders
+                FROM earnings_ledger WHERE party = ?
+                GROUP BY booking_id, party_id HAVING SUM(orders) != 0 OR ROUND(SUM(amount), 2) != 0
+            )
+            SELECT e.booking_id, e.party_id, e.amount, h.amount, h.orders
+            FROM expected e LEFT JOIN held h USING (booking_id, party_id)
+            WHERE h.orders IS NOT 1 OR ABS(h.amount - ROUND(e.amount, 2)) > 0.005
+            UNION ALL
+            SELECT h.booking_id, h.party_id, NULL, h.amount, h.orders
+            FROM held h LEFT JOIN expected e USING (booking_id, party_id)
+            WHERE e.booking_id IS NULL
+        ''', (party,)).fetchall()
+        problems.extend(
+            {'party': party, 'booking_id': row[0], 'party_id': row[1], 'expected': row[2],
+             'ledger': row[3], 'ledger_orders': row[4]}
+            for row in rows
+        )
+
+    rows = conn.execute('''
+        SELECT m.party, m.party_id, m.month, m.total, m.orders, l.total, l.orders
+        FROM earnings_monthly m
+        LEFT JOIN (
+            SELECT party, party_id, month, ROUND(SUM(amount), 2) AS total, SUM(orders) AS orders
+            FROM earnings_ledger GROUP BY party, party_id, month
+        ) l USING (party, party_id, month)
+        WHERE l.orders IS NOT m.orders OR ABS(l.total - m.total) > 0.005
+    ''').fetchall()
+    problems.extend(
+        {'party': row[0], 'party_id': row[1], 'month': row[2], 'rollup': [row[3], row[4]],
+         'ledger': [row[5], row[6]]}
+        for row in rows
+    )
+    return problems
+
+
+def main():
+    from migrations import ensure_schema
+
+    parser = argparse.ArgumentParser(description='Backfill and verify the earnings ledger')
+    parser.add_argument('--database', default=DatabaseConfig.PATH)
+    parser.add_argument('--backfill', action='store_true', help='add ledger rows for completed bookings without any')
+    parser.add_argument('--check', action='store_true', help='compare the ledger and rollups with bookings')
+    args = parser.parse_args()
+    if not args.backfill and not args.check:
+        parser.error('pass --backfill and/or --check')
+
+    ensure_schema(args.database, auto_migrate=DatabaseConfig.AUTO_MIGRATE)
+    conn = sqlite3.connect(args.database, timeout=DatabaseConfig.BUSY_TIMEOUT)
+    try:
+        if args.backfill:
+            print(f"✅ Backfilled earnings for {backfill(conn, commit=True)} completed bookings")
+        if args.check:
+            problems = check(conn)
+            for problem in problems:
+                print(json.dumps(problem))
+            print(f"{'❌' if problems else '✅'} {len(problems)} earnings ledger differences")
+            return 1 if problems else 0
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
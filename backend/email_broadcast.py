@@ -0,0 +1,140 @@
+"""Broadcast email jobs: one template to every row of an admin list query.
+
+A job renders its audience in keyset pages of batch_size rows and queues
+each page into email_outbox with one INSERT per page, tagged with the job
+id. The rows are scheduled `1 / rate` seconds apart after the last slot
+taken by any earlier job (email_jobs.send_until), which orders them and
+gives the job its ETA. The rate itself is enforced when the senders claim
+the rows (email_outbox.OutboxSender), so messages left overdue by an
+outage still go out at the rate. Transactional mail is queued for "now"
+and goes out between them.
+"""
+import json
+import time
+
+import app_logging
+
+logger = app_logging.get_logger('email_broadcast')
+
+
+def create_job(conn, template, audience, filters, variables, total, created_by=None):
+    cursor = conn.execute('''
+        INSERT INTO email_jobs (template, audience, filters, variables, total, created_by, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (template, audience, json.dumps(filters), json.dumps(variables), total, created_by, time.time()))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def recipient_values(row, name_field, variables):
+    """Template values for one recipient: the job's variables, then the row's own fields"""
+    values = dict(variables)
+    values.update((key, value) for key, value in row.items() if value is not None)
+    values['name'] = row.get(name_field) or 'User'
+    return values
+
+
+def _queue_batch(conn, job_id, messages, skipped, rate):
+    """Schedule one page of messages after every broadcast slot already taken.
+
+    Returns False (queueing nothing) once the job is no longer rendering, i.e. cancelled.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    if conn.execute('SELECT status FROM email_jobs WHERE id = ?', (job_id,)).fetchone()[0] != 'rendering':
+        conn.rollback()
+        return False
+    horizon = conn.execute('SELECT MAX(send_until) FROM email_jobs').fetchone()[0] or 0
+    now = time.time()
+    start = max(now, horizon)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    slots = [start + interval * (i + 1) for i in range(len(messages))]
+    conn.executemany('''
+        INSERT INTO email_outbox (to_email, subject, body, is_html, next_attempt_at, created_at, job_id)
+        VALUES (?, ?, ?, 1, ?, ?, ?)
+    ''', [(to_email, subject, body, slot, now, job_id) for (to_email, subject, body), slot in zip(messages, slots)])
+    conn.execute('''
+        UPDATE email_jobs SET queued = queued + ?, skipped = skipped + ?, send_until = COALESCE(?, send_until)
+        WHERE id = ?
+    ''', (len(messages), skipped, slots[-1] if slots else None, job_id))
+    conn.commit()
+    return True
+
+
+def render_job(pool, job_id, query, name_field, template, filters, variables, batch_size=200, rate=1.0):
+    """Render and queue a job's whole audience (runs on the broadcast executor)"""
+    # Only read the columns the template can use
+    fields = ['email', name_field] + sorted(name for name in template.variables
+                                            if name in query.fields and name not in ('email', name_field))
+    args = dict(filters, fields=','.join(fields), sort='id', order='asc', limit=str(batch_size))
+    conn = pool.acquire()
+    try:
+        while True:
+            page = query.fetch(conn, args)
+            messages, skipped = [], 0
+            for row in page.rows:
+                if not row.get('email'):
+                    skipped += 1
+                    continue
+                subject, body = template.render(recipient_values(row, name_field, variables))
+                messages.append((row['email'], subject, body))
+            if not _queue_batch(conn, job_id, messages, skipped, rate):
+                logger.warning('⚠️  Broadcast %s cancelled while rendering', job_id)
+                return
+            if not page.next_cursor:
+                break
+            args['cursor'] = page.next_cursor
+
+        conn.execute("UPDATE email_jobs SET status = 'sending', rendered_at = ? WHERE id = ? AND status = 'rendering'",
+                     (time.time(), job_id))
+        conn.commit()
+        logger.info('📧 Broadcast %s queued', job_id)
+    except Exception as e:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute("UPDATE email_jobs SET status = 'failed', error = ? WHERE id = ?", (str(e), job_id))
+        conn.commit()
+        logger.error('❌ Broadcast %s failed while rendering: %s', job_id, e)
+    finally:
+        pool.release(conn)
+
+
+def cancel_job(conn, job_id):
+    """Stop rendering and drop the job's unsent messages; returns how many were dropped"""
+    conn.execute("UPDATE email_jobs SET status = 'cancelled' WHERE id = ? AND status IN ('rendering', 'sending')",
+                 (job_id,))
+    dropped = conn.execute(
+        "UPDATE email_outbox SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,)
+    ).rowcount
+    conn.commit()
+    return dropped
+
+
+def job_progress(conn, job_id):
+    """Job row plus delivery counts, or None if there is no such job.
+
+    sent, failed and cancelled are kept on email_jobs as each message
+    finishes (see migration 13), so they survive the outbox purge. Skipped
+    recipients count as done.
+    """
+    job = conn.execute('SELECT * FROM email_jobs WHERE id = ?', (job_id,)).fetchone()
+    if job is None:
+        return None
+
+    job = dict(job)
+    pending = max(0, job['queued'] - job['sent'] - job['failed'] - job['cancelled'])
+    done = job['sent'] + job['failed'] + job['skipped']
+    status = job['status']
+    if status == 'sending' and pending == 0:
+        status = 'completed'
+    # The audience is only known exactly once rendering has finished
+    expected = job['total'] if status == 'rendering' else job['queued'] + job['skipped']
+
+    job['filters'] = json.loads(job['filters'] or '{}')
+    job['variables'] = json.loads(job['variables'] or '{}')
+    job.update({
+        'status': status,
+        'pending': pending,
+        'progress': round(min(1.0, done / expected), 4) if expected else 1.0,
+        'eta_seconds': round(max(0.0, job['send_until'] - time.time()), 1) if pending and job['send_until'] else 0.0
+    })
+    return job
@@ -0,0 +1,380 @@
+"""Durable outbound email queue.
+
+Request handlers only INSERT into email_outbox (see enqueue). An
+OutboxSender claims the due rows, delivers them over SMTP and records the
+outcome; a failed attempt is retried with exponential backoff until
+max_attempts, after which the row is marked failed and kept for inspection.
+The queue lives in hmx.db, so nothing is lost when a worker recycles.
+
+Broadcast rows (job_id set) are also claimed against a send budget shared
+by every sender through email_pacing, so they go out at
+EMAIL_BROADCAST_RATE even when a backlog of them is overdue at once.
+Transactional mail is claimed first and never waits for the budget.
+
+The sender runs as a thread in every app worker (EMAIL_OUTBOX_SENDER=thread)
+or as a process of its own (EMAIL_OUTBOX_SENDER=external):
+
+    python email_outbox.py            # drain the queue until stopped
+    python email_outbox.py --once     # deliver what is due now and exit
+    python email_outbox.py --stats    # queue depth and send latency
+"""
+import argparse
+import json
+import random
+import signal
+import sqlite3
+import sys
+import threading
+import time
+
+import app_logging
+import mailer
+from config import DatabaseConfig, EmailConfig
+from db_pool import ConnectionPool
+
+logger = app_logging.get_logger('email_outbox')
+
+
+def enqueue(conn, to_email, subject, body, is_html=False):
+    """Queue one message and return its id.
+
+    When the caller already has a transaction open the row joins it, so the
+    sender only sees it once the caller commits (and never, if it rolls
+    back). Otherwise the row is committed right away.
+    """
+    joined = conn.in_transaction
+    now = time.time()
+    cursor = conn.execute('''
+        INSERT INTO email_outbox (to_email, subject, body, is_html, next_attempt_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (to_email, subject, body, int(bool(is_html)), now, now))
+    if not joined:
+        conn.commit()
+    return cursor.lastrowid
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 4)
+
+
+def outbox_stats(conn, window=1000):
+    """Queue depth per status and the latency of the last `window` sent messages"""
+    now = time.time()
+    counts = dict(conn.execute('SELECT status, COUNT(*) FROM email_outbox GROUP BY status').fetchall())
+    due = conn.execute(
+        "SELECT COUNT(*) FROM email_outbox WHERE status = 'pending' AND next_attempt_at <= ?", (now,)
+    ).fetchone()[0]
+    oldest = conn.execute("SELECT MIN(created_at) FROM email_outbox WHERE status = 'pending'").fetchone()[0]
+    recent = conn.execute('''
+        SELECT sent_at - created_at, send_seconds, attempts FROM email_outbox
+        WHERE status = 'sent' ORDER BY sent_at DESC LIMIT ?
+    ''', (window,)).fetchall()
+
+    queued = [row[0] for row in recent]
+    sending = [row[1] for row in recent if row[1] is not None]
+    return {
+        'depth': counts.get('pending', 0) + counts.get('sending', 0),
+        'pending': counts.get('pending', 0),
+        'due': due,
+        'sending': counts.get('sending', 0),
+        'sent': counts.get('sent', 0),
+        'failed': counts.get('failed', 0),
+        'oldest_pending_seconds': round(now - oldest, 1) if oldest else 0.0,
+        'latency': {
+            # enqueue -> delivered, including retries
+            'samples': len(recent),
+            'p50_seconds': _percentile(queued, 0.5),
+            'p95_seconds': _percentile(queued, 0.95),
+            'max_seconds': round(max(queued), 4) if queued else None,
+            # the SMTP exchange of the successful attempt
+            'send_p50_seconds': _percentile(sending, 0.5),
+            'send_p95_seconds': _percentile(sending, 0.95),
+            'retried': sum(1 for row in recent if row[2] > 1)
+        }
+    }
+
+
+class OutboxSender:
+    """Background thread that drains email_outbox.
+
+    Any number of senders (one per worker, or a dedicated process) can share
+    a database: rows are claimed under BEGIN IMMEDIATE, so each message goes
+    to one sender. A claim older than `lease` seconds is taken to belong to a
+    sender that died mid-send and is handed out again.
+    """
+
+    def __init__(self, pool, send=mailer.send_email, poll_interval=2.0, batch_size=20, max_attempts=8,
+                 retry_base=30.0, retry_max=3600.0, lease=300.0, retention_days=7.0, broadcast_rate=0.0):
+        self.pool = pool
+        self.send = send
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+        self.retention_days = retention_days
+        self.broadcast_rate = broadcast_rate
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_purge = 0.0
+        self._sent = 0
+        self._retried = 0
+        self._failed = 0
+        self._errors = 0
+        self._last_error = None
+
+    @classmethod
+    def from_config(cls, pool, config=EmailConfig, **kwargs):
+        settings = dict(
+            poll_interval=config.OUTBOX_POLL_INTERVAL,
+            batch_size=config.OUTBOX_BATCH_SIZE,
+            max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+            retry_base=config.OUTBOX_RETRY_BASE,
+            retry_max=config.OUTBOX_RETRY_MAX,
+            lease=config.OUTBOX_LEASE,
+            retention_days=config.OUTBOX_RETENTION_DAYS,
+            broadcast_rate=config.BROADCAST_RATE
+        )
+        settings.update(kwargs)
+        return cls(pool, **settings)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='email-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Poll now instead of at the next interval (called after an enqueue)"""
+        self._wake.set()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._errors += 1
+                logger.warning('⚠️  Email outbox poll failed: %s', e)
+                claimed = 0
+            # A full batch means more may already be due
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self):
+        """Deliver every message due now (up to batch_size) and return how many were claimed"""
+        rows = self._claim()
+        for row in rows:
+            self._deliver(row)
+        self._purge()
+        return len(rows)
+
+    def backoff(self, attempts):
+        """Seconds before retry number `attempts`, with +/- 25% jitter so failures spread out"""
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.75, 1.25)
+
+    def _claim(self):
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            # Cheap read first, so idle senders never take the write lock
+            if not conn.execute('''
+                SELECT 1 FROM email_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND locked_at < ?)
+                LIMIT 1
+            ''', (now, now - self.lease)).fetchone():
+                return []
+
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                "UPDATE email_outbox SET status = 'pending', locked_at = NULL WHERE status = 'sending' AND locked_at < ?",
+                (now - self.lease,)
+            )
+            rows = conn.execute('''
+                SELECT id, to_email, subject, body, is_html, attempts FROM email_outbox
+                WHERE status = 'pending' AND next_attempt_at <= ? AND job_id IS NULL
+                ORDER BY next_attempt_at LIMIT ?
+            ''', (now, self.batch_size)).fetchall()
+            if len(rows) < self.batch_size:
+                rows += self._claim_broadcast(conn, now, self.batch_size - len(rows))
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sending', locked_at = ? WHERE id = ?",
+                [(now, row['id']) for row in rows]
+            )
+            conn.commit()
+            return rows
+        finally:
+            self.pool.release(conn)
+
+    def _claim_broadcast(self, conn, now, room):
+        """Due broadcast rows, as many as the shared budget allows now (at most `room`).
+
+        email_pacing's 'broadcast' row holds when the next broadcast message
+        may go. The budget refills at broadcast_rate and holds at most one
+        poll interval's worth, so every sender together claims no faster
+        than the rate. Runs inside the claim's BEGIN IMMEDIATE.
+        """
+        limit = room
+        if self.broadcast_rate > 0:
+            interval = 1.0 / self.broadcast_rate
+            burst = max(1, round(self.poll_interval * self.broadcast_rate))
+            row = conn.execute("SELECT next_slot FROM email_pacing WHERE name = 'broadcast'").fetchone()
+            start = max(now, row[0] if row else 0.0)
+            ahead = (now - start) / interval + burst - 1
+            limit = min(room, int(ahead + 1e-9) + 1 if ahead >= 0 else 0)
+        if limit <= 0:
+            return []
+
+        rows = conn.execute('''
+            SELECT id, to_email, subject, body, is_html, attempts FROM email_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ? AND job_id IS NOT NULL
+            ORDER BY next_attempt_at LIMIT ?
+        ''', (now, limit)).fetchall()
+        if rows and self.broadcast_rate > 0:
+            conn.execute('''
+                INSERT INTO email_pacing (name, next_slot) VALUES ('broadcast', ?)
+                ON CONFLICT (name) DO UPDATE SET next_slot = excluded.next_slot
+            ''', (start + len(rows) * interval,))
+        return rows
+
+    def _deliver(self, row):
+        attempts = row['attempts'] + 1
+        started = time.perf_counter()
+        try:
+            self.send(row['to_email'], row['subject'], row['body'], bool(row['is_html']))
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+        elapsed = time.perf_counter() - started
+        now = time.time()
+
+        conn = self.pool.acquire()
+        try:
+            if error is None:
+                # Bodies can carry credentials and OTPs; nothing needs them once delivered
+                conn.execute('''
+                    UPDATE email_outbox SET status = 'sent', body = '', attempts = ?, sent_at = ?,
+                           send_seconds = ?, locked_at = NULL, last_error = NULL
+                    WHERE id = ?
+                ''', (attempts, now, elapsed, row['id']))
+            elif attempts >= self.max_attempts:
+                conn.execute('''
+                    UPDATE email_outbox SET status = 'failed', attempts = ?, locked_at = NULL, last_error = ?
+                    WHERE id = ?
+                ''', (attempts, error, row['id']))
+            else:
+                delay = self.backoff(attempts)
+                conn.execute('''
+                    UPDATE email_outbox SET status = 'pending', attempts = ?, next_attempt_at = ?,
+                           locked_at = NULL, last_error = ?
+                    WHERE id = ?
+                ''', (attempts, now + delay, error, row['id']))
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+
+        with self._lock:
+            if error is None:
+                self._sent += 1
+            elif attempts >= self.max_attempts:
+                self._failed += 1
+                self._last_error = error
+            else:
+                self._retried += 1
+                self._last_error = error
+
+        if error is None:
+            logger.info('✅ Email %s sent to %s (%.2fs)', row['id'], row['to_email'], elapsed)
+        elif attempts >= self.max_attempts:
+            logger.error('❌ Email %s to %s failed after %s attempts: %s', row['id'], row['to_email'], attempts, error)
+        else:
+            logger.warning('⚠️  Email %s to %s failed (attempt %s/%s), retrying in %.1fs: %s',
+                           row['id'], row['to_email'], attempts, self.max_attempts, delay, error)
+
+    def _purge(self):
+        """Drop sent (and cancelled) messages older than retention_days, at most once an hour"""
+        now = time.time()
+        if self.retention_days <= 0 or now - self._last_purge < 3600:
+            return
+        self._last_purge = now
+        conn = self.pool.acquire()
+        try:
+            cutoff = now - self.retention_days * 86400
+            conn.execute("DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,))
+            conn.execute("DELETE FROM email_outbox WHERE status = 'cancelled' AND created_at < ?", (cutoff,))
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'poll_interval': self.poll_interval,
+                'batch_size': self.batch_size,
+                'max_attempts': self.max_attempts,
+                'broadcast_rate': self.broadcast_rate,
+                'sent': self._sent,
+                'retried': self._retried,
+                'failed': self._failed,
+                'errors': self._errors,
+                'last_error': self._last_error
+            }
+
+
+def main():
+    app_logging.setup()
+    from migrations import ensure_schema
+
+    parser = argparse.ArgumentParser(description='Deliver queued emails from email_outbox')
+    parser.add_argument('--database', default=DatabaseConfig.PATH)
+    parser.add_argument('--once', action='store_true', help='deliver what is due now and exit')
+    parser.add_argument('--stats', action='store_true', help='print queue depth and send latency')
+    args = parser.parse_args()
+
+    ensure_schema(args.database, auto_migrate=DatabaseConfig.AUTO_MIGRATE)
+    pool = ConnectionPool(args.database, max_size=2, timeout=DatabaseConfig.BUSY_TIMEOUT,
+                          pragmas=DatabaseConfig.pragmas())
+    if args.stats:
+        conn = pool.acquire()
+        try:
+            print(json.dumps(outbox_stats(conn), indent=2))
+        finally:
+            pool.release(conn)
+        return 0
+
+    smtp_pool = mailer.SMTPPool.from_config(EmailConfig)
+    sender = OutboxSender.from_config(pool, send=smtp_pool.send)
+    if args.once:
+        while sender.run_once() == sender.batch_size:
+            pass
+        smtp_pool.close_all()
+        return 0
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sender.stop())
+    print(f"📧 Email outbox sender running on {args.database} "
+          f"(SMTP {EmailConfig.SMTP_SERVER}:{EmailConfig.SMTP_PORT}, poll every {sender.poll_interval}s)")
+    try:
+        sender.run_forever()
+    except KeyboardInterrupt:
+        pass
+    smtp_pool.close_all()
+    pool.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
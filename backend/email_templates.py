@@ -0,0 +1,108 @@
+"""Compiled, cached email templates.
+
+A template's subject and body are split once into literal text and
+{{variable}} slots, so rendering is one join instead of a str.replace pass
+over the whole body per variable. Values are substituted in a single pass:
+a value that itself contains {{...}} is left alone.
+"""
+import re
+import threading
+import time
+
+PLACEHOLDER = re.compile(r'\{\{([^{}]*)\}\}')
+
+
+class CompiledText:
+    """Text split into literals and variable slots"""
+
+    __slots__ = ('segments', 'slots', 'variables')
+
+    def __init__(self, text):
+        parts = PLACEHOLDER.split(text or '')
+        # Even positions are literal text, odd positions variable names
+        self.segments = [part if i % 2 == 0 else '{{' + part + '}}' for i, part in enumerate(parts)]
+        self.slots = [(i, parts[i]) for i in range(1, len(parts), 2)]
+        self.variables = frozenset(name for _, name in self.slots)
+
+    def render(self, values):
+        """Substitute values; a variable without a value keeps its {{name}} text"""
+        out = self.segments.copy()
+        for i, name in self.slots:
+            if name in values:
+                out[i] = str(values[name])
+        return ''.join(out)
+
+
+class EmailTemplate:
+    __slots__ = ('name', 'subject', 'body', 'variables')
+
+    def __init__(self, name, subject, body):
+        self.name = name
+        self.subject = CompiledText(subject)
+        self.body = CompiledText(body)
+        self.variables = self.subject.variables | self.body.variables
+
+    def missing(self, values):
+        """Variables the template uses that `values` does not provide"""
+        return sorted(self.variables.difference(values))
+
+    def render(self, values):
+        return self.subject.render(values), self.body.render(values)
+
+
+class TemplateCache:
+    """Compiled templates by name, one cache per worker process.
+
+    Edits made through this worker invalidate the entry right away; other
+    workers reload it once their entry is older than ttl seconds.
+    """
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, name, fetch):
+        """Compiled template, calling fetch() -> (subject, body) or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[1] > now:
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        row = fetch()
+        if row is None:
+            return None
+        template = EmailTemplate(name, row[0], row[1])
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[name] = (template, now + self.ttl)
+        return template
+
+    def invalidate(self, name=None):
+        """Drop one template, or all of them when name is None"""
+        with self._lock:
+            if name is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                dropped = 1 if self._entries.pop(name, None) is not None else 0
+            self._invalidations += dropped
+        return dropped
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'ttl': self.ttl,
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidations': self._invalidations,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,438 @@
+"""Declarative list queries for the admin endpoints.
+
+A ListQuery describes one list endpoint: the output fields (and the SQL and
+joins each one needs), the sorts it allows and the filters it understands.
+From the request args it builds a single SELECT that only joins and selects
+what was asked for, pages with a keyset cursor on (sort column, id) instead
+of OFFSET, and can run a cached COUNT(*) for the same filters.
+
+Query parameters understood by every list:
+    limit=N            page size (capped at max_limit); omit for the full list
+    cursor=...         opaque value from the previous page's X-Next-Cursor
+    sort=name          one of the whitelisted sorts
+    order=asc|desc
+    fields=a,b,c       projection; unknown names are rejected
+    count=true         include X-Total-Count (cached for a few seconds)
+"""
+import base64
+import csv
+import io
+import json
+import threading
+import time
+
+from flask import Response, current_app, stream_with_context
+
+
+class ListQueryError(ValueError):
+    """Bad list parameters; endpoints answer 400 with the message"""
+
+
+class Field:
+    """One output key of a list row.
+
+    sql      expression selected AS the key
+    joins    names of ListQuery joins the expression needs
+    convert  applied to the selected value (e.g. bool)
+    derive   fn(raw_row) computing the value from `requires`
+    requires [(alias, sql)] selected for derive, not output on their own
+    default  constant used when there is no SQL at all
+    """
+
+    def __init__(self, sql=None, joins=(), convert=None, derive=None, requires=(), default=None):
+        self.sql = sql
+        self.joins = tuple(joins)
+        self.convert = convert
+        self.derive = derive
+        self.requires = tuple(requires)
+        self.default = default
+
+
+class Filter:
+    """A request arg mapped to a WHERE fragment.
+
+    `sql` may contain several `?`; the parsed value is bound to each of them.
+    `parse` turns the raw string into the bound value and may raise ValueError.
+    `build` can replace both for filters needing custom SQL: fn(value) -> (sql, params).
+    """
+
+    def __init__(self, sql=None, parse=str, joins=(), build=None):
+        self.sql = sql
+        self.parse = parse
+        self.joins = tuple(joins)
+        self.build = build
+
+    def clause(self, raw):
+        try:
+            value = self.parse(raw)
+        except (TypeError, ValueError):
+            raise ListQueryError(f'Invalid value: {raw}')
+        if self.build:
+            return self.build(value)
+        return self.sql, [value] * self.sql.count('?')
+
+
+def parse_date(raw):
+    """YYYY-MM-DD, validated so it can be compared against TIMESTAMP text"""
+    time.strptime(raw, '%Y-%m-%d')
+    return raw
+
+
+def parse_bool(raw):
+    return str(raw).lower() in ('1', 'true', 'yes')
+
+
+def encode_cursor(sort, direction, value, row_id):
+    payload = json.dumps([sort, direction, value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort, direction, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort, direction, value, row_id
+    except Exception:
+        raise ListQueryError('Invalid cursor')
+
+
+class _CountCache:
+    """Tiny TTL cache for COUNT(*) results, keyed by list name + filters"""
+
+    def __init__(self, ttl=30.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = _CountCache()
+
+
+class ListPage:
+    """Result of ListQuery.fetch: formatted rows plus paging metadata"""
+
+    def __init__(self, rows, next_cursor=None, limit=None, total=None, fields=None):
+        self.rows = rows
+        self.fields = fields
+        self.next_cursor = next_cursor
+        self.limit = limit
+        self.total = total
+
+    def headers(self):
+        headers = {}
+        if self.next_cursor:
+            headers['X-Next-Cursor'] = self.next_cursor
+        if self.total is not None:
+            headers['X-Total-Count'] = str(self.total)
+        return headers
+
+
+class ListQuery:
+    """One admin list endpoint.
+
+    from_sql  FROM clause including any INNER joins that filter rows
+    joins     name -> LEFT JOIN added only when a field or filter needs it
+    sorts     name -> SQL; must never be NULL for the keyset to work, so a
+              nullable column is sorted as COALESCE(col, '')
+    where     fixed WHERE fragments (e.g. u.role = 'client')
+    key       unique column of `alias` used as the keyset tie-breaker
+    """
+
+    def __init__(self, name, from_sql, alias, fields, sorts, default_sort,
+                 filters=None, joins=None, where=None, default_order='desc', max_limit=500, key='id'):
+        self.name = name
+        self.key = key
+        self.from_sql = from_sql
+        self.alias = alias
+        self.fields = fields
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.default_order = default_order
+        self.filters = filters or {}
+        self.joins = joins or {}
+        self.where = list(where or [])
+        self.max_limit = max_limit
+
+    # -- request parsing ---------------------------------------------------
+    def _limit(self, args):
+        raw = args.get('limit')
+        if raw in (None, ''):
+            return None
+        try:
+            limit = int(raw)
+        except ValueError:
+            raise ListQueryError('limit must be an integer')
+        if limit < 1:
+            raise ListQueryError('limit must be positive')
+        return min(limit, self.max_limit)
+
+    def _fields(self, args):
+        raw = args.get('fields')
+        if not raw:
+            return list(self.fields)
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ListQueryError(f"Unknown fields: {', '.join(unknown)}")
+        return names
+
+    def _sort(self, args):
+        sort = args.get('sort') or self.default_sort
+        if sort not in self.sorts:
+            raise ListQueryError(f"Invalid sort. Must be one of: {', '.join(self.sorts)}")
+        direction = (args.get('order') or self.default_order).lower()
+        if direction not in ('asc', 'desc'):
+            raise ListQueryError('order must be asc or desc')
+        return sort, direction
+
+    def _where(self, args, joins):
+        clauses = list(self.where)
+        params = []
+        for param, flt in self.filters.items():
+            raw = args.get(param)
+            if raw in (None, ''):
+                continue
+            sql, values = flt.clause(raw)
+            if sql:
+                clauses.append(sql)
+                params.extend(values)
+                joins.update(flt.joins)
+        return clauses, params
+
+    def _join_sql(self, needed):
+        # Keep the declaration order so dependent joins come after their parents
+        return ''.join(f' {sql}' for name, sql in self.joins.items() if name in needed)
+
+    # -- SQL ---------------------------------------------------------------
+    def build(self, args):
+        """Return (sql, params, plan) for the request args"""
+        limit = self._limit(args)
+        names = self._fields(args)
+        sort, direction = self._sort(args)
+        sort_sql = self.sorts[sort]
+        id_sql = f'{self.alias}.{self.key}'
+
+        joins = set()
+        select = {'_sort_value': sort_sql, '_row_id': id_sql}
+        for name in names:
+            field = self.fields[name]
+            joins.update(field.joins)
+            if field.derive:
+                select.update(field.requires)
+            elif field.sql:
+                select[name] = field.sql
+
+        clauses, params = self._where(args, joins)
+
+        cursor = args.get('cursor')
+        if cursor:
+            c_sort, c_direction, value, row_id = decode_cursor(cursor)
+            if (c_sort, c_direction) != (sort, direction):
+                raise ListQueryError('Cursor does not match the requested sort')
+            op = '<' if direction == 'desc' else '>'
+            clauses.append(f'({sort_sql}, {id_sql}) {op} (?, ?)')
+            params.extend([value, row_id])
+
+        columns = ', '.join(f'{sql} AS {alias}' for alias, sql in select.items())
+        sql = f"SELECT {columns} FROM {self.from_sql}{self._join_sql(joins)}"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(f'({clause})' for clause in clauses)
+        sql += f' ORDER BY {sort_sql} {direction.upper()}, {id_sql} {direction.upper()}'
+        if limit:
+            # One extra row tells us whether there is a next page
+            sql += ' LIMIT ?'
+            params.append(limit + 1)
+
+        plan = {'limit': limit, 'fields': names, 'sort': sort, 'direction': direction}
+        return sql, params, plan
+
+    def count_sql(self, args):
+        joins = set()
+        clauses, params = self._where(args, joins)
+        sql = f'SELECT COUNT(*) FROM {self.from_sql}{self._join_sql(joins)}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(f'({clause})' for clause in clauses)
+        return sql, params
+
+    # -- execution ---------------------------------------------------------
+    def format_row(self, raw, names):
+        row = {}
+        for name in names:
+            field = self.fields[name]
+            if field.derive:
+                row[name] = field.derive(raw)
+            elif field.sql:
+                value = raw[name]
+                row[name] = field.convert(value) if field.convert else value
+            else:
+                row[name] = field.default
+        return row
+
+    def count(self, conn, args):
+        sql, params = self.count_sql(args)
+        key = (self.name, sql, tuple(params))
+        total = count_cache.get(key)
+        if total is None:
+            total = conn.execute(sql, params).fetchone()[0]
+            count_cache.put(key, total)
+        return total
+
+    def fetch(self, conn, args, batch_size=200):
+        """Run the query and return a ListPage.
+
+        A page (limit given) is read in full so the next cursor is known up
+        front; it is at most max_limit + 1 rows. Without a limit the rows are
+        a generator over cursor.fetchmany(), so a streamed response never
+        holds more than one batch in memory.
+        """
+        sql, params, plan = self.build(args)
+        total = self.count(conn, args) if parse_bool(args.get('count', '')) else None
+        cursor = conn.execute(sql, params)
+        names = plan['fields']
+
+        limit = plan['limit']
+        if limit:
+            raw_rows = cursor.fetchall()
+            next_cursor = None
+            if len(raw_rows) > limit:
+                raw_rows = raw_rows[:limit]
+                last = raw_rows[-1]
+                next_cursor = encode_cursor(plan['sort'], plan['direction'], last['_sort_value'], last['_row_id'])
+            rows = [self.format_row(raw, names) for raw in raw_rows]
+            return ListPage(rows, next_cursor=next_cursor, limit=limit, total=total, fields=names)
+
+        def stream():
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                for raw in batch:
+                    yield self.format_row(raw, names)
+
+        return ListPage(stream(), total=total, fields=names)
+
+
+def cached_query(builder):
+    """Build a ListQuery once per process; builders may inspect the live schema"""
+    built = []
+    lock = threading.Lock()
+
+    def get(conn):
+        if not built:
+            with lock:
+                if not built:
+                    built.append(builder(conn))
+        return built[0]
+
+    get.__name__ = builder.__name__
+    get.__doc__ = builder.__doc__
+    return get
+
+
+def columns_of(conn, table, alias, exclude=('password', 'password_hash')):
+    """Field per column of a table, in schema order, minus credentials"""
+    return {
+        row[1]: Field(f'{alias}.{row[1]}')
+        for row in conn.execute(f'PRAGMA table_info({table})')
+        if row[1] not in exclude
+    }
+
+
+def json_response(page, envelope=None, batch_rows=100):
+    """Stream a ListPage as JSON.
+
+    The body is a plain array, or {"<envelope>": [...], "count": n} for
+    endpoints that always answered with that shape. Paging metadata goes in
+    the X-Next-Cursor / X-Total-Count headers.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{"%s":[' % envelope if envelope else '['
+        count = 0
+        chunk = []
+        for row in page.rows:
+            chunk.append(dumps(row))
+            count += 1
+            if len(chunk) >= batch_rows:
+                yield (',' if count > len(chunk) else '') + ','.join(chunk)
+                chunk = []
+        if chunk:
+            yield (',' if count > len(chunk) else '') + ','.join(chunk)
+        yield '],"count":%d}' % count if envelope else ']'
+
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    for header, value in page.headers().items():
+        response.headers[header] = value
+    return response
+
+
+def ndjson_response(page, filename=None, batch_rows=500):
+    """Stream a ListPage as newline-delimited JSON, one row per line"""
+    dumps = current_app.json.dumps
+
+    def generate():
+        chunk = []
+        for row in page.rows:
+            chunk.append(dumps(row))
+            if len(chunk) >= batch_rows:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+    return _download(Response(stream_with_context(generate()), mimetype='application/x-ndjson'), page, filename)
+
+
+def _csv_cell(value):
+    # Spreadsheet apps evaluate text starting with these as a formula
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def csv_response(page, filename=None, batch_rows=500):
+    """Stream a ListPage as CSV with a header row of the projected fields"""
+    fields = page.fields
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        count = 0
+        for row in page.rows:
+            writer.writerow([_csv_cell(row.get(name)) for name in fields])
+            count += 1
+            if count % batch_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return _download(Response(stream_with_context(generate()), mimetype='text/csv'), page, filename)
+
+
+def _download(response, page, filename):
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    for header, value in page.headers().items():
+        response.headers[header] = value
+    return response
@@ -0,0 +1,239 @@
+import os
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from config import EmailConfig
+
+# The session is gone before the message was accepted; it can go out on a new one
+_DISCONNECTED = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+
+def build_message(sender, to_email, subject, body, is_html=False):
+    msg = MIMEMultipart('alternative')
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html' if is_html else 'plain'))
+    return msg
+
+
+def _connect(config):
+    """Open an SMTP session: connect, STARTTLS, login"""
+    if not config.SMTP_SERVER:
+        raise smtplib.SMTPException('SMTP_SERVER is not configured')
+
+    server = smtplib.SMTP(config.SMTP_SERVER, config.SMTP_PORT, timeout=config.SMTP_TIMEOUT)
+    try:
+        if config.USE_TLS:
+            server.starttls()
+        # Login if credentials are provided
+        if config.EMAIL_PASSWORD:
+            server.login(config.EMAIL_ADDRESS, config.EMAIL_PASSWORD)
+    except BaseException:
+        server.close()
+        raise
+    return server
+
+
+def _quit(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def send_email(to_email, subject, body, is_html=False, config=EmailConfig):
+    """Deliver one message over a fresh SMTP session; raises on any failure"""
+    server = _connect(config)
+    try:
+        msg = build_message(config.EMAIL_ADDRESS, to_email, subject, body, is_html)
+        server.sendmail(config.EMAIL_ADDRESS, to_email, msg.as_string())
+    finally:
+        _quit(server)
+
+
+class _Session:
+    __slots__ = ('server', 'last_used', 'messages')
+
+    def __init__(self, server):
+        self.server = server
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SMTPPool:
+    """Authenticated SMTP sessions reused across messages, one pool per process.
+
+    Sending over a pooled session skips the connect/STARTTLS/login round
+    trips. A session that sat idle longer than noop_after is checked with
+    NOOP before reuse; one idle longer than max_idle, or that has carried
+    max_messages, is closed instead. If the server drops a session mid-send,
+    the message is retried once on a fresh one.
+    """
+
+    def __init__(self, config=EmailConfig, max_size=2, noop_after=10.0, max_idle=120.0, max_messages=100):
+        self.config = config
+        self.max_size = max_size
+        self.noop_after = noop_after
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._reset()
+
+    @classmethod
+    def from_config(cls, config=EmailConfig):
+        return cls(config, max_size=config.SMTP_POOL_SIZE, noop_after=config.SMTP_NOOP_AFTER,
+                   max_idle=config.SMTP_MAX_IDLE, max_messages=config.SMTP_MAX_MESSAGES)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._open = 0
+        self._connects = 0
+        self._connect_seconds = 0.0
+        self._reuses = 0
+        self._noops = 0
+        self._dropped = 0
+        self._reconnects = 0
+        self._sent = 0
+        self._errors = 0
+
+    def _new_session(self):
+        started = time.perf_counter()
+        server = _connect(self.config)
+        with self._lock:
+            self._open += 1
+            self._connects += 1
+            self._connect_seconds += time.perf_counter() - started
+        return _Session(server)
+
+    def _close(self, session):
+        with self._lock:
+            self._open -= 1
+        _quit(session.server)
+
+    def acquire(self):
+        """An idle session that is still usable, or a new one"""
+        if self._pid != os.getpid():
+            # Forked: the parent's sockets must not be shared
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    session = self._idle.pop() if self._idle else None
+                if session is None:
+                    return self._new_session()
+
+                idle = time.monotonic() - session.last_used
+                if idle <= self.max_idle and session.messages < self.max_messages:
+                    if idle <= self.noop_after:
+                        with self._lock:
+                            self._reuses += 1
+                        return session
+                    try:
+                        if session.server.noop()[0] == 250:
+                            with self._lock:
+                                self._reuses += 1
+                                self._noops += 1
+                            return session
+                    except (smtplib.SMTPException, OSError):
+                        pass
+                with self._lock:
+                    self._dropped += 1
+                self._close(session)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, session, broken=False):
+        if broken or self._pid != os.getpid():
+            self._close(session)
+        else:
+            session.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(session)
+        self._slots.release()
+
+    def send(self, to_email, subject, body, is_html=False):
+        """Deliver one message over a pooled session; raises on any failure"""
+        msg = build_message(self.config.EMAIL_ADDRESS, to_email, subject, body, is_html).as_string()
+        for attempt in range(2):
+            session = self.acquire()
+            try:
+                session.server.sendmail(self.config.EMAIL_ADDRESS, to_email, msg)
+            except (smtplib.SMTPException, OSError) as e:
+                # 421 = the server is closing the session; a refused message (bad recipient,
+                # 4xx/5xx on DATA) leaves the session usable after RSET
+                dropped = isinstance(e, _DISCONNECTED) or getattr(e, 'smtp_code', None) == 421
+                self.release(session, broken=dropped or not self._rset(session))
+                if dropped and not attempt:
+                    with self._lock:
+                        self._reconnects += 1
+                    continue
+                with self._lock:
+                    self._errors += 1
+                raise
+            except BaseException:
+                self.release(session, broken=True)
+                raise
+
+            session.messages += 1
+            with self._lock:
+                self._sent += 1
+            self.release(session)
+            return
+
+    def send_many(self, messages):
+        """Send (to_email, subject, body, is_html) tuples back to back; returns None or the error for each.
+
+        Sessions are reused most-recently-released first, so a batch goes out
+        over one session unless it breaks or reaches max_messages.
+        """
+        results = []
+        for message in messages:
+            try:
+                self.send(*message)
+                results.append(None)
+            except (smtplib.SMTPException, OSError) as e:
+                results.append(e)
+        return results
+
+    @staticmethod
+    def _rset(session):
+        try:
+            return session.server.rset()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close_all(self):
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                break
+            self._close(session)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'server': f"{self.config.SMTP_SERVER}:{self.config.SMTP_PORT}",
+                'max_size': self.max_size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'connects': self._connects,
+                'avg_connect_seconds': round(self._connect_seconds / self._connects, 4) if self._connects else 0.0,
+                'reuses': self._reuses,
+                'noops': self._noops,
+                'dropped': self._dropped,
+                'reconnects': self._reconnects,
+                'sent': self._sent,
+                'errors': self._errors
+            }
@@ -0,0 +1,104 @@
+import bisect
+import threading
+import time
+
+# Upper bounds in seconds, Prometheus style; anything slower lands in +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram of durations (seconds)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def percentile(self, fraction, counts=None, maximum=None):
+        """Upper bound of the bucket holding the given fraction of observations (at most the max seen)"""
+        counts = counts or self._counts
+        maximum = self._max if maximum is None else maximum
+        total = sum(counts)
+        if not total:
+            return None
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[index], maximum) if index < len(self.buckets) else maximum
+        return maximum
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            maximum = self._max
+        return self._summarize(counts, total_sum, maximum)
+
+    def _summarize(self, counts, total_sum, maximum):
+        total = sum(counts)
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+        return {
+            'count': total,
+            'sum_seconds': round(total_sum, 4),
+            'avg_seconds': round(total_sum / total, 4) if total else 0.0,
+            'max_seconds': round(maximum, 4),
+            'p50_seconds': self.percentile(0.5, counts, maximum),
+            'p95_seconds': self.percentile(0.95, counts, maximum),
+            'p99_seconds': self.percentile(0.99, counts, maximum),
+            'buckets': buckets
+        }
+
+
+class RollingHistogram(Histogram):
+    """Histogram whose percentiles cover only the last `window` seconds.
+
+    Observations go to the current of `slots` time slices; snapshot() merges
+    the slices still inside the window. count/sum/max are for the window too.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=300.0, slots=5):
+        super().__init__(buckets)
+        self.window = window
+        self.slot_seconds = window / slots
+        self._slots = []  # [slot_start, counts, sum, max], newest last
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        slot_start = time.monotonic() // self.slot_seconds * self.slot_seconds
+        with self._lock:
+            if not self._slots or self._slots[-1][0] != slot_start:
+                self._slots.append([slot_start, [0] * (len(self.buckets) + 1), 0.0, 0.0])
+                while self._slots[0][0] <= slot_start - self.window:
+                    self._slots.pop(0)
+            slot = self._slots[-1]
+            slot[1][index] += 1
+            slot[2] += value
+            if value > slot[3]:
+                slot[3] = value
+
+    def snapshot(self):
+        oldest = time.monotonic() - self.window
+        with self._lock:
+            live = [slot for slot in self._slots if slot[0] + self.slot_seconds > oldest]
+            counts = [sum(column) for column in zip(*(slot[1] for slot in live))] or [0] * (len(self.buckets) + 1)
+            total_sum = sum(slot[2] for slot in live)
+            maximum = max((slot[3] for slot in live), default=0.0)
+        snapshot = self._summarize(counts, total_sum, maximum)
+        snapshot['window_seconds'] = self.window
+        return snapshot
@@ -0,0 +1,1423 @@
+"""Versioned schema migrations for hmx.db.
+
+Each step runs once, in order, inside its own transaction and is recorded in
+the schema_version table. The latest applied version is mirrored into
+PRAGMA user_version, so a worker can verify the schema with a single header
+read at startup instead of probing every table.
+
+    python migrations.py            # apply pending migrations (under a file lock)
+    python migrations.py --status   # list applied and pending steps
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from config import DatabaseConfig
+from db_pool import apply_pragmas
+from db_indexes import create_indexes
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind the code and auto-migration is disabled"""
+
+
+def _0001_baseline_schema(c):
+    """Tables, legacy column upgrades, default admin and email templates (formerly init_db)"""
+
+    # Check if users table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
+    if not c.fetchone():
+        print("Creating users table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT,
+                email TEXT UNIQUE,
+                password_hash TEXT,
+                role TEXT DEFAULT 'admin',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    else:
+        # Add missing columns to existing users table if needed
+        new_columns = [
+            ('username', 'TEXT'),
+            ('updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+        ]
+
+        for column_name, column_type in new_columns:
+            try:
+                c.execute(f'ALTER TABLE users ADD COLUMN {column_name} {column_type}')
+                print(f"Added {column_name} column to users table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Error adding {column_name} column: {e}")
+                else:
+                    print(f"{column_name} column already exists")
+# --- Ensure default admin exists ---
+    admin_email = "admin@hmx.com"
+    c.execute("SELECT id FROM users WHERE email=?", (admin_email,))
+    if not c.fetchone():
+        from datetime import datetime
+        from werkzeug.security import generate_password_hash
+
+        password_hash = generate_password_hash("JustBrew@45")
+        c.execute('''INSERT INTO users (username, email, password_hash, role, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        "Admin User",
+        admin_email,
+        password_hash,
+        "admin",
+        datetime.now(),
+        datetime.now()
+        ))
+        print("\n✅ Admin user created successfully!")
+        print(f"Email: {admin_email}")
+        print("Password: JustBrew@45")
+    else:
+        print("\nℹ️ Admin user already exists")
+    # Check if pilots table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pilots'")
+    if not c.fetchone():
+        print("Creating pilots table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS pilots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                full_name TEXT,
+                email TEXT UNIQUE NOT NULL,
+                phone TEXT,
+                password TEXT,
+                password_hash TEXT NOT NULL,
+                date_of_birth DATE,
+                gender TEXT,
+                address TEXT,
+                government_id_proof TEXT,
+                license_number TEXT,
+                issuing_authority TEXT,
+                license_issue_date DATE,
+                license_expiry_date DATE,
+                drone_model TEXT,
+                drone_serial TEXT,
+                drone_uin TEXT,
+                drone_category TEXT,
+                total_flying_hours INTEGER,
+                flight_records TEXT,
+                insurance_policy TEXT,
+                insurance_validity DATE,
+                pilot_license_url TEXT,
+                id_proof_url TEXT,
+                training_certificate_url TEXT,
+                photograph_url TEXT,
+                insurance_certificate_url TEXT,
+                experience TEXT,
+                equipment TEXT,
+                cities TEXT,
+                portfolio_url TEXT,
+                bank_account TEXT,
+                status TEXT DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    else:
+        # Add missing columns to existing pilots table
+        new_columns = [
+            ('password_hash', 'TEXT'),
+            ('full_name', 'TEXT'),
+            ('date_of_birth', 'DATE'),
+            ('gender', 'TEXT'),
+            ('address', 'TEXT'),
+            ('government_id_proof', 'TEXT'),
+            ('license_number', 'TEXT'),
+            ('issuing_authority', 'TEXT'),
+            ('license_issue_date', 'DATE'),
+            ('license_expiry_date', 'DATE'),
+            ('drone_model', 'TEXT'),
+            ('drone_serial', 'TEXT'),
+            ('drone_uin', 'TEXT'),
+            ('drone_category', 'TEXT'),
+            ('total_flying_hours', 'INTEGER'),
+            ('flight_records', 'TEXT'),
+            ('insurance_policy', 'TEXT'),
+            ('insurance_validity', 'DATE'),
+            ('pilot_license_url', 'TEXT'),
+            ('id_proof_url', 'TEXT'),
+            ('training_certificate_url', 'TEXT'),
+            ('photograph_url', 'TEXT'),
+            ('insurance_certificate_url', 'TEXT'),
+            ('portfolio_url', 'TEXT'),
+            ('bank_account', 'TEXT'),
+            ('experience', 'TEXT'),
+            ('equipment', 'TEXT'),
+            ('cities', 'TEXT')
+        ]
+
+        for column_name, column_type in new_columns:
+            try:
+                c.execute(f'ALTER TABLE pilots ADD COLUMN {column_name} {column_type}')
+                print(f"Added {column_name} column to pilots table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Error adding {column_name} column: {e}")
+                else:
+                    print(f"{column_name} column already exists")
+
+    # Check if bookings table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='bookings'")
+    if not c.fetchone():
+        print("Creating bookings table...")
+        c.execute('''
+           CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    pilot_id INTEGER,
+    editor_id INTEGER,
+    referral_id INTEGER,
+
+    -- Booking details
+    location_address TEXT,
+    gps_link TEXT,
+    property_type TEXT,
+    indoor_outdoor TEXT,
+    area_size REAL,
+    area_unit TEXT,
+    rooms_sections INTEGER,
+    num_floors INTEGER,
+    preferred_date DATE,
+    preferred_time TEXT,
+    special_requirements TEXT,
+    drone_permissions_required BOOLEAN,
+    -- Cost
+    base_package_cost REAL,
+    total_cost REAL,
+    custom_quote TEXT,
+
+    -- Status / meta
+    status TEXT DEFAULT 'pending',
+    payment_status TEXT DEFAULT 'pending',
+    payment_amount DECIMAL(10,2),
+    payment_date TIMESTAMP,
+    completed_date TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    admin_comments TEXT,
+    description TEXT,
+    delivery_video_link TEXT,
+    drive_link TEXT,
+
+    -- Earnings
+    pilot_earnings DECIMAL(10,2),
+    editor_earnings DECIMAL(10,2),
+    referral_earnings DECIMAL(10,2),
+    hmx_earnings DECIMAL(10,2),
+    gateway_fees DECIMAL(10,2),
+
+    -- Relationships
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (pilot_id) REFERENCES pilots (id),
+    FOREIGN KEY (editor_id) REFERENCES editors (id),
+    FOREIGN KEY (referral_id) REFERENCES referrals (id)
+    )
+    ''')
+    
+
+    else:
+        # Add new columns to existing bookings table
+        required_columns = {
+        "location_address": "TEXT",
+        "gps_link": "TEXT",
+        "property_type": "TEXT",
+        "indoor_outdoor": "TEXT",
+        "area_size": "REAL",
+        "area_unit": "TEXT",
+        "rooms_sections": "INTEGER",
+        "num_floors": "INTEGER",
+        "preferred_date": "DATE",
+        "preferred_time": "TEXT",
+        "special_requirements": "TEXT",
+        "drone_permissions_required": "BOOLEAN",
+        "base_package_cost": "REAL",
+        "total_cost": "REAL",
+        "custom_quote": "TEXT",
+        "description": "TEXT",
+        "delivery_video_link": "TEXT",
+        "pilot_earnings": "DECIMAL(10,2)",
+        "editor_earnings": "DECIMAL(10,2)",
+        "referral_earnings": "DECIMAL(10,2)",
+        "hmx_earnings": "DECIMAL(10,2)",
+        "gateway_fees": "DECIMAL(10,2)"
+    }
+
+    # Get existing columns
+        c.execute("PRAGMA table_info(bookings)")
+        existing_cols = [row[1] for row in c.fetchall()]
+
+    # Add only missing ones
+        for col, col_type in required_columns.items():
+            if col not in existing_cols:
+                print(f"Adding missing column: {col}")
+                c.execute(f"ALTER TABLE bookings ADD COLUMN {col} {col_type}")
+
+    # Check if messages table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='messages'")
+    if not c.fetchone():
+        print("Creating messages table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_id INTEGER,
+                receiver_id INTEGER,
+                message TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                read_at TIMESTAMP,
+                FOREIGN KEY (sender_id) REFERENCES users (id),
+                FOREIGN KEY (receiver_id) REFERENCES users (id)
+            )
+        ''')
+    
+    # Check if videos table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='videos'")
+    if not c.fetchone():
+        print("Creating videos table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS videos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER,
+                title TEXT,
+                description TEXT,
+                status TEXT DEFAULT 'pending',
+                review_type TEXT,
+                drive_link TEXT,
+                review_notes TEXT,
+                editor_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (booking_id) REFERENCES bookings (id),
+                FOREIGN KEY (editor_id) REFERENCES editors (id)
+            )
+        ''')
+    else:
+        # Check if editor_id column exists
+        c.execute("PRAGMA table_info(videos)")
+        columns = [column[1] for column in c.fetchall()]
+        if 'editor_id' not in columns:
+            print("Adding editor_id column to videos table...")
+            c.execute('ALTER TABLE videos ADD COLUMN editor_id INTEGER REFERENCES editors(id)')
+            print("editor_id column added successfully")
+    
+    # Check if referrals table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='referrals'")
+    if not c.fetchone():
+        print("Creating referrals table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS referrals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                email TEXT UNIQUE,
+                phone TEXT,
+                status TEXT DEFAULT 'pending',
+                commission_rate DECIMAL(5,2),
+                total_earnings DECIMAL(10,2) DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    else:
+        # Add missing columns to existing referrals table
+        new_columns = [
+            ('commission_rate', 'DECIMAL(5,2)'),
+            ('total_earnings', 'DECIMAL(10,2) DEFAULT 0'),
+            ('updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+        ]
+        
+        for column_name, column_type in new_columns:
+            try:
+                c.execute(f'ALTER TABLE referrals ADD COLUMN {column_name} {column_type}')
+                print(f"Added {column_name} column to referrals table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Error adding {column_name} column: {e}")
+                else:
+                    print(f"{column_name} column already exists")
+
+    # Check if video_reviews table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='video_reviews'")
+    if not c.fetchone():
+        print("Creating video_reviews table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS video_reviews (
+                video_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                client_id INTEGER,
+                editor_id INTEGER,
+                pilot_id INTEGER,
+                drive_link TEXT,
+                submitted_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                admin_comments TEXT,
+                pilot_comments TEXT,
+                editor_comments TEXT,
+                status TEXT DEFAULT 'submitted' CHECK (status IN ('submitted', 'review_changes', 'completed', 'forwarded_to_editor')),
+                submission_type TEXT DEFAULT 'pilot' CHECK (submission_type IN ('pilot', 'editor')),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (order_id) REFERENCES bookings (id),
+                FOREIGN KEY (client_id) REFERENCES users (id),
+                FOREIGN KEY (editor_id) REFERENCES editors (id),
+                FOREIGN KEY (pilot_id) REFERENCES pilots (id)
+            )
+        ''')
+        print("video_reviews table created successfully")
+
+    # Check if editors table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='editors'")
+    if not c.fetchone():
+        print("Creating editors table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS editors (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                full_name TEXT,
+                email TEXT UNIQUE NOT NULL,
+                phone TEXT,
+                password_hash TEXT NOT NULL,
+                role TEXT,
+                years_experience INTEGER,
+                primary_skills TEXT,
+                specialization TEXT,
+                portfolio_url TEXT,
+                time_zone TEXT,
+                government_id_url TEXT,
+                tax_gst_number TEXT,
+                status TEXT DEFAULT 'active',
+                approval_status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    else:
+        # Add missing columns to existing editors table
+        new_columns = [
+            ('password_hash', 'TEXT'),
+            ('experience', 'TEXT'),
+            ('equipment', 'TEXT'),
+            ('full_name', 'TEXT'),
+            ('years_experience', 'INTEGER'),
+            ('primary_skills', 'TEXT'),
+            ('specialization', 'TEXT'),
+            ('portfolio_url', 'TEXT'),
+            ('time_zone', 'TEXT'),
+            ('government_id_url', 'TEXT'),
+            ('tax_gst_number', 'TEXT'),
+            ('role', 'TEXT'),
+            ('approval_status', 'TEXT DEFAULT "pending"')
+        ]
+
+        for column_name, column_type in new_columns:
+            try:
+                c.execute(f'ALTER TABLE editors ADD COLUMN {column_name} {column_type}')
+                print(f"Added {column_name} column to editors table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Error adding {column_name} column: {e}")
+                else:
+                    print(f"{column_name} column already exists")
+
+        # Handle the password column migration
+        try:
+            # Check if the old password column exists and has NOT NULL constraint
+            c.execute("PRAGMA table_info(editors)")
+            columns = c.fetchall()
+            has_password_column = any(col[1] == 'password' for col in columns)
+            has_password_hash_column = any(col[1] == 'password_hash' for col in columns)
+
+            if has_password_column:
+                print("Found old password column, performing migration...")
+
+                # If password_hash doesn't exist, copy password data to it
+                if not has_password_hash_column:
+                    c.execute("ALTER TABLE editors ADD COLUMN password_hash TEXT")
+                    print("Added password_hash column")
+
+                # Copy existing password data to password_hash
+                c.execute("UPDATE editors SET password_hash = password WHERE password_hash IS NULL AND password IS NOT NULL")
+
+                # Create new table without the password column
+                c.execute('''
+                    CREATE TABLE editors_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        full_name TEXT,
+                        email TEXT UNIQUE NOT NULL,
+                        phone TEXT,
+                        password_hash TEXT NOT NULL,
+                        role TEXT,
+                        years_experience INTEGER,
+                        primary_skills TEXT,
+                        specialization TEXT,
+                        portfolio_url TEXT,
+                        time_zone TEXT,
+                        government_id_url TEXT,
+                        tax_gst_number TEXT,
+                        status TEXT DEFAULT 'active',
+                        approval_status TEXT DEFAULT 'pending',
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+
+                # Copy data from old table to new table
+                c.execute('''
+                    INSERT INTO editors_new (
+                        id, name, full_name, email, phone, password_hash, role, years_experience,
+                        primary_skills, specialization, portfolio_url, time_zone,
+                        government_id_url, tax_gst_number, status, approval_status, created_at
+                    )
+                    SELECT
+                        id, name, full_name, email, phone, password_hash, role, years_experience,
+                        primary_skills, specialization, portfolio_url, time_zone,
+                        government_id_url, tax_gst_number,
+                        COALESCE(status, 'active'),
+                        COALESCE(approval_status, 'pending'),
+                        created_at
+                    FROM editors
+                ''')
+
+                # Drop old table and rename new table
+                c.execute("DROP TABLE editors")
+                c.execute("ALTER TABLE editors_new RENAME TO editors")
+                print("Successfully migrated editors table structure")
+
+        except sqlite3.OperationalError as e:
+            print(f"Migration error (this might be normal for new installations): {e}")
+            pass
+
+    # Check if business_clients table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='business_clients'")
+    if not c.fetchone():
+        print("Creating business_clients table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS business_clients (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                business_name TEXT NOT NULL,
+                registration_number TEXT NOT NULL,
+                organization_type TEXT NOT NULL,
+                incorporation_date DATE NOT NULL,
+                official_address TEXT NOT NULL,
+                official_email TEXT UNIQUE NOT NULL,
+                phone TEXT NOT NULL,
+                contact_name TEXT NOT NULL,
+                contact_person_designation TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                registration_certificate_url TEXT,
+                tax_identification_url TEXT,
+                business_license_url TEXT,
+                address_proof_url TEXT,
+                status TEXT DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        print("Business clients table created successfully")
+    else:
+        print("Business clients table already exists")
+
+    # Check if editor_applications table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='editor_applications'")
+    if not c.fetchone():
+        print("Creating editor_applications table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS editor_applications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                full_name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                phone TEXT NOT NULL,
+                role TEXT NOT NULL,
+                years_experience INTEGER NOT NULL,
+                primary_skills TEXT NOT NULL,
+                specialization TEXT NOT NULL,
+                portfolio_url TEXT,
+                time_zone TEXT,
+                government_id_url TEXT,
+                tax_gst_number TEXT,
+                password_hash TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                admin_comments TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        print("Editor applications table created successfully")
+    else:
+        print("Editor applications table already exists")
+
+    # Check if referral_applications table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='referral_applications'")
+    if not c.fetchone():
+        print("Creating referral_applications table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS referral_applications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                phone TEXT NOT NULL,
+                location TEXT,
+                experience TEXT,
+                network_size TEXT,
+                referral_strategy TEXT,
+                social_media_links TEXT,
+                password_hash TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                admin_comments TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        print("Referral applications table created successfully")
+    else:
+        print("Referral applications table already exists")
+
+    # Check if business_client_applications table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='business_client_applications'")
+    if not c.fetchone():
+        print("Creating business_client_applications table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS business_client_applications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                business_name TEXT NOT NULL,
+                registration_number TEXT NOT NULL,
+                organization_type TEXT NOT NULL,
+                incorporation_date DATE NOT NULL,
+                official_address TEXT NOT NULL,
+                official_email TEXT UNIQUE NOT NULL,
+                phone TEXT NOT NULL,
+                contact_name TEXT NOT NULL,
+                contact_person_designation TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                registration_certificate_url TEXT,
+                tax_identification_url TEXT,
+                business_license_url TEXT,
+                address_proof_url TEXT,
+                status TEXT DEFAULT 'pending',
+                admin_comments TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        print("Business client applications table created successfully")
+    else:
+        print("Business client applications table already exists")
+
+    # Check if inquiries table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='inquiries'")
+    if not c.fetchone():
+        print("Creating inquiries table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS inquiries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                email TEXT,
+                phone TEXT,
+                message TEXT,
+                status TEXT DEFAULT 'new',
+                source TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    # Check if payments table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='payments'")
+    if not c.fetchone():
+        print("Creating payments table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS payments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER,
+                amount DECIMAL(10,2),
+                status TEXT DEFAULT 'pending',
+                payment_method TEXT,
+                transaction_id TEXT,
+                merchant_transaction_id TEXT,
+                phonepe_transaction_id TEXT,
+                payment_gateway TEXT DEFAULT 'phonepe',
+                gateway_response TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (booking_id) REFERENCES bookings (id)
+            )
+        ''')
+    else:
+        # Add PhonePe specific columns to existing payments table
+        new_columns = [
+            ('merchant_transaction_id', 'TEXT'),
+            ('phonepe_transaction_id', 'TEXT'),
+            ('payment_gateway', 'TEXT DEFAULT "phonepe"'),
+            ('gateway_response', 'TEXT')
+        ]
+        
+        for column_name, column_type in new_columns:
+            try:
+                c.execute(f'ALTER TABLE payments ADD COLUMN {column_name} {column_type}')
+                print(f"Added {column_name} column to payments table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Error adding {column_name} column: {e}")
+                else:
+                    print(f"{column_name} column already exists")
+    
+    # Check if cancellations table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cancellations'")
+    if not c.fetchone():
+        print("Creating cancellations table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS cancellations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER,
+                reason TEXT,
+                status TEXT DEFAULT 'pending',
+                refund_amount DECIMAL(10,2),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (booking_id) REFERENCES bookings (id)
+            )
+        ''')
+    
+    # Check if pre_list table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pre_list'")
+    if not c.fetchone():
+        print("Creating pre_list table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS pre_list (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                
+                status TEXT DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    # Check if otp_verifications table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='otp_verifications'")
+    if not c.fetchone():
+        print("Creating otp_verifications table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS otp_verifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL,
+                otp_code TEXT NOT NULL,
+                user_type TEXT NOT NULL,
+                user_data TEXT NOT NULL,
+                is_verified BOOLEAN DEFAULT FALSE,
+                expires_at TIMESTAMP NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        print("OTP verifications table created successfully")
+    else:
+        print("OTP verifications table already exists")
+    
+    # Check if pilot_applications table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pilot_applications'")
+    if not c.fetchone():
+        print("Creating pilot_applications table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS pilot_applications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                full_name TEXT,
+                email TEXT UNIQUE NOT NULL,
+                phone TEXT,
+                password TEXT,
+                password_hash TEXT NOT NULL,
+                date_of_birth DATE,
+                gender TEXT,
+                address TEXT,
+                government_id_proof TEXT,
+                license_number TEXT,
+                issuing_authority TEXT,
+                license_issue_date DATE,
+                license_expiry_date DATE,
+                drone_model TEXT,
+                drone_serial TEXT,
+                drone_uin TEXT,
+                drone_category TEXT,
+                total_flying_hours INTEGER,
+                flight_records TEXT,
+                insurance_policy TEXT,
+                insurance_validity DATE,
+                pilot_license_url TEXT,
+                id_proof_url TEXT,
+                training_certificate_url TEXT,
+                photograph_url TEXT,
+                insurance_certificate_url TEXT,
+                cities TEXT,
+                experience TEXT,
+                equipment TEXT,
+                portfolio_url TEXT,
+                bank_account TEXT,
+                status TEXT DEFAULT 'pending',
+                admin_comments TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        print("Pilot applications table created successfully")
+    else:
+        # Add missing columns to existing pilot_applications table
+        new_columns = [
+            ('password_hash', 'TEXT'),
+            ('full_name', 'TEXT'),
+            ('date_of_birth', 'DATE'),
+            ('gender', 'TEXT'),
+            ('address', 'TEXT'),
+            ('government_id_proof', 'TEXT'),
+            ('license_number', 'TEXT'),
+            ('issuing_authority', 'TEXT'),
+            ('license_issue_date', 'DATE'),
+            ('license_expiry_date', 'DATE'),
+            ('drone_model', 'TEXT'),
+            ('drone_serial', 'TEXT'),
+            ('drone_uin', 'TEXT'),
+            ('drone_category', 'TEXT'),
+            ('total_flying_hours', 'INTEGER'),
+            ('flight_records', 'TEXT'),
+            ('insurance_policy', 'TEXT'),
+            ('insurance_validity', 'DATE'),
+            ('pilot_license_url', 'TEXT'),
+            ('id_proof_url', 'TEXT'),
+            ('training_certificate_url', 'TEXT'),
+            ('photograph_url', 'TEXT'),
+            ('insurance_certificate_url', 'TEXT'),
+            ('portfolio_url', 'TEXT'),
+            ('bank_account', 'TEXT'),
+            ('admin_comments', 'TEXT')
+        ]
+
+        for column_name, column_type in new_columns:
+            try:
+                c.execute(f'ALTER TABLE pilot_applications ADD COLUMN {column_name} {column_type}')
+                print(f"Added {column_name} column to pilot_applications table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Error adding {column_name} column to pilot_applications: {e}")
+                else:
+                    print(f"{column_name} column already exists in pilot_applications")
+        print("Pilot applications table updated successfully")
+            # Check if email_templates table exists
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='email_templates'")
+    if not c.fetchone():
+        print("Creating email_templates table...")
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS email_templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE,
+                subject TEXT,
+                body TEXT
+            )
+        ''')
+
+        default_templates = [
+    ("approval", "Application Approved", 
+     "Dear {{applicant_name}},<br><br>Your {{application_type}} application has been approved.<br>{{admin_comments}}<br><br>Welcome aboard!"),
+
+    ("rejection", "Application Rejected", 
+     "Dear {{applicant_name}},<br><br>Unfortunately, your {{application_type}} application was not successful.<br>{{admin_comments}}"),
+
+    ("forgot_password", "Password Reset Request", 
+     "Hello {{name}},<br><br>Please use this link to reset your password: {{reset_link}}"),
+
+    ("welcome", "Welcome to HMX FPV Tours", 
+     "Hi {{name}},<br><br>We are excited to have you onboard as a {{user_role}}."),
+
+    ("otp", "Your OTP Code", 
+     "Dear {{name}},<br><br>Your OTP is <b>{{otp}}</b>. It expires in 10 minutes."),
+
+    ("order_created", "Your Booking {{booking_id}} is Created", 
+     "Dear {{name}},<br><br>Your booking {{booking_id}} for {{location}} on {{date}} has been created successfully."),
+
+    # 🚀 NEW: Booking status templates
+    ("order_approved", "Your Booking {{booking_id}} is Approved",
+     "Dear {{name}},<br><br>Your booking <b>{{booking_id}}</b> for {{location}} on {{date}} has been <b>approved</b>.<br><br>"
+     "Our pilot/editor team will coordinate with you shortly.<br><br>Regards,<br>Team HMX"),
+
+    ("order_cancelled", "Your Booking {{booking_id}} is Cancelled",
+     "Dear {{name}},<br><br>We regret to inform you that your booking <b>{{booking_id}}</b> has been <b>cancelled</b>.<br>"
+     "Reason: {{reason}}<br><br>If you believe this was a mistake, please contact our support team.<br><br>Regards,<br>Team HMX"),
+
+    ("order_deleted", "Your Booking {{booking_id}} was Deleted",
+     "Dear {{name}},<br><br>Your booking <b>{{booking_id}}</b> has been <b>removed</b> from our system.<br><br>"
+     "If you did not request this or have questions, please reach out to support.<br><br>Regards,<br>Team HMX"),
+
+    # Existing credential templates...
+    ("pilot_credentials", "Your Pilot Account Credentials",
+     "Hi {{name}},<br><br>Your pilot account has been created.<br><br>"
+     "<b>Email:</b> {{email}}<br>"
+     "<b>Password:</b> {{password}}<br><br>"
+     "Please log in and change your password after first login.<br><br>Regards,<br>Team HMX"),
+
+    ("editor_credentials", "Your Editor Account Credentials",
+     "Hi {{name}},<br><br>Your editor account has been created.<br><br>"
+     "<b>Email:</b> {{email}}<br>"
+     "<b>Password:</b> {{password}}<br><br>"
+     "Please log in and change your password after first login.<br><br>Regards,<br>Team HMX"),
+
+    ("referral_credentials", "Your Referral Partner Credentials",
+     "Hi {{name}},<br><br>Your referral partner account has been created.<br><br>"
+     "<b>Email:</b> {{email}}<br>"
+     "<b>Password:</b> {{password}}<br><br>"
+     "You can now log in and start referring clients.<br><br>Regards,<br>Team HMX"),
+
+    ("client_credentials", "Your Client Account Credentials",
+     "Hi {{name}},<br><br>Your client account has been created.<br><br>"
+     "<b>Email:</b> {{email}}<br>"
+     "<b>Password:</b> {{password}}<br><br>"
+     "You can log in and follow up on your bookings.<br><br>"
+     "Please change your password after first login.<br><br>Regards,<br>Team HMX"),
+    ]
+
+
+        for tpl in default_templates:
+            c.execute(
+                "INSERT OR IGNORE INTO email_templates (name, subject, body) VALUES (?, ?, ?)", tpl
+            )
+        print("Default email templates inserted")
+    else:
+        print("Email_templates table already exists")
+
+
+def _0002_index_set_1(c):
+    """Secondary indexes for the hot filter/join/sort columns"""
+    create_indexes(c, up_to=1)
+
+
+def _0003_login_identities_view(c):
+    """Every account table behind one view, so an email resolves in a single query.
+
+    Each branch is a plain SELECT on a table with a UNIQUE email, so SQLite
+    pushes `WHERE email = ?` into every branch and uses those indexes.
+    """
+    c.execute('DROP VIEW IF EXISTS login_identities')
+    c.execute('''
+        CREATE VIEW login_identities AS
+            SELECT 'pilots' AS source, 'pilot' AS role, id, email, name,
+                   COALESCE(NULLIF(password_hash, ''), password) AS password_hash,
+                   status, NULL AS business_name
+            FROM pilots
+            UNION ALL
+            SELECT 'editors', 'editor', id, email, name, password_hash, status, NULL
+            FROM editors
+            UNION ALL
+            SELECT 'users', role, id, email, username, password_hash, NULL,
+                   (SELECT bc.business_name FROM business_clients bc WHERE bc.email = users.email)
+            FROM users
+            UNION ALL
+            SELECT 'business_clients', 'client', id, email, contact_name, password_hash, status, business_name
+            FROM business_clients
+            UNION ALL
+            SELECT 'referrals', 'referral', id, email, name, NULL, status, NULL
+            FROM referrals
+    ''')
+
+
+def _0004_email_outbox(c):
+    """Durable queue of outgoing mail, drained by email_outbox.OutboxSender.
+
+    Times are unix epoch seconds so the sender can compare and back off
+    without parsing timestamps.
+    """
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            is_html INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            locked_at REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL,
+            send_seconds REAL
+        )
+    ''')
+    # Due messages for the sender, and recent sends for the latency stats
+    c.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_status_next ON email_outbox(status, next_attempt_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_status_sent ON email_outbox(status, sent_at)')
+
+
+def _0005_email_jobs(c):
+    """Broadcast jobs; their messages are email_outbox rows tagged with job_id"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS email_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template TEXT NOT NULL,
+            audience TEXT NOT NULL,
+            filters TEXT,
+            variables TEXT,
+            status TEXT NOT NULL DEFAULT 'rendering',
+            total INTEGER NOT NULL DEFAULT 0,
+            queued INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            send_until REAL,
+            error TEXT,
+            created_by INTEGER,
+            created_at REAL NOT NULL,
+            rendered_at REAL
+        )
+    ''')
+    c.execute('ALTER TABLE email_outbox ADD COLUMN job_id INTEGER')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_job_status ON email_outbox(job_id, status)')
+
+
+def _0006_payment_events(c):
+    """Inbox of PhonePe callbacks, one row per transaction + state (see payment_events.py)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS payment_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            merchant_transaction_id TEXT NOT NULL,
+            state TEXT NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            duplicates INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            locked_at REAL,
+            result TEXT,
+            last_error TEXT,
+            received_at REAL NOT NULL,
+            processed_at REAL,
+            UNIQUE (merchant_transaction_id, state)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_payment_events_status_next ON payment_events(status, next_attempt_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_payment_events_status_processed ON payment_events(status, processed_at)')
+
+
+def _0007_payments_reconciled_at(c):
+    """When the reconciler last claimed a pending payment (epoch seconds, see payment_reconciler.py)"""
+    c.execute('ALTER TABLE payments ADD COLUMN reconciled_at REAL')
+
+
+# (party, bookings id column or None, bookings amount column) as of migration 8
+_EARNINGS_PARTIES_V8 = (
+    ('pilot', 'pilot_id', 'pilot_earnings'),
+    ('editor', 'editor_id', 'editor_earnings'),
+    ('referral', 'referral_id', 'referral_earnings'),
+    ('hmx', None, 'hmx_earnings'),
+    ('gateway', None, 'gateway_fees'),
+)
+_EPOCH_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+
+def _earnings_completed_rows():
+    """INSERT of one 'completed' ledger row per party for the NEW booking"""
+    selects = []
+    for party, id_column, amount_column in _EARNINGS_PARTIES_V8:
+        party_id = f'COALESCE(NEW.{id_column}, 0)' if id_column else '0'
+        only_with = f' AND NEW.{id_column} IS NOT NULL' if party == 'referral' else ''
+        selects.append(
+            f"SELECT NEW.id, '{party}', {party_id}, 'completed', NEW.{amount_column}, 1, "
+            f"strftime('%Y-%m', COALESCE(NEW.completed_date, 'now')), {_EPOCH_NOW} "
+            f"WHERE NEW.status = 'completed' AND NEW.{amount_column} IS NOT NULL{only_with}"
+        )
+    return ('INSERT INTO earnings_ledger (booking_id, party, party_id, kind, amount, orders, month, recorded_at) '
+            + ' UNION ALL '.join(selects) + ';')
+
+
+_EARNINGS_REVERSE_OLD = f'''
+    INSERT INTO earnings_ledger (booking_id, party, party_id, kind, amount, orders, month, recorded_at)
+    SELECT booking_id, party, party_id, 'reversed', -SUM(amount), -SUM(orders), month, {_EPOCH_NOW}
+    FROM earnings_ledger WHERE booking_id = OLD.id
+    GROUP BY party, party_id, month
+    HAVING SUM(orders) != 0 OR ROUND(SUM(amount), 2) != 0;
+'''
+
+
+def _0008_earnings_ledger(c):
+    """Append-only earnings ledger fed by triggers on bookings, with monthly rollups per party (see earnings.py)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS earnings_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id INTEGER NOT NULL,
+            party TEXT NOT NULL,
+            party_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            amount REAL NOT NULL,
+            orders INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            recorded_at REAL NOT NULL
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_earnings_ledger_booking ON earnings_ledger(booking_id)')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS earnings_monthly (
+            party TEXT NOT NULL,
+            party_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            orders INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (party, party_id, month)
+        ) WITHOUT ROWID
+    ''')
+
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS earnings_ledger_rollup AFTER INSERT ON earnings_ledger
+        BEGIN
+            INSERT INTO earnings_monthly (party, party_id, month, total, orders)
+            VALUES (NEW.party, NEW.party_id, NEW.month, NEW.amount, NEW.orders)
+            ON CONFLICT (party, party_id, month) DO UPDATE
+            SET total = ROUND(total + excluded.total, 2), orders = orders + excluded.orders;
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS bookings_earnings_insert AFTER INSERT ON bookings
+        WHEN NEW.status = 'completed'
+        BEGIN
+            {_earnings_completed_rows()}
+        END
+    ''')
+    watched = ['status', 'completed_date'] + [
+        column for _, id_column, amount_column in _EARNINGS_PARTIES_V8
+        for column in (id_column, amount_column) if column
+    ]
+    changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in watched)
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS bookings_earnings_update AFTER UPDATE OF {', '.join(watched)} ON bookings
+        WHEN (OLD.status = 'completed' OR NEW.status = 'completed') AND ({changed})
+        BEGIN
+            {_EARNINGS_REVERSE_OLD}
+            {_earnings_completed_rows()}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS bookings_earnings_delete AFTER DELETE ON bookings
+        WHEN OLD.status = 'completed'
+        BEGIN
+            {_EARNINGS_REVERSE_OLD}
+        END
+    ''')
+
+    from earnings import backfill
+    added = backfill(c)
+    if added:
+        print(f"✅ Backfilled earnings for {added} completed bookings")
+
+
+# (metric, table, watched columns, bucket, amount, counted when) as of migration 9; {r} is NEW or OLD
+_DASHBOARD_METRICS_V9 = (
+    ('bookings_by_status', 'bookings', ('status',),
+     "COALESCE({r}.status, '')", '0', '1'),
+    ('bookings_paid_by_month', 'bookings', ('payment_status', 'payment_date', 'payment_amount'),
+     "COALESCE(strftime('%Y-%m', {r}.payment_date), '')", 'COALESCE({r}.payment_amount, 0)',
+     "{r}.payment_status = 'completed'"),
+    ('videos_by_status', 'videos', ('status', 'review_type'),
+     "COALESCE({r}.status, '') || '/' || COALESCE({r}.review_type, '')", '0', '1'),
+    ('payments_completed_by_month', 'payments', ('status', 'created_at', 'amount'),
+     "COALESCE(strftime('%Y-%m', {r}.created_at), '')", 'COALESCE({r}.amount, 0)',
+     "{r}.status = 'completed'"),
+)
+
+
+def _dashboard_bump(metric, bucket, amount, counted, row, sign):
+    """Add (sign=1) or remove (sign=-1) the NEW/OLD row from its bucket"""
+    sign = '' if sign > 0 else '-'
+    return f'''
+        INSERT INTO dashboard_counters (metric, bucket, count, total)
+        SELECT '{metric}', {bucket.format(r=row)}, {sign}1, {sign}{amount.format(r=row)}
+        WHERE {counted.format(r=row)}
+        ON CONFLICT (metric, bucket) DO UPDATE
+        SET count = count + excluded.count, total = ROUND(total + excluded.total, 2);
+    '''
+
+
+def _0009_dashboard_counters(c):
+    """Per-bucket counts and totals for the admin dashboard, kept by triggers (see dashboard_counters.py)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            metric TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+    for table in ('bookings', 'videos', 'payments'):
+        metrics = [m for m in _DASHBOARD_METRICS_V9 if m[1] == table]
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_dashboard_insert AFTER INSERT ON {table}
+            BEGIN
+                {''.join(_dashboard_bump(m[0], m[3], m[4], m[5], 'NEW', 1) for m in metrics)}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_dashboard_delete AFTER DELETE ON {table}
+            BEGIN
+                {''.join(_dashboard_bump(m[0], m[3], m[4], m[5], 'OLD', -1) for m in metrics)}
+            END
+        ''')
+        for metric, _, watched, bucket, amount, counted in metrics:
+            changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in watched)
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_dashboard_{metric} AFTER UPDATE OF {', '.join(watched)} ON {table}
+                WHEN {changed}
+                BEGIN
+                    {_dashboard_bump(metric, bucket, amount, counted, 'OLD', -1)}
+                    {_dashboard_bump(metric, bucket, amount, counted, 'NEW', 1)}
+                END
+            ''')
+
+    from dashboard_counters import rebuild
+    rebuild(c)
+
+
+def _0010_otp_store(c):
+    """otp_verifications rebuilt with one row per email, epoch times and resend counters (see otp_store.py)"""
+    c.execute('ALTER TABLE otp_verifications RENAME TO otp_verifications_v1')
+    c.execute('''
+        CREATE TABLE otp_verifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL UNIQUE,
+            otp_code TEXT NOT NULL,
+            user_type TEXT NOT NULL,
+            user_data TEXT NOT NULL,
+            is_verified INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            expires_at REAL NOT NULL,
+            sends INTEGER NOT NULL DEFAULT 1,
+            window_started_at REAL NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    # The sweeper's range delete
+    c.execute('CREATE INDEX IF NOT EXISTS idx_otp_verifications_expires ON otp_verifications(expires_at)')
+    # Latest code per address; expires_at was written in server local time, created_at in UTC
+    c.execute('''
+        INSERT INTO otp_verifications (email, otp_code, user_type, user_data, is_verified, expires_at,
+                                       window_started_at, created_at)
+        SELECT lower(trim(email)), otp_code, user_type, user_data, CASE WHEN is_verified THEN 1 ELSE 0 END,
+               COALESCE(CAST(strftime('%s', expires_at, 'utc') AS REAL), 0),
+               COALESCE(CAST(strftime('%s', created_at) AS REAL), 0),
+               COALESCE(CAST(strftime('%s', created_at) AS REAL), 0)
+        FROM otp_verifications_v1
+        WHERE id IN (SELECT MAX(id) FROM otp_verifications_v1 GROUP BY lower(trim(email)))
+    ''')
+    c.execute('DROP TABLE otp_verifications_v1')
+
+
+def _0011_index_set_2(c):
+    """Indexes for the admin list sorts and filters left out of set 1"""
+    create_indexes(c, up_to=2)
+
+
+def _0012_email_pacing(c):
+    """Shared send budget for broadcast mail, taken under each sender's claim (see email_outbox.py)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS email_pacing (
+            name TEXT PRIMARY KEY,
+            next_slot REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # Due transactional and due broadcast messages are claimed separately
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_email_outbox_mail_due ON email_outbox(status, next_attempt_at)
+                 WHERE job_id IS NULL''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_email_outbox_broadcast_due ON email_outbox(status, next_attempt_at)
+                 WHERE job_id IS NOT NULL''')
+
+
+def _0013_email_job_counts(c):
+    """Delivery counts kept on email_jobs as each message finishes, so progress survives the outbox purge"""
+    for column in ('sent', 'failed', 'cancelled'):
+        c.execute(f'ALTER TABLE email_jobs ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS email_outbox_job_counts AFTER UPDATE OF status ON email_outbox
+        WHEN NEW.job_id IS NOT NULL AND NEW.status IN ('sent', 'failed', 'cancelled') AND OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE email_jobs SET sent = sent + (NEW.status = 'sent'),
+                                  failed = failed + (NEW.status = 'failed'),
+                                  cancelled = cancelled + (NEW.status = 'cancelled')
+            WHERE id = NEW.job_id;
+        END
+    ''')
+    # Sent rows already purged are lost; count what the outbox still holds
+    c.execute('''
+        UPDATE email_jobs SET
+            sent = (SELECT COUNT(*) FROM email_outbox WHERE job_id = email_jobs.id AND status = 'sent'),
+            failed = (SELECT COUNT(*) FROM email_outbox WHERE job_id = email_jobs.id AND status = 'failed'),
+            cancelled = (SELECT COUNT(*) FROM email_outbox WHERE job_id = email_jobs.id AND status = 'cancelled')
+    ''')
+
+
+# (version, name, step) - append only, never renumber or edit a shipped step
+MIGRATIONS = [
+    (1, 'baseline schema', _0001_baseline_schema),
+    (2, 'index set 1', _0002_index_set_1),
+    (3, 'login identities view', _0003_login_identities_view),
+    (4, 'email outbox', _0004_email_outbox),
+    (5, 'email broadcast jobs', _0005_email_jobs),
+    (6, 'payment events inbox', _0006_payment_events),
+    (7, 'payments reconciled_at', _0007_payments_reconciled_at),
+    (8, 'earnings ledger', _0008_earnings_ledger),
+    (9, 'dashboard counters', _0009_dashboard_counters),
+    (10, 'otp store', _0010_otp_store),
+    (11, 'index set 2', _0011_index_set_2),
+    (12, 'email broadcast pacing', _0012_email_pacing),
+    (13, 'email job counts', _0013_email_job_counts),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+@contextmanager
+def migration_lock(database):
+    """Exclusive cross-process lock so only one worker/CLI migrates at a time"""
+    lock_path = os.path.abspath(database) + '.migrate.lock'
+    with open(lock_path, 'a+') as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def current_version(database):
+    """Schema version recorded in the database header (0 for a new/legacy file)"""
+    conn = sqlite3.connect(database, timeout=DatabaseConfig.BUSY_TIMEOUT)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _connect(database):
+    conn = sqlite3.connect(database, timeout=DatabaseConfig.BUSY_TIMEOUT, isolation_level=None)
+    apply_pragmas(conn, DatabaseConfig.pragmas())
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            duration_ms REAL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn
+
+
+def migrate(database=None):
+    """Apply every pending migration in order; returns the versions applied"""
+    database = database or DatabaseConfig.PATH
+    applied_now = []
+
+    with migration_lock(database):
+        conn = _connect(database)
+        try:
+            applied = {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+            for version, name, step in MIGRATIONS:
+                if version in applied:
+                    continue
+
+                print(f"\n=== Migration {version}: {name} ===")
+                started = time.perf_counter()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    step(conn.cursor())
+                    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                    conn.execute(
+                        'INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)',
+                        (version, name, duration_ms)
+                    )
+                    conn.execute(f'PRAGMA user_version = {version}')
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                print(f"✅ Migration {version} applied in {duration_ms} ms")
+                applied_now.append(version)
+
+            # Keep the header in step even if schema_version was written by hand
+            version = max(applied | set(applied_now), default=0)
+            if conn.execute('PRAGMA user_version').fetchone()[0] != version:
+                conn.execute(f'PRAGMA user_version = {version}')
+        finally:
+            conn.close()
+
+    return applied_now
+
+
+def ensure_schema(database=None, auto_migrate=True):
+    """Startup check: one header read, migrating only if the file is behind"""
+    database = database or DatabaseConfig.PATH
+    version = current_version(database)
+    if version >= LATEST_VERSION:
+        return version
+
+    if not auto_migrate:
+        raise SchemaOutOfDate(
+            f"{database} is at schema version {version}, code expects {LATEST_VERSION}. "
+            f"Run: python migrations.py"
+        )
+
+    print(f"⚠️  {database} is at schema version {version}, migrating to {LATEST_VERSION}")
+    migrate(database)
+    return current_version(database)
+
+
+def status(database):
+    conn = _connect(database)
+    try:
+        applied = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute('SELECT version, applied_at, duration_ms FROM schema_version')
+        }
+        header = conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+    print(f"Database: {os.path.abspath(database)} (user_version={header})")
+    for version, name, _ in MIGRATIONS:
+        if version in applied:
+            applied_at, duration_ms = applied[version]
+            print(f"  ✅ {version:>4}  {name}  (applied {applied_at}, {duration_ms} ms)")
+        else:
+            print(f"  ⏳ {version:>4}  {name}  (pending)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply hmx.db schema migrations')
+    parser.add_argument('--database', default=DatabaseConfig.PATH)
+    parser.add_argument('--status', action='store_true', help='show applied and pending migrations')
+    args = parser.parse_args()
+
+    if args.status:
+        status(args.database)
+        return 0
+
+    applied = migrate(args.database)
+    if applied:
+        print(f"\n✅ Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        print(f"✅ Schema already at version {LATEST_VERSION}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
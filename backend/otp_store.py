@@ -0,0 +1,223 @@
+"""One-time codes for signup and password reset, in otp_verifications.
+
+The table holds one row per email (UNIQUE), with every time in epoch
+seconds. issue() is a single UPSERT that replaces the previous code and
+enforces the resend limits in its WHERE clause, so every worker sees the
+same counts: one code per `cooldown`, and at most `max_sends` per `window`.
+A refused request raises OtpThrottled before anything reaches SMTP.
+
+verify() is a single UPDATE ... RETURNING that only matches an unused,
+unexpired code with attempts left, so two concurrent verifies cannot both
+succeed. A miss counts as a failed attempt, and after `max_attempts` the
+code is dead.
+
+OtpSweeper deletes rows whose code has expired and whose throttle window
+has passed. Keeping the rows until then stops a flood from resuming
+straight after a code expires.
+
+    python otp_store.py --stats     # rows, live codes, throttled emails
+    python otp_store.py --sweep     # delete expired rows now
+"""
+import argparse
+import json
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+
+import app_logging
+from config import DatabaseConfig, OtpConfig
+
+logger = app_logging.get_logger('otp')
+
+CODE_DIGITS = 6
+
+
+class OtpThrottled(Exception):
+    """Too many codes requested for one email; retry_after is in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Too many codes requested, retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+def normalize_email(email):
+    # Throttling is per mailbox, so case variants must count as one
+    return email.strip().lower()
+
+
+def generate_code():
+    return f'{secrets.randbelow(10 ** CODE_DIGITS):0{CODE_DIGITS}d}'
+
+
+def issue(conn, email, user_type, user_data, ttl=None, cooldown=None, max_sends=None, window=None):
+    """Store a fresh code for email and return it, or raise OtpThrottled"""
+    ttl = OtpConfig.TTL if ttl is None else ttl
+    cooldown = OtpConfig.RESEND_COOLDOWN if cooldown is None else cooldown
+    max_sends = OtpConfig.MAX_SENDS if max_sends is None else max_sends
+    window = OtpConfig.WINDOW if window is None else window
+    email = normalize_email(email)
+    code = generate_code()
+    now = time.time()
+
+    row = conn.execute('''
+        INSERT INTO otp_verifications (email, otp_code, user_type, user_data, expires_at, sends, window_started_at,
+                                       created_at)
+        VALUES (:email, :code, :user_type, :user_data, :expires_at, 1, :now, :now)
+        ON CONFLICT (email) DO UPDATE SET
+            otp_code = excluded.otp_code,
+            user_type = excluded.user_type,
+            user_data = excluded.user_data,
+            expires_at = excluded.expires_at,
+            is_verified = 0,
+            attempts = 0,
+            sends = CASE WHEN window_started_at <= :window_start THEN 1 ELSE sends + 1 END,
+            window_started_at = CASE WHEN window_started_at <= :window_start THEN :now ELSE window_started_at END,
+            created_at = :now
+        WHERE created_at <= :now - :cooldown AND (window_started_at <= :window_start OR sends < :max_sends)
+        RETURNING otp_code
+    ''', {'email': email, 'code': code, 'user_type': user_type, 'user_data': json.dumps(user_data),
+          'expires_at': now + ttl, 'now': now, 'window_start': now - window, 'cooldown': cooldown,
+          'max_sends': max_sends}).fetchone()
+    if row is None:
+        last_sent, sends, window_started = conn.execute(
+            'SELECT created_at, sends, window_started_at FROM otp_verifications WHERE email = ?', (email,)
+        ).fetchone()
+        conn.rollback()
+        wait = last_sent + cooldown - now
+        if sends >= max_sends:
+            wait = max(wait, window_started + window - now)
+        raise OtpThrottled(max(1, int(wait + 0.999)))
+    conn.commit()
+    return row[0]
+
+
+def verify(conn, email, code, max_attempts=None):
+    """{'success': True, 'user_type', 'user_data'} for a valid code, else {'success': False, 'error'}"""
+    max_attempts = OtpConfig.MAX_ATTEMPTS if max_attempts is None else max_attempts
+    if not email or not code:
+        return {'success': False, 'error': 'Email and OTP are required'}
+    email = normalize_email(email)
+    now = time.time()
+
+    row = conn.execute('''
+        UPDATE otp_verifications SET is_verified = 1
+        WHERE email = ? AND otp_code = ? AND expires_at > ? AND NOT is_verified AND attempts < ?
+        RETURNING user_type, user_data
+    ''', (email, str(code).strip(), now, max_attempts)).fetchone()
+    if row is not None:
+        conn.commit()
+        return {'success': True, 'user_type': row[0], 'user_data': json.loads(row[1])}
+
+    # Say why, and count the miss against a code that is still live
+    state = conn.execute('''
+        UPDATE otp_verifications SET attempts = attempts + (expires_at > ? AND NOT is_verified)
+        WHERE email = ?
+        RETURNING is_verified, expires_at, attempts
+    ''', (now, email)).fetchone()
+    conn.commit()
+    if state is None:
+        return {'success': False, 'error': 'No OTP found for this email'}
+    is_verified, expires_at, attempts = state
+    if is_verified:
+        return {'success': False, 'error': 'OTP already used'}
+    if expires_at <= now:
+        return {'success': False, 'error': 'OTP has expired'}
+    if attempts > max_attempts:
+        return {'success': False, 'error': 'Too many attempts, request a new OTP'}
+    return {'success': False, 'error': 'Invalid OTP'}
+
+
+def sweep(conn, window=None):
+    """Delete rows whose code has expired and whose throttle window is over; returns the count"""
+    window = OtpConfig.WINDOW if window is None else window
+    now = time.time()
+    deleted = conn.execute('DELETE FROM otp_verifications WHERE expires_at <= ? AND window_started_at <= ?',
+                           (now, now - window)).rowcount
+    conn.commit()
+    return deleted
+
+
+def otp_stats(conn, max_sends=None):
+    max_sends = OtpConfig.MAX_SENDS if max_sends is None else max_sends
+    now = time.time()
+    rows, live, expired, throttled = conn.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(expires_at > ? AND NOT is_verified), 0),
+               COALESCE(SUM(expires_at <= ?), 0),
+               COALESCE(SUM(sends >= ? AND window_started_at > ?), 0)
+        FROM otp_verifications
+    ''', (now, now, max_sends, now - OtpConfig.WINDOW)).fetchone()
+    return {'rows': rows, 'live': live, 'expired': expired, 'throttled': throttled}
+
+
+class OtpSweeper:
+    """Background thread that runs sweep() every `interval` seconds"""
+
+    def __init__(self, pool, interval=300.0):
+        self.pool = pool
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._runs = 0
+        self._deleted = 0
+        self._errors = 0
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='otp-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            conn = self.pool.acquire()
+            try:
+                self._deleted += sweep(conn)
+                self._runs += 1
+            except sqlite3.Error as e:
+                self._errors += 1
+                logger.warning('OTP sweep failed: %s', e)
+            finally:
+                self.pool.release(conn)
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'running': bool(self._thread and self._thread.is_alive()),
+            'runs': self._runs,
+            'deleted': self._deleted,
+            'errors': self._errors
+        }
+
+
+def main():
+    from migrations import ensure_schema
+
+    parser = argparse.ArgumentParser(description='Inspect and sweep otp_verifications')
+    parser.add_argument('--database', default=DatabaseConfig.PATH)
+    parser.add_argument('--stats', action='store_true', help='print row, live-code and throttled-email counts')
+    parser.add_argument('--sweep', action='store_true', help='delete expired rows now')
+    args = parser.parse_args()
+    if not args.stats and not args.sweep:
+        parser.error('pass --stats and/or --sweep')
+
+    ensure_schema(args.database, auto_migrate=DatabaseConfig.AUTO_MIGRATE)
+    conn = sqlite3.connect(args.database, timeout=DatabaseConfig.BUSY_TIMEOUT)
+    try:
+        if args.sweep:
+            print(f"✅ Deleted {sweep(conn)} expired OTP rows")
+        if args.stats:
+            print(json.dumps(otp_stats(conn), indent=2))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Password hashing off the request threads.
+
+scrypt/pbkdf2 are deliberately slow. Run inline they pin a gunicorn thread
+and hold the GIL between hashlib calls, so a burst of logins or sign-ups
+stalls every other request on that worker. PasswordHasher runs them in a
+small process pool instead. At most max_pending hashes may be queued or
+running per worker; a caller that cannot get a slot within queue_timeout
+gets HashingBusy, which the endpoints answer with 503.
+
+Pool processes are started with spawn, never fork: the app process has
+request and background threads, and a forked child can inherit a lock one
+of them held and hang. A spawned child re-imports the entry script, so
+code that starts background work at import time must check in_pool_process().
+The pool starts on the first hash (or from gunicorn's post_fork hook, see
+start()), never on import, and a pool process hashes inline itself.
+Each pool process exits as soon as the process that started it is gone,
+so a SIGKILLed or timed-out gunicorn worker leaves no hashing processes behind.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+import app_logging
+
+logger = app_logging.get_logger('password_hashing')
+
+
+class HashingBusy(RuntimeError):
+    """Every hashing slot stayed taken for queue_timeout seconds"""
+
+
+def normalize_method(method):
+    """Spell out werkzeug's defaults, e.g. 'scrypt' -> 'scrypt:32768:8:1'.
+
+    This is the prefix werkzeug writes before the first '$' of a hash, so
+    comparing it tells whether a stored hash uses the configured cost.
+    """
+    parts = method.split(':')
+    if parts[0] == 'scrypt':
+        defaults = ['scrypt', '32768', '8', '1']
+    elif parts[0] == 'pbkdf2':
+        defaults = ['pbkdf2', 'sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        raise ValueError(f'Unsupported password hash method: {method}')
+    return ':'.join(parts + defaults[len(parts):])
+
+
+# Module-level so the pool can pickle them by reference
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def _ready():
+    return True
+
+
+def _exit_with_parent():
+    """Pool initializer: end this process once the one that started it has exited"""
+    parent = multiprocessing.parent_process()
+
+    def watch():
+        parent.join()
+        os._exit(0)
+
+    threading.Thread(target=watch, name='parent-watch', daemon=True).start()
+
+
+def in_pool_process():
+    """True while a pool process is importing the entry script, which it does before running any hash"""
+    return multiprocessing.current_process().name != 'MainProcess'
+
+
+class PasswordHasher:
+    """Bounded process pool for generate/check_password_hash, one per worker process.
+
+    workers=0 hashes inline on the calling thread (still bounded by max_pending).
+    """
+
+    def __init__(self, method='scrypt', workers=2, max_pending=2, queue_timeout=2.0):
+        self.method = normalize_method(method)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self._restarts = 0
+        self._seconds = 0.0
+        self._max_seconds = 0.0
+
+    def start(self):
+        """Start the pool processes now, so the first login does not wait for them.
+
+        Call it from a running worker (gunicorn's post_fork hook), not at import time.
+        """
+        if self.workers > 0 and not in_pool_process():
+            executor = self._get_executor()
+            for _ in range(self.workers):
+                executor.submit(_ready)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # A pool inherited across fork belongs to the parent; never reuse it
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_exit_with_parent
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _restart(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._restarts += 1
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusy(f'Password hashing busy ({self.max_pending} pending)')
+
+        with self._lock:
+            self._pending += 1
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0 or in_pool_process():
+                return fn(*args)
+            try:
+                return self._get_executor().submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A pool process died (OOM killer, etc.); start a fresh pool and retry once
+                logger.warning('⚠️  Password hashing pool broke, restarting it')
+                self._restart()
+            try:
+                return self._get_executor().submit(fn, *args).result()
+            except BrokenProcessPool as e:
+                self._restart()
+                raise HashingBusy('Password hashing pool unavailable') from e
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with a different method or cost than configured"""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def record_rehash(self):
+        with self._lock:
+            self._rehashed += 1
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queue_timeout': self.queue_timeout,
+                'pending': self._pending,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'rehashed': self._rehashed,
+                'restarts': self._restarts,
+                'avg_seconds': round(self._seconds / self._completed, 4) if self._completed else 0.0,
+                'max_seconds': round(self._max_seconds, 4)
+            }
@@ -0,0 +1,397 @@
+"""Inbox of PhonePe payment callbacks.
+
+The callback endpoint only records the event (record_event) and answers;
+it never waits on the gateway. Events are keyed by merchant transaction id
++ state, so a callback PhonePe delivers twice is stored once and only
+counted as a duplicate. A PaymentEventProcessor then claims the due
+events, confirms each transaction's state with PhonePe once - however many
+events it has - and applies it to payments and bookings (apply_status).
+
+The processor runs as a thread in every app worker (PAYMENT_EVENTS_PROCESSOR=thread)
+or as a process of its own (PAYMENT_EVENTS_PROCESSOR=external):
+
+    python payment_events.py            # process events until stopped
+    python payment_events.py --once     # process what is due now and exit
+    python payment_events.py --stats    # inbox depth and processing latency
+"""
+import argparse
+import base64
+import json
+import random
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import app_logging
+from config import DatabaseConfig, PhonePeConfig
+from db_pool import ConnectionPool
+
+logger = app_logging.get_logger('payment_events')
+
+# Callback `code` -> payment state, for callbacks that carry no state of their own
+CODE_STATES = {
+    'PAYMENT_SUCCESS': 'COMPLETED',
+    'PAYMENT_ERROR': 'FAILED',
+    'PAYMENT_DECLINED': 'FAILED',
+    'TIMED_OUT': 'FAILED',
+    'PAYMENT_PENDING': 'PENDING'
+}
+
+# payments.status values a callback can no longer change
+FINAL_STATES = ('COMPLETED', 'FAILED', 'refunded')
+
+
+def parse_callback(callback_data):
+    """Flatten a callback into the fields the app uses.
+
+    PhonePe's server-to-server callback wraps everything in a base64
+    `response`; the redirect carries plain fields. Returns the flat dict
+    with merchantTransactionId and state set (state may be 'UNKNOWN').
+    Raises ValueError for a payload that is not shaped like a callback.
+    """
+    if not isinstance(callback_data or {}, dict):
+        raise ValueError('callback is not an object')
+    data = dict(callback_data or {})
+    if data.get('response'):
+        response = data.pop('response')
+        if not isinstance(response, str):
+            raise ValueError('response is not a base64 string')
+        decoded = json.loads(base64.b64decode(response))
+        if not isinstance(decoded, dict):
+            raise ValueError('decoded response is not an object')
+        inner = decoded.get('data') or {}
+        if not isinstance(inner, dict):
+            raise ValueError('decoded response data is not an object')
+        data.update(inner)
+        data.setdefault('code', decoded.get('code'))
+    if not isinstance(data.get('merchantTransactionId', ''), str):
+        raise ValueError('merchantTransactionId is not a string')
+    state = data.get('state') or CODE_STATES.get(data.get('code')) or 'UNKNOWN'
+    data['state'] = str(state).upper()
+    return data
+
+
+def record_event(conn, merchant_transaction_id, state, payload):
+    """Store a callback unless the same transaction + state is already stored.
+
+    Returns (event_id, duplicate).
+    """
+    now = time.time()
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO payment_events (merchant_transaction_id, state, payload, next_attempt_at, received_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (merchant_transaction_id, state, json.dumps(payload), now, now))
+    duplicate = cursor.rowcount == 0
+    if duplicate:
+        conn.execute('''
+            UPDATE payment_events SET duplicates = duplicates + 1 WHERE merchant_transaction_id = ? AND state = ?
+        ''', (merchant_transaction_id, state))
+        event_id = conn.execute(
+            'SELECT id FROM payment_events WHERE merchant_transaction_id = ? AND state = ?',
+            (merchant_transaction_id, state)
+        ).fetchone()[0]
+    else:
+        event_id = cursor.lastrowid
+    conn.commit()
+    return event_id, duplicate
+
+
+def apply_status(conn, merchant_transaction_id, status_result):
+    """Write a confirmed gateway status to payments (and bookings once paid).
+
+    Runs inside the caller's transaction and does not commit. Returns True
+    if the payment changed; a payment already in that state, or in a final
+    one, is left alone.
+    """
+    payment_status = status_result['status']
+    updated = conn.execute('''
+        UPDATE payments
+        SET status = ?, gateway_response = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE merchant_transaction_id = ? AND status != ? AND status NOT IN (?, ?, ?)
+    ''', (payment_status, json.dumps(status_result), merchant_transaction_id, payment_status) + FINAL_STATES).rowcount
+    if updated and payment_status == 'COMPLETED':
+        conn.execute('''
+            UPDATE bookings
+            SET payment_status = 'paid',
+                payment_amount = (SELECT amount FROM payments WHERE merchant_transaction_id = ?),
+                payment_date = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = (SELECT booking_id FROM payments WHERE merchant_transaction_id = ?)
+        ''', (merchant_transaction_id, merchant_transaction_id))
+    return bool(updated)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 4)
+
+
+def events_stats(conn, window=1000):
+    """Inbox depth per status and the latency of the last `window` processed events"""
+    now = time.time()
+    counts = dict(conn.execute('SELECT status, COUNT(*) FROM payment_events GROUP BY status').fetchall())
+    duplicates = conn.execute('SELECT COALESCE(SUM(duplicates), 0) FROM payment_events').fetchone()[0]
+    oldest = conn.execute("SELECT MIN(received_at) FROM payment_events WHERE status = 'pending'").fetchone()[0]
+    recent = [row[0] for row in conn.execute('''
+        SELECT processed_at - received_at FROM payment_events
+        WHERE status = 'processed' ORDER BY processed_at DESC LIMIT ?
+    ''', (window,)).fetchall()]
+    return {
+        'depth': counts.get('pending', 0) + counts.get('processing', 0),
+        'pending': counts.get('pending', 0),
+        'processing': counts.get('processing', 0),
+        'processed': counts.get('processed', 0),
+        'failed': counts.get('failed', 0),
+        'duplicates': duplicates,
+        'oldest_pending_seconds': round(now - oldest, 1) if oldest else 0.0,
+        'latency': {
+            # callback received -> applied, including retries
+            'samples': len(recent),
+            'p50_seconds': _percentile(recent, 0.5),
+            'p95_seconds': _percentile(recent, 0.95),
+            'max_seconds': round(max(recent), 4) if recent else None
+        }
+    }
+
+
+class PaymentEventProcessor:
+    """Background thread that confirms and applies recorded callbacks.
+
+    Events are claimed under BEGIN IMMEDIATE like email_outbox rows, so
+    processors in several workers never handle the same event twice. An
+    event whose status check fails (gateway unavailable, or still PENDING
+    although the callback reported a final state) is retried with
+    exponential backoff until max_attempts.
+    """
+
+    def __init__(self, pool, gateway, poll_interval=1.0, batch_size=20, max_attempts=10,
+                 retry_base=15.0, retry_max=1800.0, lease=120.0):
+        self.pool = pool
+        self.gateway = gateway
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counts = {'applied': 0, 'unchanged': 0, 'retried': 0, 'failed': 0, 'gateway_calls': 0, 'errors': 0}
+        self._last_error = None
+
+    @classmethod
+    def from_config(cls, pool, gateway, config=PhonePeConfig, **kwargs):
+        settings = dict(
+            poll_interval=config.EVENTS_POLL_INTERVAL,
+            batch_size=config.EVENTS_BATCH_SIZE,
+            max_attempts=config.EVENTS_MAX_ATTEMPTS,
+            retry_base=config.EVENTS_RETRY_BASE,
+            retry_max=config.EVENTS_RETRY_MAX,
+            lease=config.EVENTS_LEASE
+        )
+        settings.update(kwargs)
+        return cls(pool, gateway, **settings)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='payment-events', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Poll now instead of at the next interval (called after a callback is recorded)"""
+        self._wake.set()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except sqlite3.Error as e:
+                self._count('errors')
+                logger.warning('⚠️  Payment events poll failed: %s', e)
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self):
+        """Process every event due now (up to batch_size) and return how many were claimed"""
+        rows = self._claim()
+        by_transaction = OrderedDict()
+        for row in rows:
+            by_transaction.setdefault(row['merchant_transaction_id'], []).append(row)
+        for merchant_transaction_id, events in by_transaction.items():
+            self._process(merchant_transaction_id, events)
+        return len(rows)
+
+    def backoff(self, attempts):
+        """Seconds before retry number `attempts`, with +/- 25% jitter"""
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.75, 1.25)
+
+    def _count(self, key, error=None):
+        with self._lock:
+            self._counts[key] += 1
+            if error:
+                self._last_error = error
+
+    def _claim(self):
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            # Cheap read first, so idle processors never take the write lock
+            if not conn.execute('''
+                SELECT 1 FROM payment_events
+                WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'processing' AND locked_at < ?)
+                LIMIT 1
+            ''', (now, now - self.lease)).fetchone():
+                return []
+
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                "UPDATE payment_events SET status = 'pending', locked_at = NULL WHERE status = 'processing' AND locked_at < ?",
+                (now - self.lease,)
+            )
+            rows = conn.execute('''
+                SELECT id, merchant_transaction_id, state, attempts FROM payment_events
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT ?
+            ''', (now, self.batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE payment_events SET status = 'processing', locked_at = ? WHERE id = ?",
+                [(now, row['id']) for row in rows]
+            )
+            conn.commit()
+            return rows
+        finally:
+            self.pool.release(conn)
+
+    def _process(self, merchant_transaction_id, events):
+        conn = self.pool.acquire()
+        try:
+            payment = conn.execute(
+                'SELECT status FROM payments WHERE merchant_transaction_id = ?', (merchant_transaction_id,)
+            ).fetchone()
+            if payment is None:
+                self._finish(conn, events, 'failed', error='No payment with this merchant transaction id')
+                self._count('failed', f'{merchant_transaction_id}: unknown transaction')
+                return
+            if payment['status'] in FINAL_STATES:
+                # Already settled (e.g. by an earlier event); nothing to ask the gateway
+                self._finish(conn, events, 'processed', result=payment['status'])
+                self._count('unchanged')
+                return
+
+            self._count('gateway_calls')
+            status_result = self.gateway.check_payment_status(merchant_transaction_id)
+            if not status_result['success']:
+                self._retry(conn, events, status_result['error'])
+                return
+            confirmed = status_result['status']
+            if confirmed == 'PENDING' and any(event['state'] != 'PENDING' for event in events):
+                # The callback is ahead of the status API; ask again later
+                self._retry(conn, events, f'Gateway still reports PENDING for a {events[0]["state"]} callback')
+                return
+
+            conn.execute('BEGIN IMMEDIATE')
+            changed = apply_status(conn, merchant_transaction_id, status_result)
+            self._finish(conn, events, 'processed', result=confirmed)
+            self._count('applied' if changed else 'unchanged')
+            if changed:
+                logger.info('💳 Payment %s -> %s', merchant_transaction_id, confirmed)
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self._retry(conn, events, f"{type(e).__name__}: {str(e)}")
+        finally:
+            self.pool.release(conn)
+
+    def _finish(self, conn, events, status, result=None, error=None):
+        """Mark events done; commits (joining a transaction the caller opened)"""
+        conn.executemany('''
+            UPDATE payment_events SET status = ?, result = ?, last_error = ?, attempts = attempts + 1,
+                   processed_at = ?, locked_at = NULL
+            WHERE id = ?
+        ''', [(status, result, error, time.time(), event['id']) for event in events])
+        conn.commit()
+
+    def _retry(self, conn, events, error):
+        now = time.time()
+        for event in events:
+            attempts = event['attempts'] + 1
+            if attempts >= self.max_attempts:
+                conn.execute('''
+                    UPDATE payment_events SET status = 'failed', attempts = ?, last_error = ?, locked_at = NULL
+                    WHERE id = ?
+                ''', (attempts, error, event['id']))
+                self._count('failed', error)
+                logger.error('❌ Payment event %s (%s) failed after %s attempts: %s',
+                             event['id'], event['merchant_transaction_id'], attempts, error)
+            else:
+                conn.execute('''
+                    UPDATE payment_events SET status = 'pending', attempts = ?, next_attempt_at = ?,
+                           last_error = ?, locked_at = NULL
+                    WHERE id = ?
+                ''', (attempts, now + self.backoff(attempts), error, event['id']))
+                self._count('retried', error)
+        conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, running=bool(self._thread and self._thread.is_alive()),
+                        poll_interval=self.poll_interval, batch_size=self.batch_size,
+                        max_attempts=self.max_attempts, last_error=self._last_error)
+
+
+def main():
+    app_logging.setup()
+    from migrations import ensure_schema
+    from phonepe_payment import phonepe
+
+    parser = argparse.ArgumentParser(description='Confirm and apply recorded PhonePe callbacks')
+    parser.add_argument('--database', default=DatabaseConfig.PATH)
+    parser.add_argument('--once', action='store_true', help='process what is due now and exit')
+    parser.add_argument('--stats', action='store_true', help='print inbox depth and processing latency')
+    args = parser.parse_args()
+
+    ensure_schema(args.database, auto_migrate=DatabaseConfig.AUTO_MIGRATE)
+    pool = ConnectionPool(args.database, max_size=2, timeout=DatabaseConfig.BUSY_TIMEOUT,
+                          pragmas=DatabaseConfig.pragmas())
+    if args.stats:
+        conn = pool.acquire()
+        try:
+            print(json.dumps(events_stats(conn), indent=2))
+        finally:
+            pool.release(conn)
+        return 0
+
+    processor = PaymentEventProcessor.from_config(pool, phonepe)
+    if args.once:
+        while processor.run_once() == processor.batch_size:
+            pass
+        return 0
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: processor.stop())
+    print(f"💳 Payment event processor running on {args.database} (poll every {processor.poll_interval}s)")
+    try:
+        processor.run_forever()
+    except KeyboardInterrupt:
+        pass
+    pool.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
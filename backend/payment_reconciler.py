@@ -0,0 +1,268 @@
+"""Scheduled reconciliation of payments still pending.
+
+A payment stays 'pending' until its callback is applied (payment_events.py)
+or someone polls its status. The reconciler settles the ones whose callback
+never came: every `interval` seconds it claims due pending payments a page
+at a time, asks PhonePe for their status over a bounded thread pool and
+applies the answers with apply_status, one transaction per page.
+
+Claiming stamps payments.reconciled_at, so reconcilers in several workers
+never check the same payment in one round, and a payment is checked at most
+once per interval however many run. Payments younger than min_age are left
+to their callback.
+
+    python payment_reconciler.py              # run every interval until stopped
+    python payment_reconciler.py --once       # one full pass, then print its metrics
+    python payment_reconciler.py --stats      # pending count and lag
+"""
+import argparse
+import json
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app_logging
+from config import DatabaseConfig, PhonePeConfig
+from db_pool import ConnectionPool
+from payment_events import apply_status
+
+logger = app_logging.get_logger('payment_reconciler')
+
+PENDING_STATES = ('pending', 'PENDING')
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 1)
+
+
+def reconcile_lag(conn, min_age=120.0, interval=300.0):
+    """How far behind reconciliation is: pending payments, how many are due and the oldest one's age"""
+    now = time.time()
+    row = conn.execute('''
+        SELECT COUNT(*),
+               SUM(CASE WHEN created_at <= datetime(?, 'unixepoch')
+                         AND (reconciled_at IS NULL OR reconciled_at <= ?) THEN 1 ELSE 0 END),
+               MIN(created_at)
+        FROM payments WHERE status IN (?, ?)
+    ''', (now - min_age, now - interval) + PENDING_STATES).fetchone()
+    oldest = conn.execute("SELECT strftime('%s', ?)", (row[2],)).fetchone()[0] if row[2] else None
+    return {
+        'pending': row[0],
+        'due': row[1] or 0,
+        'oldest_pending_seconds': round(now - int(oldest), 1) if oldest else 0.0
+    }
+
+
+class PaymentReconciler:
+    """Background thread that settles pending payments against the gateway"""
+
+    def __init__(self, pool, gateway, interval=300.0, page_size=100, workers=2, min_age=120.0):
+        self.pool = pool
+        self.gateway = gateway
+        self.interval = interval
+        self.page_size = page_size
+        self.workers = workers
+        self.min_age = min_age
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._runs = 0
+        self._totals = {'checked': 0, 'applied': 0, 'unchanged': 0, 'still_pending': 0, 'unavailable': 0,
+                        'rejected': 0}
+        self._errors = 0
+        self._last = None
+        self._last_run_at = None
+
+    @classmethod
+    def from_config(cls, pool, gateway, config=PhonePeConfig, **kwargs):
+        settings = dict(
+            interval=config.RECONCILE_INTERVAL,
+            page_size=config.RECONCILE_PAGE_SIZE,
+            workers=config.RECONCILE_WORKERS,
+            min_age=config.RECONCILE_MIN_AGE
+        )
+        settings.update(kwargs)
+        return cls(pool, gateway, **settings)
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        if getattr(self.gateway, 'mock_mode', False):
+            # Mock status checks report every payment COMPLETED
+            logger.warning('⚠️  Payment reconciler not started: PhonePe is in mock mode')
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='payment-reconciler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._errors += 1
+                logger.warning('⚠️  Payment reconciliation failed: %s', e)
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        """Reconcile every due pending payment, page by page; returns this run's metrics"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='payment-reconcile')
+        started = time.perf_counter()
+        counts = dict.fromkeys(self._totals, 0)
+        lags = []
+        pages = 0
+        while not self._stop.is_set():
+            page = self._claim()
+            if not page:
+                break
+            pages += 1
+            results = list(self._executor.map(
+                lambda payment: self.gateway.check_payment_status(payment['merchant_transaction_id']), page
+            ))
+            page_counts, page_lags = self._apply(page, results)
+            for key, value in page_counts.items():
+                counts[key] += value
+            lags.extend(page_lags)
+            if page_counts['unavailable'] == len(page):
+                # Gateway down (or circuit open); the rest can wait for the next run
+                break
+            if len(page) < self.page_size:
+                break
+
+        elapsed = time.perf_counter() - started
+        result = dict(counts, pages=pages, seconds=round(elapsed, 3),
+                      per_sec=round(counts['checked'] / elapsed, 1) if elapsed and counts['checked'] else 0.0,
+                      # created -> settled, for the payments this run settled
+                      lag_p50_seconds=_percentile(lags, 0.5), lag_p95_seconds=_percentile(lags, 0.95),
+                      at=time.time())
+        with self._lock:
+            self._runs += 1
+            for key in self._totals:
+                self._totals[key] += counts[key]
+            self._last_run_at = result['at']
+            # Idle runs would hide the last one that did something
+            if counts['checked'] or self._last is None:
+                self._last = result
+        if counts['checked']:
+            logger.info('💳 Reconciled %s pending payments in %.1fs: %s settled, %s still pending, %s unavailable',
+                        counts['checked'], elapsed, counts['applied'], counts['still_pending'],
+                        counts['unavailable'])
+        return result
+
+    def _claim(self):
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            page = conn.execute('''
+                SELECT id, merchant_transaction_id, strftime('%s', created_at) AS created FROM payments
+                WHERE status IN (?, ?) AND merchant_transaction_id IS NOT NULL
+                  AND created_at <= datetime(?, 'unixepoch')
+                  AND (reconciled_at IS NULL OR reconciled_at <= ?)
+                ORDER BY id LIMIT ?
+            ''', PENDING_STATES + (now - self.min_age, now - self.interval, self.page_size)).fetchall()
+            conn.executemany('UPDATE payments SET reconciled_at = ? WHERE id = ?',
+                             [(now, payment['id']) for payment in page])
+            conn.commit()
+            return page
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.pool.release(conn)
+
+    def _apply(self, page, results):
+        """Apply one page of status results in a single transaction"""
+        counts = dict.fromkeys(self._totals, 0)
+        lags = []
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for payment, status_result in zip(page, results):
+                counts['checked'] += 1
+                if not status_result['success']:
+                    counts['unavailable' if status_result.get('unavailable') else 'rejected'] += 1
+                elif status_result['status'] in PENDING_STATES:
+                    counts['still_pending'] += 1
+                elif apply_status(conn, payment['merchant_transaction_id'], status_result):
+                    counts['applied'] += 1
+                    if payment['created']:
+                        lags.append(now - int(payment['created']))
+                else:
+                    counts['unchanged'] += 1
+            conn.commit()
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.pool.release(conn)
+        return counts, lags
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'interval': self.interval,
+                'page_size': self.page_size,
+                'workers': self.workers,
+                'min_age': self.min_age,
+                'runs': self._runs,
+                'errors': self._errors,
+                'totals': dict(self._totals),
+                'last_run_at': self._last_run_at,
+                'last': self._last
+            }
+
+
+def main():
+    app_logging.setup()
+    from migrations import ensure_schema
+    from phonepe_payment import phonepe
+
+    parser = argparse.ArgumentParser(description='Settle pending payments against PhonePe')
+    parser.add_argument('--database', default=DatabaseConfig.PATH)
+    parser.add_argument('--once', action='store_true', help='one full pass, then print its metrics')
+    parser.add_argument('--stats', action='store_true', help='print pending count and lag')
+    args = parser.parse_args()
+
+    ensure_schema(args.database, auto_migrate=DatabaseConfig.AUTO_MIGRATE)
+    pool = ConnectionPool(args.database, max_size=2, timeout=DatabaseConfig.BUSY_TIMEOUT,
+                          pragmas=DatabaseConfig.pragmas())
+    reconciler = PaymentReconciler.from_config(pool, phonepe)
+    if not args.stats and phonepe.mock_mode:
+        print("❌ PhonePe is in mock mode; set PHONEPE_MOCK_MODE=false (see stubs/phonepe_stub.py)")
+        return 1
+    if args.stats or args.once:
+        if args.once:
+            print(json.dumps(reconciler.run_once(), indent=2))
+        conn = pool.acquire()
+        try:
+            print(json.dumps(reconcile_lag(conn, reconciler.min_age, reconciler.interval), indent=2))
+        finally:
+            pool.release(conn)
+        return 0
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: reconciler.stop())
+    print(f"💳 Payment reconciler running on {args.database} (every {reconciler.interval}s, "
+          f"{reconciler.workers} concurrent status checks)")
+    try:
+        reconciler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    pool.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,39 +2,164 @@ import requests
 import json
 import hashlib
 import base64
+import os
+import threading
 import time
 import uuid
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+import app_logging
 from config import PhonePeConfig
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from metrics import Histogram
+
+logger = app_logging.get_logger('phonepe')
+
+OPERATIONS = ('pay', 'status', 'refund')
+OUTCOMES = ('ok', 'http_error', 'timeout', 'connection_error', 'circuit_open', 'busy')
+
+
+class GatewayUnavailable(Exception):
+    """The call was not answered in time, or was not attempted (circuit open / too many in flight)"""
+
 
 class PhonePePayment:
-    def __init__(self, mock_mode=False):
+    def __init__(self, mock_mode=None, config=PhonePeConfig):
         # PhonePe Configuration from config file
-        self.MERCHANT_ID = PhonePeConfig.MERCHANT_ID
-        self.SALT_KEY = PhonePeConfig.SALT_KEY
-        self.SALT_INDEX = PhonePeConfig.SALT_INDEX
+        self.MERCHANT_ID = config.MERCHANT_ID
+        self.SALT_KEY = config.SALT_KEY
+        self.SALT_INDEX = config.SALT_INDEX
         
         # Environment URLs
-        self.BASE_URL = PhonePeConfig.BASE_URL
-        self.REDIRECT_URL = PhonePeConfig.REDIRECT_URL
+        self.BASE_URL = config.BASE_URL
+        self.REDIRECT_URL = config.REDIRECT_URL
         
         # API Endpoints
-        self.PAY_API = PhonePeConfig.PAY_API
-        self.STATUS_API = PhonePeConfig.STATUS_API
-        self.REFUND_API = PhonePeConfig.REFUND_API
+        self.PAY_API = config.PAY_API
+        self.STATUS_API = config.STATUS_API
+        self.REFUND_API = config.REFUND_API
+
+        # HTTP client: one keep-alive session per process, (connect, read) timeouts,
+        # at most pool_size calls in flight and a breaker that fails fast while the gateway is down
+        self.timeout = (config.CONNECT_TIMEOUT, config.READ_TIMEOUT)
+        self.pool_size = config.POOL_SIZE
+        self.breaker = CircuitBreaker('PhonePe', config.CIRCUIT_FAILURES, config.CIRCUIT_RESET)
+        self.latency = {operation: Histogram() for operation in OPERATIONS}
+        self._outcomes = {operation: dict.fromkeys(OUTCOMES, 0) for operation in OPERATIONS}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
         
         # Mock mode for development/testing
-        self.mock_mode = mock_mode
+        self.mock_mode = config.MOCK_MODE if mock_mode is None else mock_mode
         if self.mock_mode:
-            print("⚠️  PhonePe running in MOCK MODE for development/testing")
+            logger.warning('⚠️  PhonePe running in MOCK MODE for development/testing')
+
+    def _get_session(self):
+        """Keep-alive session for this process (connections are not shared across a fork)"""
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+    def _count(self, operation, outcome):
+        with self._lock:
+            self._outcomes[operation][outcome] += 1
+
+    def _call(self, operation, method, url, **kwargs):
+        """Make one gateway call; raise GatewayUnavailable instead of waiting on a degraded gateway.
+
+        Timeouts, connection errors and 5xx responses count against the breaker;
+        any other response means the gateway is up and is returned to the caller.
+        """
+        with self._lock:
+            if self._in_flight >= self.pool_size:
+                self._outcomes[operation]['busy'] += 1
+                raise GatewayUnavailable('too many gateway calls in flight')
+            self._in_flight += 1
+        try:
+            try:
+                self.breaker.before_call()
+            except CircuitOpen as e:
+                self._count(operation, 'circuit_open')
+                raise GatewayUnavailable(str(e))
+
+            started = time.perf_counter()
+            try:
+                response = self._get_session().request(method, url, timeout=self.timeout, **kwargs)
+            except requests.Timeout as e:
+                self.breaker.record_failure()
+                self._count(operation, 'timeout')
+                raise GatewayUnavailable(f'timed out: {e}')
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                self._count(operation, 'connection_error')
+                raise GatewayUnavailable(f'connection failed: {e}')
+            finally:
+                self.latency[operation].observe(time.perf_counter() - started)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+            self._count(operation, 'http_error')
+            raise GatewayUnavailable(f'gateway answered {response.status_code}')
+        self.breaker.record_success()
+        self._count(operation, 'ok' if response.status_code == 200 else 'http_error')
+        return response
+
+    @staticmethod
+    def _unavailable(operation, error):
+        logger.warning('⚠️  PhonePe %s API unavailable: %s', operation, error)
+        return {
+            'success': False,
+            'error': 'Payment gateway is unavailable, please try again shortly',
+            'unavailable': True
+        }
+
+    @staticmethod
+    def _rejected(response, default):
+        try:
+            message = response.json().get('message')
+        except ValueError:
+            message = None
+        return {
+            'success': False,
+            'error': message or f'{default} (status {response.status_code})'
+        }
+
+    def stats(self):
+        """Client settings, breaker state, outcome counts and latency per operation"""
+        with self._lock:
+            outcomes = {operation: dict(counts) for operation, counts in self._outcomes.items()}
+            in_flight = self._in_flight
+        return {
+            'mock_mode': self.mock_mode,
+            'connect_timeout': self.timeout[0],
+            'read_timeout': self.timeout[1],
+            'pool_size': self.pool_size,
+            'in_flight': in_flight,
+            'circuit': self.breaker.stats(),
+            'operations': {
+                operation: {'outcomes': outcomes[operation], 'latency': self.latency[operation].snapshot()}
+                for operation in OPERATIONS
+            }
+        }
     
-    def generate_checksum(self, payload):
+    def generate_checksum(self, payload, endpoint="/pg/v1/pay"):
         """Generate SHA256 checksum for PhonePe API"""
         payload_str = json.dumps(payload)
         payload_base64 = base64.b64encode(payload_str.encode()).decode()
         
         # Create string to hash
-        string_to_hash = payload_base64 + "/pg/v1/pay" + self.SALT_KEY
+        string_to_hash = payload_base64 + endpoint + self.SALT_KEY
         
         # Generate SHA256 hash
         sha256_hash = hashlib.sha256(string_to_hash.encode()).hexdigest()
@@ -80,12 +205,7 @@ class PhonePePayment:
             }
             
             # Make API call
-            response = requests.post(
-                self.PAY_API,
-                json={"request": payload_base64},
-                headers=headers,
-                timeout=30
-            )
+            response = self._call('pay', 'POST', self.PAY_API, json={"request": payload_base64}, headers=headers)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -104,13 +224,13 @@ class PhonePePayment:
                         'error': response_data.get('message', 'Payment initiation failed')
                     }
             else:
-                # If API fails, fall back to mock mode
-                print(f"⚠️  PhonePe API failed (status {response.status_code}), falling back to mock mode")
-                return self._create_mock_payment_response(transaction_id, amount)
-                
+                return self._rejected(response, 'Payment initiation failed')
+
+        except GatewayUnavailable as e:
+            return self._unavailable('pay', e)
         except Exception as e:
-            print(f"⚠️  PhonePe API error: {str(e)}, falling back to mock mode")
-            return self._create_mock_payment_response(transaction_id, amount)
+            logger.warning('⚠️  PhonePe API error: %s', e)
+            return {'success': False, 'error': 'Payment initiation failed'}
     
     def _create_mock_payment_response(self, transaction_id, amount):
         """Create a mock payment response for development/testing"""
@@ -129,7 +249,7 @@ class PhonePePayment:
         """Check payment status using merchant transaction ID"""
         try:
             # If in mock mode, return mock status
-            if self.mock_mode or merchant_transaction_id.startswith('TXN_'):
+            if self.mock_mode:
                 return self._create_mock_status_response(merchant_transaction_id)
             
             # Prepare payload
@@ -149,7 +269,7 @@ class PhonePePayment:
             
             # Make API call
             url = f"{self.STATUS_API}/{self.MERCHANT_ID}/{merchant_transaction_id}"
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self._call('status', 'GET', url, headers=headers)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -158,7 +278,7 @@ class PhonePePayment:
                     payment_info = response_data['data']
                     return {
                         'success': True,
-                        'status': payment_info.get('paymentState', 'UNKNOWN'),
+                        'status': payment_info.get('state') or payment_info.get('paymentState', 'UNKNOWN'),
                         'transaction_id': payment_info.get('merchantTransactionId'),
                         'amount': payment_info.get('amount', 0) / 100,  # Convert from paise to rupees
                         'payment_instrument': payment_info.get('paymentInstrument', {}),
@@ -171,13 +291,13 @@ class PhonePePayment:
                         'error': response_data.get('message', 'Status check failed')
                     }
             else:
-                # If API fails, fall back to mock mode
-                print(f"⚠️  PhonePe status API failed (status {response.status_code}), falling back to mock mode")
-                return self._create_mock_status_response(merchant_transaction_id)
-                
+                return self._rejected(response, 'Status check failed')
+
+        except GatewayUnavailable as e:
+            return self._unavailable('status', e)
         except Exception as e:
-            print(f"⚠️  PhonePe status API error: {str(e)}, falling back to mock mode")
-            return self._create_mock_status_response(merchant_transaction_id)
+            logger.warning('⚠️  PhonePe status API error: %s', e)
+            return {'success': False, 'error': 'Status check failed'}
     
     def _create_mock_status_response(self, merchant_transaction_id):
         """Create a mock status response for development/testing"""
@@ -216,7 +336,7 @@ class PhonePePayment:
             }
             
             # Generate checksum
-            checksum, payload_base64 = self.generate_checksum(payload)
+            checksum, payload_base64 = self.generate_checksum(payload, "/pg/v1/refund")
             
             # Prepare headers
             headers = {
@@ -225,12 +345,7 @@ class PhonePePayment:
             }
             
             # Make API call
-            response = requests.post(
-                self.REFUND_API,
-                json={"request": payload_base64},
-                headers=headers,
-                timeout=30
-            )
+            response = self._call('refund', 'POST', self.REFUND_API, json={"request": payload_base64}, headers=headers)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -247,13 +362,13 @@ class PhonePePayment:
                         'error': response_data.get('message', 'Refund initiation failed')
                     }
             else:
-                # If API fails, fall back to mock mode
-                print(f"⚠️  PhonePe refund API failed (status {response.status_code}), falling back to mock mode")
-                return self._create_mock_refund_response(refund_transaction_id, refund_amount)
-                
+                return self._rejected(response, 'Refund initiation failed')
+
+        except GatewayUnavailable as e:
+            return self._unavailable('refund', e)
         except Exception as e:
-            print(f"⚠️  PhonePe refund API error: {str(e)}, falling back to mock mode")
-            return self._create_mock_refund_response(refund_transaction_id, refund_amount)
+            logger.warning('⚠️  PhonePe refund API error: %s', e)
+            return {'success': False, 'error': 'Refund initiation failed'}
     
     def _create_mock_refund_response(self, refund_transaction_id, refund_amount):
         """Create a mock refund response for development/testing"""
@@ -292,5 +407,5 @@ class PhonePePayment:
         except Exception as e:
             return False, f"Callback validation failed: {str(e)}"
 
-# Create global instance with mock mode enabled for development
-phonepe = PhonePePayment(mock_mode=True)
+# Global instance; mock mode follows PHONEPE_MOCK_MODE (on by default for development)
+phonepe = PhonePePayment()
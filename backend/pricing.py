@@ -0,0 +1,63 @@
+"""Booking price quotes, shared by /api/cost/preview and booking creation.
+
+The table is built once at import. An area maps to its slab with bisect,
+and the price of a (category, slab, floors) combination is memoized, so a
+quote is a dict lookup after the first time.
+"""
+import math
+from bisect import bisect_left
+from functools import lru_cache
+
+# Base price per category for each area slab (up to 1000, 5000, 10000, 50000 sq ft)
+COSTING_TABLE = {
+    "Retail Store / Showroom":      (5999,  9999,  15999, 20999),
+    "Restaurants & Cafes":          (7999, 11999, 19999, 25999),
+    "Fitness & Sports Arenas":      (9999, 13999, 22999, 31999),
+    "Resorts & Farmstays / Hotels": (11999, 17999, 29999, 39999),
+    "Real Estate Property":         (13999, 23999, 37999, 49999),
+    "Shopping Mall / Complex":      (15999, 29999, 47999, 63999),
+    "Adventure / Water Parks":      (12999, 23999, 39999, 55999),
+    "Gaming & Entertainment Zones": (10999, 19999, 33999, 45999),
+}
+AREA_RANGES = (1000, 5000, 10000, 50000)
+# Each floor above the first adds 10% of the base price
+FLOOR_SURCHARGE = 0.1
+# Floors priced at most; the tallest buildings have under 200
+MAX_FLOORS = 200
+# Items accepted by one /api/cost/preview/batch request
+MAX_BATCH_QUOTES = 500
+
+
+@lru_cache(maxsize=1024)
+def _slab_price(category, slab, num_floors):
+    base_cost = COSTING_TABLE[category][slab]
+    return base_cost, int(base_cost * (1 + FLOOR_SURCHARGE * (num_floors - 1)))
+
+
+def quote(category, area_sqft, num_floors=1):
+    """Return (base_cost, final_cost, error); error is "Invalid category",
+    "Invalid area" or "Custom Quote" (over the largest slab), with both costs None"""
+    if not isinstance(category, str) or category not in COSTING_TABLE:
+        return None, None, "Invalid category"
+    try:
+        area_sqft = float(area_sqft)
+    except (TypeError, ValueError):
+        return None, None, "Invalid area"
+    if math.isnan(area_sqft):
+        return None, None, "Invalid area"
+    try:
+        num_floors = min(MAX_FLOORS, max(1, int(num_floors)))
+    except (TypeError, ValueError, OverflowError):
+        # Infinity and 1e309 cannot be an int; like any unusable value they price one floor
+        num_floors = 1
+
+    slab = bisect_left(AREA_RANGES, area_sqft)
+    if slab == len(AREA_RANGES):
+        return None, None, "Custom Quote"
+    base_cost, final_cost = _slab_price(category, slab, num_floors)
+    return base_cost, final_cost, None
+
+
+def cache_stats():
+    info = _slab_price.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
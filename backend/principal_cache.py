@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Table each token role is loaded from; any other role (admin, client) lives in users
+ROLE_TABLES = {
+    'pilot': 'pilots',
+    'editor': 'editors',
+    'referral': 'referrals',
+}
+
+
+def table_for_role(role):
+    return ROLE_TABLES.get(role, 'users')
+
+
+class PrincipalCache:
+    """TTL + LRU cache of the account row behind a token, keyed by (role, user_id).
+
+    Each worker process has its own cache. Writes made through this worker
+    invalidate the entry right away; other workers pick the change up once
+    their entry expires, so the TTL bounds how stale a principal can be.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, role, user_id):
+        """Copy of the cached row, or None on a miss"""
+        key = (role, str(user_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            row, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        # Handlers may modify current_user; never hand out the cached dict itself
+        return dict(row)
+
+    def put(self, role, user_id, row):
+        if not self.enabled:
+            return
+        key = (role, str(user_id))
+        with self._lock:
+            self._entries[key] = (dict(row), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def load(self, role, user_id, fetch):
+        """Cached row for (role, user_id), calling fetch() on a miss; None if there is no such account"""
+        row = self.get(role, user_id)
+        if row is None:
+            row = fetch()
+            if row is None:
+                return None
+            row = dict(row)
+            self.put(role, user_id, row)
+        return row
+
+    def invalidate(self, table, user_id=None):
+        """Drop entries loaded from `table` (one id, or all of them when user_id is None)"""
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if table_for_role(key[0]) == table and (user_id is None or key[1] == str(user_id))
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'ttl': self.ttl,
+                'max_entries': self.max_entries,
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,165 @@
+"""Per-endpoint request timing and SQL accounting.
+
+RequestMetrics.init_app() hooks before_request/after_request and registers
+itself as an observer of the connection pool (db_pool.InstrumentedCursor),
+so every statement and fetch made while a request is running is added to
+that request: wall time, time in SQLite, statement count and rows fetched.
+
+Each response gets a Server-Timing header (db, app, total), which browser
+dev tools show next to the request. Streamed responses (exports, NDJSON
+lists) are recorded when they are closed; their header only covers the
+work done before the first byte. Per endpoint it keeps cumulative
+histograms (exported to Prometheus) and rolling ones whose p50/p95/p99
+cover the last `window` seconds (the JSON view).
+"""
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+from metrics import LATENCY_BUCKETS, Histogram, RollingHistogram
+
+# Most requests finish in a few milliseconds
+REQUEST_BUCKETS = (0.001, 0.0025) + LATENCY_BUCKETS
+
+
+class EndpointStats:
+    def __init__(self, window):
+        self.wall = Histogram(REQUEST_BUCKETS)
+        self.db = Histogram(REQUEST_BUCKETS)
+        self.recent_wall = RollingHistogram(REQUEST_BUCKETS, window=window)
+        self.recent_db = RollingHistogram(REQUEST_BUCKETS, window=window)
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.rows = 0
+
+
+class RequestMetrics:
+    def __init__(self, window=300.0, server_timing=True):
+        self.window = window
+        self.server_timing = server_timing
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def init_app(self, app, pool):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        pool.add_observer(self)
+
+    # Pool observer: only statements made inside a request are attributed
+
+    def query(self, sql, params, seconds):
+        if has_request_context():
+            timing = g.get('_timing')
+            if timing is not None:
+                timing[1] += seconds
+                timing[2] += 1
+
+    def rows(self, count, seconds):
+        if has_request_context():
+            timing = g.get('_timing')
+            if timing is not None:
+                timing[1] += seconds
+                timing[3] += count
+
+    # Request hooks
+
+    def _before(self):
+        # [started, db seconds, statements, rows]
+        g._timing = [time.perf_counter(), 0.0, 0, 0]
+
+    def _after(self, response):
+        timing = g.get('_timing')
+        if timing is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        if response.is_streamed:
+            # The body (and its queries) is produced after this hook; count it once the response is closed
+            response.call_on_close(lambda: self._record(endpoint, timing, response.status_code))
+        else:
+            self._record(endpoint, timing, response.status_code)
+
+        if self.server_timing:
+            started, db_seconds, queries, rows = timing
+            wall = time.perf_counter() - started
+            response.headers['Server-Timing'] = (
+                f'db;dur={db_seconds * 1000:.1f};desc="{queries} queries, {rows} rows", '
+                f'app;dur={(wall - db_seconds) * 1000:.1f}, total;dur={wall * 1000:.1f}'
+            )
+        return response
+
+    def _record(self, endpoint, timing, status_code):
+        started, db_seconds, queries, rows = timing
+        wall = time.perf_counter() - started
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            with self._lock:
+                stats = self._endpoints.setdefault(endpoint, EndpointStats(self.window))
+        stats.wall.observe(wall)
+        stats.recent_wall.observe(wall)
+        stats.db.observe(db_seconds)
+        stats.recent_db.observe(db_seconds)
+        with self._lock:
+            stats.requests += 1
+            stats.queries += queries
+            stats.rows += rows
+            if status_code >= 500:
+                stats.errors += 1
+
+    def snapshot(self):
+        """Per endpoint: counts, averages and the rolling wall/db percentiles"""
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        result = {}
+        for endpoint, stats in sorted(endpoints.items()):
+            wall = stats.recent_wall.snapshot()
+            db = stats.recent_db.snapshot()
+            requests = stats.requests
+            result[endpoint] = {
+                'requests': requests,
+                'errors': stats.errors,
+                'queries_per_request': round(stats.queries / requests, 2) if requests else 0.0,
+                'rows_per_request': round(stats.rows / requests, 2) if requests else 0.0,
+                'recent_requests': wall['count'],
+                'wall_p50_ms': _ms(wall['p50_seconds']),
+                'wall_p95_ms': _ms(wall['p95_seconds']),
+                'wall_p99_ms': _ms(wall['p99_seconds']),
+                'wall_max_ms': _ms(wall['max_seconds']),
+                'db_p50_ms': _ms(db['p50_seconds']),
+                'db_p95_ms': _ms(db['p95_seconds']),
+                'db_p99_ms': _ms(db['p99_seconds']),
+                'db_share': round(db['sum_seconds'] / wall['sum_seconds'], 3) if wall['sum_seconds'] else 0.0
+            }
+        return {'window_seconds': self.window, 'since': self._started_at, 'endpoints': result}
+
+    def prometheus(self):
+        """Prometheus text exposition (cumulative since the worker started)"""
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        lines = []
+        for name, attribute, help_text in (
+            ('hmx_request_duration_seconds', 'wall', 'Request wall time by endpoint'),
+            ('hmx_request_db_seconds', 'db', 'Time spent in SQLite per request by endpoint'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for endpoint, stats in sorted(endpoints.items()):
+                snapshot = getattr(stats, attribute).snapshot()
+                for bound, count in snapshot['buckets'].items():
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {snapshot["sum_seconds"]}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {snapshot["count"]}')
+        for name, attribute, help_text in (
+            ('hmx_request_queries_total', 'queries', 'SQL statements executed by endpoint'),
+            ('hmx_request_rows_total', 'rows', 'Rows fetched by endpoint'),
+            ('hmx_request_errors_total', 'errors', 'Responses with a 5xx status by endpoint'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for endpoint, stats in sorted(endpoints.items()):
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {getattr(stats, attribute)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
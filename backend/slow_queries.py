@@ -0,0 +1,251 @@
+"""Slow-query log: statements over a threshold, with their query plan, aggregated by shape.
+
+SlowQueryLog is a connection-pool observer (see db_pool.InstrumentedCursor).
+A statement's time is its execute plus the fetches that follow it on the
+same thread, so a join that streams rows through fetchall() counts in full.
+A statement is judged when the thread runs its next one, or when the
+request ends.
+
+A statement at or over the threshold is logged with the shape of its
+parameters (types only, never values: they hold emails, OTPs and phone
+numbers) and its EXPLAIN QUERY PLAN. The plan is taken once per normalized
+statement on a separate read-only connection, so it never touches the
+caller's transaction. Entries are aggregated by normalized text (literals
+and IN lists folded) for the /api/admin/slow-queries report.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import has_request_context, request
+
+import app_logging
+
+logger = app_logging.get_logger('slow_queries')
+
+# Distinct statements kept per worker; the one with the least total time goes first
+MAX_STATEMENTS = 500
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_SPACES = re.compile(r'\s+')
+# Statements EXPLAIN QUERY PLAN has something to say about
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def normalize(sql):
+    """Statement text with comments, literals and IN lists folded, for grouping"""
+    text = _COMMENTS.sub(' ', sql)
+    text = _STRINGS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _SPACES.sub(' ', text).strip()
+    return _IN_LISTS.sub('IN (...)', text)
+
+
+def parameter_shape(params):
+    """`(int, str, None)` or `{email: str}`: the types bound to a statement, not the values"""
+    if params is None:
+        return 'executemany'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{key}: {_type_name(value)}' for key, value in params.items()) + '}'
+    return '(' + ', '.join(_type_name(value) for value in params) + ')'
+
+
+def _type_name(value):
+    return 'None' if value is None else type(value).__name__
+
+
+def render_plan(rows):
+    """EXPLAIN QUERY PLAN rows (id, parent, notused, detail) as indented lines"""
+    depth = {0: -1}
+    lines = []
+    for plan_id, parent, _, detail in rows:
+        depth[plan_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[plan_id] + detail)
+    return lines
+
+
+def full_scans(plan):
+    """Tables the plan reads end to end without an index"""
+    tables = []
+    for line in plan or ():
+        words = line.split()
+        if words[:1] == ['SCAN'] and 'USING' not in words and 'CONSTANT' not in words:
+            tables.append(words[2] if words[1] == 'TABLE' else words[1])
+    return tables
+
+
+class SlowStatement:
+    def __init__(self, statement, plan):
+        self.statement = statement
+        self.plan = plan
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.params = None
+        self.sources = {}
+        self.first_seen = time.time()
+        self.last_seen = self.first_seen
+
+    def as_dict(self):
+        return {
+            'statement': self.statement,
+            'count': self.count,
+            'total_ms': round(self.total_seconds * 1000, 1),
+            'avg_ms': round(self.total_seconds / self.count * 1000, 1),
+            'max_ms': round(self.max_seconds * 1000, 1),
+            'last_ms': round(self.last_seconds * 1000, 1),
+            'params': self.params,
+            'plan': self.plan,
+            'full_scans': full_scans(self.plan),
+            'temp_btree': any('USE TEMP B-TREE' in line for line in self.plan or ()),
+            'sources': dict(sorted(self.sources.items(), key=lambda item: -item[1])),
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen
+        }
+
+
+class SlowQueryLog:
+    SORT_KEYS = {
+        'total': lambda entry: entry.total_seconds,
+        'max': lambda entry: entry.max_seconds,
+        'count': lambda entry: entry.count,
+        'avg': lambda entry: entry.total_seconds / entry.count
+    }
+
+    def __init__(self, threshold_ms=50.0, explain=True):
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+        self.database = None
+        self._statements = {}
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = threading.local()
+        self._explain_conn = None
+        self._explain_pid = None
+        self._explain_lock = threading.Lock()
+        self.slow = 0
+        self.started_at = time.time()
+
+    def init_app(self, app, pool):
+        self.database = pool.database
+        app.teardown_request(self._teardown)
+        pool.add_observer(self)
+
+    # Pool observer
+
+    def query(self, sql, params, seconds):
+        pending = getattr(self._pending, 'statement', None)
+        if pending is not None:
+            self._judge(pending)
+        self._pending.statement = [sql, params, seconds, _source()]
+
+    def rows(self, count, seconds):
+        pending = getattr(self._pending, 'statement', None)
+        if pending is not None:
+            pending[2] += seconds
+
+    def _teardown(self, exc=None):
+        pending = getattr(self._pending, 'statement', None)
+        self._pending.statement = None
+        if pending is not None:
+            self._judge(pending)
+
+    def _judge(self, pending):
+        sql, params, seconds, source = pending
+        if seconds < self.threshold:
+            return
+        self._pending.statement = None
+        statement = normalize(sql)
+        shape = parameter_shape(params)
+        plan = self._plan(statement, sql, params)
+        self.record(statement, seconds, shape, plan, source)
+        logger.warning('Slow query %.1fms in %s: %s', seconds * 1000, source, statement,
+                       extra={'params': shape, 'plan': ' | '.join(line.strip() for line in plan or ())})
+
+    def record(self, statement, seconds, shape, plan, source):
+        with self._lock:
+            entry = self._statements.get(statement)
+            if entry is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    smallest = min(self._statements.values(), key=lambda e: e.total_seconds)
+                    del self._statements[smallest.statement]
+                entry = self._statements[statement] = SlowStatement(statement, plan)
+            entry.count += 1
+            entry.total_seconds += seconds
+            entry.max_seconds = max(entry.max_seconds, seconds)
+            entry.last_seconds = seconds
+            entry.params = shape
+            entry.sources[source] = entry.sources.get(source, 0) + 1
+            entry.last_seen = time.time()
+            self.slow += 1
+
+    # Plans
+
+    def _plan(self, statement, sql, params):
+        if not self.explain or not self.database:
+            return None
+        with self._lock:
+            if statement in self._plans:
+                self._plans.move_to_end(statement)
+                return self._plans[statement]
+        # EXPLAIN outside _lock; two threads may plan the same statement, the last one is kept
+        if sql.lstrip().split(None, 1)[0].upper() not in _EXPLAINABLE:
+            plan = None
+        else:
+            try:
+                with self._explain_lock:
+                    rows = self._explainer().execute('EXPLAIN QUERY PLAN ' + sql, params or ()).fetchall()
+                plan = render_plan(rows)
+            except sqlite3.Error as e:
+                plan = [f'(no plan: {e})']
+        with self._lock:
+            self._plans[statement] = plan
+            self._plans.move_to_end(statement)
+            if len(self._plans) > MAX_STATEMENTS:
+                self._plans.popitem(last=False)
+        return plan
+
+    def _explainer(self):
+        # A plain read-only connection, (re)opened per process: the pool's cursors would report back here
+        if self._explain_pid != os.getpid():
+            path = os.path.abspath(self.database)
+            self._explain_conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+            self._explain_pid = os.getpid()
+        return self._explain_conn
+
+    # Report
+
+    def top(self, limit=20, sort='total'):
+        key = self.SORT_KEYS.get(sort, self.SORT_KEYS['total'])
+        with self._lock:
+            entries = sorted(self._statements.values(), key=key, reverse=True)[:limit]
+            statements = [entry.as_dict() for entry in entries]
+            distinct = len(self._statements)
+        return {
+            'threshold_ms': round(self.threshold * 1000, 3),
+            'since': self.started_at,
+            'slow_queries': self.slow,
+            'distinct_statements': distinct,
+            'sort': sort if sort in self.SORT_KEYS else 'total',
+            'statements': statements
+        }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._plans.clear()
+            self.slow = 0
+            self.started_at = time.time()
+
+
+def _source():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return threading.current_thread().name
@@ -0,0 +1,231 @@
+"""Local PhonePe PG stand-in for development, smoke tests and benchmarks.
+
+Serves the three endpoints the app calls, with keep-alive (HTTP/1.1):
+
+    POST /pg/v1/pay                      -> PAY_PAGE redirect, remembers the transaction
+    GET  /pg/v1/status/<merchant>/<txn>  -> the transaction's state (--state for unknown ones)
+    POST /pg/v1/refund                   -> refund accepted
+
+Point the app at it with mock mode off:
+
+    python stubs/phonepe_stub.py --port 8090
+    PHONEPE_MOCK_MODE=false PHONEPE_BASE_URL=http://127.0.0.1:8090 python app.py
+
+--delay and --fail-rate slow down or answer 500 to a share of requests, to
+exercise the client timeouts and circuit breaker. In-process use:
+
+    stub = PhonePeStub(port=0).start()   # stub.url is the base URL
+    stub.delay = 2.0                     # settings can be changed while it runs
+    stub.set_state('TXN_1_1700000000', 'FAILED')
+    stub.stats()
+    stub.stop()
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms per answer
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.stub._count('connections')
+
+    def log_message(self, format, *args):
+        if self.server.stub.verbose:
+            super().log_message(format, *args)
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting (read timeout)
+            self.close_connection = True
+
+    def _injected(self):
+        """Apply the configured delay/failure; True if the request was already answered"""
+        stub = self.server.stub
+        stub._count('requests')
+        if stub.delay:
+            time.sleep(stub.delay)
+        if stub.fail_rate and random.random() < stub.fail_rate:
+            stub._count('failed')
+            self.reply(500, {'success': False, 'code': 'INTERNAL_SERVER_ERROR', 'message': 'Stub failure'})
+            return True
+        if not self.headers.get('X-VERIFY'):
+            self.reply(400, {'success': False, 'code': 'BAD_REQUEST', 'message': 'X-VERIFY header missing'})
+            return True
+        return False
+
+    def _payload(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        return json.loads(base64.b64decode(body.get('request', '')) or b'{}')
+
+    def do_POST(self):
+        if self.path not in ('/pg/v1/pay', '/pg/v1/refund'):
+            self.reply(404, {'success': False, 'code': 'NOT_FOUND', 'message': 'Unknown endpoint'})
+            return
+        try:
+            payload = self._payload()
+        except ValueError:
+            self.reply(400, {'success': False, 'code': 'BAD_REQUEST', 'message': 'Malformed request'})
+            return
+        if self._injected():
+            return
+
+        stub = self.server.stub
+        transaction_id = payload.get('merchantTransactionId')
+        if self.path == '/pg/v1/pay':
+            stub._record(transaction_id, payload.get('amount', 0))
+            self.reply(200, {
+                'success': True,
+                'code': 'PAYMENT_INITIATED',
+                'message': 'Payment initiated',
+                'data': {
+                    'merchantId': payload.get('merchantId'),
+                    'merchantTransactionId': transaction_id,
+                    'instrumentResponse': {
+                        'type': 'PAY_PAGE',
+                        'redirectInfo': {'url': f'{stub.url}/pay-page/{transaction_id}', 'method': 'GET'}
+                    }
+                }
+            })
+        else:
+            stub._count('refunds')
+            self.reply(200, {
+                'success': True,
+                'code': 'PAYMENT_PENDING',
+                'message': 'Refund initiated',
+                'data': {
+                    'merchantId': payload.get('merchantId'),
+                    'merchantTransactionId': transaction_id,
+                    'transactionId': f'STUB_REFUND_{stub._next_id()}',
+                    'amount': payload.get('amount', 0),
+                    'state': 'PENDING'
+                }
+            })
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 5 or parts[:3] != ['pg', 'v1', 'status']:
+            self.reply(404, {'success': False, 'code': 'NOT_FOUND', 'message': 'Unknown endpoint'})
+            return
+        if self._injected():
+            return
+
+        stub = self.server.stub
+        transaction_id = parts[4]
+        state, amount = stub._lookup(transaction_id)
+        code = {'COMPLETED': 'PAYMENT_SUCCESS', 'FAILED': 'PAYMENT_ERROR'}.get(state, 'PAYMENT_PENDING')
+        self.reply(200, {
+            'success': True,
+            'code': code,
+            'message': f'Payment {state.lower()}',
+            'data': {
+                'merchantId': parts[3],
+                'merchantTransactionId': transaction_id,
+                'transactionId': f'STUB_{transaction_id}',
+                'amount': amount,
+                'state': state,
+                'responseCode': 'SUCCESS' if state == 'COMPLETED' else state,
+                'paymentInstrument': {'type': 'UPI', 'utr': f'STUB_UTR_{transaction_id}'}
+            }
+        })
+
+
+class PhonePeStub:
+    """Threaded HTTP server answering like the PhonePe PG sandbox"""
+
+    def __init__(self, host='127.0.0.1', port=8090, state='COMPLETED', delay=0.0, fail_rate=0.0, verbose=False):
+        self.host = host
+        self.port = port
+        self.state = state
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.transactions = {}
+        self._lock = threading.Lock()
+        self._counts = {'connections': 0, 'requests': 0, 'failed': 0, 'payments': 0, 'refunds': 0}
+        self._ids = 0
+        self._server = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def _next_id(self):
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def _record(self, transaction_id, amount):
+        with self._lock:
+            self._counts['payments'] += 1
+            self.transactions[transaction_id] = {'state': None, 'amount': amount}
+
+    def _lookup(self, transaction_id):
+        """(state, amount in paise); unknown transactions get the default state"""
+        with self._lock:
+            transaction = self.transactions.get(transaction_id) or {}
+        return transaction.get('state') or self.state, transaction.get('amount', 0)
+
+    def set_state(self, transaction_id, state):
+        with self._lock:
+            self.transactions.setdefault(transaction_id, {'state': None, 'amount': 0})['state'] = state
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='phonepe-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local PhonePe PG stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--state', default='COMPLETED', choices=['COMPLETED', 'PENDING', 'FAILED'],
+                        help='state reported for transactions without one set')
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before every answer')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of requests answered with 500')
+    args = parser.parse_args()
+
+    stub = PhonePeStub(args.host, args.port, args.state, args.delay, args.fail_rate, verbose=True).start()
+    print(f"💳 PhonePe stub listening on {stub.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""Local SMTP stand-in for development, smoke tests and benchmarks.
+
+Speaks just enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any
+credentials are accepted), MAIL, RCPT, DATA, RSET, NOOP and QUIT. STARTTLS
+is refused, so point the app at it with USE_TLS=false:
+
+    python stubs/smtp_stub.py --port 2525
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=2525 USE_TLS=false python app.py
+
+--fail-rate and --delay make it reject or slow down a share of messages, to
+exercise the outbox retries; --connect-delay stands in for the TCP/TLS
+handshake and login round trips of a remote server, and --session-limit
+closes a session with 421 after that many messages, as many providers do. In-process use:
+
+    stub = SMTPStub(port=0).start()   # stub.port is the bound port
+    ...
+    stub.messages, stub.stats()
+    stub.stop()
+"""
+import argparse
+import os
+import random
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        stub = self.server.stub
+        stub._count('connections')
+        if stub.connect_delay:
+            time.sleep(stub.connect_delay)
+        self.reply('220 hmx-smtp-stub ready')
+        sender, recipients, accepted = None, [], 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode(errors='replace').strip().partition(' ')
+            command = command.upper()
+
+            if command == 'EHLO':
+                self.wfile.write(b'250-hmx-smtp-stub\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+            elif command == 'HELO':
+                self.reply('250 hmx-smtp-stub')
+            elif command == 'AUTH':
+                if argument.upper() == 'LOGIN':
+                    self.reply('334 VXNlcm5hbWU6')
+                    self.rfile.readline()
+                    self.reply('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                elif argument.upper() == 'PLAIN':
+                    self.reply('334 ')
+                    self.rfile.readline()
+                self.reply('235 Authentication successful')
+            elif command == 'STARTTLS':
+                self.reply('454 TLS not available (set USE_TLS=false)')
+            elif command == 'MAIL':
+                if stub.session_limit and accepted >= stub.session_limit:
+                    self.reply('421 Too many messages in this session')
+                    return
+                sender, recipients = argument.split(':', 1)[-1].strip(' <>'), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(argument.split(':', 1)[-1].strip(' <>'))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = self._read_data()
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if stub.fail_rate and random.random() < stub.fail_rate:
+                    stub._count('rejected')
+                    self.reply('451 Temporary failure (stub)')
+                else:
+                    stub._store(sender, recipients, data)
+                    accepted += 1
+                    self.reply('250 OK: queued')
+                sender, recipients = None, []
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                stub._count('noops')
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            # Undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPStub:
+    """Threaded SMTP server that keeps accepted messages in memory (and optionally on disk)"""
+
+    def __init__(self, host='127.0.0.1', port=2525, fail_rate=0.0, delay=0.0, save_dir=None, verbose=False,
+                 keep=1000, connect_delay=0.0, session_limit=0):
+        self.host = host
+        self.port = port
+        self.fail_rate = fail_rate
+        self.delay = delay
+        self.connect_delay = connect_delay
+        self.session_limit = session_limit
+        self.save_dir = save_dir
+        self.verbose = verbose
+        self.keep = keep
+        self.messages = []
+        self._lock = threading.Lock()
+        self._counts = {'connections': 0, 'accepted': 0, 'rejected': 0, 'noops': 0}
+        self._server = None
+        self._thread = None
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def _store(self, sender, recipients, data):
+        message = {'from': sender, 'to': recipients, 'subject': message_from_bytes(data).get('Subject'),
+                   'data': data, 'at': time.time()}
+        with self._lock:
+            self._counts['accepted'] += 1
+            number = self._counts['accepted']
+            self.messages.append(message)
+            del self.messages[:-self.keep]
+        if self.save_dir:
+            with open(os.path.join(self.save_dir, f'{number:06d}.eml'), 'wb') as f:
+                f.write(data)
+        if self.verbose:
+            print(f"📨 {number}: {sender} -> {', '.join(recipients)}: {message['subject']}")
+
+    def start(self):
+        self._server = _Server((self.host, self.port), _Handler)
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='smtp-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SMTP stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of messages answered with 451')
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before answering DATA')
+    parser.add_argument('--connect-delay', type=float, default=0.0,
+                        help='seconds to wait before the greeting, like a remote TLS handshake + login')
+    parser.add_argument('--session-limit', type=int, default=0, help='messages per session before 421 (0 = no limit)')
+    parser.add_argument('--save-dir', help='also write each accepted message to this directory as .eml')
+    args = parser.parse_args()
+
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+    stub = SMTPStub(args.host, args.port, args.fail_rate, args.delay, args.save_dir, verbose=True,
+                    connect_delay=args.connect_delay, session_limit=args.session_limit).start()
+    print(f"📧 SMTP stub listening on {stub.host}:{stub.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()